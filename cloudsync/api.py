@@ -4,7 +4,9 @@ import io
 import json
 import re
 from collections import namedtuple
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import cache
 from pathlib import Path
 from urllib.parse import quote
 from uuid import uuid4
@@ -18,10 +20,15 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
+from django.db.models import Count, Q
 from mitol.transcoding.api import media_convert_job
-from PIL import ExifTags, Image, ImageOps
+from PIL import ExifTags, Image, ImageOps, features
 
-from ui.api import get_duration_from_encode_job
+from cloudsync.exceptions import MediaConvertResultError
+from cloudsync.hls import MasterPlaylist
+from cloudsync.invalidation import queue_cloudfront_invalidation
+from cloudsync.mediaconvert import OutputDetail, OutputGroupResult, TranscodeJobResult
+from odl_video import outbox
 from ui.constants import VideoStatus
 from ui.encodings import EncodingNames
 from ui.models import (
@@ -30,20 +37,42 @@ from ui.models import (
     EncodeJob,
     Video,
     VideoFile,
+    VideoRendition,
+    VideoStatusTransition,
     VideoSubtitle,
     VideoThumbnail,
+    deferred_playback_manifest_refresh,
     delete_s3_objects,
+    video_status_changed,
 )
-from ui.utils import get_bucket
+from ui.utils import get_bucket, now_in_utc
 
 log = structlog.get_logger(__name__)
 
 THUMBNAIL_PATTERN = "thumbnails/{}_thumbnail_{{count}}"
 RETRANSCODE_FOLDER = "retranscode/"
+RESULTS_TEMPLATE_PATH = "./config/results.json"
+RESULTS_PLACEHOLDER_PATTERN = re.compile(r"<([A-Z0-9_]+)>")
+MEDIACONVERT_THROTTLING_CODES = {
+    "TooManyRequestsException",
+    "ThrottlingException",
+    "Throttling",
+}
+# Videos with a MediaConvert job queued or running
+IN_FLIGHT_STATUSES = (
+    VideoStatus.TRANSCODING,
+    VideoStatus.RETRANSCODE_SCHEDULED,
+    VideoStatus.RETRANSCODING,
+)
 ParsedVideoAttributes = namedtuple(
     "ParsedVideoAttributes",
     ["prefix", "session", "record_date", "record_date_str", "name"],
 )
+ThumbnailVariant = namedtuple(
+    "ThumbnailVariant", ["width", "height", "content_type", "extension", "data"]
+)
+# Where uploaded thumbnail images wait for process_thumbnail_upload
+THUMBNAIL_STAGING_PREFIX = "thumbnails/uploads"
 
 
 def _s3_uri_to_key(s3_uri: str) -> str:
@@ -84,38 +113,19 @@ def _collect_output_keys(output_groups: list) -> list:
     return keys
 
 
-def _invalidate_cloudfront_paths(keys: list) -> None:
-    """Create a single CloudFront invalidation batch for a list of S3 object keys."""
-    dist_id = getattr(settings, "VIDEO_CDN_DISTRIBUTION_ID", "")
-    if not dist_id or not keys:
-        return
-    paths = [f"/{k}" for k in keys]
-    try:
-        cf_client = boto3.client("cloudfront")
-        cf_client.create_invalidation(
-            DistributionId=dist_id,
-            InvalidationBatch={
-                "Paths": {"Quantity": len(paths), "Items": paths},
-                "CallerReference": str(uuid4()),
-            },
-        )
-    except Exception:
-        log.exception(
-            "CloudFront invalidation failed",
-            distribution_id=dist_id,
-            path_count=len(paths),
-        )
-
-
-def process_transcode_results(results: dict) -> None:
+def process_transcode_results(results: TranscodeJobResult | dict) -> None:
     """
     Create VideoFile and VideoThumbnail objects for a Video based on AWS MediaConvert job output.
 
     Args:
-        results (dict): The MediaConvert job results from the callback.
+        results (TranscodeJobResult | dict): The MediaConvert job results, either parsed or
+            as the camelCase dict of a completion event.
     """
+    if isinstance(results, dict):
+        results = TranscodeJobResult.from_event(results)
+
     # Fetch job details
-    video_job = EncodeJob.objects.get(id=results.get("jobId"))
+    video_job = EncodeJob.objects.get(id=results.job_id)
     video = Video.objects.get(id=video_job.object_id)
 
     # Capture before update_status() changes it
@@ -123,7 +133,7 @@ def process_transcode_results(results: dict) -> None:
 
     # Update job state
     video_job.state = EncodeJob.State.COMPLETED
-    video_job.message = results
+    video_job.message = results.to_dict()
     video_job.save()
 
     if is_retranscode:
@@ -135,22 +145,28 @@ def process_transcode_results(results: dict) -> None:
             f"{RETRANSCODE_FOLDER}{TRANSCODE_PREFIX}/{video_key}",
             f"{TRANSCODE_PREFIX}/{video_key}",
         )
-    # Extract output groups
-    output_groups = results.get("outputGroupDetails", [])
 
-    for group in output_groups:
-        group_type = group.get("type")
+    # The manifest is rebuilt once, rather than for each output file
+    with deferred_playback_manifest_refresh(video):
+        for group in results.output_groups:
+            if group.is_hls:
+                process_hls_outputs(group.playlist_file_paths, video)
+            elif group.is_file:
+                process_mp4_outputs(group.outputs, video)
 
-        if "HLS_GROUP" in group_type:
-            process_hls_outputs(group.get("playlistFilePaths", []), video)
-        elif "FILE_GROUP" in group_type:
-            process_mp4_outputs(group.get("outputDetails", []), video)
+    # Best-effort like the playlist normalization: clients fall back to the
+    # master playlist when a video has no recorded renditions.
+    try:
+        index_renditions(results, video)
+    except Exception:
+        log.exception("Could not index video renditions", video_id=video.id)
 
-    video.duration = get_duration_from_encode_job(results)
-    video.update_status(VideoStatus.COMPLETE)
+    video.update_status(VideoStatus.COMPLETE, duration=results.duration)
 
     if is_retranscode:
-        _invalidate_cloudfront_paths(_collect_output_keys(output_groups))
+        queue_cloudfront_invalidation(
+            _collect_output_keys(video_job.message["outputGroupDetails"])
+        )
 
     # Ensure content_type and object_id are set for the EncodeJob
     content_type = ContentType.objects.get_for_model(video)
@@ -174,22 +190,92 @@ def process_hls_outputs(file_paths: list, video: Video) -> None:
             bucket_name = file_path.parts[1]
             s3_path = str(Path(*file_path.parts[2:])).replace(RETRANSCODE_FOLDER, "")
 
-            cleanup_and_upsert_video_file(
+            video_file = cleanup_and_upsert_video_file(
                 video, EncodingNames.HLS, s3_path, bucket_name
             )
+            # Sort the renditions now rather than in a later backfill. Best-effort:
+            # an unsorted playlist still plays, so this must not fail the transcode.
+            try:
+                normalize_hls_playlist(video_file)
+            except Exception:
+                log.exception(
+                    "Could not normalize HLS playlist",
+                    video_id=video.id,
+                    s3_object_key=s3_path,
+                )
+
+
+def normalize_hls_playlist(video_file: VideoFile, s3_client=None) -> bool:
+    """
+    Sort the variants of an HLS master playlist with the highest resolution first.
+
+    The ETag of the normalized playlist is stored on the VideoFile, so a playlist that
+    hasn't changed since it was last normalized is skipped without being downloaded.
+    The playlist is only written back if it hasn't changed since it was read.
+
+    Args:
+        video_file (VideoFile): An HLS VideoFile
+        s3_client (S3.Client): An optional S3 client to reuse
 
+    Returns:
+        bool: True if the playlist was rewritten
 
-def process_mp4_outputs(outputs: list, video: Video) -> None:
+    Raises:
+        InvalidPlaylistError: If the playlist can't be parsed
+    """
+    s3_client = s3_client or boto3.client("s3")
+    bucket = settings.VIDEO_S3_TRANSCODE_BUCKET
+    get_kwargs = {"Bucket": bucket, "Key": video_file.s3_object_key}
+    if video_file.playlist_etag:
+        get_kwargs["IfNoneMatch"] = video_file.playlist_etag
+    try:
+        s3_object = s3_client.get_object(**get_kwargs)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in ("304", "NotModified"):
+            return False
+        raise
+
+    content = s3_object["Body"].read().decode()
+    etag = s3_object["ETag"]
+    sorted_content = MasterPlaylist.parse(content).sorted().dumps()
+    if sorted_content != content:
+        try:
+            etag = s3_client.put_object(
+                Body=sorted_content.encode(),
+                Bucket=bucket,
+                Key=video_file.s3_object_key,
+                ContentType=s3_object.get("ContentType", "application/x-mpegURL"),
+                IfMatch=etag,
+            )["ETag"]
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] not in ("412", "PreconditionFailed"):
+                raise
+            # Rewritten since it was read (e.g. by a retranscode); the next run
+            # will see the new ETag and normalize that version.
+            log.warning(
+                "HLS playlist changed while being normalized",
+                video_file_id=video_file.id,
+                s3_object_key=video_file.s3_object_key,
+            )
+            return False
+
+    if etag != video_file.playlist_etag:
+        video_file.playlist_etag = etag
+        video_file.save(update_fields=["playlist_etag"])
+    return sorted_content != content
+
+
+def process_mp4_outputs(outputs: list[OutputDetail], video: Video) -> None:
     """
     Process MP4 outputs and create VideoFile objects.
     Args:
-        outputs (list): List of MP4 output details.
+        outputs (list[OutputDetail]): The outputs of a MediaConvert file group.
         video (Video): The video object to associate with the outputs.
     """
 
     # Process MP4 outputs
-    for playlist in outputs:
-        for file_path in playlist.get("outputFilePaths", []):
+    for output in outputs:
+        for file_path in output.file_paths:
             file_path = Path(file_path)
             bucket_name = file_path.parts[1]
             s3_path = str(Path(*file_path.parts[2:])).replace(RETRANSCODE_FOLDER, "")
@@ -204,16 +290,124 @@ def process_mp4_outputs(outputs: list, video: Video) -> None:
                         "video": video,
                         "bucket_name": bucket_name,
                         "preset_id": "",
-                        "max_width": playlist.get("videoDetails", {}).get(
-                            "widthInPx", 0
-                        ),
-                        "max_height": playlist.get("videoDetails", {}).get(
-                            "heightInPx", 0
-                        ),
+                        "max_width": output.width or 0,
+                        "max_height": output.height or 0,
                     },
                 )
 
 
+def index_renditions(
+    results: TranscodeJobResult, video: Video, s3_client=None
+) -> list[VideoRendition]:
+    """
+    Record the renditions of a transcoded video from the job output and the HLS
+    master playlist, replacing any recorded for an earlier transcode.
+
+    Args:
+        results (TranscodeJobResult): The MediaConvert job results
+        video (Video): The transcoded video
+        s3_client (S3.Client): An optional S3 client to reuse
+
+    Returns:
+        list[VideoRendition]: The recorded renditions
+    """
+    s3_client = s3_client or boto3.client("s3")
+    renditions = []
+    for group in results.output_groups:
+        if group.is_hls:
+            renditions.extend(_hls_renditions(group, video, s3_client))
+        elif group.is_file and not group.is_thumbnail:
+            renditions.extend(_mp4_renditions(group, video, s3_client))
+    with transaction.atomic():
+        VideoRendition.objects.filter(video=video).delete()
+        return VideoRendition.objects.bulk_create(renditions)
+
+
+def _served_location(s3_uri: str) -> tuple[str, str]:
+    """Return the bucket and key an output is served from after a retranscode move"""
+    return s3_uri.split("/", 3)[2], _s3_uri_to_key(s3_uri).replace(
+        RETRANSCODE_FOLDER, "", 1
+    )
+
+
+def _hls_renditions(
+    group: OutputGroupResult, video: Video, s3_client
+) -> list[VideoRendition]:
+    """VideoRenditions for the variant streams of an HLS output group"""
+    master_path = next(
+        (path for path in group.playlist_file_paths if path.endswith("__index.m3u8")),
+        None,
+    )
+    if master_path is None:
+        return []
+    bucket, master_key = _served_location(master_path)
+    master = MasterPlaylist.parse(
+        s3_client.get_object(Bucket=bucket, Key=master_key)["Body"].read().decode()
+    )
+    outputs = {
+        _served_location(path)[1]: output
+        for output in group.outputs
+        for path in output.file_paths
+    }
+    directory = master_key.rsplit("/", 1)[0] if "/" in master_key else ""
+
+    renditions = []
+    for variant in master.variants:
+        key = f"{directory}/{variant.uri}" if directory else variant.uri
+        output = outputs.get(key)
+        width, height = variant.resolution or (
+            (output.width, output.height) if output else (None, None)
+        )
+        segment_count, byte_size = 0, 0
+        paginator = s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=bucket, Prefix=f"{key.removesuffix('.m3u8')}_"
+        ):
+            for s3_object in page.get("Contents", []):
+                segment_count += 1
+                byte_size += s3_object["Size"]
+        renditions.append(
+            VideoRendition(
+                video=video,
+                encoding=EncodingNames.HLS,
+                s3_object_key=key,
+                width=width,
+                height=height,
+                bandwidth=variant.bandwidth,
+                codecs=",".join(variant.codecs),
+                byte_size=byte_size,
+                segment_count=segment_count,
+            )
+        )
+    return renditions
+
+
+def _mp4_renditions(
+    group: OutputGroupResult, video: Video, s3_client
+) -> list[VideoRendition]:
+    """VideoRenditions for the MP4 files of a file output group"""
+    renditions = []
+    for output in group.outputs:
+        for path in output.file_paths:
+            if not path.endswith(".mp4"):
+                continue
+            bucket, key = _served_location(path)
+            renditions.append(
+                VideoRendition(
+                    video=video,
+                    encoding=EncodingNames.DESKTOP_MP4,
+                    s3_object_key=key,
+                    width=output.width,
+                    height=output.height,
+                    bandwidth=output.average_bitrate,
+                    byte_size=s3_client.head_object(Bucket=bucket, Key=key)[
+                        "ContentLength"
+                    ],
+                )
+            )
+    return renditions
+
+
 def get_error_type_from_et_error(et_error):
     """
     Parses an Elastic transcoder error string and matches the error to an error in VideoStatus
@@ -250,8 +444,15 @@ def refresh_status(video: Video, encode_job: EncodeJob = None) -> None:
             encode_job = video.encode_jobs.latest("created_at")
         mc_job = get_media_convert_job(encode_job.id)
         if mc_job["Job"]["Status"].lower() == VideoStatus.COMPLETE.lower():
-            with open("./config/results.json", encoding="utf-8") as f:
-                results = prepare_results(video, encode_job, f.read())
+            try:
+                results = TranscodeJobResult.from_job(mc_job["Job"])
+            except MediaConvertResultError:
+                log.warning(
+                    "MediaConvert job output is incomplete, using results template",
+                    video_id=video.id,
+                    job_id=encode_job.id,
+                )
+                results = prepare_results(video, encode_job, _results_template())
             process_transcode_results(results)
         elif mc_job["Job"]["Status"].lower() == VideoStatus.ERROR.lower():
             if video.status == VideoStatus.RETRANSCODING:
@@ -269,63 +470,243 @@ def get_media_convert_job(job_id: str) -> dict:
     Returns:
         dict: The MediaConvert job details.
     """
-    client = boto3.client(
+    results = _mediaconvert_client().get_job(Id=job_id)
+    return results
+
+
+def _mediaconvert_client():
+    """Return a MediaConvert client for the configured endpoint"""
+    return boto3.client(
         "mediaconvert",
         region_name=settings.AWS_REGION,
         aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
         endpoint_url=settings.VIDEO_S3_TRANSCODE_ENDPOINT,
     )
-    results = client.get_job(Id=job_id)
-    return results
 
 
-def prepare_results(video: Video, job: EncodeJob, results: str) -> dict:
+def is_throttling_error(exc: ClientError) -> bool:
+    """
+    Returns True if an AWS error means the request was throttled and may be retried later
+    """
+    return exc.response.get("Error", {}).get("Code") in MEDIACONVERT_THROTTLING_CODES
+
+
+def get_mediaconvert_queue_depth() -> int:
     """
-    Prepares the results from the MediaConvert job.
+    Count the jobs waiting to start in the MediaConvert queue used for transcoding.
+
+    Returns:
+        int: The number of SUBMITTED jobs
+    """
+    queue = (
+        f"arn:aws:mediaconvert:{settings.AWS_REGION}:"
+        f"{settings.AWS_ACCOUNT_ID}:queues/{settings.VIDEO_TRANSCODE_QUEUE}"
+    )
+    client = _mediaconvert_client()
+    depth = 0
+    kwargs = {"Queue": queue, "Status": "SUBMITTED", "MaxResults": 20}
+    while True:
+        response = client.list_jobs(**kwargs)
+        depth += len(response.get("Jobs", []))
+        if not response.get("NextToken"):
+            return depth
+        kwargs["NextToken"] = response["NextToken"]
+
+
+def get_retranscode_slots() -> int:
+    """
+    Number of retranscodes that can be started now without crowding out uploads.
+
+    Transcodes of new uploads and retranscodes already started both count against
+    RETRANSCODE_MAX_IN_FLIGHT, so uploads always have priority. Nothing is admitted
+    while the MediaConvert queue already has RETRANSCODE_MAX_QUEUE_DEPTH jobs waiting.
+
+    Returns:
+        int: The number of retranscodes to start
+    """
+    in_flight = Video.objects.filter(status__in=IN_FLIGHT_STATUSES).count()
+    slots = min(
+        settings.RETRANSCODE_MAX_IN_FLIGHT - in_flight,
+        settings.RETRANSCODE_WAVE_SIZE,
+    )
+    if slots <= 0:
+        return 0
+    if get_mediaconvert_queue_depth() >= settings.RETRANSCODE_MAX_QUEUE_DEPTH:
+        return 0
+    return slots
+
+
+def admit_retranscodes(count: int) -> list[int]:
+    """
+    Move the oldest videos scheduled for a retranscode to RETRANSCODE_SCHEDULED, with
+    a single UPDATE, and clear their schedule_retranscode flag. They then count as in
+    flight while their retranscode_video tasks wait in the queue, and the next wave
+    doesn't admit them again.
+
     Args:
-        results (str): The MediaConvert job results.
+        count (int): The most videos to admit
+
     Returns:
-        dict: The prepared results.
-    """
-    # Load the results from the JSON file
-
-    results = results.replace("<JOB_ID>", job.id)
-
-    for key in [
-        "AWS_ACCOUNT_ID",
-        "AWS_REGION",
-        "VIDEO_TRANSCODE_QUEUE",
-        "VIDEO_S3_TRANSCODE_BUCKET",
-        "VIDEO_S3_TRANSCODE_PREFIX",
-        "VIDEO_S3_THUMBNAIL_BUCKET",
-        "VIDEO_S3_THUMBNAIL_PREFIX",
-    ]:
-        results = results.replace(
-            f"<{key}>",
-            (
-                RETRANSCODE_FOLDER + getattr(settings, key, "")
-                if (
-                    key == "VIDEO_S3_TRANSCODE_PREFIX"
-                    and video.status == VideoStatus.RETRANSCODING
-                )
-                else getattr(settings, key, "")
+        list[int]: The ids of the admitted videos, oldest first
+    """
+    admissible = [
+        status
+        for status in VideoStatus.ALL_STATUSES
+        if VideoStatus.can_transition(status, VideoStatus.RETRANSCODE_SCHEDULED)
+    ]
+    updated_at = now_in_utc()
+    with transaction.atomic():
+        videos = list(
+            Video.objects.select_for_update()
+            .filter(schedule_retranscode=True, status__in=admissible)
+            .order_by("created_at")[:count]
+        )
+        Video.objects.filter(id__in=[video.id for video in videos]).update(
+            status=VideoStatus.RETRANSCODE_SCHEDULED,
+            schedule_retranscode=False,
+            updated_at=updated_at,
+        )
+        VideoStatusTransition.objects.bulk_create(
+            VideoStatusTransition(
+                video=video,
+                from_status=video.status,
+                to_status=VideoStatus.RETRANSCODE_SCHEDULED,
+            )
+            for video in videos
+        )
+        for video in videos:
+            from_status = video.status
+            video.status = VideoStatus.RETRANSCODE_SCHEDULED
+            video.schedule_retranscode = False
+            video.updated_at = updated_at
+            video_status_changed.send(
+                sender=Video,
+                video=video,
+                from_status=from_status,
+                to_status=VideoStatus.RETRANSCODE_SCHEDULED,
+            )
+    return [video.id for video in videos]
+
+
+def get_retranscode_progress() -> list[dict]:
+    """
+    Report the progress of scheduled retranscodes for each collection.
+
+    The ETA assumes each remaining wave takes as long as the average transcode job
+    finished in the last day, or the scheduling interval if that is longer.
+
+    Returns:
+        list[dict]: Progress for each collection with retranscodes waiting or running
+    """
+    recent_jobs = EncodeJob.objects.filter(
+        state=EncodeJob.State.COMPLETED,
+        last_modified__gte=now_in_utc() - timedelta(days=1),
+    ).values_list("created_at", "last_modified")
+    durations = [(end - start).total_seconds() for start, end in recent_jobs]
+    wave_seconds = max(
+        sum(durations) / len(durations) if durations else 0,
+        settings.SCHEDULE_RETRANSCODE_FREQUENCY,
+    )
+
+    progress = []
+    for collection in (
+        Collection.objects.annotate(
+            waiting=Count("videos", filter=Q(videos__schedule_retranscode=True)),
+            in_flight=Count(
+                "videos",
+                filter=Q(
+                    videos__status__in=(
+                        VideoStatus.RETRANSCODE_SCHEDULED,
+                        VideoStatus.RETRANSCODING,
+                    )
+                ),
+            ),
+            failed=Count(
+                "videos", filter=Q(videos__status=VideoStatus.RETRANSCODE_FAILED)
             ),
         )
-    video_key = video.video_s3_prefix()
-    results = results.replace("<VIDEO_KEY>", video_key).replace("<VIDEO_NAME>", "video")
+        .filter(Q(waiting__gt=0) | Q(in_flight__gt=0))
+        .order_by("created_at")
+    ):
+        remaining = collection.waiting + collection.in_flight
+        waves = -(-remaining // max(settings.RETRANSCODE_WAVE_SIZE, 1))
+        progress.append(
+            {
+                "collection_id": collection.id,
+                "collection_title": collection.title,
+                "waiting": collection.waiting,
+                "in_flight": collection.in_flight,
+                "failed": collection.failed,
+                "eta_seconds": int(waves * wave_seconds),
+            }
+        )
+    return progress
 
-    # Decode the JSON string
-    try:
-        results = json.loads(results)
 
-        if video.status == VideoStatus.RETRANSCODING:
-            results["outputGroupDetails"] = results.get("outputGroupDetails", [])[:-1]
+@cache
+def _results_template() -> str:
+    """
+    Read the MediaConvert results template once per process.
+
+    Only used as a fallback when a job's own output cannot be parsed.
+    """
+    with open(RESULTS_TEMPLATE_PATH, encoding="utf-8") as f:
+        return f.read()
+
+
+def prepare_results(video: Video, job: EncodeJob, results: str) -> TranscodeJobResult:
+    """
+    Fill in the MediaConvert results template for a video.
+
+    Args:
+        video (Video): The video that was transcoded.
+        job (EncodeJob): The job that transcoded it.
+        results (str): The results template, with <PLACEHOLDER> values.
+    Returns:
+        TranscodeJobResult: The prepared results.
+
+    Raises:
+        MediaConvertResultError: If the filled-in template is not valid JSON.
+    """
+    replacements = {
+        key: getattr(settings, key, "")
+        for key in (
+            "AWS_ACCOUNT_ID",
+            "AWS_REGION",
+            "VIDEO_TRANSCODE_QUEUE",
+            "VIDEO_S3_TRANSCODE_BUCKET",
+            "VIDEO_S3_TRANSCODE_PREFIX",
+            "VIDEO_S3_THUMBNAIL_BUCKET",
+            "VIDEO_S3_THUMBNAIL_PREFIX",
+        )
+    }
+    if video.status == VideoStatus.RETRANSCODING:
+        replacements["VIDEO_S3_TRANSCODE_PREFIX"] = (
+            RETRANSCODE_FOLDER + replacements["VIDEO_S3_TRANSCODE_PREFIX"]
+        )
+    replacements.update(
+        {
+            "JOB_ID": job.id,
+            "VIDEO_KEY": video.video_s3_prefix(),
+            "VIDEO_NAME": "video",
+        }
+    )
+    results = RESULTS_PLACEHOLDER_PATTERN.sub(
+        lambda match: replacements.get(match.group(1), match.group(0)), results
+    )
 
-    except json.JSONDecodeError:
+    try:
+        prepared = TranscodeJobResult.from_event(json.loads(results))
+    except json.JSONDecodeError as exc:
         log.error("Failed to decode MediaConvert job results")
-        return {}
-    return results
+        raise MediaConvertResultError(
+            f"Could not prepare results for MediaConvert job {job.id}"
+        ) from exc
+    if video.status == VideoStatus.RETRANSCODING:
+        # Retranscodes don't generate a new thumbnail
+        prepared = prepared.without_thumbnails()
+    return prepared
 
 
 def _get_template_path(video: Video) -> str | None:
@@ -366,6 +747,7 @@ def transcode_video(
 
     job_id = str(uuid4())
     job_message_data = {"Status": "Submitted"}
+    throttled = False
     try:
         # Start the MediaConvert job
         job = media_convert_job(
@@ -381,34 +763,44 @@ def transcode_video(
     except ClientError as exc:
         log.error("Transcode job creation failed", video_id=video.id)
         if video.status == VideoStatus.RETRANSCODE_SCHEDULED:
-            video.update_status(VideoStatus.RETRANSCODE_FAILED)
+            # A throttled retranscode is rescheduled by the caller instead, without
+            # a job or a status change here
+            throttled = is_throttling_error(exc)
+            if not throttled:
+                video.update_status(VideoStatus.RETRANSCODE_FAILED)
         else:
             video.update_status(VideoStatus.TRANSCODE_FAILED_INTERNAL)
         if hasattr(exc, "response"):
             job_message_data = exc.response
         raise
     finally:
-        # Get the content type for the Video model
-        content_type = ContentType.objects.get_for_model(video)
-        # Create or update the EncodeJob instance
-        EncodeJob.objects.get_or_create(
-            id=job_id,
-            defaults={
-                "content_type": content_type,
-                "object_id": video.pk,
-                "message": job_message_data,
-            },
-        )
+        if not throttled:
+            _record_transcode_job(video, job_id, job_message_data)
 
-        # Update video status
-        if video.status == VideoStatus.RETRANSCODE_SCHEDULED:
-            video.update_status(VideoStatus.RETRANSCODING)
-        elif video.status not in (
-            VideoStatus.TRANSCODE_FAILED_INTERNAL,
-            VideoStatus.TRANSCODE_FAILED_VIDEO,
-            VideoStatus.RETRANSCODE_FAILED,
-        ):
-            video.update_status(VideoStatus.TRANSCODING)
+
+def _record_transcode_job(video, job_id, job_message_data):
+    """Create the EncodeJob of a transcode and move the video to its next status"""
+    # Get the content type for the Video model
+    content_type = ContentType.objects.get_for_model(video)
+    # Create or update the EncodeJob instance
+    EncodeJob.objects.get_or_create(
+        id=job_id,
+        defaults={
+            "content_type": content_type,
+            "object_id": video.pk,
+            "message": job_message_data,
+        },
+    )
+
+    # Update video status
+    if video.status == VideoStatus.RETRANSCODE_SCHEDULED:
+        video.update_status(VideoStatus.RETRANSCODING)
+    elif video.status not in (
+        VideoStatus.TRANSCODE_FAILED_INTERNAL,
+        VideoStatus.TRANSCODE_FAILED_VIDEO,
+        VideoStatus.RETRANSCODE_FAILED,
+    ):
+        video.update_status(VideoStatus.TRANSCODING)
 
 
 def create_lecture_collection_slug(video_attributes):
@@ -754,8 +1146,8 @@ def replace_thumbnail_in_s3(thumbnail, file_data):
     thumbnail.max_height = height
     thumbnail.save(update_fields=["max_width", "max_height"])
 
-    # Invalidate the CloudFront cache so the new image is served immediately.
-    _invalidate_cloudfront_paths([thumbnail.s3_object_key])
+    # Invalidate the CloudFront cache so the new image is served shortly.
+    queue_cloudfront_invalidation([thumbnail.s3_object_key])
 
 
 def create_thumbnail_in_s3(video, file_data):
@@ -803,6 +1195,316 @@ def create_thumbnail_in_s3(video, file_data):
     )
 
 
+def check_thumbnail_image(file_data):
+    """
+    Check from its header, without decoding it, that an uploaded image is a JPEG or
+    PNG image
+
+    Args:
+        file_data: A file-like object containing the image.
+
+    Raises:
+        ValueError: If the file isn't a JPEG or PNG image.
+    """
+    try:
+        with Image.open(file_data) as img:
+            img_format = img.format
+    except Exception as exc:
+        raise ValueError(f"Could not decode image: {exc}") from exc
+    finally:
+        file_data.seek(0)
+    if img_format not in ("JPEG", "PNG"):
+        raise ValueError(
+            f"Unsupported image format: {img_format!r}. Only JPEG and PNG are supported."
+        )
+
+
+def stage_thumbnail_upload(video, file_data):
+    """
+    Store an uploaded image in the thumbnail bucket until process_thumbnail_upload
+    processes it. A lifecycle rule should expire images left under
+    THUMBNAIL_STAGING_PREFIX.
+
+    Args:
+        video (Video): The video the image is a thumbnail for.
+        file_data (UploadedFile): The uploaded image.
+
+    Returns:
+        str: The S3 key of the stored image.
+    """
+    s3_key = f"{THUMBNAIL_STAGING_PREFIX}/{video.hexkey}/{uuid4().hex}"
+    boto3.client("s3").put_object(
+        Bucket=settings.VIDEO_S3_THUMBNAIL_BUCKET, Key=s3_key, Body=file_data.read()
+    )
+    return s3_key
+
+
+def _thumbnail_formats():
+    """The PIL format, content type, extension and save options of each version"""
+    formats = [("JPEG", "image/jpeg", "jpg", {})]
+    if features.check("webp"):
+        formats.append(
+            (
+                "WEBP",
+                "image/webp",
+                "webp",
+                {"quality": settings.THUMBNAIL_WEBP_QUALITY},
+            )
+        )
+    return formats
+
+
+def render_thumbnail_variants(file_data, max_width=None, max_height=None, widths=None):
+    """
+    Decode an uploaded image once and render the versions of a thumbnail from it: the
+    image downscaled to fit the maximum dimensions, and each smaller width, as JPEG
+    and (if PIL supports it) WebP.
+
+    JPEGs are decoded in draft mode, so libjpeg scales them down by up to 8 while
+    decoding, to the smallest size still larger than the largest version. As in
+    convert_image_to_jpeg, a JPEG which doesn't need resizing or rotating is kept
+    as it is.
+
+    Args:
+        file_data: A file-like object containing the source image.
+        max_width (int | None): Maximum width in pixels. Defaults to
+            ``settings.THUMBNAIL_UPLOAD_MAX_WIDTH``.
+        max_height (int | None): Maximum height in pixels. Defaults to
+            ``settings.THUMBNAIL_UPLOAD_MAX_HEIGHT``.
+        widths (list[int] | None): Widths of the smaller versions. Defaults to
+            ``settings.THUMBNAIL_VARIANT_WIDTHS``.
+
+    Returns:
+        list[ThumbnailVariant]: The versions, largest first, with the JPEG of each
+        size first.
+
+    Raises:
+        ValueError: If the file cannot be decoded or is not a JPEG or PNG image.
+    """
+    if max_width is None:
+        max_width = settings.THUMBNAIL_UPLOAD_MAX_WIDTH
+    if max_height is None:
+        max_height = settings.THUMBNAIL_UPLOAD_MAX_HEIGHT
+    if widths is None:
+        widths = settings.THUMBNAIL_VARIANT_WIDTHS
+    if max_width <= 0 or max_height <= 0:
+        raise ValueError(
+            f"Invalid thumbnail max dimensions: {max_width}x{max_height}. Both must be positive integers."
+        )
+    formats = _thumbnail_formats()
+    try:
+        with Image.open(file_data) as img:
+            img_format = img.format
+            if img_format not in ("JPEG", "PNG"):
+                raise ValueError(
+                    f"Unsupported image format: {img_format!r}. Only JPEG and PNG are supported."
+                )
+            exif_changed = img.getexif().get(ExifTags.Base.Orientation, 1) != 1
+            orig_size = img.size
+            if img_format == "JPEG":
+                # Either side may become the width once the EXIF orientation is applied
+                longest = max(max_width, max_height)
+                img.draft("RGB", (longest, longest))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_width, max_height), Image.LANCZOS)
+            keep_original = (
+                img_format == "JPEG" and not exif_changed and img.size == orig_size
+            )
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+
+            variants = []
+            sizes = [img.width] + sorted(
+                {width for width in widths if 0 < width < img.width}, reverse=True
+            )
+            for width in sizes:
+                if width != img.width:
+                    # Each size is scaled down from the previous one
+                    height = max(1, round(img.height * width / img.width))
+                    img = img.resize((width, height), Image.LANCZOS)
+                for pil_format, content_type, extension, options in formats:
+                    if keep_original and not variants:
+                        file_data.seek(0)
+                        data = file_data.read()
+                    else:
+                        output = io.BytesIO()
+                        img.save(output, format=pil_format, **options)
+                        data = output.getvalue()
+                    variants.append(
+                        ThumbnailVariant(
+                            img.width, img.height, content_type, extension, data
+                        )
+                    )
+            return variants
+    except ValueError:
+        raise
+    except Exception as exc:
+        raise ValueError(f"Could not decode image: {exc}") from exc
+
+
+def _upload_thumbnail_variants(bucket_name, uploads):
+    """
+    Upload the versions of a thumbnail to S3, THUMBNAIL_UPLOAD_CONCURRENCY at a time
+
+    Args:
+        bucket_name (str): The bucket name
+        uploads (list[tuple[str, ThumbnailVariant]]): The S3 key and version of each
+            upload
+    """
+    s3_client = boto3.client("s3")
+    with ThreadPoolExecutor(
+        max_workers=max(1, settings.THUMBNAIL_UPLOAD_CONCURRENCY)
+    ) as executor:
+        futures = [
+            executor.submit(
+                s3_client.put_object,
+                Bucket=bucket_name,
+                Key=key,
+                Body=variant.data,
+                ContentType=variant.content_type,
+            )
+            for key, variant in uploads
+        ]
+    for future in futures:
+        future.result()
+
+
+def _is_older_upload(thumbnail, uploaded_at):
+    """Return True if a thumbnail already has an image uploaded after uploaded_at"""
+    return (
+        thumbnail is not None
+        and uploaded_at is not None
+        and thumbnail.uploaded_at is not None
+        and thumbnail.uploaded_at >= uploaded_at
+    )
+
+
+def _publish_largest_thumbnail(video):
+    """
+    Copy the largest JPEG of the latest upload ingested for a video to the key of its
+    thumbnail. An upload that is ingested meanwhile may copy its own image first, so
+    the copy is repeated until the latest upload doesn't change during it.
+
+    Args:
+        video (Video): The video.
+
+    Returns:
+        VideoThumbnail: The thumbnail
+    """
+    s3_client = boto3.client("s3")
+    copied = None
+    while True:
+        thumbnail = video.videothumbnail_set.first()
+        source_key = thumbnail.variants[0]["key"]
+        if source_key == copied:
+            return thumbnail
+        try:
+            s3_client.copy_object(
+                Bucket=thumbnail.bucket_name,
+                Key=thumbnail.s3_object_key,
+                CopySource={"Bucket": thumbnail.bucket_name, "Key": source_key},
+                ContentType=thumbnail.variants[0]["content_type"],
+                MetadataDirective="REPLACE",
+            )
+        except ClientError:
+            # A newer upload may have replaced and deleted the image meanwhile
+            if video.videothumbnail_set.first().variants[0]["key"] == source_key:
+                raise
+        copied = source_key
+
+
+def ingest_thumbnail(video, file_data, uploaded_at=None):
+    """
+    Replace the thumbnail of a video with the versions of an uploaded image. Each
+    version is stored under a key of its own upload, and the largest JPEG is then
+    copied to the S3 object of the thumbnail, so its URL never changes. A thumbnail
+    is created if the video has none.
+
+    An upload older than the one the thumbnail already has is dropped, so uploads
+    processed out of order can't replace a newer image. The video row is only
+    locked to compare the uploads and update the thumbnail, not during S3 requests.
+
+    Args:
+        video (Video): The video.
+        file_data: A file-like object containing the uploaded image.
+        uploaded_at (datetime | None): When the image was uploaded.
+
+    Returns:
+        VideoThumbnail: The thumbnail, with its versions, or None if a newer upload
+        was already ingested.
+
+    Raises:
+        ValueError: If the file cannot be decoded or is not a JPEG or PNG image.
+    """
+    variants = render_thumbnail_variants(file_data)
+    thumbnail = video.videothumbnail_set.first()
+    if _is_older_upload(thumbnail, uploaded_at):
+        log.info(
+            "Dropping a thumbnail upload older than the current thumbnail",
+            video_id=video.id,
+            uploaded_at=uploaded_at,
+        )
+        return None
+    created = thumbnail is None
+    if created:
+        thumbnail = VideoThumbnail(
+            video=video,
+            bucket_name=settings.VIDEO_S3_THUMBNAIL_BUCKET,
+            s3_object_key=f"thumbnails/{video.hexkey}/video_thumbnail.0000000.jpg",
+        )
+    upload_id = uuid4().hex[:12]
+    uploads = [
+        (
+            f"{thumbnail.s3_basename}_{upload_id}_{variant.width}w.{variant.extension}",
+            variant,
+        )
+        for variant in variants
+    ]
+    try:
+        _upload_thumbnail_variants(thumbnail.bucket_name, uploads)
+    except Exception:
+        log.exception(
+            "An error occurred uploading thumbnail versions to S3",
+            s3_object_key=thumbnail.s3_object_key,
+        )
+        raise
+
+    with transaction.atomic():
+        Video.objects.select_for_update().filter(pk=video.pk).exists()
+        current = video.videothumbnail_set.first()
+        if _is_older_upload(current, uploaded_at):
+            log.info(
+                "Dropping a thumbnail upload older than the current thumbnail",
+                video_id=video.id,
+                uploaded_at=uploaded_at,
+            )
+            for key, _ in uploads:
+                outbox.enqueue(delete_s3_objects.si(thumbnail.bucket_name, key))
+            return None
+        if current is not None:
+            thumbnail = current
+        for variant in thumbnail.variants:
+            outbox.enqueue(delete_s3_objects.si(thumbnail.bucket_name, variant["key"]))
+        thumbnail.max_width = variants[0].width
+        thumbnail.max_height = variants[0].height
+        thumbnail.uploaded_at = uploaded_at
+        thumbnail.variants = [
+            {
+                "key": key,
+                "width": variant.width,
+                "height": variant.height,
+                "content_type": variant.content_type,
+            }
+            for key, variant in uploads
+        ]
+        thumbnail.save()
+    thumbnail = _publish_largest_thumbnail(video)
+    if not created:
+        # Invalidate the CloudFront cache so the new image is served shortly.
+        queue_cloudfront_invalidation([thumbnail.s3_object_key])
+    return thumbnail
+
+
 def move_s3_objects(bucket_name, from_prefix, to_prefix):
     """
     Copies files from one prefix (subfolder) to another, then deletes the originals
@@ -816,12 +1518,12 @@ def move_s3_objects(bucket_name, from_prefix, to_prefix):
     for obj in bucket.objects.filter(Prefix=from_prefix):
         copy_src = {"Bucket": bucket_name, "Key": obj.key}
         bucket.copy(copy_src, Key=obj.key.replace(from_prefix, to_prefix))
-    delete_s3_objects.delay(bucket_name, from_prefix, as_filter=True)
+    outbox.enqueue(delete_s3_objects.si(bucket_name, from_prefix, as_filter=True))
 
 
 def cleanup_and_upsert_video_file(
     video: Video, encoding: str, s3_path: str, bucket_name: str
-) -> None:
+) -> VideoFile:
     """
     Ensures there is only one VideoFile object for a given video and encoding.
     If there are duplicates, delete them. Then, create or update the VideoFile object
@@ -832,6 +1534,9 @@ def cleanup_and_upsert_video_file(
         encoding (str): The encoding type to check for duplicates.
         s3_path (str): The s3_object_key that should be retained.
         bucket_name (str): The S3 bucket name where the video file is stored.
+
+    Returns:
+        VideoFile: The created or updated VideoFile
     """
     video_files = VideoFile.objects.filter(video=video, encoding=encoding)
     for vf in video_files:
@@ -855,7 +1560,7 @@ def cleanup_and_upsert_video_file(
                     error=str(exc),
                 )
 
-    VideoFile.objects.update_or_create(
+    video_file, _ = VideoFile.objects.update_or_create(
         s3_object_key=s3_path,
         defaults={
             "video": video,
@@ -864,3 +1569,4 @@ def cleanup_and_upsert_video_file(
             "preset_id": "",
         },
     )
+    return video_file
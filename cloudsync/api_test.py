@@ -5,7 +5,7 @@ Tests for api
 import io
 import os
 import uuid
-from datetime import datetime
+from datetime import UTC, datetime, timedelta
 from types import SimpleNamespace
 
 import boto3
@@ -17,36 +17,54 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import transaction
 from django.test import override_settings
 from moto import mock_aws
-from PIL import Image
+from PIL import Image, JpegImagePlugin
 
 from cloudsync import api
 from cloudsync.api import (
     RETRANSCODE_FOLDER,
     _collect_output_keys,
-    _invalidate_cloudfront_paths,
     _s3_uri_to_key,
+    check_thumbnail_image,
     convert_image_to_jpeg,
     create_thumbnail_in_s3,
+    get_mediaconvert_queue_depth,
+    get_retranscode_progress,
+    get_retranscode_slots,
+    index_renditions,
+    ingest_thumbnail,
     move_s3_objects,
+    normalize_hls_playlist,
+    process_hls_outputs,
+    render_thumbnail_variants,
     replace_thumbnail_in_s3,
     upload_subtitle_to_s3,
 )
-from cloudsync.conftest import MockBoto, MockClientMC
+from cloudsync.conftest import MockBoto, MockClientMC, recorded_mediaconvert_job
+from cloudsync.exceptions import MediaConvertResultError
+from cloudsync.mediaconvert import TranscodeJobResult
 from ui.constants import VideoStatus
+from ui.encodings import EncodingNames
 from ui.factories import (
     CollectionFactory,
     EncodeJobFactory,
     UserFactory,
     VideoFactory,
     VideoFileFactory,
+    VideoRenditionFactory,
     VideoSubtitleFactory,
     VideoThumbnailFactory,
 )
-from ui.models import TRANSCODE_PREFIX, Video
+from ui.models import TRANSCODE_PREFIX, EncodeJob, Video
 
 pytestmark = pytest.mark.django_db
 
 
+@pytest.fixture(autouse=True)
+def queue_invalidation_mock(mocker):
+    """Keep CloudFront invalidations from being queued in redis"""
+    return mocker.patch("cloudsync.api.queue_cloudfront_invalidation")
+
+
 @pytest.fixture()
 def video():
     """Fixture to create a video"""
@@ -105,7 +123,7 @@ def test_refresh_status_video_job_status_error(mocker, prior_status, error_statu
         }
     }
     mocker.patch("cloudsync.api.boto3", MockBoto)
-    mocker.patch("ui.models.tasks")
+    mocker.patch("mail.tasks.async_send_notification_email")
     api.refresh_status(video, encodejob)
     assert video.status == error_status
 
@@ -124,7 +142,7 @@ def test_refresh_status_video_job_status_complete(mocker, status):
         "cloudsync.api.process_transcode_results",
         side_effect=lambda results: video.update_status(VideoStatus.COMPLETE),
     )
-    mocker.patch("ui.models.tasks")
+    mocker.patch("mail.tasks.async_send_notification_email")
     api.refresh_status(video, encodejob)
     assert video.status == VideoStatus.COMPLETE
 
@@ -147,6 +165,107 @@ def test_refresh_status_video_job_othererror(mocker, status):
         api.refresh_status(video)
 
 
+@pytest.mark.parametrize("with_thumbnail", [True, False])
+def test_refresh_status_uses_job_output(mocker, with_thumbnail):
+    """
+    refresh_status should build VideoFiles and thumbnails from the MediaConvert job
+    itself without reading the results template
+    """
+    video = VideoFactory(status=VideoStatus.TRANSCODING)
+    VideoFileFactory(video=video)
+    encodejob = EncodeJobFactory(video=video)
+    prefix = video.video_s3_prefix()
+    MockClientMC.job = recorded_mediaconvert_job(
+        encodejob.id,
+        f"s3://{settings.VIDEO_S3_TRANSCODE_BUCKET}/{TRANSCODE_PREFIX}/{prefix}/video",
+        (
+            f"s3://{settings.VIDEO_S3_THUMBNAIL_BUCKET}/thumbnails/{prefix}/video"
+            if with_thumbnail
+            else None
+        ),
+    )
+    mocker.patch("cloudsync.api.boto3", MockBoto)
+    mocker.patch("mail.tasks.async_send_notification_email")
+    template_mock = mocker.patch("cloudsync.api._results_template")
+    refresh_manifest = mocker.spy(Video, "refresh_playback_manifest")
+
+    api.refresh_status(video, encodejob)
+
+    template_mock.assert_not_called()
+    # Once for all the output files, rather than once per file
+    refresh_manifest.assert_called_once()
+    video.refresh_from_db()
+    assert video.playback_manifest == video.build_playback_manifest()
+    assert video.status == VideoStatus.COMPLETE
+    assert video.duration == 5.28
+    assert set(
+        video.videofile_set.exclude(encoding=EncodingNames.ORIGINAL).values_list(
+            "encoding", "s3_object_key"
+        )
+    ) == {
+        (EncodingNames.HLS, f"{TRANSCODE_PREFIX}/{prefix}/video__index.m3u8"),
+        (EncodingNames.DESKTOP_MP4, f"{TRANSCODE_PREFIX}/{prefix}/video_custom.mp4"),
+    }
+    thumbnails = list(
+        video.videothumbnail_set.values_list("s3_object_key", "max_width", "max_height")
+    )
+    assert thumbnails == (
+        [(f"thumbnails/{prefix}/video_thumbnail.0000000.jpg", 1280, 720)]
+        if with_thumbnail
+        else []
+    )
+    encodejob.refresh_from_db()
+    assert encodejob.state == EncodeJob.State.COMPLETED
+    assert encodejob.message["jobId"] == encodejob.id
+    assert len(encodejob.message["outputGroupDetails"]) == (3 if with_thumbnail else 2)
+
+
+@pytest.mark.parametrize("status", [VideoStatus.TRANSCODING, VideoStatus.RETRANSCODING])
+def test_refresh_status_falls_back_to_results_template(mocker, status):
+    """
+    If the job output can't be parsed the cached results template is used, and
+    retranscodes skip the thumbnail group
+    """
+    video = VideoFactory(status=status)
+    VideoFileFactory(video=video)
+    encodejob = EncodeJobFactory(video=video)
+    MockClientMC.job = {"Job": {"Id": encodejob.id, "Status": "COMPLETE"}}
+    mocker.patch("cloudsync.api.boto3", MockBoto)
+    mocker.patch("mail.tasks.async_send_notification_email")
+    mocker.patch("cloudsync.api.move_s3_objects")
+    api._results_template.cache_clear()
+    process_mock = mocker.patch("cloudsync.api.process_transcode_results")
+
+    api.refresh_status(video, encodejob)
+    api.refresh_status(video, encodejob)
+
+    assert api._results_template.cache_info().misses == 1
+    results = process_mock.call_args[0][0]
+    assert results.job_id == encodejob.id
+    assert [group.group_type for group in results.output_groups] == (
+        ["HLS_GROUP", "FILE_GROUP", "FILE_GROUP"]
+        if status == VideoStatus.TRANSCODING
+        else ["HLS_GROUP", "FILE_GROUP"]
+    )
+    expected_prefix = (
+        f"{RETRANSCODE_FOLDER}{settings.VIDEO_S3_TRANSCODE_PREFIX}"
+        if status == VideoStatus.RETRANSCODING
+        else settings.VIDEO_S3_TRANSCODE_PREFIX
+    )
+    assert results.output_groups[0].playlist_file_paths[1] == (
+        f"s3://{settings.VIDEO_S3_TRANSCODE_BUCKET}/{expected_prefix}/"
+        f"{video.video_s3_prefix()}/video__index.m3u8"
+    )
+
+
+def test_prepare_results_invalid_template(video):
+    """prepare_results should raise MediaConvertResultError for a broken template"""
+    VideoFileFactory(video=video)
+    encodejob = EncodeJobFactory(video=video)
+    with pytest.raises(MediaConvertResultError):
+        api.prepare_results(video, encodejob, "{<JOB_ID>")
+
+
 @pytest.mark.parametrize(
     "course_prefix, session, date_str, expected_record_date",
     [
@@ -351,7 +470,7 @@ def test_transcode_job(mocker, status, expected_status, exclude_thumbnail):
         "cloudsync.api.media_convert_job", return_value=mock_job
     )
     mock_delete_objects = mocker.patch("cloudsync.api.delete_s3_objects")
-    mocker.patch("ui.models.tasks")
+    mocker.patch("mail.tasks.async_send_notification_email")
 
     api.transcode_video(video, videofile)
     mock_encoder.assert_called_once_with(
@@ -389,7 +508,7 @@ def test_transcode_job_failure(mocker, status, error_status, exclude_thumbnail):
         "Job": {"Id": "1498220566931-qtmtcu", "Status": "Error"},
         "Error": {"Code": 200, "Message": "FAIL"},
     }
-    mocker.patch("ui.models.tasks")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mock_encoder = mocker.patch(
         "cloudsync.api.media_convert_job",
         side_effect=ClientError(error_response=job_result, operation_name="job"),
@@ -435,7 +554,7 @@ def test_transcode_video_routes_shorts_to_portrait_template(
     mock_encoder = mocker.patch(
         "cloudsync.api.media_convert_job", return_value=mock_job
     )
-    mocker.patch("ui.models.tasks")
+    mocker.patch("mail.tasks.async_send_notification_email")
 
     api.transcode_video(video, videofile)
 
@@ -566,7 +685,7 @@ def test_upload_subtitle_to_s3_srt(mocker, video, file_object, replace, s3error)
 
 
 @mock_aws
-def test_move_s3_objects():
+def test_move_s3_objects(django_capture_on_commit_callbacks):
     """
     Test that move_s3_objects changes the S3 object keys to expected values
     """
@@ -584,7 +703,8 @@ def test_move_s3_objects():
     assert f"{from_prefix}{filename}" in bucket_keys
     assert f"{to_prefix}{filename}" not in bucket_keys
 
-    move_s3_objects(bucket_name, from_prefix, to_prefix)
+    with django_capture_on_commit_callbacks(execute=True):
+        move_s3_objects(bucket_name, from_prefix, to_prefix)
 
     bucket_keys = [obj.key for obj in bucket.objects.all()]
     assert f"{from_prefix}{filename}" not in bucket_keys
@@ -605,7 +725,7 @@ def test_transcode_video_client_error_no_job_id(mocker):
     mock_uuid = "test-uuid-1234"
     mocker.patch("cloudsync.api.uuid4", return_value=mock_uuid)
     mocker.patch("cloudsync.api.delete_s3_objects")
-    mocker.patch("ui.models.tasks")
+    mocker.patch("mail.tasks.async_send_notification_email")
 
     # Create a ClientError without Job ID in response
     error_response = {
@@ -703,19 +823,17 @@ def test_replace_thumbnail_in_s3_updates_s3_and_model():
 
 
 @mock_aws
-@override_settings(VIDEO_CDN_DISTRIBUTION_ID="EDIST123")
-def test_replace_thumbnail_in_s3_invalidates_cloudfront(mocker):
+def test_replace_thumbnail_in_s3_invalidates_cloudfront(
+    mocker, queue_invalidation_mock
+):
     """
-    When VIDEO_CDN_DISTRIBUTION_ID is set, a CloudFront invalidation is issued.
+    Replacing a thumbnail queues a CloudFront invalidation for its key.
     """
-    mock_cf = mocker.MagicMock()
     mock_boto3 = mocker.patch("cloudsync.api.boto3")
     # resource("s3").Bucket(...).upload_fileobj must not raise
     mock_boto3.resource.return_value.Bucket.return_value.upload_fileobj.return_value = (
         None
     )
-    mock_boto3.client.return_value = mock_cf
-
     thumbnail = VideoThumbnailFactory(
         s3_object_key="thumbnails/abc/thumb.jpg",
         bucket_name="thumb-bucket",
@@ -723,13 +841,7 @@ def test_replace_thumbnail_in_s3_invalidates_cloudfront(mocker):
 
     replace_thumbnail_in_s3(thumbnail, _make_jpeg_file())
 
-    mock_cf.create_invalidation.assert_called_once()
-    call_kwargs = mock_cf.create_invalidation.call_args[1]
-    assert call_kwargs["DistributionId"] == "EDIST123"
-    assert (
-        "/thumbnails/abc/thumb.jpg"
-        in call_kwargs["InvalidationBatch"]["Paths"]["Items"]
-    )
+    queue_invalidation_mock.assert_called_once_with(["thumbnails/abc/thumb.jpg"])
 
 
 @mock_aws
@@ -921,6 +1033,265 @@ def test_convert_image_to_jpeg_raises_for_unsupported_format():
         convert_image_to_jpeg(buf)
 
 
+# ---------------------------------------------------------------------------
+# Tests for thumbnails processed in the background
+# ---------------------------------------------------------------------------
+
+
+def test_check_thumbnail_image():
+    """
+    JPEG and PNG images should pass, from their header, and be rewound; anything
+    else should raise ValueError.
+    """
+    image = _make_png_file()
+    check_thumbnail_image(image)
+    assert image.tell() == 0
+
+    gif = io.BytesIO()
+    Image.new("RGB", (1, 1)).save(gif, format="GIF")
+    with pytest.raises(ValueError, match="Unsupported image format"):
+        check_thumbnail_image(gif)
+    with pytest.raises(ValueError, match="Could not decode image"):
+        check_thumbnail_image(io.BytesIO(b"this is not an image"))
+
+
+@override_settings(THUMBNAIL_WEBP_QUALITY=80)
+def test_render_thumbnail_variants():
+    """
+    A PNG should be rendered at the maximum size and every smaller width, as JPEG
+    and WebP, largest first.
+    """
+    variants = render_thumbnail_variants(
+        _make_png_file(), max_width=320, max_height=320, widths=[160, 80, 640]
+    )
+    assert [
+        (variant.width, variant.height, variant.content_type) for variant in variants
+    ] == [
+        (320, 240, "image/jpeg"),
+        (320, 240, "image/webp"),
+        (160, 120, "image/jpeg"),
+        (160, 120, "image/webp"),
+        (80, 60, "image/jpeg"),
+        (80, 60, "image/webp"),
+    ]
+    for variant in variants:
+        with Image.open(io.BytesIO(variant.data)) as img:
+            assert img.format == variant.extension.replace("jpg", "jpeg").upper()
+            assert img.size == (variant.width, variant.height)
+
+
+def test_render_thumbnail_variants_without_webp(mocker):
+    """Only JPEGs should be rendered if PIL doesn't support WebP"""
+    mocker.patch("cloudsync.api.features.check", return_value=False)
+    variants = render_thumbnail_variants(_make_png_file(), widths=[320])
+    assert [variant.content_type for variant in variants] == ["image/jpeg"] * 2
+
+
+def test_render_thumbnail_variants_keeps_small_jpeg():
+    """
+    A JPEG which doesn't need resizing should be kept as it is, and smaller sizes
+    rendered from it.
+    """
+    image = _make_jpeg_file()
+    original = image.getvalue()
+    variants = render_thumbnail_variants(image, widths=[320])
+    assert variants[0].data == original
+    assert (variants[0].width, variants[0].height) == (640, 360)
+    assert (variants[-1].width, variants[-1].height) == (320, 180)
+
+
+def test_render_thumbnail_variants_drafts_large_jpeg(mocker):
+    """A large JPEG should be scaled down by libjpeg while it's decoded"""
+    image = io.BytesIO()
+    Image.new("RGB", (4000, 3000), color=(0, 0, 255)).save(image, format="JPEG")
+    image.seek(0)
+    draft = mocker.spy(JpegImagePlugin.JpegImageFile, "draft")
+
+    variants = render_thumbnail_variants(
+        image, max_width=640, max_height=360, widths=[]
+    )
+    draft.assert_any_call(mocker.ANY, "RGB", (640, 640))
+    assert [(variant.width, variant.height) for variant in variants[:1]] == [(480, 360)]
+
+
+def test_render_thumbnail_variants_raises_for_corrupt_data():
+    """Corrupt data should raise ValueError"""
+    with pytest.raises(ValueError, match="Could not decode image"):
+        render_thumbnail_variants(io.BytesIO(b"this is not an image"))
+
+
+@mock_aws
+@override_settings(THUMBNAIL_VARIANT_WIDTHS=[320])
+def test_ingest_thumbnail_replaces_existing(
+    mocker, queue_invalidation_mock, django_capture_on_commit_callbacks
+):
+    """
+    Every version should be stored under a key of its upload and the largest JPEG
+    copied to the thumbnail's key. The previous versions are deleted after commit and
+    the thumbnail's key is invalidated.
+    """
+    mocker.patch("cloudsync.api.features.check", return_value=True)
+    mocker.patch("cloudsync.api.uuid4", return_value=SimpleNamespace(hex="a" * 32))
+    delete_mock = mocker.patch("cloudsync.api.delete_s3_objects")
+    s3c = boto3.client("s3", region_name="us-east-1")
+    s3c.create_bucket(Bucket="thumb-bucket")
+    thumbnail = VideoThumbnailFactory(
+        s3_object_key="thumbnails/abc/thumb.jpg",
+        bucket_name="thumb-bucket",
+        variants=[
+            {
+                "key": "thumbnails/abc/thumb_160w.jpg",
+                "width": 160,
+                "height": 90,
+                "content_type": "image/jpeg",
+            }
+        ],
+    )
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        assert ingest_thumbnail(thumbnail.video, _make_png_file()) == thumbnail
+        delete_mock.si.assert_called_once_with(
+            "thumb-bucket", "thumbnails/abc/thumb_160w.jpg"
+        )
+        assert not delete_mock.si.return_value.apply_async.called
+    assert len(callbacks) == 1
+    delete_mock.si.return_value.apply_async.assert_called_once()
+    thumbnail.refresh_from_db()
+    prefix = "thumbnails/abc/thumb_aaaaaaaaaaaa"
+    keys = [
+        f"{prefix}_480w.jpg",
+        f"{prefix}_480w.webp",
+        f"{prefix}_320w.jpg",
+        f"{prefix}_320w.webp",
+    ]
+    assert (thumbnail.max_width, thumbnail.max_height) == (480, 360)
+    assert [variant["key"] for variant in thumbnail.variants] == keys
+    assert thumbnail.variants[2] == {
+        "key": f"{prefix}_320w.jpg",
+        "width": 320,
+        "height": 240,
+        "content_type": "image/jpeg",
+    }
+    for key in keys:
+        obj = s3c.get_object(Bucket="thumb-bucket", Key=key)
+        assert obj["ContentType"] == (
+            "image/webp" if key.endswith(".webp") else "image/jpeg"
+        )
+    published = s3c.get_object(Bucket="thumb-bucket", Key="thumbnails/abc/thumb.jpg")
+    assert published["ContentType"] == "image/jpeg"
+    assert (
+        published["Body"].read()
+        == s3c.get_object(Bucket="thumb-bucket", Key=keys[0])["Body"].read()
+    )
+    queue_invalidation_mock.assert_called_once_with(["thumbnails/abc/thumb.jpg"])
+
+
+@mock_aws
+def test_ingest_thumbnail_drops_older_upload(
+    mocker, queue_invalidation_mock, django_capture_on_commit_callbacks
+):
+    """An upload older than the one the thumbnail has should be dropped"""
+    s3c = boto3.client("s3", region_name="us-east-1")
+    s3c.create_bucket(Bucket="thumb-bucket")
+    newer = datetime(2026, 1, 2, tzinfo=UTC)
+    thumbnail = VideoThumbnailFactory(
+        s3_object_key="thumbnails/abc/thumb.jpg",
+        bucket_name="thumb-bucket",
+        max_width=100,
+        uploaded_at=newer,
+    )
+
+    older = newer - timedelta(seconds=1)
+    assert ingest_thumbnail(thumbnail.video, _make_png_file(), older) is None
+    thumbnail.refresh_from_db()
+    assert thumbnail.max_width == 100
+    assert thumbnail.uploaded_at == newer
+    assert s3c.list_objects_v2(Bucket="thumb-bucket")["KeyCount"] == 0
+    assert queue_invalidation_mock.call_count == 0
+
+    later = newer + timedelta(seconds=1)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert ingest_thumbnail(thumbnail.video, _make_png_file(), later) == thumbnail
+    thumbnail.refresh_from_db()
+    assert thumbnail.max_width == 480
+    assert thumbnail.uploaded_at == later
+
+
+@mock_aws
+def test_ingest_thumbnail_newer_upload_meanwhile(
+    mocker, queue_invalidation_mock, django_capture_on_commit_callbacks
+):
+    """
+    An upload overtaken by a newer one while its versions were uploaded should be
+    dropped, and its versions deleted, without locking the video during S3 requests
+    """
+    s3c = boto3.client("s3", region_name="us-east-1")
+    s3c.create_bucket(Bucket="thumb-bucket")
+    thumbnail = VideoThumbnailFactory(
+        s3_object_key="thumbnails/abc/thumb.jpg",
+        bucket_name="thumb-bucket",
+        max_width=100,
+    )
+    older = datetime(2026, 1, 2, tzinfo=UTC)
+    newer = older + timedelta(seconds=1)
+    upload = api._upload_thumbnail_variants  # pylint: disable=protected-access
+    savepoints = len(transaction.get_connection().savepoint_ids)
+    overtaken = []
+
+    def upload_then_overtake(bucket_name, uploads):
+        """Store the versions, then ingest a newer upload before this one finishes"""
+        # The video isn't locked while the versions are uploaded
+        assert len(transaction.get_connection().savepoint_ids) == savepoints
+        upload(bucket_name, uploads)
+        if not overtaken:
+            overtaken.append(uploads)
+            ingest_thumbnail(thumbnail.video, _make_jpeg_file(), newer)
+
+    mocker.patch(
+        "cloudsync.api._upload_thumbnail_variants", side_effect=upload_then_overtake
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        assert ingest_thumbnail(thumbnail.video, _make_png_file(), older) is None
+
+    thumbnail.refresh_from_db()
+    assert thumbnail.uploaded_at == newer
+    keys = {
+        obj["Key"] for obj in s3c.list_objects_v2(Bucket="thumb-bucket")["Contents"]
+    }
+    assert keys == {"thumbnails/abc/thumb.jpg"} | {
+        variant["key"] for variant in thumbnail.variants
+    }
+    published = s3c.get_object(Bucket="thumb-bucket", Key="thumbnails/abc/thumb.jpg")
+    assert (
+        published["Body"].read()
+        == s3c.get_object(Bucket="thumb-bucket", Key=thumbnail.variants[0]["key"])[
+            "Body"
+        ].read()
+    )
+
+
+@mock_aws
+@override_settings(VIDEO_S3_THUMBNAIL_BUCKET="thumbnail-bucket")
+def test_ingest_thumbnail_creates_new(queue_invalidation_mock):
+    """A thumbnail should be created for a video without one"""
+    s3c = boto3.client("s3", region_name="us-east-1")
+    s3c.create_bucket(Bucket="thumbnail-bucket")
+    video = VideoFactory()
+
+    thumbnail = ingest_thumbnail(video, _make_jpeg_file())
+
+    assert thumbnail.pk is not None
+    assert thumbnail.bucket_name == "thumbnail-bucket"
+    assert (
+        thumbnail.s3_object_key
+        == f"thumbnails/{video.hexkey}/video_thumbnail.0000000.jpg"
+    )
+    s3c.head_object(Bucket="thumbnail-bucket", Key=thumbnail.s3_object_key)
+    for variant in thumbnail.variants:
+        s3c.head_object(Bucket="thumbnail-bucket", Key=variant["key"])
+    assert queue_invalidation_mock.call_count == 0
+
+
 # ---------------------------------------------------------------------------
 # Tests for _s3_uri_to_key
 # ---------------------------------------------------------------------------
@@ -1089,52 +1460,235 @@ def test_collect_output_keys_strips_retranscode_folder():
     assert "transcoded/abc/video.mp4" in keys
 
 
-# ---------------------------------------------------------------------------
-# Tests for _invalidate_cloudfront_paths
-# ---------------------------------------------------------------------------
+UNSORTED_PLAYLIST = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=1163306,RESOLUTION=640x360
+video_HLS400k.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2148515,RESOLUTION=1920x1080
+video_HLS2M.m3u8
+"""
+SORTED_PLAYLIST = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=2148515,RESOLUTION=1920x1080
+video_HLS2M.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1163306,RESOLUTION=640x360
+video_HLS400k.m3u8
+"""
+
+
+@pytest.fixture
+def hls_playlist(mocker):
+    """An unsorted HLS master playlist on S3 and its VideoFile"""
+    bucket_name = "transcode-bucket"
+    mocker.patch("cloudsync.api.settings.VIDEO_S3_TRANSCODE_BUCKET", bucket_name)
+    with mock_aws():
+        s3c = boto3.client("s3")
+        s3c.create_bucket(Bucket=bucket_name)
+        key = "transcoded/abc/video__index.m3u8"
+        s3c.put_object(Bucket=bucket_name, Key=key, Body=UNSORTED_PLAYLIST)
+        video_file = VideoFileFactory(
+            s3_object_key=key, bucket_name=bucket_name, encoding=EncodingNames.HLS
+        )
+        yield SimpleNamespace(s3c=s3c, bucket_name=bucket_name, video_file=video_file)
+
+
+def test_normalize_hls_playlist(hls_playlist):
+    """The playlist is sorted once; later runs are skipped by ETag"""
+    video_file = hls_playlist.video_file
+
+    assert normalize_hls_playlist(video_file) is True
+    s3_object = hls_playlist.s3c.get_object(
+        Bucket=hls_playlist.bucket_name, Key=video_file.s3_object_key
+    )
+    assert s3_object["Body"].read().decode() == SORTED_PLAYLIST
+    video_file.refresh_from_db()
+    assert video_file.playlist_etag == s3_object["ETag"]
+
+    # Already sorted, and unchanged since
+    assert normalize_hls_playlist(video_file) is False
+
+
+def test_normalize_hls_playlist_skips_unchanged(mocker, hls_playlist):
+    """A playlist whose ETag matches the stored one is not downloaded"""
+    video_file = hls_playlist.video_file
+    normalize_hls_playlist(video_file)
+    s3_client = mocker.MagicMock()
+    s3_client.get_object.side_effect = ClientError(
+        {"Error": {"Code": "304", "Message": "Not Modified"}}, "GetObject"
+    )
+
+    assert normalize_hls_playlist(video_file, s3_client=s3_client) is False
+    assert s3_client.get_object.call_args[1]["IfNoneMatch"] == video_file.playlist_etag
+    s3_client.put_object.assert_not_called()
+
+
+def test_normalize_hls_playlist_changed_concurrently(mocker, hls_playlist):
+    """A playlist rewritten between the read and the write is left alone"""
+    video_file = hls_playlist.video_file
+    s3_client = boto3.client("s3")
+    get_object = s3_client.get_object
+
+    def get_then_overwrite(**kwargs):
+        """Read the playlist, then replace it before the conditional write"""
+        response = get_object(**kwargs)
+        hls_playlist.s3c.put_object(
+            Bucket=hls_playlist.bucket_name, Key=kwargs["Key"], Body=SORTED_PLAYLIST
+        )
+        return response
 
+    mocker.patch.object(s3_client, "get_object", side_effect=get_then_overwrite)
 
-@override_settings(VIDEO_CDN_DISTRIBUTION_ID="DIST123")
-def test_invalidate_cloudfront_paths_sends_invalidation(mocker):
-    """When VIDEO_CDN_DISTRIBUTION_ID is set and keys are provided, a batch invalidation is created."""
-    mock_cf = mocker.MagicMock()
-    mocker.patch("cloudsync.api.boto3").client.return_value = mock_cf
+    assert normalize_hls_playlist(video_file, s3_client=s3_client) is False
+    video_file.refresh_from_db()
+    assert video_file.playlist_etag == ""
 
-    _invalidate_cloudfront_paths(["transcoded/abc/video.m3u8", "transcoded/abc/*"])
 
-    mock_cf.create_invalidation.assert_called_once()
-    call_kwargs = mock_cf.create_invalidation.call_args[1]
-    assert call_kwargs["DistributionId"] == "DIST123"
-    items = call_kwargs["InvalidationBatch"]["Paths"]["Items"]
-    assert "/transcoded/abc/video.m3u8" in items
-    assert "/transcoded/abc/*" in items
-    assert call_kwargs["InvalidationBatch"]["Paths"]["Quantity"] == 2
+def test_process_hls_outputs_normalizes_playlist(hls_playlist):
+    """New HLS playlists are sorted as soon as the VideoFile is created"""
+    video_file = hls_playlist.video_file
+    process_hls_outputs(
+        [
+            f"s3://{hls_playlist.bucket_name}/transcoded/abc/video.m3u8",
+            f"s3://{hls_playlist.bucket_name}/{video_file.s3_object_key}",
+        ],
+        video_file.video,
+    )
+
+    s3_object = hls_playlist.s3c.get_object(
+        Bucket=hls_playlist.bucket_name, Key=video_file.s3_object_key
+    )
+    assert s3_object["Body"].read().decode() == SORTED_PLAYLIST
+    video_file.refresh_from_db()
+    assert video_file.playlist_etag == s3_object["ETag"]
+
+
+def test_index_renditions(hls_playlist):
+    """
+    Renditions are recorded from the master playlist, segment listing and job
+    output, replacing earlier ones
+    """
+    video_file = hls_playlist.video_file
+    video = video_file.video
+    bucket_name = hls_playlist.bucket_name
+    destination = f"s3://{bucket_name}/{RETRANSCODE_FOLDER}transcoded/abc/video"
+    for key, size in (
+        ("transcoded/abc/video_HLS2M_00001.ts", 300),
+        ("transcoded/abc/video_HLS2M_00002.ts", 200),
+        ("transcoded/abc/video_HLS400k_00001.ts", 50),
+        ("transcoded/abc/video_custom.mp4", 1000),
+    ):
+        hls_playlist.s3c.put_object(Bucket=bucket_name, Key=key, Body=b"x" * size)
+    results = TranscodeJobResult.from_job(
+        recorded_mediaconvert_job("job-1", destination)["Job"]
+    )
+    VideoRenditionFactory(video=video)
+
+    index_renditions(results, video)
+
+    assert list(
+        video.videorendition_set.values_list(
+            "encoding",
+            "s3_object_key",
+            "width",
+            "height",
+            "bandwidth",
+            "byte_size",
+            "segment_count",
+        )
+    ) == [
+        (
+            EncodingNames.HLS,
+            "transcoded/abc/video_HLS2M.m3u8",
+            1920,
+            1080,
+            2148515,
+            500,
+            2,
+        ),
+        (
+            EncodingNames.HLS,
+            "transcoded/abc/video_HLS400k.m3u8",
+            640,
+            360,
+            1163306,
+            50,
+            1,
+        ),
+        (
+            EncodingNames.DESKTOP_MP4,
+            "transcoded/abc/video_custom.mp4",
+            1280,
+            720,
+            2026268,
+            1000,
+            None,
+        ),
+    ]
+
+
+def test_get_mediaconvert_queue_depth(mocker, settings):
+    """get_mediaconvert_queue_depth should count submitted jobs on every page"""
+    settings.AWS_REGION = "us-east-1"
+    settings.AWS_ACCOUNT_ID = "1234"
+    settings.VIDEO_TRANSCODE_QUEUE = "ovs"
+    client = mocker.patch("cloudsync.api.boto3").client.return_value
+    client.list_jobs.side_effect = [
+        {"Jobs": [{}, {}], "NextToken": "next"},
+        {"Jobs": [{}]},
+    ]
+
+    assert get_mediaconvert_queue_depth() == 3
+    assert client.list_jobs.call_args_list[0][1] == {
+        "Queue": "arn:aws:mediaconvert:us-east-1:1234:queues/ovs",
+        "Status": "SUBMITTED",
+        "MaxResults": 20,
+    }
+    assert client.list_jobs.call_args_list[1][1]["NextToken"] == "next"
 
 
 @pytest.mark.parametrize(
-    "dist_id, keys",
+    "in_flight, queue_depth, expected",
     [
-        ("", ["some/key"]),  # dist not configured
-        ("DIST123", []),  # empty key list
+        # Uploads and retranscodes in flight both take up slots
+        ({VideoStatus.TRANSCODING: 2, VideoStatus.RETRANSCODING: 1}, 0, 2),
+        # The wave size caps the slots
+        ({}, 0, 4),
+        ({VideoStatus.TRANSCODING: 5}, 0, 0),
+        ({}, 3, 0),
     ],
 )
-def test_invalidate_cloudfront_paths_no_op(mocker, settings, dist_id, keys):
-    """No CloudFront call is made when the dist is unset or the key list is empty."""
-    settings.VIDEO_CDN_DISTRIBUTION_ID = dist_id
-    mock_boto3 = mocker.patch("cloudsync.api.boto3")
-    _invalidate_cloudfront_paths(keys)
-    mock_boto3.client.assert_not_called()
-
-
-@override_settings(VIDEO_CDN_DISTRIBUTION_ID="DIST123")
-def test_invalidate_cloudfront_paths_swallows_exceptions(mocker):
-    """
-    If the CloudFront API call raises, the exception is caught and logged
-    rather than propagated to the caller.
-    """
-    mock_cf = mocker.MagicMock()
-    mock_cf.create_invalidation.side_effect = Exception("CF error")
-    mocker.patch("cloudsync.api.boto3").client.return_value = mock_cf
+def test_get_retranscode_slots(mocker, settings, in_flight, queue_depth, expected):
+    """get_retranscode_slots should leave room for uploads and back off a busy queue"""
+    settings.RETRANSCODE_MAX_IN_FLIGHT = 5
+    settings.RETRANSCODE_WAVE_SIZE = 4
+    settings.RETRANSCODE_MAX_QUEUE_DEPTH = 3
+    mocker.patch("cloudsync.api.get_mediaconvert_queue_depth", return_value=queue_depth)
+    for status, count in in_flight.items():
+        VideoFactory.create_batch(count, status=status)
+    VideoFactory.create(status=VideoStatus.COMPLETE)
+
+    assert get_retranscode_slots() == expected
+
+
+def test_get_retranscode_progress(settings):
+    """get_retranscode_progress should report counts and an ETA for each collection"""
+    settings.RETRANSCODE_WAVE_SIZE = 2
+    settings.SCHEDULE_RETRANSCODE_FREQUENCY = 60
+    collection = CollectionFactory.create()
+    VideoFactory.create_batch(3, collection=collection, schedule_retranscode=True)
+    VideoFactory.create(collection=collection, status=VideoStatus.RETRANSCODING)
+    VideoFactory.create(collection=collection, status=VideoStatus.RETRANSCODE_FAILED)
+    VideoFactory.create_batch(2, status=VideoStatus.COMPLETE)
+    job = EncodeJobFactory.create(state=EncodeJob.State.COMPLETED)
+    EncodeJob.objects.filter(id=job.id).update(
+        created_at=job.last_modified - timedelta(seconds=300)
+    )
 
-    # Must not raise
-    _invalidate_cloudfront_paths(["transcoded/abc/video.m3u8"])
+    assert get_retranscode_progress() == [
+        {
+            "collection_id": collection.id,
+            "collection_title": collection.title,
+            "waiting": 3,
+            "in_flight": 1,
+            "failed": 1,
+            "eta_seconds": 600,
+        }
+    ]
@@ -103,3 +103,155 @@ class MockHttpErrorResponse:
     def __init__(self, status, reason="mock reason"):
         self.status = status
         self.reason = reason
+
+
+def _mediaconvert_hls_output(name_modifier, width, height, bitrate):
+    """An HLS rendition as configured in a MediaConvert job's settings"""
+    return {
+        "NameModifier": name_modifier,
+        "ContainerSettings": {"Container": "M3U8"},
+        "VideoDescription": {
+            "Width": width,
+            "Height": height,
+            "CodecSettings": {
+                "Codec": "H_264",
+                "H264Settings": {"Bitrate": bitrate},
+            },
+        },
+    }
+
+
+def recorded_mediaconvert_job(
+    job_id, destination, thumbnail_destination=None, status="COMPLETE"
+):
+    """
+    A get_job() response recorded from MediaConvert for a job created from
+    config/mediaconvert.json, with the destinations swapped for the given ones.
+    """
+    output_groups = [
+        {
+            "Name": "Apple HLS",
+            "OutputGroupSettings": {
+                "Type": "HLS_GROUP_SETTINGS",
+                "HlsGroupSettings": {
+                    "SegmentLength": 10,
+                    "Destination": destination,
+                    "AdditionalManifests": [
+                        {
+                            "ManifestNameModifier": "__index",
+                            "SelectedOutputs": ["_HLS2M", "_HLS1.5M", "_HLS400k"],
+                        }
+                    ],
+                },
+            },
+            "Outputs": [
+                _mediaconvert_hls_output("_HLS2M", 1024, 576, 1872000),
+                _mediaconvert_hls_output("_HLS1.5M", 854, 480, 1404000),
+                _mediaconvert_hls_output("_HLS400k", 640, 360, 360000),
+            ],
+        },
+        {
+            "Name": "File Group",
+            "OutputGroupSettings": {
+                "Type": "FILE_GROUP_SETTINGS",
+                "FileGroupSettings": {"Destination": destination},
+            },
+            "Outputs": [
+                {
+                    "NameModifier": "_custom",
+                    "ContainerSettings": {"Container": "MP4"},
+                    "VideoDescription": {
+                        "CodecSettings": {"Codec": "H_264"},
+                    },
+                }
+            ],
+        },
+    ]
+    output_group_details = [
+        {
+            "OutputDetails": [
+                {
+                    "DurationInMs": 5280,
+                    "VideoDetails": {
+                        "WidthInPx": 1024,
+                        "HeightInPx": 768,
+                        "AverageBitrate": 2148515,
+                    },
+                },
+                {
+                    "DurationInMs": 5280,
+                    "VideoDetails": {
+                        "WidthInPx": 854,
+                        "HeightInPx": 480,
+                        "AverageBitrate": 1687472,
+                    },
+                },
+                {
+                    "DurationInMs": 5280,
+                    "VideoDetails": {
+                        "WidthInPx": 640,
+                        "HeightInPx": 360,
+                        "AverageBitrate": 478263,
+                    },
+                },
+            ]
+        },
+        {
+            "OutputDetails": [
+                {
+                    "DurationInMs": 5280,
+                    "VideoDetails": {
+                        "WidthInPx": 1280,
+                        "HeightInPx": 720,
+                        "AverageBitrate": 2026268,
+                    },
+                }
+            ]
+        },
+    ]
+    if thumbnail_destination:
+        output_groups.append(
+            {
+                "Name": "Thumbnails",
+                "OutputGroupSettings": {
+                    "Type": "FILE_GROUP_SETTINGS",
+                    "FileGroupSettings": {"Destination": thumbnail_destination},
+                },
+                "Outputs": [
+                    {
+                        "NameModifier": "_thumbnail",
+                        "ContainerSettings": {"Container": "RAW"},
+                        "VideoDescription": {
+                            "CodecSettings": {"Codec": "FRAME_CAPTURE"},
+                        },
+                    }
+                ],
+            }
+        )
+        output_group_details.append(
+            {
+                "OutputDetails": [
+                    {
+                        "DurationInMs": 1000,
+                        "VideoDetails": {
+                            "WidthInPx": 1280,
+                            "HeightInPx": 720,
+                            "AverageBitrate": 914280,
+                        },
+                    }
+                ]
+            }
+        )
+    return {
+        "Job": {
+            "Id": job_id,
+            "Status": status,
+            "Queue": "arn:aws:mediaconvert:us-east-1:12345678:queues/Default",
+            "Settings": {
+                "Inputs": [{"FileInput": "s3://video-s3/abc/video.mp4"}],
+                "OutputGroups": output_groups,
+            },
+            "OutputGroupDetails": output_group_details,
+            "Timing": {"SubmitTime": "2025-04-17T03:14:50Z"},
+        }
+    }
@@ -0,0 +1,359 @@
+"""
+Reuse of transcoded files for identical sources
+
+Backfills, replacements and double selections in the Dropbox chooser stream and
+transcode the same file again. The original VideoFile of a video streamed to S3 keeps
+a fingerprint of its content: its size and a content hash computed while it's
+streamed. The hash uses the Dropbox content hash algorithm (the SHA-256 of the
+concatenated SHA-256 digests of every 4 MB block), so it can be computed over a
+stream in any chunk size and compared with the content_hash in the metadata of a
+Dropbox download before downloading it.
+
+Before a source is streamed or transcoded:
+
+* a replacement with the same fingerprint as the file it replaces is a no-op,
+* a source with the same fingerprint as a completed video transcoded with the same
+  template gets copies of that video's files, made by S3 server-side copies, unless
+  it's replacing a video which has transcoded files of its own.
+
+Each reuse is recorded as a TranscodeReuse, for the admin report of what was saved.
+"""
+
+import hashlib
+
+import structlog
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Sum
+
+from ui.constants import VideoStatus
+from ui.encodings import EncodingNames
+from ui.models import (
+    TRANSCODE_PREFIX,
+    TranscodeReuse,
+    Video,
+    VideoFile,
+    VideoRendition,
+    VideoThumbnail,
+)
+from ui.utils import get_bucket
+
+log = structlog.get_logger(__name__)
+
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class ContentHasher:
+    """
+    Computes the Dropbox content hash of a stream, fed in chunks of any size
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._block = hashlib.sha256()
+        self._block_size = 0
+        self._blocks = hashlib.sha256()
+
+    def update(self, data):
+        """
+        Add the next bytes of the stream
+
+        Args:
+            data (bytes): The bytes
+        """
+        self.size += len(data)
+        view = memoryview(data)
+        while view:
+            chunk = view[: BLOCK_SIZE - self._block_size]
+            self._block.update(chunk)
+            self._block_size += len(chunk)
+            view = view[len(chunk) :]
+            if self._block_size == BLOCK_SIZE:
+                self._blocks.update(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_size = 0
+
+    def hexdigest(self):
+        """
+        Get the content hash of the bytes added so far
+
+        Returns:
+            str: The hex digest
+        """
+        blocks = self._blocks.copy()
+        if self._block_size:
+            blocks.update(self._block.digest())
+        return blocks.hexdigest()
+
+
+class HashingReader:
+    """
+    A file-like object which hashes what's read from a stream. It isn't seekable, so
+    s3transfer reads it once, in order.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.hasher = ContentHasher()
+
+    def read(self, size=-1):
+        """Read from the stream, hashing the bytes read"""
+        data = self.stream.read(size)
+        self.hasher.update(data)
+        return data
+
+
+def _with_transcodes(queryset):
+    """Filter videos to the ones with an HLS playlist"""
+    return queryset.filter(
+        Exists(
+            VideoFile.objects.filter(video=OuterRef("pk"), encoding=EncodingNames.HLS)
+        )
+    )
+
+
+def find_identical_video(video, content_size, content_hash):
+    """
+    Find a completed video whose original file has the same fingerprint, and which
+    was transcoded with the same template as the video would be
+
+    Args:
+        video (ui.models.Video): The video about to be uploaded or transcoded
+        content_size (int): The size of its source
+        content_hash (str): The content hash of its source
+
+    Returns:
+        ui.models.Video: The identical video, or None
+    """
+    if not content_hash or content_size is None:
+        return None
+    return (
+        _with_transcodes(
+            Video.objects.filter(
+                status=VideoStatus.COMPLETE,
+                collection__for_shorts=video.collection.for_shorts,
+                videofile__encoding=EncodingNames.ORIGINAL,
+                videofile__content_size=content_size,
+                videofile__content_hash=content_hash,
+            )
+        )
+        .exclude(pk=video.pk)
+        .order_by("-updated_at")
+        .first()
+    )
+
+
+def save_fingerprint(video, content_size, content_hash):
+    """
+    Store the fingerprint of a video's original file
+
+    Args:
+        video (ui.models.Video): The video
+        content_size (int): The size of the original file
+        content_hash (str): Its content hash
+    """
+    VideoFile.objects.filter(video=video, encoding=EncodingNames.ORIGINAL).update(
+        content_size=content_size, content_hash=content_hash
+    )
+
+
+def _transcode_prefix(video):
+    """The S3 prefix of a video's transcoded files"""
+    return f"{TRANSCODE_PREFIX}/{video.video_s3_prefix()}/"
+
+
+def _copy_objects(bucket_name, from_prefix, to_prefix):
+    """
+    Copy the S3 objects under a prefix to another prefix, server-side
+
+    Returns:
+        int: The number of bytes copied
+    """
+    bucket = get_bucket(bucket_name)
+    copied = 0
+    for obj in bucket.objects.filter(Prefix=from_prefix):
+        bucket.copy(
+            {"Bucket": bucket_name, "Key": obj.key},
+            Key=to_prefix + obj.key[len(from_prefix) :],
+        )
+        copied += obj.size
+    return copied
+
+
+def _copy_rows(queryset, video, from_prefix, to_prefix):
+    """
+    Copy the files of a video under a prefix to another video, with their keys
+    moved to another prefix
+    """
+    copies = []
+    for row in queryset:
+        if not row.s3_object_key.startswith(from_prefix):
+            # Uploaded by a user rather than transcoded
+            continue
+        row.pk = None
+        row.video = video
+        row.s3_object_key = to_prefix + row.s3_object_key[len(from_prefix) :]
+        if getattr(row, "variants", None):
+            # The versions of an uploaded thumbnail are stored next to it
+            row.variants = [
+                {**variant, "key": to_prefix + variant["key"][len(from_prefix) :]}
+                for variant in row.variants
+                if variant["key"].startswith(from_prefix)
+            ]
+        copies.append(row)
+    queryset.model.objects.bulk_create(copies)
+
+
+def _output_bytes(video):
+    """The bytes of a video's transcoded files, as recorded with its renditions"""
+    totals = VideoRendition.objects.filter(video=video).aggregate(
+        total=Sum("byte_size")
+    )
+    return totals["total"] or 0
+
+
+def copy_transcodes(video, source, copy_original=False):
+    """
+    Give a video copies of the transcoded files of an identical video, and complete it
+
+    Args:
+        video (ui.models.Video): The video being uploaded
+        source (ui.models.Video): The completed video with an identical source
+        copy_original (bool): Whether the original file should also be copied,
+            because it wasn't uploaded
+
+    Returns:
+        ui.models.TranscodeReuse: The record of the reuse, or None if the files
+            couldn't be copied
+    """
+    if _with_transcodes(Video.objects.filter(pk=video.pk)).exists():
+        # A replaced video already has files under the prefix the copies would go
+        # to, so it's retranscoded instead
+        log.info(
+            "Not copying the files of an identical video over existing files",
+            video_id=video.id,
+            source_id=source.id,
+        )
+        return None
+    from_prefix, to_prefix = _transcode_prefix(source), _transcode_prefix(video)
+    source_original = source.original_video
+    try:
+        if copy_original:
+            bucket = get_bucket(source_original.bucket_name)
+            bucket.copy(
+                {
+                    "Bucket": source_original.bucket_name,
+                    "Key": source_original.s3_object_key,
+                },
+                Key=video.original_video.s3_object_key,
+            )
+        output_bytes = _copy_objects(
+            settings.VIDEO_S3_TRANSCODE_BUCKET, from_prefix, to_prefix
+        )
+    except (BotoCoreError, ClientError):
+        log.exception(
+            "Unable to copy the files of an identical video",
+            video_id=video.id,
+            source_id=source.id,
+        )
+        return None
+
+    with transaction.atomic():
+        _copy_rows(
+            source.videofile_set.exclude(encoding=EncodingNames.ORIGINAL),
+            video,
+            from_prefix,
+            to_prefix,
+        )
+        _copy_rows(
+            VideoThumbnail.objects.filter(video=source), video, from_prefix, to_prefix
+        )
+        _copy_rows(
+            VideoRendition.objects.filter(video=source), video, from_prefix, to_prefix
+        )
+        save_fingerprint(
+            video, source_original.content_size, source_original.content_hash
+        )
+        reuse = TranscodeReuse.objects.create(
+            video=video,
+            source=source,
+            reason=TranscodeReuse.Reason.COPIED,
+            upload_bytes_saved=source_original.content_size if copy_original else 0,
+            output_bytes_reused=output_bytes,
+            transcode_seconds_saved=source.duration or 0.0,
+        )
+        # The copies were bulk created, without post_save signals
+        video.refresh_playback_manifest()
+        video.update_status(VideoStatus.COMPLETE, duration=source.duration)
+    log.info(
+        "Copied the transcoded files of an identical video",
+        video_id=video.id,
+        source_id=source.id,
+        output_bytes=output_bytes,
+    )
+    return reuse
+
+
+def reuse_before_upload(video, content_size, content_hash):
+    """
+    Complete a video without uploading its source, if the source is unchanged since
+    it was last uploaded or identical to the source of another video
+
+    Args:
+        video (ui.models.Video): The video being uploaded
+        content_size (int): The size of its source, from the download metadata
+        content_hash (str): The content hash of its source, from the download metadata
+
+    Returns:
+        ui.models.TranscodeReuse: The record of the reuse, or None if the source
+            should be uploaded
+    """
+    if not content_hash or content_size is None:
+        return None
+    original = video.original_video
+    if original is None:
+        return None
+    if (
+        original.content_hash == content_hash
+        and original.content_size == content_size
+        and _with_transcodes(Video.objects.filter(pk=video.pk)).exists()
+    ):
+        with transaction.atomic():
+            reuse = TranscodeReuse.objects.create(
+                video=video,
+                source=video,
+                reason=TranscodeReuse.Reason.UNCHANGED,
+                upload_bytes_saved=content_size,
+                output_bytes_reused=_output_bytes(video),
+                transcode_seconds_saved=video.duration or 0.0,
+            )
+            video.update_status(VideoStatus.COMPLETE)
+        log.info("Skipped a replacement with an unchanged file", video_id=video.id)
+        return reuse
+
+    source = find_identical_video(video, content_size, content_hash)
+    if source is None:
+        return None
+    return copy_transcodes(video, source, copy_original=True)
+
+
+def reuse_before_transcode(video, video_file):
+    """
+    Complete a video with copies of the transcoded files of an identical video,
+    instead of transcoding it
+
+    Args:
+        video (ui.models.Video): The uploaded video
+        video_file (ui.models.VideoFile): Its original file
+
+    Returns:
+        ui.models.TranscodeReuse: The record of the reuse, or None if the video
+            should be transcoded
+    """
+    source = find_identical_video(
+        video, video_file.content_size, video_file.content_hash
+    )
+    if source is None:
+        return None
+    return copy_transcodes(video, source)
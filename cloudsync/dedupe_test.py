@@ -0,0 +1,253 @@
+"""
+Tests for the reuse of transcoded files for identical sources
+"""
+
+import hashlib
+import io
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from django.conf import settings
+from moto import mock_aws
+
+from cloudsync import dedupe
+from cloudsync.dedupe import (
+    BLOCK_SIZE,
+    ContentHasher,
+    HashingReader,
+    find_identical_video,
+    reuse_before_transcode,
+    reuse_before_upload,
+)
+from ui.constants import VideoStatus
+from ui.encodings import EncodingNames
+from ui.factories import (
+    CollectionFactory,
+    VideoFactory,
+    VideoFileFactory,
+    VideoRenditionFactory,
+    VideoThumbnailFactory,
+)
+from ui.models import TRANSCODE_PREFIX, TranscodeReuse
+
+pytestmark = pytest.mark.django_db
+
+CONTENT = b"identical video"
+CONTENT_HASH = hashlib.sha256(hashlib.sha256(CONTENT).digest()).hexdigest()
+
+
+@pytest.fixture
+def s3():
+    """A local S3 stand-in with the upload and transcode buckets"""
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=settings.VIDEO_S3_BUCKET)
+        client.create_bucket(Bucket=settings.VIDEO_S3_TRANSCODE_BUCKET)
+        yield client
+
+
+def _transcoded_key(video, name):
+    """The key of a transcoded file of a video"""
+    return f"{TRANSCODE_PREFIX}/{video.hexkey}/{name}"
+
+
+@pytest.fixture
+def source(s3):
+    """A completed video, with its original and transcoded files in S3"""
+    video = VideoFactory(status=VideoStatus.COMPLETE, duration=90.0)
+    original = VideoFileFactory(
+        video=video, content_size=len(CONTENT), content_hash=CONTENT_HASH
+    )
+    s3.put_object(
+        Bucket=settings.VIDEO_S3_BUCKET, Key=original.s3_object_key, Body=CONTENT
+    )
+    for name in ("video__index.m3u8", "video_1280x720.m3u8", "video_thumb.jpg"):
+        s3.put_object(
+            Bucket=settings.VIDEO_S3_TRANSCODE_BUCKET,
+            Key=_transcoded_key(video, name),
+            Body=b"1234",
+        )
+    VideoFileFactory(
+        video=video,
+        encoding=EncodingNames.HLS,
+        bucket_name=settings.VIDEO_S3_TRANSCODE_BUCKET,
+        s3_object_key=_transcoded_key(video, "video__index.m3u8"),
+    )
+    VideoThumbnailFactory(
+        video=video,
+        bucket_name=settings.VIDEO_S3_TRANSCODE_BUCKET,
+        s3_object_key=_transcoded_key(video, "video_thumb.jpg"),
+    )
+    # Uploaded by a user, so not copied
+    VideoThumbnailFactory(video=video)
+    VideoRenditionFactory(
+        video=video,
+        s3_object_key=_transcoded_key(video, "video_1280x720.m3u8"),
+        byte_size=1000,
+    )
+    return video
+
+
+@pytest.fixture
+def video(source):
+    """A video being uploaded to the same collection as the source"""
+    video = VideoFactory(
+        collection=source.collection, status=VideoStatus.UPLOADING, duration=0.0
+    )
+    VideoFileFactory(video=video)
+    return video
+
+
+def _assert_copied(s3, video, source):
+    """Assert that a video has copies of the transcoded files of the source"""
+    assert video.status == VideoStatus.COMPLETE
+    assert video.duration == source.duration
+    hls = video.videofile_set.get(encoding=EncodingNames.HLS)
+    assert hls.s3_object_key == _transcoded_key(video, "video__index.m3u8")
+    assert [
+        thumbnail.s3_object_key for thumbnail in video.videothumbnail_set.all()
+    ] == [_transcoded_key(video, "video_thumb.jpg")]
+    assert video.videorendition_set.get().s3_object_key == _transcoded_key(
+        video, "video_1280x720.m3u8"
+    )
+    copied = s3.list_objects_v2(
+        Bucket=settings.VIDEO_S3_TRANSCODE_BUCKET,
+        Prefix=f"{TRANSCODE_PREFIX}/{video.hexkey}/",
+    )["KeyCount"]
+    assert copied == 3
+    original = video.original_video
+    assert (original.content_size, original.content_hash) == (
+        len(CONTENT),
+        CONTENT_HASH,
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1000, BLOCK_SIZE, BLOCK_SIZE + 1])
+def test_content_hasher(chunk_size):
+    """The content hash should be the hash of the hashes of every 4 MB block,
+    whatever the size of the chunks it's fed"""
+    content = os.urandom(2 * BLOCK_SIZE + 10)
+    blocks = [content[:BLOCK_SIZE], content[BLOCK_SIZE : 2 * BLOCK_SIZE], content[-10:]]
+    expected = hashlib.sha256(
+        b"".join(hashlib.sha256(block).digest() for block in blocks)
+    ).hexdigest()
+
+    reader = HashingReader(io.BytesIO(content))
+    while reader.read(chunk_size):
+        pass
+    assert reader.hasher.size == len(content)
+    assert reader.hasher.hexdigest() == expected
+    assert ContentHasher().hexdigest() == hashlib.sha256().hexdigest()
+
+
+def test_find_identical_video(source, video):
+    """Only a completed video transcoded with the same template should be reused"""
+    assert find_identical_video(video, len(CONTENT), CONTENT_HASH) == source
+    assert find_identical_video(source, len(CONTENT), CONTENT_HASH) is None
+    assert find_identical_video(video, len(CONTENT) + 1, CONTENT_HASH) is None
+    assert find_identical_video(video, len(CONTENT), "") is None
+
+    shorts = VideoFactory(collection=CollectionFactory(for_shorts=True))
+    assert find_identical_video(shorts, len(CONTENT), CONTENT_HASH) is None
+
+    source.update_status(VideoStatus.RETRANSCODE_SCHEDULED)
+    assert find_identical_video(video, len(CONTENT), CONTENT_HASH) is None
+
+
+def test_reuse_before_transcode(s3, source, video):
+    """An uploaded video identical to a completed one should get copies of its
+    transcoded files instead of being transcoded"""
+    dedupe.save_fingerprint(video, len(CONTENT), CONTENT_HASH)
+    reuse = reuse_before_transcode(video, video.original_video)
+
+    video.refresh_from_db()
+    _assert_copied(s3, video, source)
+    assert video.playback_manifest is not None
+    assert reuse.source == source
+    assert reuse.reason == TranscodeReuse.Reason.COPIED
+    assert reuse.upload_bytes_saved == 0
+    assert reuse.output_bytes_reused == 12
+    assert reuse.transcode_seconds_saved == 90.0
+
+
+def test_reuse_before_transcode_not_identical(source, video):  # pylint: disable=unused-argument
+    """A video without an identical one should be transcoded"""
+    dedupe.save_fingerprint(video, len(CONTENT), "0" * 64)
+    assert reuse_before_transcode(video, video.original_video) is None
+    video.refresh_from_db()
+    assert video.status == VideoStatus.UPLOADING
+
+
+def test_reuse_before_upload_identical(s3, source, video):
+    """A source identical to a completed video's shouldn't be uploaded, and its
+    original file should be copied too"""
+    reuse = reuse_before_upload(video, len(CONTENT), CONTENT_HASH)
+
+    video.refresh_from_db()
+    _assert_copied(s3, video, source)
+    assert reuse.upload_bytes_saved == len(CONTENT)
+    copied = s3.get_object(
+        Bucket=settings.VIDEO_S3_BUCKET, Key=video.original_video.s3_object_key
+    )
+    assert copied["Body"].read() == CONTENT
+
+
+def test_reuse_before_upload_unchanged(source):
+    """A replacement with the same file as the original should be a no-op"""
+    source.update_status(VideoStatus.CREATED)
+    source.update_status(VideoStatus.UPLOADING)
+    reuse = reuse_before_upload(source, len(CONTENT), CONTENT_HASH)
+
+    source.refresh_from_db()
+    assert source.status == VideoStatus.COMPLETE
+    assert source.videofile_set.count() == 2
+    assert reuse.reason == TranscodeReuse.Reason.UNCHANGED
+    assert reuse.upload_bytes_saved == len(CONTENT)
+    assert reuse.output_bytes_reused == 1000
+    assert reuse.transcode_seconds_saved == 90.0
+
+
+def test_reuse_before_upload_replacement(s3, source):
+    """A replacement identical to another video shouldn't copy that video's files
+    over its own, and should be uploaded and retranscoded instead"""
+    video = VideoFactory(collection=source.collection, status=VideoStatus.COMPLETE)
+    VideoFileFactory(video=video)
+    hls_key = _transcoded_key(video, "video__index.m3u8")
+    s3.put_object(Bucket=settings.VIDEO_S3_TRANSCODE_BUCKET, Key=hls_key, Body=b"mine")
+    VideoFileFactory(
+        video=video,
+        encoding=EncodingNames.HLS,
+        bucket_name=settings.VIDEO_S3_TRANSCODE_BUCKET,
+        s3_object_key=hls_key,
+    )
+    video.update_status(VideoStatus.CREATED)
+    video.update_status(VideoStatus.UPLOADING)
+
+    assert reuse_before_upload(video, len(CONTENT), CONTENT_HASH) is None
+    video.refresh_from_db()
+    assert video.status == VideoStatus.UPLOADING
+    assert video.videofile_set.count() == 2
+    body = s3.get_object(Bucket=settings.VIDEO_S3_TRANSCODE_BUCKET, Key=hls_key)
+    assert body["Body"].read() == b"mine"
+    assert not TranscodeReuse.objects.exists()
+
+
+@pytest.mark.parametrize("content_hash", [None, "0" * 64])
+def test_reuse_before_upload_new_source(video, content_hash):
+    """A source without a known or matching content hash should be uploaded"""
+    assert reuse_before_upload(video, len(CONTENT), content_hash) is None
+    assert not TranscodeReuse.objects.exists()
+
+
+def test_reuse_copy_error(mocker, source, video):  # pylint: disable=unused-argument
+    """A video whose files can't be copied should be uploaded and transcoded"""
+    mocker.patch(
+        "cloudsync.dedupe.get_bucket",
+        side_effect=ClientError({"Error": {"Code": "AccessDenied"}}, "CopyObject"),
+    )
+    assert reuse_before_upload(video, len(CONTENT), CONTENT_HASH) is None
+    video.refresh_from_db()
+    assert video.status == VideoStatus.UPLOADING
+    assert not video.videofile_set.filter(encoding=EncodingNames.HLS).exists()
@@ -0,0 +1,324 @@
+"""
+Direct multipart uploads from the browser to S3
+
+Instead of going through Dropbox and a stream_to_s3 worker, the browser uploads a
+local file straight to the upload bucket in parts, with presigned URLs:
+
+1. start_direct_upload creates the video and an S3 multipart upload for its original
+   file, and returns a signed token describing the upload.
+2. presign_parts returns the presigned URLs of some parts. Asking for the URLs in
+   batches as the upload goes keeps the video from being reaped as stuck.
+3. The browser PUTs the parts, in parallel, and keeps the ETag header of each.
+4. complete_direct_upload checks the parts against S3, completes the upload, creates
+   the original VideoFile and starts transcode_from_s3 once it's committed.
+
+abort_direct_upload cancels an upload and deletes its video. The bucket's CORS
+configuration must allow PUT from the site and expose the ETag header, and a
+lifecycle rule should abort incomplete multipart uploads which are never completed.
+"""
+
+import math
+import os
+from urllib.parse import quote
+
+import boto3
+import structlog
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from cloudsync.exceptions import DirectUploadError
+from cloudsync.tasks import transcode_from_s3
+from odl_video import outbox
+from ui.constants import VideoStatus
+from ui.models import Video, VideoFile
+
+log = structlog.get_logger(__name__)
+
+TOKEN_SALT = "cloudsync.direct_upload"
+MB = 1024 * 1024
+# S3 multipart upload limits
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024 * MB
+
+
+def _s3_client():
+    """
+    Return the S3 client for direct uploads. DIRECT_UPLOAD_S3_ENDPOINT_URL points it
+    at a local S3 stand-in for development.
+    """
+    return boto3.client(
+        "s3", endpoint_url=settings.DIRECT_UPLOAD_S3_ENDPOINT_URL or None
+    )
+
+
+def get_part_size(size):
+    """
+    Get the size of the parts of an upload
+
+    Args:
+        size (int): The size of the file in bytes
+
+    Returns:
+        int: The size of every part but the last one
+    """
+    part_size = max(settings.DIRECT_UPLOAD_PART_SIZE_MB * MB, MIN_PART_SIZE)
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+
+def _sign(upload):
+    """Sign the description of an upload"""
+    return signing.dumps(upload, salt=TOKEN_SALT, compress=True)
+
+
+def load_upload(token):
+    """
+    Load the description of an upload from its token
+
+    Args:
+        token (str): The token returned by start_direct_upload
+
+    Returns:
+        dict: The video key, S3 key, upload id, size and part size of the upload
+
+    Raises:
+        DirectUploadError: If the token is invalid or expired
+    """
+    try:
+        return signing.loads(
+            token, salt=TOKEN_SALT, max_age=settings.DIRECT_UPLOAD_MAX_AGE_SECONDS
+        )
+    except signing.BadSignature as exc:
+        raise DirectUploadError("Invalid or expired upload token") from exc
+
+
+def part_count(upload):
+    """
+    Get the number of parts of an upload
+
+    Args:
+        upload (dict): The description of the upload
+
+    Returns:
+        int: The number of parts
+    """
+    return max(1, math.ceil(upload["size"] / upload["part_size"]))
+
+
+def start_direct_upload(collection, filename, size, content_type=""):
+    """
+    Create a video and start the multipart upload of its original file
+
+    Args:
+        collection (ui.models.Collection): The collection of the video
+        filename (str): The name of the local file
+        size (int): The size of the file in bytes
+        content_type (str): The MIME type of the file
+
+    Returns:
+        dict: The video key, upload token, part size and number of parts
+
+    Raises:
+        DirectUploadError: If the file is too large
+    """
+    if size > MAX_UPLOAD_SIZE:
+        raise DirectUploadError(
+            f"Files larger than {MAX_UPLOAD_SIZE} bytes can't be uploaded"
+        )
+    title, extension = os.path.splitext(filename)
+    video = Video(
+        collection=collection,
+        title=(title or filename)[: Video._meta.get_field("title").max_length],
+    )
+    s3_key = f"{video.hexkey}/video{extension}"
+    video.source_url = (
+        f"https://{settings.AWS_S3_DOMAIN}/{settings.VIDEO_S3_BUCKET}/{quote(s3_key)}"
+    )
+    extra = {"ContentType": content_type} if content_type else {}
+    s3_upload = _s3_client().create_multipart_upload(
+        Bucket=settings.VIDEO_S3_BUCKET, Key=s3_key, **extra
+    )
+    try:
+        video.save()
+        video.update_status(VideoStatus.UPLOADING)
+    except Exception:
+        _abort(s3_key, s3_upload["UploadId"])
+        raise
+
+    upload = {
+        "video": video.hexkey,
+        "key": s3_key,
+        "upload_id": s3_upload["UploadId"],
+        "size": size,
+        "part_size": get_part_size(size),
+    }
+    log.info("Started a direct upload", video_id=video.id, size=size)
+    return {
+        "video": video.hexkey,
+        "token": _sign(upload),
+        "part_size": upload["part_size"],
+        "part_count": part_count(upload),
+    }
+
+
+def presign_parts(upload, part_numbers):
+    """
+    Presign the URLs of some parts of an upload
+
+    Args:
+        upload (dict): The description of the upload
+        part_numbers (list of int): The part numbers, starting from 1
+
+    Returns:
+        list of dict: The part number and URL of each part
+
+    Raises:
+        DirectUploadError: If a part number is out of range
+    """
+    count = part_count(upload)
+    invalid = [number for number in part_numbers if not 1 <= number <= count]
+    if invalid:
+        raise DirectUploadError(f"Invalid part numbers {invalid}, expected 1-{count}")
+    client = _s3_client()
+    parts = [
+        {
+            "part_number": number,
+            "url": client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": settings.VIDEO_S3_BUCKET,
+                    "Key": upload["key"],
+                    "UploadId": upload["upload_id"],
+                    "PartNumber": number,
+                },
+                ExpiresIn=settings.DIRECT_UPLOAD_URL_EXPIRY_SECONDS,
+            ),
+        }
+        for number in part_numbers
+    ]
+    # Keep fail_stuck_uploading_videos from reaping a long upload in progress
+    Video.objects.filter(key=upload["video"], status=VideoStatus.UPLOADING).update()
+    return parts
+
+
+def _uploaded_parts(upload):
+    """The part number, ETag and size of the parts uploaded to S3, by part number"""
+    paginator = _s3_client().get_paginator("list_parts")
+    try:
+        return {
+            part["PartNumber"]: part
+            for page in paginator.paginate(
+                Bucket=settings.VIDEO_S3_BUCKET,
+                Key=upload["key"],
+                UploadId=upload["upload_id"],
+            )
+            for part in page.get("Parts", [])
+        }
+    except ClientError as exc:
+        raise DirectUploadError(f"Unable to list the uploaded parts: {exc}") from exc
+
+
+def _validate_parts(upload, parts):
+    """
+    Check that the parts of an upload were all uploaded, with the given ETags and the
+    expected sizes
+
+    Raises:
+        DirectUploadError: If they weren't
+    """
+    count = part_count(upload)
+    numbers = [part["part_number"] for part in parts]
+    if sorted(numbers) != list(range(1, count + 1)):
+        raise DirectUploadError(f"Expected parts 1-{count}")
+    uploaded = _uploaded_parts(upload)
+    for part in parts:
+        number = part["part_number"]
+        s3_part = uploaded.get(number)
+        if s3_part is None:
+            raise DirectUploadError(f"Part {number} wasn't uploaded")
+        if s3_part["ETag"].strip('"') != part["etag"].strip('"'):
+            raise DirectUploadError(f"Part {number} doesn't match its ETag")
+        expected_size = (
+            upload["part_size"]
+            if number < count
+            else upload["size"] - upload["part_size"] * (count - 1)
+        )
+        if s3_part["Size"] != expected_size:
+            raise DirectUploadError(
+                f"Part {number} is {s3_part['Size']} bytes, expected {expected_size}"
+            )
+
+
+def complete_direct_upload(upload, parts):
+    """
+    Complete an upload, create the original file of its video and start transcoding it
+
+    Args:
+        upload (dict): The description of the upload
+        parts (list of dict): The part number and ETag of each part
+
+    Returns:
+        ui.models.Video: The video
+
+    Raises:
+        DirectUploadError: If the parts don't match what was uploaded, or the video
+            isn't being uploaded anymore
+    """
+    video = Video.objects.select_related("collection").get(key=upload["video"])
+    if video.status != VideoStatus.UPLOADING:
+        raise DirectUploadError(f"Video {video.hexkey} is {video.status!r}")
+    _validate_parts(upload, parts)
+    try:
+        _s3_client().complete_multipart_upload(
+            Bucket=settings.VIDEO_S3_BUCKET,
+            Key=upload["key"],
+            UploadId=upload["upload_id"],
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": part["part_number"], "ETag": part["etag"]}
+                    for part in sorted(parts, key=lambda part: part["part_number"])
+                ]
+            },
+        )
+    except ClientError as exc:
+        raise DirectUploadError(f"Unable to complete the upload: {exc}") from exc
+
+    with transaction.atomic():
+        VideoFile.objects.create(
+            s3_object_key=upload["key"],
+            video=video,
+            bucket_name=settings.VIDEO_S3_BUCKET,
+        )
+        outbox.enqueue(transcode_from_s3.si(video.id))
+    log.info("Completed a direct upload", video_id=video.id)
+    return video
+
+
+def _abort(s3_key, upload_id):
+    """Abort a multipart upload, logging errors"""
+    try:
+        _s3_client().abort_multipart_upload(
+            Bucket=settings.VIDEO_S3_BUCKET, Key=s3_key, UploadId=upload_id
+        )
+    except ClientError:
+        log.exception("Unable to abort a direct upload", s3_object_key=s3_key)
+
+
+def abort_direct_upload(upload):
+    """
+    Cancel an upload and delete its video
+
+    Args:
+        upload (dict): The description of the upload
+
+    Raises:
+        DirectUploadError: If the upload was already completed
+    """
+    video = Video.objects.filter(key=upload["video"]).first()
+    if video is not None and video.videofile_set.exists():
+        raise DirectUploadError("The upload is already complete")
+    _abort(upload["key"], upload["upload_id"])
+    if video is not None:
+        video.delete()
@@ -0,0 +1,195 @@
+"""
+Tests for direct multipart uploads to S3
+"""
+
+import os
+
+import boto3
+import pytest
+import requests
+from django.conf import settings
+from django.core import signing
+from moto import mock_aws
+
+from cloudsync import direct_upload
+from cloudsync.direct_upload import (
+    MB,
+    abort_direct_upload,
+    complete_direct_upload,
+    get_part_size,
+    load_upload,
+    presign_parts,
+    start_direct_upload,
+)
+from cloudsync.exceptions import DirectUploadError
+from ui.constants import VideoStatus
+from ui.encodings import EncodingNames
+from ui.factories import CollectionFactory
+from ui.models import Video
+
+pytestmark = pytest.mark.django_db
+
+FILE_SIZE = 5 * MB + 1024
+
+
+@pytest.fixture
+def s3():
+    """A local S3 stand-in with the upload bucket"""
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=settings.VIDEO_S3_BUCKET)
+        yield client
+
+
+@pytest.fixture
+def transcode(mocker):
+    """Mock the transcode task"""
+    return mocker.patch("cloudsync.direct_upload.transcode_from_s3")
+
+
+@pytest.fixture
+def started(s3, settings):  # pylint: disable=unused-argument
+    """A started direct upload of a file in two parts"""
+    settings.DIRECT_UPLOAD_PART_SIZE_MB = 5
+    content = os.urandom(FILE_SIZE)
+    response = start_direct_upload(
+        CollectionFactory(), "Lecture 1.mp4", len(content), "video/mp4"
+    )
+    return response, load_upload(response["token"]), content
+
+
+def _upload_parts(upload, content):
+    """PUT the parts of a file to their presigned URLs, like a browser would"""
+    part_size = upload["part_size"]
+    parts = []
+    for part in presign_parts(upload, [1, 2]):
+        number = part["part_number"]
+        body = content[(number - 1) * part_size : number * part_size]
+        response = requests.put(part["url"], data=body, timeout=10)
+        response.raise_for_status()
+        parts.append({"part_number": number, "etag": response.headers["ETag"]})
+    return parts
+
+
+def test_start_direct_upload(started):
+    """Starting an upload should create a video being uploaded and a multipart
+    upload for its original file"""
+    response, upload, _ = started
+    video = Video.objects.get(key=response["video"])
+    assert video.title == "Lecture 1"
+    assert video.status == VideoStatus.UPLOADING
+    assert video.get_s3_key() == upload["key"] == f"{video.hexkey}/video.mp4"
+    assert response["part_size"] == 5 * MB
+    assert response["part_count"] == 2
+    assert upload["size"] == FILE_SIZE
+
+
+def test_direct_upload(s3, started, transcode, django_capture_on_commit_callbacks):
+    """A complete upload should be in S3, with the original file of the video,
+    which is then transcoded"""
+    response, upload, content = started
+    parts = _upload_parts(upload, content)
+    with django_capture_on_commit_callbacks(execute=True):
+        video = complete_direct_upload(upload, parts)
+
+    assert video.hexkey == response["video"]
+    video_file = video.videofile_set.get()
+    assert video_file.encoding == EncodingNames.ORIGINAL
+    assert video_file.s3_object_key == upload["key"]
+    s3_object = s3.get_object(Bucket=settings.VIDEO_S3_BUCKET, Key=upload["key"])
+    assert s3_object["Body"].read() == content
+    assert s3_object["ContentType"] == "video/mp4"
+    transcode.si.assert_called_once_with(video.id)
+    transcode.si.return_value.apply_async.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "change, message",
+    [
+        (lambda parts: parts[:1], "Expected parts 1-2"),
+        (lambda parts: parts + parts[:1], "Expected parts 1-2"),
+        (
+            lambda parts: [parts[0], {**parts[1], "etag": '"0123"'}],
+            "Part 2 doesn't match its ETag",
+        ),
+    ],
+)
+def test_complete_invalid_parts(started, transcode, change, message):
+    """An upload should only be completed with every part as uploaded"""
+    _, upload, content = started
+    parts = _upload_parts(upload, content)
+    with pytest.raises(DirectUploadError, match=message):
+        complete_direct_upload(upload, change(parts))
+    assert not Video.objects.get(key=upload["video"]).videofile_set.exists()
+    assert transcode.si.call_count == 0
+
+
+def test_complete_missing_part(started):
+    """An upload with a part which wasn't uploaded shouldn't be completed"""
+    _, upload, _ = started
+    with pytest.raises(DirectUploadError, match="Part 1 wasn't uploaded"):
+        complete_direct_upload(
+            upload,
+            [{"part_number": 1, "etag": "a"}, {"part_number": 2, "etag": "b"}],
+        )
+
+
+def test_complete_not_uploading(started):
+    """An upload whose video isn't being uploaded anymore can't be completed"""
+    _, upload, content = started
+    parts = _upload_parts(upload, content)
+    video = Video.objects.get(key=upload["video"])
+    video.update_status(VideoStatus.UPLOAD_FAILED)
+    with pytest.raises(DirectUploadError):
+        complete_direct_upload(upload, parts)
+
+
+def test_presign_parts(started):
+    """Part URLs should only be presigned for the parts of the upload, and keep the
+    video from being considered stuck"""
+    _, upload, _ = started
+    Video.objects.filter(key=upload["video"]).update(updated_at="2020-01-01T00:00Z")
+    parts = presign_parts(upload, [2])
+    assert [part["part_number"] for part in parts] == [2]
+    assert "partNumber=2" in parts[0]["url"]
+    assert Video.objects.get(key=upload["video"]).updated_at.year > 2020
+
+    with pytest.raises(DirectUploadError):
+        presign_parts(upload, [3])
+
+
+def test_abort_direct_upload(s3, started):
+    """Aborting an upload should delete its video and S3 multipart upload"""
+    _, upload, _ = started
+    abort_direct_upload(upload)
+    assert not Video.objects.filter(key=upload["video"]).exists()
+    assert "Uploads" not in s3.list_multipart_uploads(Bucket=settings.VIDEO_S3_BUCKET)
+
+
+def test_abort_completed_upload(started, transcode):  # pylint: disable=unused-argument
+    """A completed upload can't be aborted"""
+    _, upload, content = started
+    complete_direct_upload(upload, _upload_parts(upload, content))
+    with pytest.raises(DirectUploadError):
+        abort_direct_upload(upload)
+    assert Video.objects.filter(key=upload["video"]).exists()
+
+
+def test_load_upload_invalid(settings):
+    """A tampered or expired token should be rejected"""
+    token = signing.dumps({"video": "abc"}, salt="something else")
+    with pytest.raises(DirectUploadError):
+        load_upload(token)
+    settings.DIRECT_UPLOAD_MAX_AGE_SECONDS = -1
+    with pytest.raises(DirectUploadError):
+        load_upload(signing.dumps({}, salt=direct_upload.TOKEN_SALT))
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [(1, 64 * MB), (64 * MB * 10000, 64 * MB), (64 * MB * 10000 + 1, 64 * MB + 1)],
+)
+def test_get_part_size(settings, size, expected):
+    """Parts should be large enough for the file to fit in 10,000 of them"""
+    settings.DIRECT_UPLOAD_PART_SIZE_MB = 64
+    assert get_part_size(size) == expected
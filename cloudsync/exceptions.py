@@ -3,3 +3,15 @@
 
 class TranscodeTargetDoesNotExist(Exception):
     """Custom exception to be used when a video does not exist for a transcode task"""
+
+
+class MediaConvertResultError(Exception):
+    """Custom exception to be used when a MediaConvert job result cannot be parsed"""
+
+
+class InvalidPlaylistError(Exception):
+    """Custom exception to be used when an HLS playlist cannot be parsed"""
+
+
+class DirectUploadError(Exception):
+    """Custom exception to be used when a direct upload to S3 can't go on"""
@@ -0,0 +1,139 @@
+"""
+Parsing and writing of HLS master playlists
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from cloudsync.exceptions import InvalidPlaylistError
+
+HEADER_TAG = "#EXTM3U"
+STREAM_INF_TAG = "#EXT-X-STREAM-INF:"
+ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+RESOLUTION_PATTERN = re.compile(r"^(\d+)x(\d+)$")
+
+
+def parse_attributes(attribute_list):
+    """
+    Parse an HLS attribute list (``KEY=value,KEY="quoted, value"``)
+
+    Args:
+        attribute_list (str): The text after a tag's colon
+
+    Returns:
+        dict: Attribute values by name, with quotes removed
+    """
+    return {
+        name: value[1:-1] if value.startswith('"') else value
+        for name, value in ATTRIBUTE_PATTERN.findall(attribute_list)
+    }
+
+
+@dataclass
+class Variant:
+    """A variant stream of a master playlist"""
+
+    attributes: dict
+    uri: str
+    # The tag, URI and any other lines up to the next variant, as written
+    text: str
+
+    @property
+    def bandwidth(self):
+        """Peak bitrate of the variant in bits per second"""
+        return int(self.attributes["BANDWIDTH"])
+
+    @property
+    def resolution(self):
+        """(width, height) of the variant, or None for audio-only variants"""
+        match = RESOLUTION_PATTERN.match(self.attributes.get("RESOLUTION", ""))
+        if not match:
+            return None
+        return int(match.group(1)), int(match.group(2))
+
+    @property
+    def codecs(self):
+        """The codecs of the variant"""
+        codecs = self.attributes.get("CODECS", "")
+        return [codec.strip() for codec in codecs.split(",") if codec.strip()]
+
+
+@dataclass
+class MasterPlaylist:
+    """An HLS master playlist"""
+
+    # Everything before the first variant, as written
+    header: str
+    variants: list[Variant] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, content):
+        """
+        Parse the text of a master playlist
+
+        Args:
+            content (str): The playlist text
+
+        Returns:
+            MasterPlaylist: The parsed playlist
+
+        Raises:
+            InvalidPlaylistError: If the text isn't a master playlist
+        """
+        header, *chunks = content.split(STREAM_INF_TAG)
+        header_lines = [line.strip() for line in header.splitlines() if line.strip()]
+        if not header_lines or header_lines[0] != HEADER_TAG:
+            raise InvalidPlaylistError("Playlist does not start with #EXTM3U")
+
+        variants = []
+        for chunk in chunks:
+            attribute_list, _, rest = chunk.partition("\n")
+            uri = next(
+                (
+                    line.strip()
+                    for line in rest.splitlines()
+                    if line.strip() and not line.startswith("#")
+                ),
+                None,
+            )
+            attributes = parse_attributes(attribute_list.strip())
+            if not uri or not attributes.get("BANDWIDTH", "").isdigit():
+                raise InvalidPlaylistError(
+                    f"Invalid variant stream {attribute_list.strip()!r}"
+                )
+            variants.append(
+                Variant(attributes=attributes, uri=uri, text=f"{STREAM_INF_TAG}{chunk}")
+            )
+        return cls(header=header, variants=variants)
+
+    def sorted(self):
+        """
+        Return a copy of the playlist with the highest resolution variants first, and
+        the highest bandwidth first among variants of the same resolution
+
+        Returns:
+            MasterPlaylist: The sorted playlist
+        """
+        return MasterPlaylist(
+            header=self.header,
+            variants=sorted(
+                self.variants,
+                key=lambda variant: (
+                    -(variant.resolution or (0, 0))[0],
+                    -variant.bandwidth,
+                ),
+            ),
+        )
+
+    def dumps(self):
+        """
+        Write the playlist text. An unmodified parsed playlist is written back exactly.
+
+        Returns:
+            str: The playlist text
+        """
+        texts = [variant.text for variant in self.variants]
+        return self.header + "".join(
+            text if index == len(texts) - 1 or text.endswith("\n") else f"{text}\n"
+            for index, text in enumerate(texts)
+        )
@@ -0,0 +1,77 @@
+"""
+Tests for HLS playlist parsing
+"""
+
+import pytest
+
+from cloudsync.exceptions import InvalidPlaylistError
+from cloudsync.hls import MasterPlaylist, parse_attributes
+
+MEDIACONVERT_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-INDEPENDENT-SEGMENTS
+#EXT-X-STREAM-INF:BANDWIDTH=1163306,AVERAGE-BANDWIDTH=1107843,CODECS="avc1.4d401f,mp4a.40.2",RESOLUTION=640x360,FRAME-RATE=29.970
+video_HLS400k.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2148515,AVERAGE-BANDWIDTH=2026268,CODECS="avc1.640028,mp4a.40.2",RESOLUTION=1920x1080,FRAME-RATE=29.970
+video_HLS2M.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1648515,AVERAGE-BANDWIDTH=1526268,CODECS="avc1.4d401f,mp4a.40.2",RESOLUTION=1280x720,FRAME-RATE=29.970
+video_HLS1.5M.m3u8"""
+
+
+def test_parse_attributes():
+    """Quoted values may contain commas"""
+    assert parse_attributes('BANDWIDTH=10,CODECS="avc1,mp4a",RESOLUTION=2x1') == {
+        "BANDWIDTH": "10",
+        "CODECS": "avc1,mp4a",
+        "RESOLUTION": "2x1",
+    }
+
+
+def test_parse_master_playlist():
+    """Variants should expose their bandwidth, resolution, codecs and URI"""
+    playlist = MasterPlaylist.parse(MEDIACONVERT_PLAYLIST)
+
+    assert [variant.uri for variant in playlist.variants] == [
+        "video_HLS400k.m3u8",
+        "video_HLS2M.m3u8",
+        "video_HLS1.5M.m3u8",
+    ]
+    variant = playlist.variants[1]
+    assert variant.bandwidth == 2148515
+    assert variant.resolution == (1920, 1080)
+    assert variant.codecs == ["avc1.640028", "mp4a.40.2"]
+    assert playlist.dumps() == MEDIACONVERT_PLAYLIST
+
+
+def test_sorted_playlist():
+    """Sorting puts the highest resolution first and keeps the header"""
+    playlist = MasterPlaylist.parse(MEDIACONVERT_PLAYLIST).sorted()
+    content = playlist.dumps()
+
+    assert [variant.uri for variant in playlist.variants] == [
+        "video_HLS2M.m3u8",
+        "video_HLS1.5M.m3u8",
+        "video_HLS400k.m3u8",
+    ]
+    assert content.startswith(
+        "#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-INDEPENDENT-SEGMENTS\n"
+    )
+    # The variant that used to be last gets a line break before the next one
+    assert "video_HLS1.5M.m3u8\n#EXT-X-STREAM-INF:" in content
+    assert content.endswith("\nvideo_HLS400k.m3u8\n")
+    assert MasterPlaylist.parse(content).sorted().dumps() == content
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "",
+        "invalid_header\n#EXT-X-STREAM-INF:BANDWIDTH=1\nvideo.m3u8\n",
+        "#EXTM3U\n#EXT-X-STREAM-INF: No\n#EXT-X-STREAM-INF: RESOLUTIONS\n",
+        "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1,RESOLUTION=2x1\n",
+    ],
+)
+def test_parse_invalid_playlist(content):
+    """Text that isn't a master playlist should raise InvalidPlaylistError"""
+    with pytest.raises(InvalidPlaylistError):
+        MasterPlaylist.parse(content)
@@ -0,0 +1,313 @@
+"""
+Debounced CloudFront invalidations
+
+Paths to invalidate are accumulated in a redis set and flushed together, either
+once a debounce window has passed since the first queued path or as soon as the
+set reaches a size threshold. Before flushing, paths that are covered by a
+wildcard are dropped and directories with many paths are collapsed into a single
+wildcard, then the result is split into batches that stay within the CloudFront
+per-distribution limits. Throttled and failed batches are put back into the set
+and retried; paths that keep failing are eventually dropped.
+"""
+
+import json
+import os
+from collections import defaultdict
+from uuid import uuid4
+
+import boto3
+import structlog
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+from odl_video.celery import app
+from ui.utils import now_in_utc
+
+log = structlog.get_logger(__name__)
+
+PENDING_PATHS_KEY = "cloudfront_invalidation:pending"
+FLUSH_SCHEDULED_KEY = "cloudfront_invalidation:flush_scheduled"
+FLUSH_LOCK_KEY = "cloudfront_invalidation:lock"
+FAILURE_COUNTS_KEY = "cloudfront_invalidation:failures"
+INVALIDATION_LOG_KEY = "cloudfront_invalidation:log"
+INVALIDATION_LOG_LENGTH = 100
+THROTTLING_ERROR_CODES = {
+    "TooManyInvalidationsInProgress",
+    "Throttling",
+    "ThrottlingException",
+}
+
+
+class InvalidationThrottled(Exception):
+    """Raised when CloudFront refuses an invalidation batch because of rate limits"""
+
+
+def _redis_client():
+    """Return the redis client shared with the celery result backend"""
+    return app.backend.client
+
+
+def _as_path(key):
+    """Convert an S3 key or CloudFront path to a CloudFront path"""
+    return key if key.startswith("/") else f"/{key}"
+
+
+def collapse_paths(paths, collapse_threshold):
+    """
+    Reduce a set of CloudFront paths to an equivalent, smaller set
+
+    Paths under a directory with at least ``collapse_threshold`` paths are replaced
+    by a ``<directory>/*`` wildcard, and any path covered by another wildcard is
+    dropped.
+
+    Args:
+        paths (iterable of str): CloudFront paths (or S3 keys)
+        collapse_threshold (int): Number of paths in one directory at which they are
+            replaced by a wildcard. 0 disables collapsing.
+
+    Returns:
+        list of str: The collapsed paths, sorted
+    """
+    paths = {_as_path(path) for path in paths}
+    if collapse_threshold:
+        by_directory = defaultdict(set)
+        for path in paths:
+            if not path.endswith("*"):
+                by_directory[os.path.dirname(path)].add(path)
+        for directory, directory_paths in by_directory.items():
+            if len(directory_paths) >= collapse_threshold:
+                paths -= directory_paths
+                paths.add(f"{directory.rstrip('/')}/*")
+
+    wildcard_prefixes = {path[:-1] for path in paths if path.endswith("*")}
+    return sorted(
+        path
+        for path in paths
+        if not any(
+            path.startswith(prefix) and path != f"{prefix}*"
+            for prefix in wildcard_prefixes
+        )
+    )
+
+
+def chunk_paths(paths, max_paths, max_wildcards):
+    """
+    Split paths into invalidation batches
+
+    Args:
+        paths (list of str): CloudFront paths
+        max_paths (int): Maximum number of paths in one batch
+        max_wildcards (int): Maximum number of wildcard paths in one batch
+
+    Returns:
+        list of list of str: The batches
+    """
+    wildcards = [path for path in paths if path.endswith("*")]
+    files = [path for path in paths if not path.endswith("*")]
+    batches = []
+    while wildcards or files:
+        batch = wildcards[:max_wildcards]
+        wildcards = wildcards[max_wildcards:]
+        room = max_paths - len(batch)
+        batch.extend(files[:room])
+        files = files[room:]
+        batches.append(batch)
+    return batches
+
+
+def queue_cloudfront_invalidation(keys):
+    """
+    Queue S3 object keys for invalidation on the video CloudFront distribution
+
+    Args:
+        keys (list of str): S3 object keys or wildcard paths
+    """
+    if not settings.VIDEO_CDN_DISTRIBUTION_ID or not keys:
+        return
+    from cloudsync.tasks import flush_cloudfront_invalidations
+
+    client = _redis_client()
+    client.sadd(PENDING_PATHS_KEY, *[_as_path(key) for key in keys])
+    if client.scard(PENDING_PATHS_KEY) >= settings.CLOUDFRONT_INVALIDATION_FLUSH_SIZE:
+        flush_cloudfront_invalidations.delay()
+    elif client.set(
+        FLUSH_SCHEDULED_KEY,
+        1,
+        nx=True,
+        ex=settings.CLOUDFRONT_INVALIDATION_DEBOUNCE_SECONDS,
+    ):
+        flush_cloudfront_invalidations.apply_async(
+            countdown=settings.CLOUDFRONT_INVALIDATION_DEBOUNCE_SECONDS
+        )
+
+
+def create_invalidation(paths):
+    """
+    Create a single CloudFront invalidation and record its id
+
+    Args:
+        paths (list of str): CloudFront paths
+
+    Returns:
+        str: The invalidation id
+
+    Raises:
+        InvalidationThrottled: If CloudFront throttled the request
+    """
+    dist_id = settings.VIDEO_CDN_DISTRIBUTION_ID
+    try:
+        response = boto3.client("cloudfront").create_invalidation(
+            DistributionId=dist_id,
+            InvalidationBatch={
+                "Paths": {"Quantity": len(paths), "Items": paths},
+                "CallerReference": str(uuid4()),
+            },
+        )
+    except ClientError as exc:
+        if exc.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+            raise InvalidationThrottled(str(exc)) from exc
+        raise
+    invalidation_id = response["Invalidation"]["Id"]
+    client = _redis_client()
+    client.lpush(
+        INVALIDATION_LOG_KEY,
+        json.dumps(
+            {
+                "id": invalidation_id,
+                "distribution_id": dist_id,
+                "path_count": len(paths),
+                "created_at": now_in_utc().isoformat(),
+            }
+        ),
+    )
+    client.ltrim(INVALIDATION_LOG_KEY, 0, INVALIDATION_LOG_LENGTH - 1)
+    log.info(
+        "Created CloudFront invalidation",
+        invalidation_id=invalidation_id,
+        distribution_id=dist_id,
+        path_count=len(paths),
+    )
+    return invalidation_id
+
+
+def recent_invalidations():
+    """
+    Return the most recently created invalidations, newest first
+
+    Returns:
+        list of dict: Invalidation ids, path counts and creation times
+    """
+    return [
+        json.loads(entry)
+        for entry in _redis_client().lrange(
+            INVALIDATION_LOG_KEY, 0, INVALIDATION_LOG_LENGTH - 1
+        )
+    ]
+
+
+def _requeue_failed_batch(client, batch):
+    """
+    Put the paths of a batch that failed back into the pending set, unless they have
+    already failed CLOUDFRONT_INVALIDATION_MAX_FAILURES times
+
+    Args:
+        client (redis.Redis): The redis client
+        batch (list of str): CloudFront paths
+
+    Returns:
+        list of str: The paths that were re-queued
+    """
+    requeued = []
+    dropped = []
+    for path in batch:
+        if (
+            client.hincrby(FAILURE_COUNTS_KEY, path, 1)
+            < settings.CLOUDFRONT_INVALIDATION_MAX_FAILURES
+        ):
+            requeued.append(path)
+        else:
+            dropped.append(path)
+    if requeued:
+        client.sadd(PENDING_PATHS_KEY, *requeued)
+    if dropped:
+        client.hdel(FAILURE_COUNTS_KEY, *dropped)
+        log.error(
+            "Dropping CloudFront invalidation paths that keep failing",
+            distribution_id=settings.VIDEO_CDN_DISTRIBUTION_ID,
+            paths=dropped,
+        )
+    return requeued
+
+
+def flush_pending_invalidations():
+    """
+    Send all queued paths to CloudFront, unless another flush is already running
+
+    Batches after a throttled one are not attempted; their paths are put back into
+    the pending set along with the throttled batch's. Batches that fail for another
+    reason are put back too, up to CLOUDFRONT_INVALIDATION_MAX_FAILURES times.
+
+    Returns:
+        list of str: Paths that were re-queued
+    """
+    client = _redis_client()
+    lock = client.lock(
+        FLUSH_LOCK_KEY, timeout=settings.CLOUDFRONT_INVALIDATION_LOCK_TTL
+    )
+    if not lock.acquire(blocking=False):
+        # Another flush is running, and will pick up anything queued before it popped
+        # the pending set. Anything queued after has scheduled its own flush.
+        return []
+    try:
+        return _flush_pending_invalidations(client)
+    finally:
+        lock.release()
+
+
+def _flush_pending_invalidations(client):
+    """
+    Send all queued paths to CloudFront (see flush_pending_invalidations)
+
+    Args:
+        client (redis.Redis): The redis client
+
+    Returns:
+        list of str: Paths that were re-queued
+    """
+    client.delete(FLUSH_SCHEDULED_KEY)
+    pending_count = client.scard(PENDING_PATHS_KEY)
+    if not pending_count:
+        return []
+    pending = client.spop(PENDING_PATHS_KEY, pending_count)
+    paths = collapse_paths(
+        [path.decode("utf-8") if isinstance(path, bytes) else path for path in pending],
+        settings.CLOUDFRONT_INVALIDATION_COLLAPSE_THRESHOLD,
+    )
+    batches = chunk_paths(
+        paths,
+        settings.CLOUDFRONT_INVALIDATION_MAX_PATHS,
+        settings.CLOUDFRONT_INVALIDATION_MAX_WILDCARDS,
+    )
+    failed = []
+    for index, batch in enumerate(batches):
+        try:
+            create_invalidation(batch)
+        except InvalidationThrottled:
+            requeued = [path for remaining in batches[index:] for path in remaining]
+            client.sadd(PENDING_PATHS_KEY, *requeued)
+            log.warning(
+                "CloudFront invalidation throttled",
+                distribution_id=settings.VIDEO_CDN_DISTRIBUTION_ID,
+                path_count=len(requeued),
+            )
+            return failed + requeued
+        except Exception:
+            log.exception(
+                "CloudFront invalidation failed",
+                distribution_id=settings.VIDEO_CDN_DISTRIBUTION_ID,
+                path_count=len(batch),
+            )
+            failed.extend(_requeue_failed_batch(client, batch))
+        else:
+            client.hdel(FAILURE_COUNTS_KEY, *batch)
+    return failed
@@ -0,0 +1,287 @@
+"""
+Tests for debounced CloudFront invalidations
+"""
+
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from cloudsync import invalidation
+from cloudsync.invalidation import (
+    FAILURE_COUNTS_KEY,
+    FLUSH_SCHEDULED_KEY,
+    PENDING_PATHS_KEY,
+    chunk_paths,
+    collapse_paths,
+    flush_pending_invalidations,
+    queue_cloudfront_invalidation,
+    recent_invalidations,
+)
+from cloudsync.tasks import flush_cloudfront_invalidations
+
+pytestmark = pytest.mark.django_db
+
+
+class RedisSets:
+    """The subset of redis set, string and list commands used for invalidations"""
+
+    def __init__(self, mocker):
+        self.data = {}
+        self.lock = mocker.MagicMock()
+
+    def sadd(self, key, *values):
+        self.data.setdefault(key, set()).update(values)
+
+    def scard(self, key):
+        return len(self.data.get(key, ()))
+
+    def spop(self, key, count):
+        members = self.data.get(key, set())
+        return [members.pop() for _ in range(min(count, len(members)))]
+
+    def set(self, key, value, nx=False, ex=None):  # pylint: disable=unused-argument
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def hincrby(self, key, field, amount):
+        counts = self.data.setdefault(key, {})
+        counts[field] = counts.get(field, 0) + amount
+        return counts[field]
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.data.get(key, {}).pop(field, None)
+
+    def lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, value)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start : end + 1]
+
+    def lrange(self, key, start, end):
+        return self.data.get(key, [])[start : end + 1]
+
+
+@pytest.fixture
+def redis(mocker, settings):
+    """Point the invalidation module at an in-memory redis and a configured distribution"""
+    settings.VIDEO_CDN_DISTRIBUTION_ID = "DIST123"
+    client = RedisSets(mocker)
+    client.lock.return_value.acquire.return_value = True
+    mocker.patch("cloudsync.invalidation._redis_client", return_value=client)
+    return client
+
+
+@pytest.fixture
+def cloudfront(mocker):
+    """Mock CloudFront client"""
+    client = mocker.MagicMock()
+    client.create_invalidation.return_value = {"Invalidation": {"Id": "I123"}}
+    mocker.patch("cloudsync.invalidation.boto3").client.return_value = client
+    return client
+
+
+def _throttled():
+    """A CloudFront throttling error"""
+    return ClientError(
+        {"Error": {"Code": "TooManyInvalidationsInProgress"}}, "CreateInvalidation"
+    )
+
+
+def test_collapse_paths():
+    """Paths covered by a wildcard are dropped and crowded directories collapse"""
+    paths = [
+        "transcoded/abc/video.m3u8",
+        "transcoded/abc/*",
+        "transcoded/abc/sub/video.mp4",
+        "/thumbnails/a/1.jpg",
+        "/thumbnails/a/2.jpg",
+        "/thumbnails/a/3.jpg",
+        "/thumbnails/b/1.jpg",
+    ]
+    assert collapse_paths(paths, 3) == [
+        "/thumbnails/a/*",
+        "/thumbnails/b/1.jpg",
+        "/transcoded/abc/*",
+    ]
+    assert len(collapse_paths(paths, 0)) == 5
+
+
+def test_chunk_paths():
+    """Batches respect both the path and the wildcard limits"""
+    paths = ["/a/*", "/b/*", "/c/*", "/1", "/2", "/3", "/4"]
+    assert chunk_paths(paths, 4, 2) == [
+        ["/a/*", "/b/*", "/1", "/2"],
+        ["/c/*", "/3", "/4"],
+    ]
+    assert not chunk_paths([], 4, 2)
+
+
+def test_queue_debounces(mocker, redis, settings):
+    """Only the first queued path within the debounce window schedules a flush"""
+    settings.CLOUDFRONT_INVALIDATION_DEBOUNCE_SECONDS = 30
+    settings.CLOUDFRONT_INVALIDATION_FLUSH_SIZE = 10
+    flush_mock = mocker.patch("cloudsync.tasks.flush_cloudfront_invalidations")
+
+    queue_cloudfront_invalidation(["transcoded/abc/video.m3u8"])
+    queue_cloudfront_invalidation(["thumbnails/abc/thumb.jpg"])
+
+    flush_mock.apply_async.assert_called_once_with(countdown=30)
+    flush_mock.delay.assert_not_called()
+    assert redis.data[PENDING_PATHS_KEY] == {
+        "/transcoded/abc/video.m3u8",
+        "/thumbnails/abc/thumb.jpg",
+    }
+
+
+def test_queue_flushes_at_size_threshold(mocker, redis, settings):
+    """Reaching the size threshold flushes without waiting for the debounce window"""
+    settings.CLOUDFRONT_INVALIDATION_FLUSH_SIZE = 2
+    flush_mock = mocker.patch("cloudsync.tasks.flush_cloudfront_invalidations")
+
+    queue_cloudfront_invalidation(["a.m3u8", "b.m3u8"])
+
+    flush_mock.delay.assert_called_once_with()
+    flush_mock.apply_async.assert_not_called()
+
+
+def test_queue_no_distribution(mocker, settings):
+    """Nothing is queued when no distribution is configured"""
+    settings.VIDEO_CDN_DISTRIBUTION_ID = ""
+    client_mock = mocker.patch("cloudsync.invalidation._redis_client")
+    queue_cloudfront_invalidation(["a.m3u8"])
+    client_mock.assert_not_called()
+
+
+def test_flush_creates_chunked_invalidations(redis, cloudfront, settings):
+    """Pending paths are collapsed, chunked and their invalidation ids recorded"""
+    settings.CLOUDFRONT_INVALIDATION_MAX_PATHS = 2
+    settings.CLOUDFRONT_INVALIDATION_COLLAPSE_THRESHOLD = 0
+    redis.set(FLUSH_SCHEDULED_KEY, 1)
+    redis.sadd(PENDING_PATHS_KEY, "/a/*", "/a/1.ts", "/b/1.jpg", "/c/1.jpg")
+
+    assert flush_pending_invalidations() == []
+
+    batches = [
+        call[1]["InvalidationBatch"]["Paths"]["Items"]
+        for call in cloudfront.create_invalidation.call_args_list
+    ]
+    assert batches == [["/a/*", "/b/1.jpg"], ["/c/1.jpg"]]
+    assert all(
+        call[1]["DistributionId"] == "DIST123"
+        for call in cloudfront.create_invalidation.call_args_list
+    )
+    assert [entry["id"] for entry in recent_invalidations()] == ["I123", "I123"]
+    assert redis.scard(PENDING_PATHS_KEY) == 0
+    assert FLUSH_SCHEDULED_KEY not in redis.data
+
+
+def test_flush_requeues_throttled_batches(redis, cloudfront, settings):
+    """A throttled batch and every batch after it go back into the pending set"""
+    settings.CLOUDFRONT_INVALIDATION_MAX_PATHS = 1
+    cloudfront.create_invalidation.side_effect = [
+        {"Invalidation": {"Id": "I1"}},
+        _throttled(),
+    ]
+    redis.sadd(PENDING_PATHS_KEY, "/a.jpg", "/b.jpg", "/c.jpg")
+
+    assert flush_pending_invalidations() == ["/b.jpg", "/c.jpg"]
+    assert redis.data[PENDING_PATHS_KEY] == {"/b.jpg", "/c.jpg"}
+    assert cloudfront.create_invalidation.call_count == 2
+
+
+def test_flush_requeues_failed_batches(mocker, redis, cloudfront, settings):
+    """Batches that fail are logged and re-queued, without holding up the others"""
+    settings.CLOUDFRONT_INVALIDATION_MAX_PATHS = 1
+    log_mock = mocker.patch("cloudsync.invalidation.log")
+    cloudfront.create_invalidation.side_effect = [
+        Exception("CF error"),
+        {"Invalidation": {"Id": "I1"}},
+    ]
+    redis.sadd(PENDING_PATHS_KEY, "/a.jpg", "/b.jpg")
+
+    assert flush_pending_invalidations() == ["/a.jpg"]
+    log_mock.exception.assert_called_once()
+    assert redis.data[PENDING_PATHS_KEY] == {"/a.jpg"}
+    assert redis.data[FAILURE_COUNTS_KEY] == {"/a.jpg": 1}
+
+    cloudfront.create_invalidation.side_effect = None
+    assert flush_pending_invalidations() == []
+    assert redis.scard(PENDING_PATHS_KEY) == 0
+    assert redis.data[FAILURE_COUNTS_KEY] == {}
+
+
+def test_flush_drops_paths_that_keep_failing(mocker, redis, cloudfront, settings):
+    """Paths are dropped after failing CLOUDFRONT_INVALIDATION_MAX_FAILURES times"""
+    settings.CLOUDFRONT_INVALIDATION_MAX_FAILURES = 2
+    log_mock = mocker.patch("cloudsync.invalidation.log")
+    cloudfront.create_invalidation.side_effect = Exception("CF error")
+    redis.sadd(PENDING_PATHS_KEY, "/a.jpg")
+
+    assert flush_pending_invalidations() == ["/a.jpg"]
+    assert flush_pending_invalidations() == []
+    assert redis.scard(PENDING_PATHS_KEY) == 0
+    assert redis.data[FAILURE_COUNTS_KEY] == {}
+    log_mock.error.assert_called_once()
+    assert log_mock.error.call_args[1]["paths"] == ["/a.jpg"]
+
+
+def test_flush_task_retries_when_throttled(mocker, redis, cloudfront, settings):
+    """The flush task retries later while CloudFront throttles it"""
+    settings.CLOUDFRONT_INVALIDATION_RETRY_SECONDS = 120
+    cloudfront.create_invalidation.side_effect = _throttled()
+    redis.sadd(PENDING_PATHS_KEY, "/a.jpg")
+    retry_mock = mocker.patch.object(
+        flush_cloudfront_invalidations, "retry", side_effect=Exception("retry")
+    )
+
+    with pytest.raises(Exception, match="retry"):
+        flush_cloudfront_invalidations()
+
+    retry_mock.assert_called_once_with(countdown=120)
+    redis.lock.return_value.release.assert_called_once_with()
+    assert redis.data[PENDING_PATHS_KEY] == {"/a.jpg"}
+
+
+def test_flush_task_gives_up_after_max_retries(mocker, redis, cloudfront, settings):
+    """Once out of retries, the flush task leaves the paths queued for a later flush"""
+    settings.CLOUDFRONT_INVALIDATION_MAX_RETRIES = 0
+    cloudfront.create_invalidation.side_effect = _throttled()
+    redis.sadd(PENDING_PATHS_KEY, "/a.jpg")
+    retry_mock = mocker.patch.object(flush_cloudfront_invalidations, "retry")
+
+    flush_cloudfront_invalidations()
+
+    retry_mock.assert_not_called()
+    assert redis.data[PENDING_PATHS_KEY] == {"/a.jpg"}
+
+
+def test_flush_skips_when_locked(redis, cloudfront):
+    """A flush that can't get the lock leaves the pending set to the running one"""
+    redis.lock.return_value.acquire.return_value = False
+    redis.sadd(PENDING_PATHS_KEY, "/a.jpg")
+
+    assert flush_pending_invalidations() == []
+
+    cloudfront.create_invalidation.assert_not_called()
+    assert redis.data[PENDING_PATHS_KEY] == {"/a.jpg"}
+
+
+def test_recent_invalidations_order(redis, cloudfront):
+    """Recorded invalidations are returned newest first"""
+    cloudfront.create_invalidation.side_effect = [
+        {"Invalidation": {"Id": "first"}},
+        {"Invalidation": {"Id": "second"}},
+    ]
+    invalidation.create_invalidation(["/a.jpg"])
+    invalidation.create_invalidation(["/b.jpg"])
+
+    entries = recent_invalidations()
+    assert [entry["id"] for entry in entries] == ["second", "first"]
+    assert json.loads(redis.data["cloudfront_invalidation:log"][0])["path_count"] == 1
@@ -43,6 +43,7 @@ from django.utils.dateparse import parse_date
 from cloudsync import tasks
 from ui import api, models
 from ui.constants import VideoStatus
+from ui.exceptions import StatusConflict
 
 REQUIRED_COLUMNS = {"publication_date", "title", "dropbox_link"}
 
@@ -297,7 +298,13 @@ class Command(BaseCommand):
         # status flip for *_FAILED states (cloudsync/api.py), so without
         # this the operator-visible status never moves off "...failed".
         prior_status = existing.status
-        existing.update_status(VideoStatus.CREATED)
+        try:
+            existing.update_status(VideoStatus.CREATED)
+        except StatusConflict as exc:
+            raise CommandError(
+                f"Video {existing.id} changed status (was {prior_status!r}); "
+                "not dispatching the retry"
+            ) from exc
         try:
             if needs_upload:
                 chain(
@@ -0,0 +1,27 @@
+"""Management command to show the progress of scheduled retranscodes for each collection"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from cloudsync.api import get_retranscode_progress
+
+
+class Command(BaseCommand):
+    """Show the progress and ETA of scheduled retranscodes for each collection"""
+
+    help = __doc__
+
+    def handle(self, *args, **options):
+        progress = get_retranscode_progress()
+        if not progress:
+            self.stdout.write("No retranscodes are scheduled or running.")
+            return
+
+        for collection in progress:
+            self.stdout.write(
+                f"{collection['collection_title']} ({collection['collection_id']}): "
+                f"{collection['waiting']} waiting, {collection['in_flight']} running, "
+                f"{collection['failed']} failed, "
+                f"ETA {timedelta(seconds=collection['eta_seconds'])}"
+            )
@@ -23,6 +23,7 @@ from django.core.management.base import BaseCommand, CommandError
 from cloudsync.tasks import transcode_from_s3
 from ui.constants import VideoStatus
 from ui.encodings import EncodingNames
+from ui.exceptions import StatusConflict
 from ui.models import Video, VideoFile
 
 
@@ -149,7 +150,13 @@ class Command(BaseCommand):
             )
         self.stdout.write(self.style.SUCCESS("Upload complete."))
 
-        video.update_status(VideoStatus.CREATED)
+        try:
+            video.update_status(VideoStatus.CREATED)
+        except StatusConflict as exc:
+            raise CommandError(
+                f"Upload succeeded but video {video.id} changed status meanwhile; "
+                "not dispatching the transcode"
+            ) from exc
 
         try:
             transcode_from_s3.si(video.id).delay()
@@ -0,0 +1,282 @@
+"""
+Typed model of AWS MediaConvert job results
+"""
+
+from dataclasses import dataclass, field
+
+from cloudsync.exceptions import MediaConvertResultError
+
+HLS_GROUP = "HLS_GROUP"
+FILE_GROUP = "FILE_GROUP"
+
+# MediaConvert names its frame captures <destination><modifier>.<index>.jpg
+FRAME_CAPTURE_SUFFIX = ".0000000.jpg"
+CONTAINER_EXTENSIONS = {
+    "M3U8": "m3u8",
+    "MP4": "mp4",
+    "MOV": "mov",
+    "MPD": "mpd",
+    "CMFC": "mp4",
+}
+
+
+@dataclass
+class OutputDetail:
+    """A single rendition written by a MediaConvert output"""
+
+    file_paths: list[str] = field(default_factory=list)
+    duration_ms: int = 0
+    width: int | None = None
+    height: int | None = None
+    average_bitrate: int | None = None
+
+    @property
+    def is_thumbnail(self):
+        """True if every file written by this output is a JPEG frame capture"""
+        return bool(self.file_paths) and all(
+            path.endswith(".jpg") for path in self.file_paths
+        )
+
+    def to_dict(self):
+        """Serialize to the camelCase shape used by MediaConvert completion events"""
+        details = {"outputFilePaths": list(self.file_paths)}
+        if self.duration_ms:
+            details["durationInMs"] = self.duration_ms
+        video_details = {
+            key: value
+            for key, value in (
+                ("widthInPx", self.width),
+                ("heightInPx", self.height),
+                ("averageBitrate", self.average_bitrate),
+            )
+            if value is not None
+        }
+        if video_details:
+            details["videoDetails"] = video_details
+        return details
+
+
+@dataclass
+class OutputGroupResult:
+    """An output group (HLS package or file group) of a MediaConvert job"""
+
+    group_type: str
+    outputs: list[OutputDetail] = field(default_factory=list)
+    playlist_file_paths: list[str] = field(default_factory=list)
+
+    @property
+    def is_hls(self):
+        """True for HLS output groups"""
+        return HLS_GROUP in self.group_type
+
+    @property
+    def is_file(self):
+        """True for file (MP4/frame capture) output groups"""
+        return FILE_GROUP in self.group_type
+
+    @property
+    def is_thumbnail(self):
+        """True if the group only produced thumbnails"""
+        return bool(self.outputs) and all(
+            output.is_thumbnail for output in self.outputs
+        )
+
+    def to_dict(self):
+        """Serialize to the camelCase shape used by MediaConvert completion events"""
+        group = {
+            "type": self.group_type,
+            "outputDetails": [output.to_dict() for output in self.outputs],
+        }
+        if self.playlist_file_paths:
+            group["playlistFilePaths"] = list(self.playlist_file_paths)
+        return group
+
+
+@dataclass
+class TranscodeJobResult:
+    """The outcome of a completed MediaConvert job"""
+
+    job_id: str
+    status: str = ""
+    output_groups: list[OutputGroupResult] = field(default_factory=list)
+
+    @property
+    def duration(self):
+        """Duration of the transcoded video in seconds, from the first rendition"""
+        if self.output_groups and self.output_groups[0].outputs:
+            return self.output_groups[0].outputs[0].duration_ms / 1000.0
+        return 0.0
+
+    def without_thumbnails(self):
+        """
+        Return a copy of this result without thumbnail-only output groups
+
+        Returns:
+            TranscodeJobResult: the filtered result
+        """
+        return TranscodeJobResult(
+            job_id=self.job_id,
+            status=self.status,
+            output_groups=[
+                group for group in self.output_groups if not group.is_thumbnail
+            ],
+        )
+
+    def to_dict(self):
+        """
+        Serialize to the camelCase shape used by MediaConvert completion events.
+        This is what gets stored on EncodeJob.message.
+        """
+        return {
+            "jobId": self.job_id,
+            "status": self.status,
+            "outputGroupDetails": [group.to_dict() for group in self.output_groups],
+        }
+
+    @classmethod
+    def from_event(cls, results):
+        """
+        Build a result from a MediaConvert completion event (or the locally
+        templated equivalent in config/results.json).
+
+        Args:
+            results (dict): camelCase job results with ``outputGroupDetails``
+
+        Returns:
+            TranscodeJobResult: the parsed result
+        """
+        output_groups = []
+        for group in results.get("outputGroupDetails", []):
+            outputs = []
+            for output in group.get("outputDetails", []):
+                video_details = output.get("videoDetails", {})
+                outputs.append(
+                    OutputDetail(
+                        file_paths=list(output.get("outputFilePaths", [])),
+                        duration_ms=output.get("durationInMs", 0),
+                        width=video_details.get("widthInPx"),
+                        height=video_details.get("heightInPx"),
+                        average_bitrate=video_details.get("averageBitrate"),
+                    )
+                )
+            output_groups.append(
+                OutputGroupResult(
+                    group_type=group.get("type", ""),
+                    outputs=outputs,
+                    playlist_file_paths=list(group.get("playlistFilePaths", [])),
+                )
+            )
+        return cls(
+            job_id=results.get("jobId", ""),
+            status=results.get("status", ""),
+            output_groups=output_groups,
+        )
+
+    @classmethod
+    def from_job(cls, job):
+        """
+        Build a result from the ``Job`` returned by the MediaConvert ``get_job`` API.
+
+        ``get_job`` reports durations and rendition details in ``OutputGroupDetails``
+        but not the written file names, so those are derived from the job's own
+        output settings (destination + name modifier + container extension), which
+        is how MediaConvert names them.
+
+        Args:
+            job (dict): the ``Job`` entry of a ``get_job`` response
+
+        Returns:
+            TranscodeJobResult: the parsed result
+
+        Raises:
+            MediaConvertResultError: if the job does not carry enough information
+        """
+        try:
+            group_settings = job["Settings"]["OutputGroups"]
+        except (KeyError, TypeError) as exc:
+            raise MediaConvertResultError(
+                f"MediaConvert job {job.get('Id')} has no output settings"
+            ) from exc
+        group_details = job.get("OutputGroupDetails", [])
+        if len(group_details) != len(group_settings):
+            raise MediaConvertResultError(
+                f"MediaConvert job {job.get('Id')} reported {len(group_details)} "
+                f"output groups but was configured with {len(group_settings)}"
+            )
+
+        output_groups = []
+        for group_setting, group_detail in zip(group_settings, group_details):
+            output_groups.append(_parse_output_group(job, group_setting, group_detail))
+        return cls(
+            job_id=job.get("Id", ""),
+            status=job.get("Status", ""),
+            output_groups=output_groups,
+        )
+
+
+def _parse_output_group(job, group_settings, group_details):
+    """Combine one configured output group with its reported output details"""
+    output_group_settings = group_settings.get("OutputGroupSettings", {})
+    settings_type = output_group_settings.get("Type", "")
+    if settings_type == "HLS_GROUP_SETTINGS":
+        group_type = HLS_GROUP
+        type_settings = output_group_settings.get("HlsGroupSettings", {})
+    elif settings_type == "FILE_GROUP_SETTINGS":
+        group_type = FILE_GROUP
+        type_settings = output_group_settings.get("FileGroupSettings", {})
+    else:
+        raise MediaConvertResultError(
+            f"MediaConvert job {job.get('Id')} has unsupported output group {settings_type!r}"
+        )
+    destination = type_settings.get("Destination")
+    if not destination:
+        raise MediaConvertResultError(
+            f"MediaConvert job {job.get('Id')} has an output group without a destination"
+        )
+
+    output_settings = group_settings.get("Outputs", [])
+    output_details = group_details.get("OutputDetails", [])
+    if len(output_settings) != len(output_details):
+        raise MediaConvertResultError(
+            f"MediaConvert job {job.get('Id')} reported {len(output_details)} outputs "
+            f"for a group configured with {len(output_settings)}"
+        )
+
+    outputs = []
+    for output, detail in zip(output_settings, output_details):
+        video_details = detail.get("VideoDetails", {})
+        outputs.append(
+            OutputDetail(
+                file_paths=[_output_file_path(destination, output)],
+                duration_ms=detail.get("DurationInMs", 0),
+                width=video_details.get("WidthInPx"),
+                height=video_details.get("HeightInPx"),
+                average_bitrate=video_details.get("AverageBitrate"),
+            )
+        )
+
+    playlist_file_paths = []
+    if group_type == HLS_GROUP:
+        playlist_file_paths.append(f"{destination}.m3u8")
+        playlist_file_paths.extend(
+            f"{destination}{manifest['ManifestNameModifier']}.m3u8"
+            for manifest in type_settings.get("AdditionalManifests", [])
+            if manifest.get("ManifestNameModifier")
+        )
+    return OutputGroupResult(
+        group_type=group_type,
+        outputs=outputs,
+        playlist_file_paths=playlist_file_paths,
+    )
+
+
+def _output_file_path(destination, output):
+    """Return the S3 URI MediaConvert writes a single output to"""
+    name = f"{destination}{output.get('NameModifier', '')}"
+    codec = output.get("VideoDescription", {}).get("CodecSettings", {}).get("Codec")
+    if codec == "FRAME_CAPTURE":
+        return f"{name}{FRAME_CAPTURE_SUFFIX}"
+    extension = output.get("Extension") or CONTAINER_EXTENSIONS.get(
+        output.get("ContainerSettings", {}).get("Container"), "mp4"
+    )
+    return f"{name}.{extension}"
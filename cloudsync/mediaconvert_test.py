@@ -0,0 +1,106 @@
+"""
+Tests for the MediaConvert result model
+"""
+
+import json
+
+import pytest
+
+from cloudsync.conftest import recorded_mediaconvert_job
+from cloudsync.exceptions import MediaConvertResultError
+from cloudsync.mediaconvert import TranscodeJobResult
+
+DESTINATION = "s3://video-s3-transcodes/transcoded/abc/video"
+THUMBNAIL_DESTINATION = "s3://video-s3-thumbs/thumbnails/abc/video"
+
+
+def test_from_job_derives_output_paths():
+    """File names should be derived from the job's destinations and name modifiers"""
+    job = recorded_mediaconvert_job("job-1", DESTINATION, THUMBNAIL_DESTINATION)["Job"]
+    result = TranscodeJobResult.from_job(job)
+
+    assert result.job_id == "job-1"
+    assert result.status == "COMPLETE"
+    hls_group, mp4_group, thumbnail_group = result.output_groups
+    assert hls_group.is_hls is True
+    assert hls_group.playlist_file_paths == [
+        f"{DESTINATION}.m3u8",
+        f"{DESTINATION}__index.m3u8",
+    ]
+    assert [output.file_paths for output in hls_group.outputs] == [
+        [f"{DESTINATION}_HLS2M.m3u8"],
+        [f"{DESTINATION}_HLS1.5M.m3u8"],
+        [f"{DESTINATION}_HLS400k.m3u8"],
+    ]
+    assert mp4_group.is_file is True
+    assert mp4_group.is_thumbnail is False
+    assert mp4_group.outputs[0].file_paths == [f"{DESTINATION}_custom.mp4"]
+    assert thumbnail_group.is_thumbnail is True
+    assert thumbnail_group.outputs[0].file_paths == [
+        f"{THUMBNAIL_DESTINATION}_thumbnail.0000000.jpg"
+    ]
+
+
+def test_from_job_rendition_details():
+    """Durations, dimensions and bitrates should come from OutputGroupDetails"""
+    job = recorded_mediaconvert_job("job-1", DESTINATION)["Job"]
+    result = TranscodeJobResult.from_job(job)
+
+    assert result.duration == 5.28
+    first = result.output_groups[0].outputs[0]
+    assert (first.width, first.height, first.average_bitrate) == (1024, 768, 2148515)
+    mp4 = result.output_groups[1].outputs[0]
+    assert (mp4.width, mp4.height, mp4.average_bitrate) == (1280, 720, 2026268)
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda job: job.pop("Settings"),
+        lambda job: job["OutputGroupDetails"].pop(),
+        lambda job: job["OutputGroupDetails"][0]["OutputDetails"].pop(),
+        lambda job: job["Settings"]["OutputGroups"][0]["OutputGroupSettings"][
+            "HlsGroupSettings"
+        ].pop("Destination"),
+        lambda job: job["Settings"]["OutputGroups"][0]["OutputGroupSettings"].update(
+            {"Type": "DASH_ISO_GROUP_SETTINGS"}
+        ),
+    ],
+)
+def test_from_job_incomplete(mutate):
+    """A job without usable output settings should raise MediaConvertResultError"""
+    job = recorded_mediaconvert_job("job-1", DESTINATION)["Job"]
+    mutate(job)
+    with pytest.raises(MediaConvertResultError):
+        TranscodeJobResult.from_job(job)
+
+
+def test_event_round_trip():
+    """to_dict() should produce the completion event shape that from_event() reads"""
+    with open("./config/results.json", encoding="utf-8") as f:
+        event = json.loads(f.read())
+    result = TranscodeJobResult.from_event(event)
+
+    assert result.job_id == "<JOB_ID>"
+    assert len(result.output_groups) == 3
+    assert result.duration == 5.28
+    assert TranscodeJobResult.from_event(result.to_dict()) == result
+    assert result.to_dict()["outputGroupDetails"] == event["outputGroupDetails"]
+
+
+def test_duration_without_outputs():
+    """A result without rendition outputs should have no duration"""
+    assert TranscodeJobResult(job_id="job-1").duration == 0.0
+
+
+def test_without_thumbnails():
+    """without_thumbnails() should drop thumbnail-only groups wherever they are"""
+    job = recorded_mediaconvert_job("job-1", DESTINATION, THUMBNAIL_DESTINATION)["Job"]
+    job["Settings"]["OutputGroups"].insert(0, job["Settings"]["OutputGroups"].pop())
+    job["OutputGroupDetails"].insert(0, job["OutputGroupDetails"].pop())
+    result = TranscodeJobResult.from_job(job).without_thumbnails()
+
+    assert [group.group_type for group in result.output_groups] == [
+        "HLS_GROUP",
+        "FILE_GROUP",
+    ]
@@ -0,0 +1,205 @@
+"""
+Progress of videos being streamed to S3
+
+s3transfer reports every chunk of an upload, from several threads. UploadProgress
+adds those up and reports the total at most every CLOUDSYNC_UPLOAD_PROGRESS_INTERVAL
+seconds: it's stored in the task's result meta (for the task status API), in a redis
+hash of the uploads in flight for the video's collection, and published on a redis
+channel of the collection. collection_progress_events streams the uploads of a
+collection as Server-Sent Events, so a page follows all of them over one connection.
+"""
+
+import threading
+import time
+
+import structlog
+from django.conf import settings
+
+from odl_video.celery import app
+from odl_video.json_backend import dumps, loads
+
+log = structlog.get_logger(__name__)
+
+PROGRESS_KEY_PREFIX = "upload_progress:collection"
+PROGRESS_CHANNEL_PREFIX = "upload_progress:events"
+PROGRESS_STATE = "PROGRESS"
+
+
+def _redis_client():
+    """Return the redis client shared with the celery result backend"""
+    return app.backend.client
+
+
+def progress_key(collection_id):
+    """The key of the redis hash of a collection's uploads"""
+    return f"{PROGRESS_KEY_PREFIX}:{collection_id}"
+
+
+def progress_channel(collection_id):
+    """The redis channel where a collection's upload progress is published"""
+    return f"{PROGRESS_CHANNEL_PREFIX}:{collection_id}"
+
+
+def _stale_after():
+    """
+    The seconds after which an upload without progress is considered gone. An
+    upload without progress for this long has lost its lock, see
+    cloudsync.tasks.stream_to_s3.
+    """
+    return settings.CLOUDSYNC_STREAM_S3_LOCK_TTL
+
+
+class UploadProgress:
+    """
+    Progress of one upload, reported at a fixed cadence
+    """
+
+    def __init__(self, video, total, task=None, task_id=None):
+        """
+        Args:
+            video (ui.models.Video): The video being uploaded
+            total (int): The size of the upload in bytes, if known
+            task (celery.Task): The upload task, whose state is updated
+            task_id (str): The id of the upload task
+        """
+        self.video = video
+        self.total = total
+        self.task = task
+        self.task_id = task_id
+        self.uploaded = 0
+        self.last_report = None
+        self._lock = threading.Lock()
+
+    def add(self, bytes_uploaded):
+        """
+        Add the bytes of an uploaded chunk, reporting the progress if the last report
+        is older than CLOUDSYNC_UPLOAD_PROGRESS_INTERVAL seconds
+
+        Args:
+            bytes_uploaded (int): The size of the chunk
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.uploaded += bytes_uploaded
+            if (
+                self.last_report is not None
+                and now - self.last_report < settings.CLOUDSYNC_UPLOAD_PROGRESS_INTERVAL
+            ):
+                return
+            self.last_report = now
+            uploaded = self.uploaded
+        self.report(uploaded)
+
+    def report(self, uploaded):
+        """
+        Store and publish the progress of the upload
+
+        Args:
+            uploaded (int): The bytes uploaded so far
+        """
+        progress = {
+            "video": self.video.hexkey,
+            "uploaded": uploaded,
+            "total": self.total,
+            "reported_at": time.time(),
+        }
+        if self.task is not None:
+            self.task.update_state(
+                task_id=self.task_id,
+                state=PROGRESS_STATE,
+                meta={"uploaded": uploaded, "total": self.total},
+            )
+        try:
+            _publish(self.video.collection_id, self.video.hexkey, progress)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Unable to publish upload progress", video_id=self.video.id)
+
+    def finish(self):
+        """
+        Remove the upload from its collection's uploads in flight
+        """
+        try:
+            _publish(self.video.collection_id, self.video.hexkey, None)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Unable to clear upload progress", video_id=self.video.id)
+
+
+def _publish(collection_id, video_key, progress):
+    """
+    Store and publish the progress of an upload, or its end if progress is None
+    """
+    client = _redis_client()
+    key = progress_key(collection_id)
+    event = {"video": video_key, "progress": progress}
+    with client.pipeline() as pipe:
+        if progress is None:
+            pipe.hdel(key, video_key)
+        else:
+            pipe.hset(key, video_key, dumps(progress))
+            pipe.expire(key, _stale_after())
+        pipe.publish(progress_channel(collection_id), dumps(event))
+        pipe.execute()
+
+
+def get_collection_progress(collection_id):
+    """
+    Get the progress of a collection's uploads in flight
+
+    Args:
+        collection_id (int): The collection id
+
+    Returns:
+        dict: The progress of each upload, by video key
+    """
+    client = _redis_client()
+    key = progress_key(collection_id)
+    stale_before = time.time() - _stale_after()
+    uploads, stale = {}, []
+    for video_key, value in client.hgetall(key).items():
+        video_key = video_key.decode() if isinstance(video_key, bytes) else video_key
+        progress = loads(value)
+        if progress["reported_at"] < stale_before:
+            stale.append(video_key)
+        else:
+            uploads[video_key] = progress
+    if stale:
+        client.hdel(key, *stale)
+    return uploads
+
+
+def _server_sent_event(event, data):
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: ".encode() + dumps(data) + b"\n\n"
+
+
+def collection_progress_events(collection_id):
+    """
+    Stream the progress of a collection's uploads as Server-Sent Events: a snapshot
+    event with every upload in flight, then a progress event for each report, with
+    null progress once an upload ends. The stream ends after
+    UPLOAD_PROGRESS_STREAM_SECONDS, and the browser reconnects.
+
+    Args:
+        collection_id (int): The collection id
+
+    Yields:
+        bytes: The events
+    """
+    pubsub = _redis_client().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(progress_channel(collection_id))
+    try:
+        retry = settings.UPLOAD_PROGRESS_RETRY_SECONDS * 1000
+        yield f"retry: {retry}\n\n".encode()
+        yield _server_sent_event("snapshot", get_collection_progress(collection_id))
+        deadline = time.monotonic() + settings.UPLOAD_PROGRESS_STREAM_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = pubsub.get_message(
+                timeout=min(remaining, settings.UPLOAD_PROGRESS_KEEPALIVE_SECONDS)
+            )
+            if message is None:
+                # Keep proxies from closing an idle connection
+                yield b": keepalive\n\n"
+                continue
+            yield _server_sent_event("progress", loads(message["data"]))
+    finally:
+        pubsub.close()
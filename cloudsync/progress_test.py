@@ -0,0 +1,237 @@
+"""
+Tests for upload progress reporting
+"""
+
+import pytest
+
+from cloudsync.progress import (
+    UploadProgress,
+    collection_progress_events,
+    get_collection_progress,
+    progress_channel,
+    progress_key,
+)
+from odl_video.json_backend import dumps, loads
+from ui.factories import VideoFactory
+
+pytestmark = pytest.mark.django_db
+
+
+class RedisHashes:
+    """The subset of redis hash and pub/sub commands used for upload progress"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.published = []
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.data.get(key, {}).pop(field, None)
+
+    def hgetall(self, key):
+        return {
+            field.encode(): value for field, value in self.data.get(key, {}).items()
+        }
+
+    def expire(self, key, seconds):
+        self.expiry[key] = seconds
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def pipeline(self):
+        return Pipeline(self)
+
+    def pubsub(self, **kwargs):  # pylint: disable=unused-argument
+        return PubSub(self)
+
+
+class Pipeline:
+    """Runs the commands of a pipeline right away"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def execute(self):
+        pass
+
+
+class PubSub:
+    """Returns the messages published since the last call, one at a time"""
+
+    def __init__(self, client):
+        self.client = client
+        self.channels = set()
+        self.closed = False
+
+    def subscribe(self, channel):
+        self.channels.add(channel)
+
+    def get_message(self, timeout):  # pylint: disable=unused-argument
+        for index, (channel, message) in enumerate(self.client.published):
+            if channel in self.channels:
+                del self.client.published[index]
+                return {"type": "message", "data": message}
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def redis(mocker):
+    """Point the progress module at an in-memory redis"""
+    client = RedisHashes()
+    mocker.patch("cloudsync.progress._redis_client", return_value=client)
+    return client
+
+
+@pytest.fixture
+def clock(mocker):
+    """Control the monotonic and wall clocks of the progress module"""
+    now = {"monotonic": 1000.0, "time": 1_700_000_000.0}
+    mocker.patch(
+        "cloudsync.progress.time.monotonic", side_effect=lambda: now["monotonic"]
+    )
+    mocker.patch("cloudsync.progress.time.time", side_effect=lambda: now["time"])
+
+    def advance(seconds):
+        now["monotonic"] += seconds
+        now["time"] += seconds
+
+    return advance
+
+
+@pytest.fixture
+def video():
+    """A video being uploaded"""
+    return VideoFactory()
+
+
+def _stored(redis, video):
+    """The stored progress of a video's upload"""
+    value = redis.data.get(progress_key(video.collection_id), {}).get(video.hexkey)
+    return loads(value) if value is not None else None
+
+
+def test_upload_progress_coalesces(mocker, settings, redis, clock, video):
+    """Progress should be reported at most every CLOUDSYNC_UPLOAD_PROGRESS_INTERVAL
+    seconds, with the bytes of every chunk"""
+    settings.CLOUDSYNC_UPLOAD_PROGRESS_INTERVAL = 2
+    task = mocker.Mock()
+    upload = UploadProgress(video, 1000, task=task, task_id="abc")
+    for _ in range(10):
+        upload.add(10)
+    assert task.update_state.call_count == 1
+    assert _stored(redis, video)["uploaded"] == 10
+
+    clock(2)
+    upload.add(10)
+    assert task.update_state.call_count == 2
+    task.update_state.assert_called_with(
+        task_id="abc", state="PROGRESS", meta={"uploaded": 110, "total": 1000}
+    )
+    assert _stored(redis, video) == {
+        "video": video.hexkey,
+        "uploaded": 110,
+        "total": 1000,
+        "reported_at": 1_700_000_002.0,
+    }
+    reports = [loads(message)["progress"] for _, message in redis.published]
+    assert [report["uploaded"] for report in reports] == [10, 110]
+
+
+def test_upload_progress_finish(redis, video):
+    """An upload should leave its collection's uploads in flight when it ends"""
+    upload = UploadProgress(video, 1000)
+    upload.add(10)
+    upload.finish()
+    assert _stored(redis, video) is None
+    assert loads(redis.published[-1][1]) == {"video": video.hexkey, "progress": None}
+
+
+def test_upload_progress_redis_error(mocker, video):
+    """A redis error shouldn't fail the upload"""
+    mocker.patch("cloudsync.progress._redis_client", side_effect=ConnectionError)
+    task = mocker.Mock()
+    upload = UploadProgress(video, 1000, task=task)
+    upload.add(10)
+    upload.finish()
+    assert task.update_state.call_count == 1
+
+
+def test_get_collection_progress(settings, redis, clock, video):
+    """Uploads without progress for longer than the upload lock TTL should be
+    dropped"""
+    settings.CLOUDSYNC_STREAM_S3_LOCK_TTL = 120
+    stalled = VideoFactory(collection=video.collection)
+    UploadProgress(stalled, None).add(10)
+    clock(100)
+    UploadProgress(video, 1000).add(10)
+    assert set(get_collection_progress(video.collection_id)) == {
+        stalled.hexkey,
+        video.hexkey,
+    }
+
+    clock(30)
+    assert set(get_collection_progress(video.collection_id)) == {video.hexkey}
+    assert _stored(redis, stalled) is None
+
+
+def test_collection_progress_events(mocker, settings, redis, clock, video):
+    """The stream should start with a snapshot, then have an event per report
+    and keepalives, until UPLOAD_PROGRESS_STREAM_SECONDS have passed"""
+    settings.UPLOAD_PROGRESS_STREAM_SECONDS = 45
+    settings.UPLOAD_PROGRESS_KEEPALIVE_SECONDS = 15
+    settings.UPLOAD_PROGRESS_RETRY_SECONDS = 1
+    upload = UploadProgress(video, 1000)
+    upload.add(10)
+    redis.published.clear()
+    pubsub = PubSub(redis)
+    mocker.patch.object(RedisHashes, "pubsub", return_value=pubsub)
+
+    events = collection_progress_events(video.collection_id)
+    assert next(events) == b"retry: 1000\n\n"
+    assert next(events) == (
+        b"event: snapshot\ndata: "
+        + dumps({video.hexkey: _stored(redis, video)})
+        + b"\n\n"
+    )
+    assert pubsub.channels == {progress_channel(video.collection_id)}
+
+    upload.finish()
+    assert next(events) == (
+        b"event: progress\ndata: "
+        + dumps({"video": video.hexkey, "progress": None})
+        + b"\n\n"
+    )
+    keepalives = 0
+    for event in events:
+        assert event == b": keepalive\n\n"
+        keepalives += 1
+        clock(15)
+    assert keepalives == 3
+    assert pubsub.closed
+
+
+def test_collection_progress_events_closed(mocker, redis, video):
+    """The subscription should be closed when the client goes away"""
+    pubsub = PubSub(redis)
+    mocker.patch.object(RedisHashes, "pubsub", return_value=pubsub)
+    events = collection_progress_events(video.collection_id)
+    next(events)
+    events.close()
+    assert pubsub.closed
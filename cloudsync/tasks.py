@@ -2,9 +2,9 @@
 Tasks for cloudsync app
 """
 
+import io
 import json
 import mimetypes
-import re
 import threading
 from datetime import timedelta
 
@@ -25,6 +25,7 @@ from celery import Task, group, shared_task, states
 from celery.utils.time import get_exponential_backoff_interval
 from django.conf import settings
 from django.db import connection
+from django.utils.dateparse import parse_datetime
 from googleapiclient.errors import HttpError
 from redis.exceptions import LockError
 from urllib3.exceptions import (
@@ -34,13 +35,37 @@ from urllib3.exceptions import (
     TimeoutError as Urllib3TimeoutError,
 )
 
-from cloudsync import dropbox_api
-from cloudsync.api import process_watch_file, refresh_status, transcode_video
-from cloudsync.exceptions import TranscodeTargetDoesNotExist
+from cloudsync import dedupe, dropbox_api
+from cloudsync.api import (
+    admit_retranscodes,
+    get_retranscode_progress,
+    get_retranscode_slots,
+    ingest_thumbnail,
+    is_throttling_error,
+    normalize_hls_playlist,
+    process_watch_file,
+    refresh_status,
+    transcode_video,
+)
+from cloudsync.exceptions import (
+    InvalidPlaylistError,
+    MediaConvertResultError,
+    TranscodeTargetDoesNotExist,
+)
+from cloudsync.invalidation import flush_pending_invalidations
+from cloudsync.progress import UploadProgress
 from cloudsync.youtube import API_QUOTA_ERROR_MSG, YouTubeApi
 from ui.constants import StreamSource, VideoStatus, YouTubeStatus
 from ui.encodings import EncodingNames
-from ui.models import Collection, EncodeJob, Video, VideoSubtitle, YouTubeVideo
+from ui.exceptions import InvalidStatusTransition, StatusConflict
+from ui.models import (
+    Collection,
+    EncodeJob,
+    Video,
+    VideoFile,
+    VideoSubtitle,
+    YouTubeVideo,
+)
 from ui.utils import get_bucket, now_in_utc
 
 log = structlog.get_logger(__name__)
@@ -157,6 +182,15 @@ class VideoTask(Task):
                 return
         return self.request.id
 
+    def stop_chain(self):
+        """
+        Keep the tasks chained after this one from running once it returns
+        """
+        # Celery sends the next task of a chain from request.chain, and linked
+        # callbacks from request.callbacks, after this task succeeds. Clearing both
+        # ends the chain here without marking this task as failed.
+        self.request.chain = self.request.callbacks = None
+
 
 @shared_task(bind=True)
 def update_video_statuses(self):
@@ -168,26 +202,45 @@ def update_video_statuses(self):
     )
     for video in transcoding_videos:
         log.info("Checking video status", video_id=video.id)
-        error = (
-            VideoStatus.RETRANSCODE_FAILED
-            if video.status == VideoStatus.RETRANSCODING
-            else VideoStatus.TRANSCODE_FAILED_INTERNAL
-        )
-
         try:
-            refresh_status(video)
-        except EncodeJob.DoesNotExist:
-            # Log the exception but don't raise it so other videos can be checked.
-            log.exception("No EncodeJob object exists for video", video_id=video.id)
-            video.update_status(error)
-        except ClientError as exc:
-            # Log the exception but don't raise it so other videos can be checked.
+            _refresh_video_status(video)
+        except (InvalidStatusTransition, StatusConflict):
+            # Don't let one video's status change abort the sweep of the rest.
             log.exception(
-                "AWS error when refreshing job status",
-                video_id=video.id,
-                response=exc.response,
+                "Failed to update transcoding video status", video_id=video.id
             )
-            video.update_status(error)
+
+
+def _refresh_video_status(video):
+    """
+    Refresh the status of a transcoding video, failing it if its job can't be read
+
+    Args:
+        video(ui.models.Video): A TRANSCODING or RETRANSCODING video
+    """
+    error = (
+        VideoStatus.RETRANSCODE_FAILED
+        if video.status == VideoStatus.RETRANSCODING
+        else VideoStatus.TRANSCODE_FAILED_INTERNAL
+    )
+    try:
+        refresh_status(video)
+    except EncodeJob.DoesNotExist:
+        # Log the exception but don't raise it so other videos can be checked.
+        log.exception("No EncodeJob object exists for video", video_id=video.id)
+        video.update_status(error)
+    except MediaConvertResultError:
+        # Log the exception but don't raise it so other videos can be checked.
+        log.exception("Could not read MediaConvert job output", video_id=video.id)
+        video.update_status(error)
+    except ClientError as exc:
+        # Log the exception but don't raise it so other videos can be checked.
+        log.exception(
+            "AWS error when refreshing job status",
+            video_id=video.id,
+            response=exc.response,
+        )
+        video.update_status(error)
 
 
 @shared_task
@@ -256,23 +309,29 @@ def stream_to_s3(self, video_id):
         # Don't advance the chain: the worker that owns the upload transcodes via
         # its own chain. Returning normally would otherwise run transcode_from_s3
         # on an incomplete object and poison the video out of UPLOADING.
-        self.request.chain = self.request.callbacks = None
+        self.stop_chain()
         return False
 
-    video.update_status(VideoStatus.UPLOADING)
-
     task_id = self.get_task_id()
     response = None
+    progress = None
 
     try:
+        video.update_status(VideoStatus.UPLOADING)
         response = dropbox_api.stream_shared_link(video.source_url)
         # KeyError/ValueError here mean the Dropbox metadata header is
         # missing or malformed, which is still an upload failure.
         _, content_type, content_length = parse_content_metadata(response)
+        content_hash = parse_content_hash(response)
+        if dedupe.reuse_before_upload(video, content_length, content_hash):
+            # Already transcoded: there's nothing left for the chain to do
+            self.stop_chain()
+            return True
 
         s3 = boto3.resource("s3")
         bucket = s3.Bucket(settings.VIDEO_S3_BUCKET)
-        total_bytes_uploaded = 0
+        # Reports progress at a fixed cadence rather than on every chunk
+        progress = UploadProgress(video, content_length, task=self, task_id=task_id)
         last_progress_refresh = None
         # boto3's s3transfer invokes this callback concurrently from a thread
         # pool, so guard the shared progress state.
@@ -282,10 +341,10 @@ def stream_to_s3(self, video_id):
             """
             Callback function after upload
             """
-            nonlocal total_bytes_uploaded, last_progress_refresh
+            nonlocal last_progress_refresh
             now = now_in_utc()
+            progress.add(bytes_uploaded)
             with progress_lock:
-                total_bytes_uploaded += bytes_uploaded
                 should_refresh = (
                     last_progress_refresh is None
                     or (now - last_progress_refresh).total_seconds()
@@ -293,11 +352,6 @@ def stream_to_s3(self, video_id):
                 )
                 if should_refresh:
                     last_progress_refresh = now
-            self.update_state(
-                task_id=task_id,
-                state="PROGRESS",
-                meta={"uploaded": total_bytes_uploaded, "total": content_length},
-            )
             if should_refresh:
                 # Heartbeat the lease so a short TTL survives a long upload. If we
                 # can't reacquire, another worker now owns the lock and may be
@@ -322,13 +376,20 @@ def stream_to_s3(self, video_id):
                         connection.close()
 
         config = TransferConfig(**settings.AWS_S3_UPLOAD_TRANSFER_CONFIG)
+        reader = dedupe.HashingReader(response.raw)
         bucket.upload_fileobj(
-            Fileobj=response.raw,
+            Fileobj=reader,
             Key=video.get_s3_key(),
             ExtraArgs={"ContentType": content_type},
             Callback=callback,
             Config=config,
         )
+        if content_hash and content_hash != reader.hasher.hexdigest():
+            log.warning(
+                "Uploaded file doesn't match its Dropbox content hash",
+                video_id=video_id,
+            )
+        dedupe.save_fingerprint(video, reader.hasher.size, reader.hasher.hexdigest())
     except _UploadLockLost:
         # Another worker owns the lock now and is driving this upload (and its
         # transcode chain). Give up quietly: don't fail the video, don't retry,
@@ -337,7 +398,15 @@ def stream_to_s3(self, video_id):
             "stream_to_s3 lost upload lock mid-stream; another worker owns it",
             video_id=video_id,
         )
-        self.request.chain = self.request.callbacks = None
+        self.stop_chain()
+        return False
+    except StatusConflict:
+        # Another worker moved the video while this task waited for the lock, so
+        # this upload is stale. Don't fail the video or advance the chain.
+        log.warning(
+            "stream_to_s3 skipped; the video's status changed", video_id=video_id
+        )
+        self.stop_chain()
         return False
     except Exception as exc:
         retryable = _should_retry_upload(exc)
@@ -353,7 +422,11 @@ def stream_to_s3(self, video_id):
             raise self.retry(exc=exc, countdown=countdown)
         if retryable:
             log.error("stream_to_s3 retries exhausted", video_id=video_id)
-        video.update_status(VideoStatus.UPLOAD_FAILED)
+        try:
+            video.update_status(VideoStatus.UPLOAD_FAILED)
+        except StatusConflict:
+            # Keep the upload error rather than hiding it behind this one
+            log.exception("Failed to mark the upload as failed", video_id=video_id)
         self.update_state(task_id=task_id, state=states.FAILURE)
         raise
     finally:
@@ -361,6 +434,8 @@ def stream_to_s3(self, video_id):
         # successful-upload path where nothing else closes it.
         if response is not None:
             response.close()
+        if progress is not None:
+            progress.finish()
         # Release the upload lock.
         try:
             lock.release()
@@ -389,9 +464,15 @@ def transcode_from_s3(self, video_id):
     self.update_state(task_id=task_id, state=VideoStatus.TRANSCODING)
 
     video_file = video.videofile_set.get(encoding="original")
-
     try:
+        if dedupe.reuse_before_transcode(video, video_file):
+            return
         transcode_video(video, video_file, True)
+    except (InvalidStatusTransition, StatusConflict):
+        # The video was moved by another worker, or its status doesn't allow a
+        # transcode (e.g. a failed upload)
+        log.exception("Could not start the transcode", video_id=video.id)
+        self.update_state(task_id=task_id, state=states.FAILURE)
     except ClientError:
         self.update_state(task_id=task_id, state=states.FAILURE)
         raise
@@ -415,41 +496,121 @@ def retranscode_video(self, video_id):
     self.update_state(task_id=task_id, state=VideoStatus.RETRANSCODING)
 
     video_file = video.videofile_set.get(encoding="original")
+    previous_status = video.status
+    if previous_status == VideoStatus.RETRANSCODE_SCHEDULED:
+        # Admitted by schedule_retranscodes, which recorded the status it came from
+        admission = (
+            video.status_history.filter(to_status=VideoStatus.RETRANSCODE_SCHEDULED)
+            .order_by("-created_at", "-id")
+            .first()
+        )
+        if admission is not None:
+            previous_status = admission.from_status
 
     try:
         video.update_status(VideoStatus.RETRANSCODE_SCHEDULED)
         transcode_video(video, video_file, True)
-    except ClientError:
+    except (InvalidStatusTransition, StatusConflict):
+        # The video is already retranscoding, or was moved by another worker
+        log.exception("Could not start the retranscode", video_id=video.id)
+        self.update_state(task_id=task_id, state=states.FAILURE)
+    except ClientError as exc:
+        if is_throttling_error(exc):
+            # Put the video back in line for a later wave
+            video.update_status(previous_status, schedule_retranscode=True)
+            log.warning(
+                "Retranscode throttled by MediaConvert, rescheduling",
+                video_id=video.id,
+            )
+            return
         self.update_state(task_id=task_id, state=states.FAILURE)
         video.update_status(VideoStatus.RETRANSCODE_FAILED)
         raise
 
 
+@shared_task
+def process_thumbnail_upload(video_id, staged_key, uploaded_at=None):
+    """
+    Replace the thumbnail of a video with the versions of an uploaded image, stored
+    by stage_thumbnail_upload
+
+    Args:
+        video_id(int): The video primary key
+        staged_key(str): The S3 key of the uploaded image in the thumbnail bucket
+        uploaded_at(str): When the image was uploaded, as an ISO 8601 datetime. An
+            upload older than the one the thumbnail already has is dropped.
+
+    Returns:
+        dict: The key and dimensions of the thumbnail, and the number of versions,
+            or None if a newer upload was already processed
+    """
+    bucket_name = settings.VIDEO_S3_THUMBNAIL_BUCKET
+    s3_client = boto3.client("s3")
+    try:
+        video = Video.objects.get(id=video_id)
+        image = s3_client.get_object(Bucket=bucket_name, Key=staged_key)
+        thumbnail = ingest_thumbnail(
+            video,
+            io.BytesIO(image["Body"].read()),
+            uploaded_at=parse_datetime(uploaded_at) if uploaded_at else None,
+        )
+    finally:
+        try:
+            s3_client.delete_object(Bucket=bucket_name, Key=staged_key)
+        except ClientError:
+            log.exception(
+                "Unable to delete an uploaded thumbnail", s3_object_key=staged_key
+            )
+    if thumbnail is None:
+        return None
+    return {
+        "s3_object_key": thumbnail.s3_object_key,
+        "max_width": thumbnail.max_width,
+        "max_height": thumbnail.max_height,
+        "variants": len(thumbnail.variants),
+    }
+
+
 @shared_task(bind=True)
 def schedule_retranscodes(self):
     """
-    Start retranscode tasks for all scheduled videos,
-    and reset scheduled collections without scheduled videos
+    Start the next wave of retranscode tasks for scheduled videos, oldest first,
+    and reset scheduled collections without scheduled videos.
+
+    The wave is sized so that uploads and retranscodes in flight stay under
+    RETRANSCODE_MAX_IN_FLIGHT, and is skipped while the MediaConvert queue is backed up.
     """
     # Reset all collections with no scheduled videos
     Collection.objects.filter(schedule_retranscode=True).exclude(
         videos__schedule_retranscode=True
     ).update(schedule_retranscode=False)
 
-    # Run retranscodes on all videos with schedule_retranscode=True
-    videos = Video.objects.filter(schedule_retranscode=True).values_list(
-        "id", flat=True
-    )
-    if videos:
-        try:
-            retranscode_tasks = group(
-                [retranscode_video.si(video_id) for video_id in videos]
-            )
-        except:  # noqa: E722
-            error = "schedule_retranscodes threw an error"
-            log.exception(error)
-            return error
-        raise self.replace(retranscode_tasks)
+    if not Video.objects.filter(schedule_retranscode=True).exists():
+        return None
+
+    try:
+        slots = get_retranscode_slots()
+    except ClientError:
+        log.exception("Unable to get the MediaConvert queue depth")
+        return None
+    for progress in get_retranscode_progress():
+        log.info("Retranscode progress", **progress)
+    if not slots:
+        log.info("No capacity for retranscodes, waiting for the next wave")
+        return None
+
+    videos = admit_retranscodes(slots)
+    if not videos:
+        return None
+    try:
+        retranscode_tasks = group(
+            [retranscode_video.si(video_id) for video_id in videos]
+        )
+    except:  # noqa: E722
+        error = "schedule_retranscodes threw an error"
+        log.exception(error)
+        return error
+    raise self.replace(retranscode_tasks)
 
 
 @shared_task()
@@ -606,54 +767,70 @@ def parse_content_metadata(response):
     return file_name, content_type, content_length
 
 
-@shared_task(bind=True)
-def sort_transcoded_m3u8_files(self):
+def parse_content_hash(response):
     """
-    Sort files with highest resolution first in trancoded video playlist
+    Given a Response object from Requests, return the Dropbox content hash of the
+    file, if its metadata has one
     """
-    for video in Video.objects.filter(videofile__encoding=EncodingNames.HLS).iterator():
-        for transcoded_video in video.transcoded_videos:
-            s3_filename = transcoded_video.s3_object_key
-            s3_client = boto3.client("s3")
-            try:
-                file = s3_client.get_object(
-                    Bucket=settings.VIDEO_S3_TRANSCODE_BUCKET, Key=s3_filename
-                )
-            except ClientError:
-                log.error("Object not found on s3", video_id=video.id)
-                continue
+    try:
+        return json.loads(response.headers["Dropbox-API-Result"]).get("content_hash")
+    except (KeyError, ValueError):
+        return None
 
-            file_content = file["Body"].read().decode()
 
-            delimiter = "#EXT-X-STREAM-INF:"
-            lines = file_content.split(delimiter)
-            header = lines.pop(0)
+@shared_task
+def sort_transcoded_m3u8_files():
+    """
+    Sort files with highest resolution first in trancoded video playlists, in
+    parallel chunks of HLS_PLAYLIST_NORMALIZE_CHUNK_SIZE playlists
+    """
+    video_file_ids = list(
+        VideoFile.objects.filter(encoding=EncodingNames.HLS)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    chunk_size = settings.HLS_PLAYLIST_NORMALIZE_CHUNK_SIZE
+    if video_file_ids:
+        group(
+            normalize_hls_playlists.si(video_file_ids[i : i + chunk_size])
+            for i in range(0, len(video_file_ids), chunk_size)
+        ).delay()
 
-            if str.strip(header) != "#EXTM3U":
-                log.error(
-                    "Unexpected format for transcoded video file", video_id=video.id
-                )
-                continue
 
-            try:
-                lines.sort(
-                    key=lambda line: [
-                        -int(re.search(r"RESOLUTION=(\d+)", line).group(1)),
-                        -int(re.search(r"BANDWIDTH=(\d+)", line).group(1)),
-                    ]
-                )
-            except AttributeError:
-                log.error(
-                    "Unexpected format for transcoded video file", video_id=video.id
-                )
-                continue
+@shared_task
+def normalize_hls_playlists(video_file_ids):
+    """
+    Sort the variants of some HLS master playlists with highest resolution first
 
-            lines.insert(0, header)
-            sorted_content = delimiter.join(lines)
+    Args:
+        video_file_ids (list of int): VideoFile ids
+    """
+    s3_client = boto3.client("s3")
+    for video_file in VideoFile.objects.filter(
+        id__in=video_file_ids, encoding=EncodingNames.HLS
+    ):
+        try:
+            normalize_hls_playlist(video_file, s3_client=s3_client)
+        except ClientError:
+            log.error("Object not found on s3", video_id=video_file.video_id)
+        except InvalidPlaylistError:
+            log.error(
+                "Unexpected format for transcoded video file",
+                video_id=video_file.video_id,
+            )
 
-            if sorted_content != file_content:
-                s3_client.put_object(
-                    Body=str.encode(sorted_content),
-                    Bucket=settings.VIDEO_S3_TRANSCODE_BUCKET,
-                    Key=s3_filename,
-                )
+
+@shared_task(bind=True, max_retries=None)
+def flush_cloudfront_invalidations(self):
+    """
+    Flush queued CloudFront invalidations, retrying later if some were re-queued
+    """
+    requeued = flush_pending_invalidations()
+    if requeued:
+        if self.request.retries >= settings.CLOUDFRONT_INVALIDATION_MAX_RETRIES:
+            log.error(
+                "CloudFront invalidation still failing, leaving paths queued",
+                path_count=len(requeued),
+            )
+            return
+        raise self.retry(countdown=settings.CLOUDFRONT_INVALIDATION_RETRY_SECONDS)
@@ -7,7 +7,7 @@ import json
 import os
 import random
 import string
-from datetime import timedelta
+from datetime import UTC, datetime, timedelta
 from types import SimpleNamespace
 from unittest.mock import PropertyMock, call
 
@@ -23,7 +23,8 @@ from moto import mock_aws
 from requests import HTTPError
 from urllib3.exceptions import ProtocolError as Urllib3ProtocolError
 
-from cloudsync import dropbox_api
+from cloudsync import dedupe, dropbox_api
+from cloudsync.api import admit_retranscodes
 from cloudsync.conftest import MockBoto, MockHttpErrorResponse
 from cloudsync.exceptions import TranscodeTargetDoesNotExist
 from cloudsync.tasks import (
@@ -33,6 +34,7 @@ from cloudsync.tasks import (
     fail_stuck_uploading_videos,
     monitor_watch_bucket,
     parse_content_metadata,
+    process_thumbnail_upload,
     remove_youtube_caption,
     remove_youtube_video,
     retranscode_video,
@@ -40,21 +42,31 @@ from cloudsync.tasks import (
     sort_transcoded_m3u8_files,
     stream_to_s3,
     transcode_from_s3,
+    update_video_statuses,
     update_youtube_statuses,
     upload_youtube_caption,
     upload_youtube_videos,
 )
 from cloudsync.youtube import API_QUOTA_ERROR_MSG
+from mail import tasks as mail_tasks
 from ui.constants import StreamSource, VideoStatus, YouTubeStatus
+from ui.exceptions import InvalidStatusTransition, StatusConflict
 from ui.factories import (
     CollectionFactory,
     UserFactory,
     VideoFactory,
     VideoFileFactory,
     VideoSubtitleFactory,
+    VideoThumbnailFactory,
     YouTubeVideoFactory,
 )
-from ui.models import TRANSCODE_PREFIX, Collection, Video, YouTubeVideo
+from ui.models import (
+    TRANSCODE_PREFIX,
+    Collection,
+    EncodeJob,
+    Video,
+    YouTubeVideo,
+)
 from ui.utils import now_in_utc
 
 pytestmark = pytest.mark.django_db
@@ -88,16 +100,16 @@ def _make_uploading_video(updated_hours_ago, created_hours_ago=None):
 
 def test_fail_stuck_uploading_recent_video_notifies(mocker):
     """Stuck + recently created → UPLOAD_FAILED with an email."""
-    mocked_email = mocker.patch(
-        "mail.tasks.async_send_notification_email", autospec=True
-    )
+    mocked_enqueue = mocker.patch("ui.signals.outbox.enqueue")
     video = _make_uploading_video(updated_hours_ago=3.5, created_hours_ago=3.5)
 
     fail_stuck_uploading_videos.delay()
 
     video.refresh_from_db()
     assert video.status == VideoStatus.UPLOAD_FAILED
-    mocked_email.delay.assert_called_once_with(video.id)
+    mocked_enqueue.assert_called_once_with(
+        mail_tasks.async_send_notification_email.si(video.id)
+    )
 
 
 def test_fail_stuck_uploading_within_threshold_untouched(mocker):
@@ -140,6 +152,42 @@ def test_fail_stuck_uploading_continues_after_error(mocker):
     assert mocked_update.call_count == 2
 
 
+@pytest.mark.parametrize("error", [InvalidStatusTransition, StatusConflict])
+def test_update_video_statuses_continues_after_status_error(mocker, error):
+    """A status change failing for one video must not abort the sweep of the rest."""
+    videos = VideoFactory.create_batch(2, status=VideoStatus.TRANSCODING)
+    refresh = mocker.patch(
+        "cloudsync.tasks.refresh_status", side_effect=[error("boom"), None]
+    )
+
+    update_video_statuses.delay()
+
+    assert sorted(call.args[0].id for call in refresh.call_args_list) == sorted(
+        video.id for video in videos
+    )
+
+
+def test_update_video_statuses_failed_job_status_error(mocker):
+    """A video that can't be failed after its job can't be read is skipped."""
+    completed, failed = VideoFactory.create_batch(2, status=VideoStatus.TRANSCODING)
+
+    def refresh_status(video):
+        """Complete one video behind the sweep's back, and fail to read both jobs"""
+        if video.id == completed.id:
+            Video.objects.filter(id=video.id).update(status=VideoStatus.COMPLETE)
+        raise EncodeJob.DoesNotExist
+
+    refresh = mocker.patch("cloudsync.tasks.refresh_status", side_effect=refresh_status)
+
+    update_video_statuses.delay()
+
+    assert refresh.call_count == 2
+    assert Video.objects.get(id=completed.id).status == VideoStatus.COMPLETE
+    assert (
+        Video.objects.get(id=failed.id).status == VideoStatus.TRANSCODE_FAILED_INTERNAL
+    )
+
+
 @pytest.fixture()
 def video():
     """Fixture to create a video"""
@@ -187,7 +235,7 @@ def mock_transcode(mocker):
     mocker.patch("cloudsync.api.process_transcode_results")
     mocker.patch("cloudsync.api.boto3", MockBoto)
     mocker.patch("cloudsync.api.delete_s3_objects")
-    mocker.patch("ui.models.tasks")
+    mocker.patch("mail.tasks.async_send_notification_email")
 
 
 @pytest.fixture()
@@ -249,8 +297,11 @@ def test_parse_content_metadata_dropbox(api_result, extra_headers, expected):
 
 
 def test_happy_path(mocker, video):
-    """A shared link is streamed to S3 via the authenticated Dropbox download."""
-    mock_video_file = io.BytesIO(os.urandom(6250000))
+    """A shared link is streamed to S3 via the authenticated Dropbox download, and
+    the fingerprint of the streamed file is stored."""
+    VideoFileFactory(video=video)
+    content = os.urandom(6250000)
+    mock_video_file = io.BytesIO(content)
     fake_response = SimpleNamespace(
         raw=mock_video_file,
         url=video.source_url,
@@ -267,21 +318,31 @@ def test_happy_path(mocker, video):
     mock_boto3 = mocker.patch("cloudsync.tasks.boto3")
     mock_bucket = mock_boto3.resource.return_value.Bucket.return_value
 
+    mock_bucket.upload_fileobj.side_effect = lambda Fileobj, **kwargs: Fileobj.read()
+
     stream_to_s3(video.id)
 
     mock_bucket.upload_fileobj.assert_called_with(
-        Fileobj=mock_video_file,
+        Fileobj=mocker.ANY,
         Key=video.get_s3_key(),
         ExtraArgs={"ContentType": "video/mp4"},
         Callback=mocker.ANY,
         Config=mocker.ANY,
     )
+    assert mock_bucket.upload_fileobj.call_args.kwargs["Fileobj"].stream is (
+        mock_video_file
+    )
     assert Video.objects.get(id=video.id).status == VideoStatus.UPLOADING
+    hasher = dedupe.ContentHasher()
+    hasher.update(content)
+    original = video.original_video
+    assert original.content_size == len(content)
+    assert original.content_hash == hasher.hexdigest()
 
 
 def test_upload_progress_refreshes_updated_at(mocker, video):
     """The progress callback refreshes updated_at so the janitor sees life."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     fake_response = SimpleNamespace(
         raw=io.BytesIO(os.urandom(1024)),
@@ -307,6 +368,33 @@ def test_upload_progress_refreshes_updated_at(mocker, video):
     assert abs((refreshed - future).total_seconds()) < 1
 
 
+def test_upload_progress_coalesced(mocker, video):
+    """Chunk callbacks are coalesced into one progress report per interval."""
+    mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
+    upload_progress = mocker.patch("cloudsync.tasks.UploadProgress")
+    fake_response = SimpleNamespace(
+        raw=io.BytesIO(os.urandom(1024)),
+        headers={"Dropbox-API-Result": json.dumps({"name": "video.mp4", "size": 1024})},
+        close=lambda: None,
+    )
+    mocker.patch(
+        "cloudsync.tasks.dropbox_api.stream_shared_link", return_value=fake_response
+    )
+    mock_boto3 = mocker.patch("cloudsync.tasks.boto3")
+    mock_bucket = mock_boto3.resource.return_value.Bucket.return_value
+
+    stream_to_s3(video.id)
+
+    upload_progress.assert_called_once_with(
+        video, 1024, task=mocker.ANY, task_id=mocker.ANY
+    )
+    callback = mock_bucket.upload_fileobj.call_args.kwargs["Callback"]
+    callback(512)
+    callback(512)
+    assert upload_progress.return_value.add.call_args_list == [call(512), call(512)]
+    upload_progress.return_value.finish.assert_called_once_with()
+
+
 def _http_error(status):
     """Build a requests.HTTPError carrying a response with the given status."""
     err = HTTPError(f"status {status}")
@@ -348,7 +436,7 @@ PERMANENT_UPLOAD_ERRORS = [
 @pytest.mark.parametrize("exc", TRANSIENT_UPLOAD_ERRORS)
 def test_upload_transient_error_retries(mocker, video, exc):
     """Transient errors request a retry and leave the video in UPLOADING."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch("cloudsync.tasks.dropbox_api.stream_shared_link", side_effect=exc)
     mocker.patch("cloudsync.tasks.boto3")
@@ -375,7 +463,7 @@ def test_upload_honors_retry_after_header(
     err.response = SimpleNamespace(
         status_code=429, headers={"Retry-After": retry_after}
     )
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch("cloudsync.tasks.dropbox_api.stream_shared_link", side_effect=err)
     mocker.patch("cloudsync.tasks.boto3")
@@ -395,7 +483,7 @@ def test_upload_ignores_retry_after_for_non_429(mocker, video):
     header still uses exponential backoff, not the header value."""
     err = HTTPError("503 unavailable")
     err.response = SimpleNamespace(status_code=503, headers={"Retry-After": "42"})
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch("cloudsync.tasks.dropbox_api.stream_shared_link", side_effect=err)
     mocker.patch("cloudsync.tasks.boto3")
@@ -414,7 +502,7 @@ def test_upload_ignores_retry_after_for_non_429(mocker, video):
 @pytest.mark.parametrize("exc", TRANSIENT_UPLOAD_ERRORS)
 def test_upload_retries_exhausted(mocker, video, exc):
     """Once retries are exhausted the original error fails the video."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch("cloudsync.tasks.dropbox_api.stream_shared_link", side_effect=exc)
     mocker.patch("cloudsync.tasks.boto3")
@@ -430,7 +518,7 @@ def test_upload_retries_exhausted(mocker, video, exc):
 @pytest.mark.parametrize("exc", PERMANENT_UPLOAD_ERRORS)
 def test_upload_permanent_error_fails_fast(mocker, video, exc):
     """Permanent errors (4xx, statusless, AccessDenied) fail without retrying."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch("cloudsync.tasks.dropbox_api.stream_shared_link", side_effect=exc)
     mocker.patch("cloudsync.tasks.boto3")
@@ -440,6 +528,50 @@ def test_upload_permanent_error_fails_fast(mocker, video, exc):
     assert Video.objects.get(id=video.id).status == VideoStatus.UPLOAD_FAILED
 
 
+@pytest.mark.parametrize(
+    "status",
+    [
+        VideoStatus.COMPLETE,
+        VideoStatus.TRANSCODE_FAILED_VIDEO,
+        VideoStatus.RETRANSCODING,
+    ],
+)
+def test_upload_redispatched(mocker, status):
+    """A re-dispatched upload moves the video to UPLOADING, then UPLOAD_FAILED on error."""
+    mocker.patch("mail.tasks.async_send_notification_email")
+    mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
+    mocker.patch(
+        "cloudsync.tasks.dropbox_api.stream_shared_link", side_effect=ValueError("bad")
+    )
+    video = VideoFactory(status=status)
+    with pytest.raises(ValueError):
+        stream_to_s3.apply((video.id,), retries=0, throw=True).get()
+    assert [
+        (transition.from_status, transition.to_status)
+        for transition in video.status_history.all()
+    ] == [
+        (status, VideoStatus.UPLOADING),
+        (VideoStatus.UPLOADING, VideoStatus.UPLOAD_FAILED),
+    ]
+
+
+def test_upload_status_conflict_skips(mocker, video, upload_lock):
+    """An upload of a video moved by another worker is skipped, without its chain."""
+    mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
+    mock_bucket = _stub_happy_upload(mocker)
+    mocker.patch("ui.models.Video.update_status", side_effect=StatusConflict("moved"))
+
+    stream_to_s3.push_request(chain=[{"options": {"task_id": "1"}}], callbacks=["cb"])
+    try:
+        assert stream_to_s3.run(video.id) is False
+        assert stream_to_s3.request.chain is None
+        assert stream_to_s3.request.callbacks is None
+    finally:
+        stream_to_s3.pop_request()
+    mock_bucket.upload_fileobj.assert_not_called()
+    upload_lock.release.assert_called_once()
+
+
 @pytest.mark.parametrize(
     "exc, expected",
     [
@@ -546,9 +678,28 @@ def test_upload_lock_contention_suppresses_chain(mocker, video, upload_lock):
         stream_to_s3.pop_request()
 
 
+def test_upload_reuses_identical_source(mocker, video, upload_lock):
+    """A source which was already transcoded isn't uploaded, and the rest of the
+    chain is skipped."""
+    mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
+    mock_bucket = _stub_happy_upload(mocker)
+    reuse = mocker.patch("cloudsync.tasks.dedupe.reuse_before_upload")
+
+    stream_to_s3.push_request(chain=[{"options": {"task_id": "abc"}}], callbacks=["cb"])
+    try:
+        assert stream_to_s3.run(video.id) is True
+        assert stream_to_s3.request.chain is None
+        assert stream_to_s3.request.callbacks is None
+    finally:
+        stream_to_s3.pop_request()
+    reuse.assert_called_once_with(video, 1024, None)
+    mock_bucket.upload_fileobj.assert_not_called()
+    upload_lock.release.assert_called_once()
+
+
 def test_upload_releases_lock_on_error(mocker, video, upload_lock):
     """The lock is released even when the upload fails."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch(
         "cloudsync.tasks.dropbox_api.stream_shared_link", side_effect=_http_error(403)
@@ -574,7 +725,7 @@ def test_lock_release_error_is_swallowed(mocker, video, upload_lock):
 
 def test_progress_callback_heartbeats_lock(mocker, video, upload_lock):
     """The throttled progress callback extends the lock lease (heartbeat)."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mock_bucket = _stub_happy_upload(mocker)
 
@@ -616,7 +767,7 @@ def test_upload_aborts_when_lock_lost_mid_stream(mocker, video, upload_lock):
 
 def test_upload_auth_failure(mocker, video):
     """Video is marked failed when Dropbox authentication errors."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mock_update = mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch(
         "cloudsync.tasks.dropbox_api.stream_shared_link",
@@ -632,7 +783,7 @@ def test_upload_auth_failure(mocker, video):
 
 def test_upload_metadata_failure(mocker, video):
     """Video is marked failed when the Dropbox metadata header is missing."""
-    mocker.patch("ui.models.tasks.async_send_notification_email")
+    mocker.patch("mail.tasks.async_send_notification_email")
     mock_update = mocker.patch("cloudsync.tasks.stream_to_s3.update_state")
     mocker.patch(
         "cloudsync.tasks.dropbox_api.stream_shared_link",
@@ -682,6 +833,66 @@ def test_retranscode_failures(
     )
 
 
+@pytest.mark.parametrize("status", [VideoStatus.COMPLETE, VideoStatus.ERROR])
+def test_retranscode_throttled(mocker, videofile, mock_transcode, status):
+    """
+    Test that a retranscode throttled by MediaConvert is rescheduled instead of
+    failing, without an encode job or the side effects of its previous status
+    """
+    mocker.patch(
+        "cloudsync.api.media_convert_job",
+        side_effect=ClientError(
+            error_response={"Error": {"Code": "TooManyRequestsException"}},
+            operation_name="CreateJob",
+        ),
+    )
+    mock_enqueue = mocker.patch("ui.signals.outbox.enqueue")
+    video = videofile.video
+    video.collection.edx_course_id = "course-v1:MITx+1+1"
+    video.collection.save()
+    video.status = status
+    video.schedule_retranscode = True
+    video.save()
+
+    retranscode_video(video.id)
+    video.refresh_from_db()
+    assert video.status == status
+    assert video.schedule_retranscode is True
+    assert [
+        (transition.from_status, transition.to_status)
+        for transition in video.status_history.all()
+    ] == [
+        (status, VideoStatus.RETRANSCODE_SCHEDULED),
+        (VideoStatus.RETRANSCODE_SCHEDULED, status),
+    ]
+    assert not EncodeJob.objects.filter(object_id=video.id).exists()
+    assert mock_enqueue.call_count == 0
+
+
+def test_admitted_retranscode_throttled(mocker, videofile, mock_transcode):
+    """
+    Test that a throttled retranscode admitted by schedule_retranscodes goes back to
+    the status it had before it was admitted
+    """
+    mocker.patch(
+        "cloudsync.api.media_convert_job",
+        side_effect=ClientError(
+            error_response={"Error": {"Code": "TooManyRequestsException"}},
+            operation_name="CreateJob",
+        ),
+    )
+    video = videofile.video
+    video.status = VideoStatus.COMPLETE
+    video.schedule_retranscode = True
+    video.save()
+    assert admit_retranscodes(5) == [video.id]
+
+    retranscode_video(video.id)
+    video.refresh_from_db()
+    assert video.status == VideoStatus.COMPLETE
+    assert video.schedule_retranscode is True
+
+
 def test_transcode_target_does_not_exist():
     """
     Test transcode task, verify exception is thrown when target does not exist.
@@ -717,6 +928,15 @@ def test_transcode_starting(
     )
 
 
+def test_transcode_reuses_identical_source(mocker, videofile, mock_transcode):  # pylint: disable=unused-argument
+    """A video identical to a transcoded one isn't transcoded"""
+    reuse = mocker.patch("cloudsync.tasks.dedupe.reuse_before_transcode")
+    transcode = mocker.patch("cloudsync.tasks.transcode_video")
+    transcode_from_s3(videofile.video.id)
+    reuse.assert_called_once_with(videofile.video, videofile)
+    transcode.assert_not_called()
+
+
 def test_retranscode_starting(
     mocker, videofile, mock_transcode, mock_successful_encode_job
 ):
@@ -730,6 +950,40 @@ def test_retranscode_starting(
     )
 
 
+def test_transcode_invalid_status(
+    mocker, videofile, mock_transcode, mock_successful_encode_job
+):
+    """A video whose status doesn't allow a transcode is left as it is"""
+    video = videofile.video
+    Video.objects.filter(id=video.id).update(status=VideoStatus.UPLOAD_FAILED)
+    transcode_from_s3(video.id)
+    assert Video.objects.get(id=video.id).status == VideoStatus.UPLOAD_FAILED
+    assert not video.status_history.exists()
+
+
+def test_transcode_failed_again(
+    mocker, videofile, mock_transcode, mock_failed_encode_job
+):
+    """A transcode retried after a failure can fail again"""
+    video = videofile.video
+    Video.objects.filter(id=video.id).update(status=VideoStatus.TRANSCODE_FAILED_VIDEO)
+    with pytest.raises(ClientError):
+        transcode_from_s3(video.id)
+    assert (
+        Video.objects.get(id=video.id).status == VideoStatus.TRANSCODE_FAILED_INTERNAL
+    )
+
+
+def test_retranscode_already_retranscoding(mocker, videofile, mock_transcode):
+    """A video that is already retranscoding isn't retranscoded again"""
+    transcode = mocker.patch("cloudsync.tasks.transcode_video")
+    video = videofile.video
+    Video.objects.filter(id=video.id).update(status=VideoStatus.RETRANSCODING)
+    retranscode_video(video.id)
+    transcode.assert_not_called()
+    assert Video.objects.get(id=video.id).status == VideoStatus.RETRANSCODING
+
+
 def test_video_task_chain(mocker):
     """
     Test that video task get_task_id method returns the correct id from the chain.
@@ -818,6 +1072,25 @@ def test_video_task_no_chain(mocker):
     assert task.get_task_id() == task.request.id
 
 
+def test_video_task_stop_chain(mocker):
+    """stop_chain should clear the chained tasks and callbacks of the request"""
+    request = celery.app.task.Context(
+        {
+            "id": "1853b857-84d8-4af4-8b19-1c307c1e07d5",
+            "chain": [{"task": "cloudsync.tasks.transcode_from_s3", "options": {}}],
+            "callbacks": ["callback"],
+        }
+    )
+    mocker.patch(
+        "cloudsync.tasks.VideoTask.request",
+        new_callable=PropertyMock,
+        return_value=request,
+    )
+    VideoTask().stop_chain()
+    assert request.chain is None
+    assert request.callbacks is None
+
+
 def test_stream_to_s3_no_video():
     """Test DoesNotExistError"""
     with pytest.raises(Video.DoesNotExist):
@@ -1102,6 +1375,47 @@ def test_update_youtube_statuses_dupe(mocker):
         assert len(YouTubeVideo.objects.filter(status=status).all()) == 1
 
 
+@mock_aws
+@override_settings(VIDEO_S3_THUMBNAIL_BUCKET="thumbnail-bucket")
+@pytest.mark.parametrize("error", [None, ValueError("Could not decode image")])
+def test_process_thumbnail_upload(mocker, error):
+    """The staged image should be ingested, and deleted whether or not it could be"""
+    s3c = boto3.client("s3")
+    s3c.create_bucket(Bucket="thumbnail-bucket")
+    s3c.put_object(Bucket="thumbnail-bucket", Key="thumbnails/uploads/a", Body=b"abc")
+    thumbnail = VideoThumbnailFactory(
+        max_width=320,
+        max_height=180,
+        variants=[{"key": "a_160w.jpg"}],
+    )
+    mock_ingest = mocker.patch(
+        "cloudsync.tasks.ingest_thumbnail", return_value=thumbnail, side_effect=error
+    )
+
+    uploaded_at = "2026-01-02T03:04:05+00:00"
+    if error:
+        with pytest.raises(ValueError):
+            process_thumbnail_upload.delay(
+                thumbnail.video.id, "thumbnails/uploads/a", uploaded_at
+            )
+    else:
+        assert process_thumbnail_upload.delay(
+            thumbnail.video.id, "thumbnails/uploads/a", uploaded_at
+        ).get() == {
+            "s3_object_key": thumbnail.s3_object_key,
+            "max_width": 320,
+            "max_height": 180,
+            "variants": 1,
+        }
+    mock_ingest.assert_called_once_with(
+        thumbnail.video,
+        mocker.ANY,
+        uploaded_at=datetime(2026, 1, 2, 3, 4, 5, tzinfo=UTC),
+    )
+    assert mock_ingest.call_args[0][1].read() == b"abc"
+    assert s3c.list_objects_v2(Bucket="thumbnail-bucket")["KeyCount"] == 0
+
+
 def test_update_youtube_statuses_failed(mocker):
     """
     Test that the correct number of YouTubeVideo objects have their statuses updated to FAILED
@@ -1125,8 +1439,11 @@ def test_schedule_retranscodes(
     mocker, mock_transcode, mock_successful_encode_job, mocked_celery
 ):
     """
-    Test that schedule_retranscodes triggers retranscode_video tasks for each scheduled video
+    Test that schedule_retranscodes triggers retranscode_video tasks for the oldest
+    scheduled videos, up to the number of free slots
     """
+    mocker.patch("cloudsync.tasks.get_retranscode_slots", return_value=3)
+    mocker.patch("cloudsync.tasks.get_retranscode_progress", return_value=[])
     retranscode_video_mock = mocker.patch(
         "cloudsync.tasks.retranscode_video", autospec=True
     )
@@ -1136,24 +1453,59 @@ def test_schedule_retranscodes(
     with pytest.raises(mocked_celery.replace_exception_class):
         schedule_retranscodes.delay()
     assert mocked_celery.group.call_count == 1
-    assert retranscode_video_mock.si.call_count == len(scheduled_videos)
-    for video in scheduled_videos:
-        retranscode_video_mock.si.assert_any_call(video.id)
+    assert [call[0][0] for call in retranscode_video_mock.si.call_args_list] == [
+        video.id for video in scheduled_videos[:3]
+    ]
     assert Collection.objects.get(id=collection.id).schedule_retranscode is False
+    # Admitted videos count as in flight and aren't admitted again
+    for video in scheduled_videos[:3]:
+        video.refresh_from_db()
+        assert video.status == VideoStatus.RETRANSCODE_SCHEDULED
+        assert video.schedule_retranscode is False
+        assert video.status_history.get().from_status == VideoStatus.CREATED
+    assert Video.objects.filter(schedule_retranscode=True).count() == 2
+
+    retranscode_video_mock.si.reset_mock()
+    with pytest.raises(mocked_celery.replace_exception_class):
+        schedule_retranscodes.delay()
+    assert [call[0][0] for call in retranscode_video_mock.si.call_args_list] == [
+        video.id for video in scheduled_videos[3:]
+    ]
+
+
+@pytest.mark.parametrize(
+    "slots_kwargs",
+    [{"return_value": 0}, {"side_effect": ClientError({}, "ListJobs")}],
+)
+def test_schedule_retranscodes_no_capacity(mocker, mocked_celery, slots_kwargs):
+    """
+    Test that schedule_retranscodes waits for the next wave if there are no free slots
+    or the MediaConvert queue can't be checked
+    """
+    mocker.patch("cloudsync.tasks.get_retranscode_slots", **slots_kwargs)
+    mocker.patch("cloudsync.tasks.get_retranscode_progress", return_value=[])
+    VideoFactory.create_batch(2, schedule_retranscode=True)
+    schedule_retranscodes.delay()
+    assert mocked_celery.group.call_count == 0
+    assert Video.objects.filter(schedule_retranscode=True).count() == 2
 
 
-def test_no_scheduled_retranscodes(mocked_celery):
+def test_no_scheduled_retranscodes(mocker, mocked_celery):
     """
     Test that schedule_retranscodes doesn't raise a replacement if no videos need a retranscode
     """
+    slots_mock = mocker.patch("cloudsync.tasks.get_retranscode_slots")
     schedule_retranscodes.delay()
     assert mocked_celery.group.call_count == 0
+    slots_mock.assert_not_called()
 
 
 def test_schedule_retranscodes_error(mocker, mocked_celery):
     """
     Test that schedule_retranscodes logs an error if it occurs
     """
+    mocker.patch("cloudsync.tasks.get_retranscode_slots", return_value=10)
+    mocker.patch("cloudsync.tasks.get_retranscode_progress", return_value=[])
     mock_error_log = mocker.patch("cloudsync.tasks.log.exception")
     mocker.patch("cloudsync.tasks.retranscode_video.si", side_effect=ClientError)
     VideoFactory.create_batch(5, schedule_retranscode=True)
@@ -1224,7 +1576,7 @@ video_1504127981867-06dkm6.m3u8
     # file on s3
     VideoFileFactory(s3_object_key="not a valid key", encoding="HLS")
 
-    sort_transcoded_m3u8_files()
+    sort_transcoded_m3u8_files.delay()
 
     expected_file_body = """
 #EXTM3U
@@ -5,6 +5,7 @@ Celery configuration
 import os
 
 from celery import Celery
+from celery.signals import celeryd_init
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "odl_video.settings")
@@ -23,6 +24,17 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)  # pragma: no cover
 
 
+@celeryd_init.connect
+def select_worker_pool_queues(options, **kwargs):  # pylint: disable=unused-argument
+    """
+    Consume the queues of the worker pool named by CELERY_WORKER_POOL, unless the
+    worker was started with explicit queues (-Q)
+    """
+    if settings.CELERY_WORKER_POOL and not options.get("queues"):
+        pool = settings.CELERY_WORKER_POOLS[settings.CELERY_WORKER_POOL]
+        options["queues"] = pool["queues"]
+
+
 @app.task(bind=True)
 def debug_task(self):
     """
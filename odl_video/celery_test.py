@@ -0,0 +1,54 @@
+"""
+Tests for celery configuration
+"""
+
+import pytest
+
+from odl_video.celery import app, select_worker_pool_queues
+
+
+@pytest.mark.parametrize(
+    "task_name, queue",
+    [
+        ("cloudsync.tasks.stream_to_s3", "uploads"),
+        ("cloudsync.tasks.process_thumbnail_upload", "default"),
+        ("ui.tasks.dispatch_upload_chains", "default"),
+        ("cloudsync.tasks.transcode_from_s3", "transcode"),
+        ("cloudsync.tasks.flush_cloudfront_invalidations", "transcode"),
+        ("ui.tasks.post_video_to_edx", "integrations"),
+        ("mail.tasks.async_send_notification_email", "notifications"),
+        ("ui.tasks.migrate_keycloak_users_chunk", "bulk"),
+        ("ui.models.delete_s3_objects", "default"),
+    ],
+)
+def test_task_routes(task_name, queue):
+    """Tasks should be routed to the queue for their class of work"""
+    assert app.amqp.router.route({}, task_name)["queue"].name == queue
+
+
+def test_worker_pools_cover_queues(settings):
+    """Every queue should be consumed by exactly one worker pool"""
+    pool_queues = [
+        queue
+        for pool in settings.CELERY_WORKER_POOLS.values()
+        for queue in pool["queues"]
+    ]
+    assert sorted(pool_queues) == sorted(
+        queue.name for queue in settings.CELERY_TASK_QUEUES
+    )
+
+
+@pytest.mark.parametrize(
+    "pool, queues, expected",
+    [
+        ("uploads", None, ["uploads"]),
+        ("uploads", ["default"], ["default"]),
+        ("", None, None),
+    ],
+)
+def test_select_worker_pool_queues(settings, pool, queues, expected):
+    """A worker started with CELERY_WORKER_POOL should consume the pool's queues"""
+    settings.CELERY_WORKER_POOL = pool
+    options = {"queues": queues}
+    select_worker_pool_queues(sender="worker@host", options=options)
+    assert options["queues"] == expected
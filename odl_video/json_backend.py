@@ -0,0 +1,100 @@
+"""
+JSON encoding and decoding for API responses, requests and page settings
+
+orjson is used when it is installed, and the standard library otherwise. Either
+way the output is the same as DRF's JSONRenderer: compact, UTF-8, with values
+orjson doesn't encode the same way (datetimes, decimals, lazy strings, ...) handed
+to DRF's encoder.
+"""
+
+import json
+
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson can only produce DRF's default, compact and unescaped, output
+USE_ORJSON = (
+    orjson is not None and api_settings.UNICODE_JSON and api_settings.COMPACT_JSON
+)
+
+_encoder = JSONEncoder(
+    ensure_ascii=not api_settings.UNICODE_JSON,
+    allow_nan=not api_settings.STRICT_JSON,
+    separators=(",", ":") if api_settings.COMPACT_JSON else (", ", ": "),
+)
+
+
+def _strict_constant(value):
+    """Reject NaN and infinite values, like DRF's JSONParser"""
+    raise ValueError(f"Out of range float values are not JSON compliant: {value!r}")
+
+
+def dumps(data):
+    """
+    Encode data as JSON
+
+    Args:
+        data: The data to encode
+
+    Returns:
+        bytes: The UTF-8 encoded JSON
+    """
+    content = None
+    if USE_ORJSON:
+        try:
+            content = orjson.dumps(
+                data,
+                default=_encoder.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            # Non-string keys, integers over 64 bits and the like
+            pass
+    if content is None:
+        content = _encoder.encode(data).encode("utf-8")
+    # Escape the line and paragraph separators so the JSON is also valid javascript
+    return content.replace("\u2028".encode(), b"\\u2028").replace(
+        "\u2029".encode(), b"\\u2029"
+    )
+
+
+def loads(content):
+    """
+    Decode JSON
+
+    Args:
+        content (bytes or str): The JSON
+
+    Returns:
+        The decoded data
+
+    Raises:
+        ValueError: If the content isn't valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content, parse_constant=_strict_constant)
+
+
+def dumps_for_script(data):
+    """
+    Encode data as JSON that can be placed directly inside a <script> element
+
+    Args:
+        data: The data to encode
+
+    Returns:
+        str: The JSON, with <, > and & escaped so it can't close the element
+    """
+    return (
+        dumps(data)
+        .decode("utf-8")
+        .replace("<", "\\u003c")
+        .replace(">", "\\u003e")
+        .replace("&", "\\u0026")
+    )
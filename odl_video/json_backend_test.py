@@ -0,0 +1,64 @@
+"""Tests for odl_video.json_backend"""
+
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+import pytz
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from odl_video import json_backend
+
+DATA = {
+    "key": uuid.uuid4(),
+    "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=pytz.utc),
+    "title": "Café\u2028\u2029",
+    "label": gettext_lazy("Video"),
+    "duration": Decimal("1.50"),
+    "sources": [{"src": None, "label": 1.5, "count": 2**70}],
+    "tags": ("a", "b"),
+}
+
+
+@pytest.fixture(params=[False, True], ids=["stdlib", "orjson"])
+def backend(request, mocker):
+    """Use each of the JSON backends"""
+    if request.param:
+        pytest.importorskip("orjson")
+    mocker.patch.object(json_backend, "USE_ORJSON", request.param)
+
+
+def test_dumps(backend):
+    """dumps should render the same JSON as DRF's JSONRenderer"""
+    assert json_backend.dumps(DATA) == JSONRenderer().render(DATA)
+
+
+def test_dumps_line_separators(backend):
+    """dumps should escape the line and paragraph separators"""
+    assert json_backend.dumps(["\u2028\u2029"]) == b'["\\u2028\\u2029"]'
+
+
+def test_loads():
+    """loads should decode bytes and strings"""
+    assert json_backend.loads(b'{"title": "Caf\\u00e9"}') == {"title": "Café"}
+    assert json_backend.loads("[1, 2.5, null]") == [1, 2.5, None]
+
+
+@pytest.mark.parametrize("content", ["[NaN]", "[Infinity]", "{", ""])
+def test_loads_invalid(content):
+    """loads should raise a ValueError for invalid or out of range JSON"""
+    with pytest.raises(ValueError):
+        json_backend.loads(content)
+
+
+def test_dumps_for_script():
+    """dumps_for_script should escape characters which could end a <script> element"""
+    data = {"title": "</script><!-- & -->"}
+    content = json_backend.dumps_for_script(data)
+    assert "<" not in content
+    assert ">" not in content
+    assert "&" not in content
+    assert json.loads(content) == data
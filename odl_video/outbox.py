@@ -0,0 +1,117 @@
+"""
+Transactional outbox for celery tasks
+
+Task signatures passed to enqueue() inside a transaction are held until it commits
+and then sent together over one broker connection, in the order they were queued.
+Signatures with the same dedupe key are only sent once per transaction, and those
+queued inside a savepoint that is rolled back are dropped along with it. Outside of
+a transaction signatures are sent right away.
+"""
+
+import json
+
+import structlog
+from django.db import transaction
+
+from odl_video.celery import app
+
+log = structlog.get_logger(__name__)
+
+
+class Outbox:
+    """
+    Task signatures queued at one savepoint level of a transaction
+
+    Instances are registered as on_commit callbacks, so Django runs them after the
+    transaction commits and discards them when their savepoint is rolled back.
+    """
+
+    def __init__(self, earlier=()):
+        """
+        Args:
+            earlier (list of Outbox): Outboxes of the same transaction that were
+                registered before this one, and so are sent before it
+        """
+        self.earlier = list(earlier)
+        self.signatures = {}
+        self.sent_keys = set()
+
+    def add(self, signature, dedupe_key):
+        """Queue a signature unless one with the same dedupe key is already queued"""
+        self.signatures.setdefault(dedupe_key, signature)
+
+    def __call__(self):
+        already_sent = set().union(*(outbox.sent_keys for outbox in self.earlier))
+        pending = [
+            (key, signature)
+            for key, signature in self.signatures.items()
+            if key not in already_sent
+        ]
+        if not pending:
+            return
+        with app.producer_or_acquire() as producer:
+            for key, signature in pending:
+                try:
+                    signature.apply_async(producer=producer)
+                except Exception:  # pylint: disable=broad-except
+                    log.exception("Failed to send queued task", dedupe_key=key)
+                else:
+                    self.sent_keys.add(key)
+        log.debug("Sent queued tasks", count=len(self.sent_keys))
+
+
+def signature_key(signature):
+    """
+    The default dedupe key of a signature: its task name, arguments and options
+
+    Args:
+        signature (celery.canvas.Signature): A task signature
+
+    Returns:
+        str: The dedupe key
+    """
+    return json.dumps(signature, sort_keys=True, default=str)
+
+
+def _current_outbox(connection, using):
+    """
+    Find or register the outbox for the current savepoint level of the transaction
+
+    Args:
+        connection (django.db.backends.base.base.BaseDatabaseWrapper): The connection
+        using (str): The database alias
+
+    Returns:
+        Outbox: The outbox to queue signatures in
+    """
+    savepoint_ids = set(connection.savepoint_ids)
+    outboxes = []
+    for callback_savepoint_ids, callback, *_ in connection.run_on_commit:
+        if isinstance(callback, Outbox):
+            if callback_savepoint_ids == savepoint_ids:
+                return callback
+            outboxes.append(callback)
+    outbox = Outbox(earlier=outboxes)
+    transaction.on_commit(outbox, using=using)
+    return outbox
+
+
+def enqueue(signature, dedupe_key=None, using=None):
+    """
+    Send a task signature once the current transaction commits
+
+    Args:
+        signature (celery.canvas.Signature): The task signature (or chain) to send
+        dedupe_key (hashable): Signatures with the same key are only sent once per
+            transaction. Defaults to a key built from the signature itself.
+        using (str): The database alias of the transaction
+    """
+    if dedupe_key is None:
+        dedupe_key = signature_key(signature)
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        outbox = Outbox()
+        outbox.add(signature, dedupe_key)
+        outbox()
+        return
+    _current_outbox(connection, using).add(signature, dedupe_key)
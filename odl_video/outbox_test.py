@@ -0,0 +1,111 @@
+"""
+Tests for the transactional task outbox
+"""
+
+import pytest
+from celery.canvas import Signature
+from django.db import transaction
+
+from odl_video import outbox
+from ui.models import delete_s3_objects
+from ui.tasks import post_video_to_edx
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def broker(mocker):
+    """A broker stand-in that records the signatures sent to it, in order"""
+    sent = []
+    mocker.patch.object(
+        Signature,
+        "apply_async",
+        autospec=True,
+        side_effect=lambda signature, **kwargs: sent.append(
+            (signature.task, signature.args)
+        ),
+    )
+    return sent
+
+
+def test_enqueue_sends_on_commit(broker, django_capture_on_commit_callbacks):
+    """Signatures are held until commit, then sent in order with duplicates dropped"""
+    with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+        outbox.enqueue(post_video_to_edx.si(1))
+        outbox.enqueue(delete_s3_objects.si("bucket", "key"))
+        outbox.enqueue(post_video_to_edx.si(2))
+        outbox.enqueue(post_video_to_edx.si(1))
+        assert broker == []
+
+    assert broker == [
+        ("ui.tasks.post_video_to_edx", (1,)),
+        ("ui.models.delete_s3_objects", ("bucket", "key")),
+        ("ui.tasks.post_video_to_edx", (2,)),
+    ]
+
+
+def test_enqueue_dedupe_key(broker, django_capture_on_commit_callbacks):
+    """Signatures with the same explicit dedupe key are only sent once"""
+    with django_capture_on_commit_callbacks(execute=True):
+        outbox.enqueue(post_video_to_edx.si(1), dedupe_key=("edx", 1))
+        outbox.enqueue(post_video_to_edx.si(1, "again"), dedupe_key=("edx", 1))
+
+    assert broker == [("ui.tasks.post_video_to_edx", (1,))]
+
+
+def test_enqueue_savepoints(broker, django_capture_on_commit_callbacks):
+    """
+    Signatures queued in a rolled back savepoint are dropped, and a signature that was
+    already queued by an outer level isn't sent again by a savepoint
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        outbox.enqueue(post_video_to_edx.si(1))
+        with transaction.atomic():
+            outbox.enqueue(post_video_to_edx.si(1))
+            outbox.enqueue(post_video_to_edx.si(2))
+        try:
+            with transaction.atomic():
+                outbox.enqueue(post_video_to_edx.si(3))
+                raise ValueError
+        except ValueError:
+            pass
+
+    assert broker == [
+        ("ui.tasks.post_video_to_edx", (1,)),
+        ("ui.tasks.post_video_to_edx", (2,)),
+    ]
+
+
+def test_enqueue_rollback(broker, django_capture_on_commit_callbacks):
+    """Nothing is sent if the transaction is rolled back"""
+    with (
+        django_capture_on_commit_callbacks(execute=True) as callbacks,
+        pytest.raises(ValueError),
+        transaction.atomic(),
+    ):
+        outbox.enqueue(post_video_to_edx.si(1))
+        raise ValueError
+
+    assert callbacks == []
+    assert broker == []
+
+
+def test_send_failure(mocker, django_capture_on_commit_callbacks):
+    """A signature that can't be sent is logged without stopping the rest"""
+    log_mock = mocker.patch("odl_video.outbox.log")
+    sent = []
+
+    def apply_async(signature, **kwargs):
+        if signature.args == (1,):
+            raise ConnectionError
+        sent.append(signature.args)
+
+    mocker.patch.object(
+        Signature, "apply_async", autospec=True, side_effect=apply_async
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        outbox.enqueue(post_video_to_edx.si(1))
+        outbox.enqueue(post_video_to_edx.si(2))
+
+    assert sent == [(2,)]
+    log_mock.exception.assert_called_once()
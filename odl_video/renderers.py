@@ -0,0 +1,37 @@
+"""
+DRF renderer and parser classes using odl_video.json_backend
+"""
+
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+
+from odl_video import json_backend
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    Renders JSON with json_backend. Indented responses, as asked for by the
+    browsable API, are still rendered by DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return json_backend.dumps(data)
+
+
+class JSONParser(parsers.JSONParser):
+    """Parses JSON request bodies with json_backend"""
+
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            return json_backend.loads(stream.read().decode(encoding))
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}") from exc
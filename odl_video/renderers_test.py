@@ -0,0 +1,36 @@
+"""Tests for odl_video.renderers"""
+
+import io
+
+import pytest
+from rest_framework.exceptions import ParseError
+
+from odl_video.renderers import JSONParser, JSONRenderer
+
+
+def test_render():
+    """JSONRenderer should render compact JSON, and nothing for None"""
+    assert JSONRenderer().render({"title": "Café", "count": 1}) == (
+        '{"title":"Café","count":1}'.encode()
+    )
+    assert JSONRenderer().render(None) == b""
+
+
+def test_render_indented():
+    """JSONRenderer should leave indented JSON to DRF"""
+    content = JSONRenderer().render(
+        {"count": 1}, "application/json; indent=2", {"indent": None}
+    )
+    assert content == b'{\n  "count": 1\n}'
+
+
+def test_parse():
+    """JSONParser should parse JSON request bodies"""
+    stream = io.BytesIO('{"title": "Café"}'.encode())
+    assert JSONParser().parse(stream) == {"title": "Café"}
+
+
+def test_parse_error():
+    """JSONParser should raise a ParseError for invalid JSON"""
+    with pytest.raises(ParseError):
+        JSONParser().parse(io.BytesIO(b"{"))
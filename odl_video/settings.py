@@ -9,10 +9,19 @@ from urllib.parse import urljoin
 
 import dj_database_url
 from django.core.exceptions import ImproperlyConfigured
+from kombu import Queue
 from mitol.common.envs import import_settings_modules
 from redbeat import RedBeatScheduler
 
-from odl_video.envs import get_any, get_bool, get_int, get_key, get_string, parse_env
+from odl_video.envs import (
+    get_any,
+    get_bool,
+    get_int,
+    get_key,
+    get_list_of_str,
+    get_string,
+    parse_env,
+)
 from odl_video.sentry import init_sentry
 
 VERSION = "0.94.5"
@@ -70,7 +79,7 @@ INSTALLED_APPS = [
     "mitol.observability.apps.ObservabilityConfig",
     "ui.apps.UIConfig",
     "cloudsync.apps.CloudSyncConfig",
-    "techtv2ovs",
+    "techtv2ovs.apps.TechTV2OVSConfig",
     "mail.apps.MailConfig",
     "django.contrib.admin",
     "django.contrib.auth",
@@ -371,6 +380,20 @@ AWS_S3_UPLOAD_TRANSFER_CONFIG = {
     "use_threads": AWS_S3_UPLOAD_USE_THREADS,
 }
 
+# Direct browser-to-S3 multipart uploads. The endpoint URL points the S3 client at a
+# local S3 stand-in for development.
+DIRECT_UPLOAD_S3_ENDPOINT_URL = get_string("DIRECT_UPLOAD_S3_ENDPOINT_URL", "")
+# Size of the parts of a direct upload, raised for files too large for 10,000 parts
+DIRECT_UPLOAD_PART_SIZE_MB = get_int("DIRECT_UPLOAD_PART_SIZE_MB", 64)
+# Seconds a presigned part URL is valid for
+DIRECT_UPLOAD_URL_EXPIRY_SECONDS = get_int("DIRECT_UPLOAD_URL_EXPIRY_SECONDS", 60 * 60)
+# Seconds a direct upload token is valid for, from the start of the upload
+DIRECT_UPLOAD_MAX_AGE_SECONDS = get_int(
+    "DIRECT_UPLOAD_MAX_AGE_SECONDS", 7 * 24 * 60 * 60
+)
+# Part URLs presigned per request
+DIRECT_UPLOAD_MAX_PART_URLS = get_int("DIRECT_UPLOAD_MAX_PART_URLS", 100)
+
 # Janitor: fail videos stuck in UPLOADING past the threshold so they can be retried.
 STUCK_UPLOADING_THRESHOLD_HOURS = get_int("STUCK_UPLOADING_THRESHOLD_HOURS", 2)
 
@@ -386,6 +409,16 @@ CLOUDSYNC_STREAM_S3_RETRY_MAX_BACKOFF = get_int(
 CLOUDSYNC_UPLOAD_PROGRESS_REFRESH_SECONDS = get_int(
     "CLOUDSYNC_UPLOAD_PROGRESS_REFRESH_SECONDS", 60
 )
+# Seconds between progress reports of an upload (task state, collection progress
+# hash and channel); s3transfer reports every chunk, which is far too often.
+CLOUDSYNC_UPLOAD_PROGRESS_INTERVAL = get_int("CLOUDSYNC_UPLOAD_PROGRESS_INTERVAL", 2)
+# How long an upload progress event stream is held open before the browser
+# reconnects. Must stay below the uwsgi harakiri timeout.
+UPLOAD_PROGRESS_STREAM_SECONDS = get_int("UPLOAD_PROGRESS_STREAM_SECONDS", 45)
+# Seconds between keepalive comments on an idle upload progress event stream
+UPLOAD_PROGRESS_KEEPALIVE_SECONDS = get_int("UPLOAD_PROGRESS_KEEPALIVE_SECONDS", 15)
+# Seconds the browser waits before reconnecting to an upload progress event stream
+UPLOAD_PROGRESS_RETRY_SECONDS = get_int("UPLOAD_PROGRESS_RETRY_SECONDS", 1)
 # Redis-broker redelivery window for unacked messages (also applied to
 # CELERY_BROKER_TRANSPORT_OPTIONS below). The per-video lock — not this value —
 # prevents concurrent double-uploads, so it can be short for faster crash
@@ -395,6 +428,12 @@ CELERY_BROKER_VISIBILITY_TIMEOUT = get_int("CELERY_BROKER_VISIBILITY_TIMEOUT", 6
 # can reacquire before expiry, and must stay below CELERY_BROKER_VISIBILITY_TIMEOUT
 # so a dead worker's lock expires before redelivery (letting the retry re-acquire).
 CLOUDSYNC_STREAM_S3_LOCK_TTL = get_int("CLOUDSYNC_STREAM_S3_LOCK_TTL", 120)
+# Upload chains sent at a time for videos imported from Dropbox, and the seconds
+# between chunks, to keep a large import within Dropbox and S3 rate limits
+DROPBOX_IMPORT_DISPATCH_CHUNK_SIZE = get_int("DROPBOX_IMPORT_DISPATCH_CHUNK_SIZE", 10)
+DROPBOX_IMPORT_DISPATCH_INTERVAL = get_int("DROPBOX_IMPORT_DISPATCH_INTERVAL", 30)
+# HLS master playlists normalized by each sort_transcoded_m3u8_files subtask
+HLS_PLAYLIST_NORMALIZE_CHUNK_SIZE = get_int("HLS_PLAYLIST_NORMALIZE_CHUNK_SIZE", 100)
 
 if CLOUDSYNC_UPLOAD_PROGRESS_REFRESH_SECONDS >= STUCK_UPLOADING_THRESHOLD_HOURS * 3600:
     raise ImproperlyConfigured(
@@ -415,6 +454,32 @@ if CLOUDSYNC_STREAM_S3_LOCK_TTL >= CELERY_BROKER_VISIBILITY_TIMEOUT:
     )
 VIDEO_CLOUDFRONT_DIST = get_string("VIDEO_CLOUDFRONT_DIST", "")
 VIDEO_CDN_DISTRIBUTION_ID = get_string("VIDEO_CDN_DISTRIBUTION_ID", "")
+# CloudFront invalidations are queued in redis and flushed together, either this
+# many seconds after the first queued path or once CLOUDFRONT_INVALIDATION_FLUSH_SIZE
+# paths are pending.
+CLOUDFRONT_INVALIDATION_DEBOUNCE_SECONDS = get_int(
+    "CLOUDFRONT_INVALIDATION_DEBOUNCE_SECONDS", 60
+)
+CLOUDFRONT_INVALIDATION_FLUSH_SIZE = get_int("CLOUDFRONT_INVALIDATION_FLUSH_SIZE", 1000)
+# Paths in one directory at which they're replaced by a <directory>/* wildcard
+CLOUDFRONT_INVALIDATION_COLLAPSE_THRESHOLD = get_int(
+    "CLOUDFRONT_INVALIDATION_COLLAPSE_THRESHOLD", 10
+)
+# CloudFront allows 3000 file paths and 15 wildcard paths in progress per distribution
+CLOUDFRONT_INVALIDATION_MAX_PATHS = get_int("CLOUDFRONT_INVALIDATION_MAX_PATHS", 3000)
+CLOUDFRONT_INVALIDATION_MAX_WILDCARDS = get_int(
+    "CLOUDFRONT_INVALIDATION_MAX_WILDCARDS", 15
+)
+CLOUDFRONT_INVALIDATION_RETRY_SECONDS = get_int(
+    "CLOUDFRONT_INVALIDATION_RETRY_SECONDS", 300
+)
+CLOUDFRONT_INVALIDATION_MAX_RETRIES = get_int("CLOUDFRONT_INVALIDATION_MAX_RETRIES", 12)
+# Paths of a batch that CloudFront rejects (other than throttling) are retried with
+# the next flushes, and dropped after failing this many times
+CLOUDFRONT_INVALIDATION_MAX_FAILURES = get_int(
+    "CLOUDFRONT_INVALIDATION_MAX_FAILURES", 3
+)
+CLOUDFRONT_INVALIDATION_LOCK_TTL = get_int("CLOUDFRONT_INVALIDATION_LOCK_TTL", 300)
 VIDEO_S3_BUCKET = AWS_STORAGE_BUCKET_NAME = get_string("VIDEO_S3_BUCKET", "")
 VIDEO_S3_TRANSCODE_BUCKET = get_string("VIDEO_S3_TRANSCODE_BUCKET", "")
 VIDEO_S3_THUMBNAIL_BUCKET = get_string("VIDEO_S3_THUMBNAIL_BUCKET", "")
@@ -422,6 +487,18 @@ VIDEO_S3_SUBTITLE_BUCKET = get_string("VIDEO_S3_SUBTITLE_BUCKET", "")
 THUMBNAIL_UPLOAD_MAX_WIDTH = get_int("THUMBNAIL_UPLOAD_MAX_WIDTH", 640)
 THUMBNAIL_UPLOAD_MAX_HEIGHT = get_int("THUMBNAIL_UPLOAD_MAX_HEIGHT", 360)
 THUMBNAIL_UPLOAD_MAX_SIZE = get_int("THUMBNAIL_UPLOAD_MAX_SIZE", 1024 * 1024)
+# Process uploaded thumbnails in a celery task, into the sizes below and WebP. If
+# False they're converted to a single JPEG during the request.
+THUMBNAIL_PROCESS_IN_BACKGROUND = get_bool("THUMBNAIL_PROCESS_IN_BACKGROUND", True)
+# Widths of the smaller versions of an uploaded thumbnail, which is first scaled to
+# fit THUMBNAIL_UPLOAD_MAX_WIDTH x THUMBNAIL_UPLOAD_MAX_HEIGHT
+THUMBNAIL_VARIANT_WIDTHS = [
+    int(width) for width in get_list_of_str("THUMBNAIL_VARIANT_WIDTHS", ["320", "160"])
+]
+# Quality of the WebP versions of an uploaded thumbnail
+THUMBNAIL_WEBP_QUALITY = get_int("THUMBNAIL_WEBP_QUALITY", 80)
+# Number of versions of a thumbnail uploaded to S3 at a time
+THUMBNAIL_UPLOAD_CONCURRENCY = get_int("THUMBNAIL_UPLOAD_CONCURRENCY", 4)
 VIDEO_S3_WATCH_BUCKET = get_string("VIDEO_S3_WATCH_BUCKET", "")
 
 ADWORDS_CONVERSION_ID = get_string("ADWORDS_CONVERSION_ID", "")
@@ -499,7 +576,16 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-    )
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "odl_video.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "odl_video.renderers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 # Celery
@@ -545,6 +631,75 @@ CELERY_REDIS_MAX_CONNECTIONS = REDIS_MAX_CONNECTIONS
 CELERY_BROKER_TRANSPORT_OPTIONS = {
     "visibility_timeout": CELERY_BROKER_VISIBILITY_TIMEOUT,
 }
+
+# Tasks are routed to a queue per class of work, so that multi-hour uploads and bulk
+# migrations don't hold up notification emails, edX posts and transcode bookkeeping.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = [
+    Queue(name)
+    for name in (
+        "default",
+        "uploads",
+        "transcode",
+        "integrations",
+        "notifications",
+        "bulk",
+    )
+]
+CELERY_TASK_ROUTES = {
+    "cloudsync.tasks.stream_to_s3": {"queue": "uploads"},
+    "cloudsync.tasks.monitor_watch_bucket": {"queue": "uploads"},
+    "cloudsync.tasks.transcode_from_s3": {"queue": "transcode"},
+    "cloudsync.tasks.retranscode_video": {"queue": "transcode"},
+    "cloudsync.tasks.schedule_retranscodes": {"queue": "transcode"},
+    "cloudsync.tasks.update_video_statuses": {"queue": "transcode"},
+    "cloudsync.tasks.sort_transcoded_m3u8_files": {"queue": "transcode"},
+    "cloudsync.tasks.normalize_hls_playlists": {"queue": "transcode"},
+    "cloudsync.tasks.flush_cloudfront_invalidations": {"queue": "transcode"},
+    "cloudsync.tasks.upload_youtube_videos": {"queue": "integrations"},
+    "cloudsync.tasks.remove_youtube_video": {"queue": "integrations"},
+    "cloudsync.tasks.upload_youtube_caption": {"queue": "integrations"},
+    "cloudsync.tasks.remove_youtube_caption": {"queue": "integrations"},
+    "cloudsync.tasks.update_youtube_statuses": {"queue": "integrations"},
+    "ui.tasks.post_video_to_edx": {"queue": "integrations"},
+    "ui.tasks.post_collection_videos_to_edx": {"queue": "integrations"},
+    "mail.tasks.async_send_notification_email": {"queue": "notifications"},
+    "ui.tasks.batch_update_video_on_edx": {"queue": "bulk"},
+    "ui.tasks.batch_update_video_on_edx_chunked": {"queue": "bulk"},
+    "ui.tasks.migrate_keycloak_groups_chunk": {"queue": "bulk"},
+    "ui.tasks.migrate_keycloak_users_chunk": {"queue": "bulk"},
+}
+# Worker pools, selected with CELERY_WORKER_POOL when starting a worker. A worker
+# without a pool consumes every queue, which is enough for local development.
+# Pools of long-running tasks only reserve one message per process at a time, so
+# a queued task is never stuck behind a running one on a busy process.
+CELERY_WORKER_POOLS = {
+    "uploads": {
+        "queues": ["uploads"],
+        "concurrency": get_int("CELERY_UPLOADS_CONCURRENCY", 4),
+        "prefetch_multiplier": 1,
+    },
+    "bulk": {
+        "queues": ["bulk"],
+        "concurrency": get_int("CELERY_BULK_CONCURRENCY", 2),
+        "prefetch_multiplier": 1,
+    },
+    "default": {
+        "queues": ["default", "transcode", "integrations", "notifications"],
+        "concurrency": get_int("CELERY_DEFAULT_CONCURRENCY", 8),
+        "prefetch_multiplier": get_int("CELERY_DEFAULT_PREFETCH_MULTIPLIER", 4),
+    },
+}
+CELERY_WORKER_POOL = get_string("CELERY_WORKER_POOL", "")
+if CELERY_WORKER_POOL:
+    if CELERY_WORKER_POOL not in CELERY_WORKER_POOLS:
+        raise ImproperlyConfigured(
+            f"CELERY_WORKER_POOL must be one of {', '.join(CELERY_WORKER_POOLS)}"
+        )
+    CELERY_WORKER_CONCURRENCY = CELERY_WORKER_POOLS[CELERY_WORKER_POOL]["concurrency"]
+    CELERY_WORKER_PREFETCH_MULTIPLIER = CELERY_WORKER_POOLS[CELERY_WORKER_POOL][
+        "prefetch_multiplier"
+    ]
 CELERY_BEAT_SCHEDULE = {
     "update-youtube-statuses": {
         "task": "cloudsync.tasks.update_youtube_statuses",
@@ -585,6 +740,21 @@ CACHES = {
         },
     },
 }
+# Rendered public video list responses are cached here, keyed by their query
+# parameters and a version that is bumped whenever the public catalogue changes.
+# A timeout of 0 disables the cache.
+PUBLIC_VIDEO_CACHE_ALIAS = get_string("PUBLIC_VIDEO_CACHE_ALIAS", "redis")
+PUBLIC_VIDEO_CACHE_TIMEOUT = get_int("PUBLIC_VIDEO_CACHE_TIMEOUT", 3600)
+# The video-specific parts of video detail and embed pages, and the whole pages of
+# public videos for anonymous viewers, are cached in the same backend, keyed by the
+# version of the video. A timeout of 0 disables the cache.
+VIDEO_PAGE_CACHE_TIMEOUT = get_int("VIDEO_PAGE_CACHE_TIMEOUT", 3600)
+# How long browsers and CDNs may cache the pages of public videos, in seconds
+VIDEO_PAGE_MAX_AGE = get_int("VIDEO_PAGE_MAX_AGE", 300)
+# The OVS video keys of TechTV ids, used to resolve legacy TechTV URLs. A timeout of
+# 0 disables the cache.
+TECHTV_RESOLVER_CACHE_ALIAS = get_string("TECHTV_RESOLVER_CACHE_ALIAS", "redis")
+TECHTV_RESOLVER_CACHE_TIMEOUT = get_int("TECHTV_RESOLVER_CACHE_TIMEOUT", 7 * 86400)
 
 
 # features flags
@@ -601,10 +771,20 @@ FEATURES = {
 }
 
 
+# Seconds between waves of scheduled retranscodes
+SCHEDULE_RETRANSCODE_FREQUENCY = get_int("SCHEDULE_RETRANSCODE_FREQUENCY", 600)
+# Maximum number of transcodes (uploads and retranscodes) running at once before no
+# more retranscodes are started. Uploads always start, so they take priority.
+RETRANSCODE_MAX_IN_FLIGHT = get_int("RETRANSCODE_MAX_IN_FLIGHT", 20)
+# Maximum number of retranscodes started per wave
+RETRANSCODE_WAVE_SIZE = get_int("RETRANSCODE_WAVE_SIZE", 10)
+# No retranscodes are started while this many jobs are waiting in the MediaConvert queue
+RETRANSCODE_MAX_QUEUE_DEPTH = get_int("RETRANSCODE_MAX_QUEUE_DEPTH", 10)
+
 if FEATURES.get("RETRANSCODE_ENABLED", False):
     CELERY_BEAT_SCHEDULE["schedule_retranscodes"] = {
         "task": "cloudsync.tasks.schedule_retranscodes",
-        "schedule": get_int("SCHEDULE_RETRANSCODE_FREQUENCY", 600),
+        "schedule": SCHEDULE_RETRANSCODE_FREQUENCY,
     }
 
 MIDDLEWARE_FEATURE_FLAG_QS_PREFIX = get_string(
@@ -628,6 +808,14 @@ PAGE_SIZE_QUERY_PARAM = get_string("PAGE_SIZE_QUERY_PARAM", "page_size")
 PAGE_SIZE_MAXIMUM = get_int("PAGE_SIZE_MAXIMUM", 1000)
 PAGE_SIZE_COLLECTIONS = get_int("PAGE_SIZE_COLLECTIONS", 50)
 PAGE_SIZE_VIDEOS = get_int("PAGE_SIZE_VIDEOS", 1000)
+# Rows fetched from the database at a time when a list is streamed (?stream=true)
+API_STREAM_CHUNK_SIZE = get_int("API_STREAM_CHUNK_SIZE", 100)
+# Videos read from the database at a time by the MIT Learn export feed
+PUBLIC_VIDEO_EXPORT_CHUNK_SIZE = get_int("PUBLIC_VIDEO_EXPORT_CHUNK_SIZE", 500)
+# Seconds the watermark of an export trails its start, so rows written by
+# transactions which committed after the export read the database are exported by
+# the next one. Longer than any transaction which changes a video should take.
+PUBLIC_VIDEO_EXPORT_WATERMARK_LAG = get_int("PUBLIC_VIDEO_EXPORT_WATERMARK_LAG", 300)
 
 HIJACK_ALLOW_GET_REQUESTS = True
 HIJACK_LOGOUT_REDIRECT_URL = "/admin/auth/user"
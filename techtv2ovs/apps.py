@@ -0,0 +1,14 @@
+"""
+Django App
+"""
+
+from django.apps import AppConfig
+
+
+class TechTV2OVSConfig(AppConfig):
+    """AppConfig for techtv2ovs"""
+
+    name = "techtv2ovs"
+
+    def ready(self):
+        import techtv2ovs.signals  # noqa: F401
@@ -1,8 +1,8 @@
 """Factories for techtv2ovs"""
 
-from factory import Faker, SubFactory
+from factory import Faker, Sequence, SubFactory
 from factory.django import DjangoModelFactory
-from factory.fuzzy import FuzzyInteger, FuzzyText
+from factory.fuzzy import FuzzyText
 
 from techtv2ovs.models import TechTVCollection, TechTVVideo
 from ui.factories import CollectionFactory, VideoFactory
@@ -13,7 +13,7 @@ class TechTVCollectionFactory(DjangoModelFactory):
     Factory for a TechTVCollection
     """
 
-    id = FuzzyInteger(low=1)
+    id = Sequence(lambda n: n + 1)
     name = FuzzyText(prefix="TTV Collection")
     description = Faker("text")
     owner_email = FuzzyText(suffix="@mit.edu")
@@ -28,7 +28,7 @@ class TechTVVideoFactory(DjangoModelFactory):
     Factory for a TechTVVideo
     """
 
-    ttv_id = FuzzyInteger(low=1)
+    ttv_id = Sequence(lambda n: n + 1)
     ttv_collection = SubFactory(TechTVCollectionFactory)
     title = FuzzyText(prefix="TTV Video ")
     description = Faker("text")
@@ -0,0 +1,31 @@
+"""
+Django management command for caching the OVS video keys of every TechTV id, so that
+legacy TechTV URLs are resolved without a database query.
+
+Usage:
+    python manage.py warm_techtv_resolver [--chunk-size <size>]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from techtv2ovs import resolver
+
+
+class Command(BaseCommand):
+    help = """
+    Cache the OVS video keys of every TechTV id
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="The number of keys cached at a time",
+        )
+
+    def handle(self, *args, **options):
+        if not resolver.resolver_cache_enabled():
+            raise CommandError("The TechTV resolver cache is disabled")
+        count = resolver.warm_resolver_cache(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Cached the video keys of {count} ids"))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("techtv2ovs", "0002_add_timestamps"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="techtvvideo",
+            name="ttv_id",
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name="techtvvideo",
+            index=models.Index(
+                condition=models.Q(
+                    ("private_token__isnull", False),
+                    models.Q(("private_token", ""), _negated=True),
+                ),
+                fields=["private_token"],
+                name="techtv2ovs_private_token_idx",
+            ),
+        ),
+    ]
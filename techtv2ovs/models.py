@@ -28,7 +28,7 @@ class TechTVVideo(TimestampedModel):
     A TechTV video with only the most relevant fields, and statuses to monitor migration to OVS
     """
 
-    ttv_id = IntegerField(null=False)
+    ttv_id = IntegerField(null=False, db_index=True)
     ttv_collection = models.ForeignKey(
         TechTVCollection, on_delete=models.CASCADE, null=True, blank=True
     )
@@ -59,3 +59,15 @@ class TechTVVideo(TimestampedModel):
         max_length=50,
     )
     errors = models.TextField()
+
+    class Meta:
+        indexes = [
+            # Legacy private URLs are resolved by their token. A video imported more
+            # than once shares its token with its duplicates, so it isn't unique.
+            models.Index(
+                fields=["private_token"],
+                condition=models.Q(private_token__isnull=False)
+                & ~models.Q(private_token=""),
+                name="techtv2ovs_private_token_idx",
+            ),
+        ]
@@ -0,0 +1,177 @@
+"""
+Resolution of legacy TechTV URLs to OVS videos
+
+TechTV URLs name a video by its TechTV id. The key of the OVS video for each id is
+cached, so that a legacy URL costs one cache hit (or one indexed query) before the
+video itself is loaded by its key.
+"""
+
+from uuid import UUID
+
+import structlog
+from django.conf import settings
+from django.core.cache import caches
+
+from techtv2ovs.models import TechTVVideo
+
+log = structlog.get_logger(__name__)
+
+TECHTV_VIDEO_KEY_PREFIX = "techtv:video_key"
+# TechTV ids are stored in an IntegerField
+MAX_TTV_ID = 2**31 - 1
+
+
+def _cache():
+    """Return the cache backend for TechTV id to video key mappings"""
+    return caches[settings.TECHTV_RESOLVER_CACHE_ALIAS]
+
+
+def resolver_cache_enabled():
+    """Return True if TechTV id to video key mappings should be cached"""
+    return settings.TECHTV_RESOLVER_CACHE_TIMEOUT > 0
+
+
+def ttv_cache_key(ttv_id):
+    """
+    Build the cache key of the video key for a TechTV id
+
+    Args:
+        ttv_id (int): The TechTV id
+
+    Returns:
+        str: The cache key
+    """
+    return f"{TECHTV_VIDEO_KEY_PREFIX}:{ttv_id}"
+
+
+def parse_ttv_id(value):
+    """
+    Parse the TechTV id in a legacy URL
+
+    Args:
+        value (str): The id from the URL
+
+    Returns:
+        int: The TechTV id, or None if it can't be one
+    """
+    try:
+        ttv_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return ttv_id if 0 <= ttv_id <= MAX_TTV_ID else None
+
+
+def _lookup_video_key(ttv_id):
+    """Query the key of the first video imported from a TechTV id"""
+    return (
+        TechTVVideo.objects.filter(ttv_id=ttv_id, video__isnull=False)
+        .order_by("id")
+        .values_list("video__key", flat=True)
+        .first()
+    )
+
+
+def resolve_ttv_id(value):
+    """
+    Get the key of the video imported from a TechTV id
+
+    Args:
+        value (str): The TechTV id from a legacy URL
+
+    Returns:
+        uuid.UUID: The video key, or None if no video was imported from the id
+    """
+    ttv_id = parse_ttv_id(value)
+    if ttv_id is None:
+        return None
+    if not resolver_cache_enabled():
+        return _lookup_video_key(ttv_id)
+
+    key = ttv_cache_key(ttv_id)
+    try:
+        cached = _cache().get(key)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Unable to read the TechTV resolver cache", ttv_id=ttv_id)
+        return _lookup_video_key(ttv_id)
+    if cached is not None:
+        return UUID(cached)
+
+    video_key = _lookup_video_key(ttv_id)
+    if video_key is not None:
+        try:
+            _cache().set(key, video_key.hex, settings.TECHTV_RESOLVER_CACHE_TIMEOUT)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Unable to cache a TechTV video key", ttv_id=ttv_id)
+    return video_key
+
+
+def resolve_private_token(token):
+    """
+    Get the video imported from a private TechTV video
+
+    Args:
+        token (str): The private token from a legacy URL
+
+    Returns:
+        ui.models.Video: The video, with its collection, or None
+    """
+    ttv_video = (
+        TechTVVideo.objects.filter(private_token=token, video__isnull=False)
+        .select_related("video__collection")
+        .order_by("id")
+        .first()
+    )
+    return ttv_video.video if ttv_video is not None else None
+
+
+def warm_resolver_cache(chunk_size=1000):
+    """
+    Cache the video keys of every TechTV id
+
+    Args:
+        chunk_size (int): The number of keys cached at a time
+
+    Returns:
+        int: The number of TechTV ids cached
+    """
+    rows = (
+        TechTVVideo.objects.filter(video__isnull=False)
+        .order_by("ttv_id", "id")
+        .values_list("ttv_id", "video__key")
+        .iterator(chunk_size=chunk_size)
+    )
+    count = 0
+    batch = {}
+    last_ttv_id = None
+    for ttv_id, video_key in rows:
+        # Only the first video imported from an id is resolved
+        if ttv_id == last_ttv_id:
+            continue
+        last_ttv_id = ttv_id
+        batch[ttv_cache_key(ttv_id)] = video_key.hex
+        if len(batch) >= chunk_size:
+            _cache().set_many(batch, settings.TECHTV_RESOLVER_CACHE_TIMEOUT)
+            count += len(batch)
+            batch = {}
+    if batch:
+        _cache().set_many(batch, settings.TECHTV_RESOLVER_CACHE_TIMEOUT)
+        count += len(batch)
+    return count
+
+
+def forget_ttv_ids(ttv_ids):
+    """
+    Remove the cached video keys of TechTV ids
+
+    Args:
+        ttv_ids (iterable of int): The TechTV ids
+    """
+    if not resolver_cache_enabled():
+        return
+    keys = [ttv_cache_key(ttv_id) for ttv_id in ttv_ids]
+    if not keys:
+        return
+    try:
+        _cache().delete_many(keys)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Unable to remove cached TechTV video keys", keys=keys)
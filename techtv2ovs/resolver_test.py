@@ -0,0 +1,123 @@
+"""
+Tests for the resolution of legacy TechTV URLs
+"""
+
+from io import StringIO
+from uuid import uuid4
+
+import pytest
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+
+from techtv2ovs import resolver
+from techtv2ovs.factories import TechTVVideoFactory
+from ui.factories import VideoFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def resolver_cache(settings):
+    """Enable the resolver cache, backed by the in-memory cache"""
+    settings.TECHTV_RESOLVER_CACHE_ALIAS = "default"
+    settings.TECHTV_RESOLVER_CACHE_TIMEOUT = 60
+    caches["default"].clear()
+    yield
+    caches["default"].clear()
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("123", 123),
+        ("2147483647", 2147483647),
+        ("2147483648", None),
+        ("012345678901234567890123456789012", None),
+        ("0", 0),
+        ("-1", None),
+        ("abc", None),
+    ],
+)
+def test_parse_ttv_id(value, expected):
+    """parse_ttv_id should only accept ids which can be stored"""
+    assert resolver.parse_ttv_id(value) == expected
+
+
+def test_resolve_ttv_id(django_assert_num_queries):
+    """resolve_ttv_id should return the key of the first video imported from an id"""
+    first = TechTVVideoFactory()
+    TechTVVideoFactory(ttv_id=first.ttv_id)
+    TechTVVideoFactory(ttv_id=first.ttv_id + 1, video=None)
+
+    with django_assert_num_queries(1):
+        assert resolver.resolve_ttv_id(str(first.ttv_id)) == first.video.key
+    assert resolver.resolve_ttv_id(str(first.ttv_id + 1)) is None
+    with django_assert_num_queries(0):
+        assert resolver.resolve_ttv_id("2147483648") is None
+
+
+def test_resolve_ttv_id_cached(
+    resolver_cache, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    """A resolved video key should be cached until the TechTV video changes"""
+    ttv_video = TechTVVideoFactory()
+    ttv_id = str(ttv_video.ttv_id)
+    assert resolver.resolve_ttv_id(ttv_id) == ttv_video.video.key
+    with django_assert_num_queries(0):
+        assert resolver.resolve_ttv_id(ttv_id) == ttv_video.video.key
+
+    ttv_video.video = VideoFactory()
+    with django_capture_on_commit_callbacks(execute=True):
+        ttv_video.save()
+    assert resolver.resolve_ttv_id(ttv_id) == ttv_video.video.key
+
+
+def test_resolve_ttv_id_deleted_video(
+    resolver_cache, django_capture_on_commit_callbacks
+):
+    """The cached key of a deleted video should be forgotten"""
+    ttv_video = TechTVVideoFactory()
+    ttv_id = str(ttv_video.ttv_id)
+    assert resolver.resolve_ttv_id(ttv_id) == ttv_video.video.key
+    with django_capture_on_commit_callbacks(execute=True):
+        ttv_video.video.delete()
+    assert resolver.resolve_ttv_id(ttv_id) is None
+
+
+def test_warm_resolver_cache(resolver_cache, django_assert_num_queries):
+    """warm_resolver_cache should cache the video key of every TechTV id"""
+    ttv_videos = TechTVVideoFactory.create_batch(3)
+    TechTVVideoFactory(ttv_id=ttv_videos[0].ttv_id)
+    TechTVVideoFactory(video=None)
+
+    assert resolver.warm_resolver_cache(chunk_size=2) == 3
+    with django_assert_num_queries(0):
+        for ttv_video in ttv_videos:
+            assert resolver.resolve_ttv_id(str(ttv_video.ttv_id)) == ttv_video.video.key
+
+
+def test_resolve_private_token():
+    """resolve_private_token should return the video of a private TechTV video"""
+    ttv_video = TechTVVideoFactory(private=True, private_token=uuid4().hex)
+    assert resolver.resolve_private_token(ttv_video.private_token) == ttv_video.video
+    assert resolver.resolve_private_token(uuid4().hex) is None
+
+
+def test_resolve_private_token_duplicates():
+    """A private video imported more than once should resolve to its first import"""
+    token = uuid4().hex
+    first = TechTVVideoFactory(private=True, private_token=token)
+    TechTVVideoFactory(private=True, private_token=token, ttv_id=first.ttv_id)
+    assert resolver.resolve_private_token(token) == first.video
+
+
+def test_warm_techtv_resolver_command(resolver_cache, settings):
+    """The command should warm the cache, if it's enabled"""
+    TechTVVideoFactory.create_batch(2)
+    stdout = StringIO()
+    call_command("warm_techtv_resolver", stdout=stdout)
+    assert "2 ids" in stdout.getvalue()
+
+    settings.TECHTV_RESOLVER_CACHE_TIMEOUT = 0
+    with pytest.raises(CommandError):
+        call_command("warm_techtv_resolver")
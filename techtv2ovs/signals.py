@@ -0,0 +1,32 @@
+"""
+techtv2ovs model signals
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from techtv2ovs import resolver
+from techtv2ovs.models import TechTVVideo
+from ui.models import Video
+
+
+@receiver(post_save, sender=TechTVVideo)
+@receiver(post_delete, sender=TechTVVideo)
+def forget_techtv_video(sender, instance, **kwargs):
+    """
+    Remove the cached video key of a TechTV video's id when it changes
+    """
+    transaction.on_commit(lambda: resolver.forget_ttv_ids([instance.ttv_id]))
+
+
+@receiver(pre_delete, sender=Video)
+def forget_techtv_videos_of_video(sender, instance, **kwargs):
+    """
+    Remove the cached video keys of the TechTV ids a deleted video was imported from
+    """
+    ttv_ids = list(
+        TechTVVideo.objects.filter(video=instance).values_list("ttv_id", flat=True)
+    )
+    if ttv_ids:
+        transaction.on_commit(lambda: resolver.forget_ttv_ids(ttv_ids))
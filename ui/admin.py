@@ -8,11 +8,14 @@ from urllib.parse import urljoin
 from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.contenttypes.admin import GenericTabularInline
+from django.db import transaction
+from django.db.models import Count, Sum
 from django.urls import reverse
 from django.utils.html import format_html
 
-from ui import api, models
+from ui import api, export, models
 from ui.models import EncodeJob
+from ui.utils import now_in_utc
 
 
 class ViewListsInline(admin.TabularInline):
@@ -90,7 +93,17 @@ class CollectionAdmin(admin.ModelAdmin):
             and "is_public" in form.changed_data
             and not (obj.is_public and obj.include_in_learn)
         ):
-            obj.videos.update(is_public=obj.is_public, is_private=not obj.is_public)
+            with transaction.atomic():
+                if not obj.is_public:
+                    # The bulk update below sends no post_save signals
+                    export.record_tombstones(
+                        obj.videos.filter(is_public=True).values_list("key", flat=True)
+                    )
+                obj.videos.update(
+                    is_public=obj.is_public,
+                    is_private=not obj.is_public,
+                    updated_at=now_in_utc(),
+                )
 
 
 class CollectionEdxEndpointAdmin(admin.ModelAdmin):
@@ -120,6 +133,25 @@ class VideoFilesInline(admin.TabularInline):
     readonly_fields = ["created_at"]
 
 
+class VideoRenditionsInline(admin.TabularInline):
+    """Inline model for video renditions"""
+
+    model = models.VideoRendition
+    extra = 0
+    readonly_fields = ["created_at"]
+
+
+class VideoStatusHistoryInline(admin.TabularInline):
+    """Inline model for video status transitions"""
+
+    model = models.VideoStatusTransition
+    extra = 0
+    readonly_fields = ["from_status", "to_status", "created_at"]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class VideoSubtitlesInline(admin.TabularInline):
     """Inline model for video videoSubtitles"""
 
@@ -178,6 +210,8 @@ class VideoAdmin(admin.ModelAdmin):
     inlines = [
         VideoEncodeJobsInline,
         VideoFilesInline,
+        VideoRenditionsInline,
+        VideoStatusHistoryInline,
         VideoSubtitlesInline,
         VideoThumbnailsInline,
     ]
@@ -315,6 +349,48 @@ class VideoThumbnailAdmin(admin.ModelAdmin):
     )
 
 
+class TranscodeReuseAdmin(admin.ModelAdmin):
+    """Report of the uploads and transcodes saved by reusing identical sources"""
+
+    model = models.TranscodeReuse
+    list_display = (
+        "video",
+        "reason",
+        "source",
+        "upload_bytes_saved",
+        "output_bytes_reused",
+        "transcode_seconds_saved",
+        "created_at",
+    )
+    list_filter = ("reason",)
+    list_select_related = ("video", "source")
+    date_hierarchy = "created_at"
+    search_fields = ("video__title", "source__title")
+    readonly_fields = [field.name for field in models.TranscodeReuse._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        """Add the totals of the filtered reuses to the list"""
+        response = super().changelist_view(request, extra_context=extra_context)
+        if hasattr(response, "context_data") and "cl" in response.context_data:
+            totals = response.context_data["cl"].queryset.aggregate(
+                count=Count("id"),
+                upload_bytes_saved=Sum("upload_bytes_saved"),
+                output_bytes_reused=Sum("output_bytes_reused"),
+                transcode_seconds_saved=Sum("transcode_seconds_saved"),
+            )
+            totals["transcode_minutes_saved"] = (
+                totals["transcode_seconds_saved"] or 0
+            ) / 60
+            response.context_data["totals"] = totals
+        return response
+
+
 class EncodeJobAdmin(admin.ModelAdmin):
     """EncodeJob admin"""
 
@@ -334,4 +410,5 @@ admin.site.register(models.VideoFile, VideoFileAdmin)
 admin.site.register(models.VideoThumbnail, VideoThumbnailAdmin)
 admin.site.register(models.VideoSubtitle, VideoSubtitleAdmin)
 admin.site.register(models.YouTubeVideo, YouTubeVideoAdmin)
+admin.site.register(models.TranscodeReuse, TranscodeReuseAdmin)
 admin.site.register(EncodeJob, EncodeJobAdmin)
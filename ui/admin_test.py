@@ -7,12 +7,13 @@ from django.contrib import messages
 from django.contrib.admin.sites import AdminSite
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.test import RequestFactory
+from django.urls import reverse
 
 from ui.admin import CollectionAdmin, VideoAdmin
 from ui.constants import VideoStatus
 from ui.encodings import EncodingNames
 from ui.factories import CollectionFactory, VideoFactory, VideoFileFactory
-from ui.models import Collection, Video
+from ui.models import Collection, TranscodeReuse, Video, VideoTombstone
 
 pytestmark = pytest.mark.django_db
 
@@ -86,6 +87,25 @@ def test_collection_admin_save_model_turning_off_public_still_propagates_for_lea
     assert video.is_public is False
 
 
+def test_collection_admin_save_model_records_tombstones(collection_admin, mock_request):
+    """
+    Making a collection private should record that its public videos left the
+    export feed, and mark every video as updated.
+    """
+    collection = CollectionFactory(is_public=False, include_in_learn=True)
+    public_video = VideoFactory(collection=collection, is_public=True)
+    private_video = VideoFactory(collection=collection, is_public=False)
+    updated_at = private_video.updated_at
+
+    _save_with_changed_data(collection_admin, mock_request, collection, ["is_public"])
+
+    assert list(VideoTombstone.objects.values_list("video_key", flat=True)) == [
+        public_video.key
+    ]
+    private_video.refresh_from_db()
+    assert private_video.updated_at > updated_at
+
+
 def test_collection_admin_save_model_no_change_to_is_public_skips_update(
     collection_admin, mock_request
 ):
@@ -233,3 +253,39 @@ def test_retry_upload_mixed_queryset_reports_each_category(
     assert mocked_chain.return_value.delay.call_count == 1
     # one message each for retried + skipped_status + skipped_no_source
     assert video_admin.message_user.call_count == 3
+
+
+def test_transcode_reuse_report(admin_client):
+    """The transcode reuse list should report the totals of the listed reuses"""
+    source = VideoFactory()
+    TranscodeReuse.objects.create(
+        video=VideoFactory(),
+        source=source,
+        reason=TranscodeReuse.Reason.COPIED,
+        upload_bytes_saved=1000,
+        output_bytes_reused=2000,
+        transcode_seconds_saved=90,
+    )
+    TranscodeReuse.objects.create(
+        video=source,
+        source=source,
+        reason=TranscodeReuse.Reason.UNCHANGED,
+        upload_bytes_saved=500,
+        output_bytes_reused=2000,
+        transcode_seconds_saved=90,
+    )
+    url = reverse("admin:ui_transcodereuse_changelist")
+
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    assert response.context["totals"] == {
+        "count": 2,
+        "upload_bytes_saved": 1500,
+        "output_bytes_reused": 4000,
+        "transcode_seconds_saved": 180,
+        "transcode_minutes_saved": 3,
+    }
+    assert "Transcoding minutes saved" in response.content.decode()
+
+    response = admin_client.get(url, {"reason__exact": "unchanged"})
+    assert response.context["totals"]["upload_bytes_saved"] == 500
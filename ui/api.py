@@ -11,7 +11,8 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404
 
 from cloudsync import tasks
-from ui import models
+from odl_video import outbox
+from ui import caching, models
 from ui.constants import VideoStatus
 from ui.encodings import EncodingNames
 from ui.utils import get_error_response_summary_dict
@@ -19,49 +20,88 @@ from ui.utils import get_error_response_summary_dict
 log = structlog.get_logger(__name__)
 
 
+def upload_chain(video_id):
+    """The chained stream_to_s3 → transcode_from_s3 tasks for a video."""
+    return chain(tasks.stream_to_s3.s(video_id), tasks.transcode_from_s3.si(video_id))
+
+
 def dispatch_upload_chain(video_id):
     """Kick off the chained stream_to_s3 → transcode_from_s3 tasks for a video."""
-    return chain(
-        tasks.stream_to_s3.s(video_id), tasks.transcode_from_s3.si(video_id)
-    ).delay()
+    return upload_chain(video_id).delay()
 
 
 def process_dropbox_data(dropbox_upload_data):
     """
     Takes care of processing a list of videos to be uploaded from dropbox
 
+    The videos and their original files are inserted in bulk in one transaction,
+    without the post_save signals meant for videos being edited. Once it commits a
+    single dispatch_upload_chains task sends the upload chains of the videos in
+    rate-limited chunks.
+
     Args:
         dropbox_links_list (dict): a dictionary containing the collection key and a list of dropbox links
 
     Returns:
         list: A list of dictionaries containing informations about the videos
     """
+    # ui.tasks imports this module
+    from ui.tasks import dispatch_upload_chains
+
     collection_key = dropbox_upload_data["collection"]
     dropbox_links_list = dropbox_upload_data["files"]
     collection = get_object_or_404(models.Collection, key=collection_key)
-    response_data = {}
+    title_max_length = models.Video._meta.get_field("title").max_length
+    # New videos inherit the collection's is_public value, see
+    # ui.signals.set_video_is_public_from_collection
+    is_public = collection.is_public and not collection.include_in_learn
+
+    videos, video_files = [], []
     for dropbox_link in dropbox_links_list:
-        with transaction.atomic():
-            video = models.Video.objects.create(
-                source_url=dropbox_link["link"],
-                title=dropbox_link["name"][
-                    : models.Video._meta.get_field("title").max_length
-                ],
-                collection=collection,
-            )
-            models.VideoFile.objects.create(
-                s3_object_key=video.get_s3_key(),
-                video_id=video.id,
-                bucket_name=settings.VIDEO_S3_BUCKET,
-            )
-        # Kick off chained async celery tasks to transfer file to S3, then start a transcode job
-        dispatch_upload_chain(video.id)
+        video = models.Video(
+            source_url=dropbox_link["link"],
+            title=dropbox_link["name"][:title_max_length],
+            collection=collection,
+            is_public=is_public,
+        )
+        # The keys are new random UUIDs, and the collection was just loaded
+        video.full_clean(exclude=["collection"], validate_unique=False)
+        video_file = models.VideoFile(
+            s3_object_key=video.get_s3_key(),
+            bucket_name=settings.VIDEO_S3_BUCKET,
+        )
+        video.playback_manifest = video.build_playback_manifest(
+            files=[video_file], thumbnails=[]
+        )
+        videos.append(video)
+        video_files.append(video_file)
+    if not videos:
+        return {}
+
+    with transaction.atomic():
+        models.Video.objects.bulk_create(videos)
+        for video, video_file in zip(videos, video_files):
+            video_file.video = video
+        models.VideoFile.objects.bulk_create(video_files)
+        if is_public and caching.public_video_cache_enabled():
+            transaction.on_commit(caching.bump_public_catalogue_version)
+        # Once the videos are committed, transfer each file to S3 and then start
+        # a transcode job
+        video_ids = [video.id for video in videos]
+        outbox.enqueue(
+            dispatch_upload_chains.si(video_ids),
+            dedupe_key=("upload", *video_ids),
+        )
 
-        response_data[video.hexkey] = {
-            "s3key": video.get_s3_key(),
-            "title": video.title,
-        }
-    return response_data
+    log.info(
+        "Imported videos from Dropbox",
+        collection_id=collection.id,
+        count=len(videos),
+    )
+    return {
+        video.hexkey: {"s3key": video_file.s3_object_key, "title": video.title}
+        for video, video_file in zip(videos, video_files)
+    }
 
 
 def retry_failed_upload(video):
@@ -107,6 +147,8 @@ def replace_video_from_dropbox(video_key, dropbox_file):
     the existing original VideoFile is repointed to the new S3 key so that
     stream_to_s3 writes there and retranscode_video reads the correct object.
     The old S3 object is scheduled for deletion to avoid leaving stale files.
+    Otherwise a new file identical to the original is neither uploaded nor
+    retranscoded (see cloudsync.dedupe).
 
     Args:
         video_key (UUID): The key of the existing Video to replace
@@ -115,8 +157,11 @@ def replace_video_from_dropbox(video_key, dropbox_file):
     Returns:
         dict: Basic info about the video being re-processed
     """
-    video = get_object_or_404(models.Video, key=video_key)
     with transaction.atomic():
+        # Locked, so that a worker can't move the video while it's being reset
+        video = get_object_or_404(
+            models.Video.objects.select_for_update(), key=video_key
+        )
         video.source_url = dropbox_file["link"]
         video.save(update_fields=["source_url"])
         video.update_status(VideoStatus.CREATED)
@@ -127,12 +172,20 @@ def replace_video_from_dropbox(video_key, dropbox_file):
             old_s3_key = original_vf.s3_object_key
             old_bucket = original_vf.bucket_name
             original_vf.s3_object_key = new_s3_key
-            original_vf.save(update_fields=["s3_object_key"])
+            # Nothing is at the new key yet, so the file can't be kept as unchanged
+            original_vf.content_size = None
+            original_vf.content_hash = ""
+            original_vf.save(
+                update_fields=["s3_object_key", "content_size", "content_hash"]
+            )
             # Delete the stale source object asynchronously so it doesn't linger.
-            models.delete_s3_objects.delay(old_bucket, old_s3_key)
+            outbox.enqueue(models.delete_s3_objects.si(old_bucket, old_s3_key))
 
-    # Considering Retranscode here as that will handle replacing the existing video
-    chain(tasks.stream_to_s3.s(video.id), tasks.retranscode_video.si(video.id)).delay()
+        # Considering Retranscode here as that will handle replacing the existing video
+        outbox.enqueue(
+            chain(tasks.stream_to_s3.s(video.id), tasks.retranscode_video.si(video.id)),
+            dedupe_key=("upload", video.id),
+        )
     return {"key": video.hexkey, "title": video.title}
 
 
@@ -150,11 +203,17 @@ def post_video_to_edx(video_files):
     encoded_videos = []
     for video_file in video_files:
         assert video_file.can_add_to_edx, "This video file cannot be added to edX"
+        # Report the highest quality rendition, as recorded when transcoding completed
+        rendition = (
+            video_file.video.videorendition_set.filter(encoding=video_file.encoding)
+            .order_by("-bandwidth")
+            .first()
+        )
         encoded_videos.append(
             {
                 "url": video_file.cloudfront_url,
-                "file_size": 0,
-                "bitrate": 0,
+                "file_size": (rendition and rendition.byte_size) or 0,
+                "bitrate": ((rendition and rendition.bandwidth) or 0) // 1000,
                 "profile": video_file.encoding.lower(),
             }
         )
@@ -255,26 +314,3 @@ def update_video_on_edx(video_key, encoded_videos=None):
             resp = exc.response
         responses[video_partial_update_url] = resp
     return responses
-
-
-def get_duration_from_encode_job(encode_job):
-    """
-    Get video's duration from EncodeJob
-
-    Args:
-        encode_job: EncodeJob object
-    Returns:
-        duration: float
-    """
-    duration = 0.0
-    if encode_job and (output_groups := encode_job.get("outputGroupDetails", [])):
-        # Get the first output group
-        output_group = output_groups[0]
-        if outputs := output_group.get("outputDetails", []):
-            # Get the first output
-            output = outputs[0]
-            duration_in_ms = output.get("durationInMs", 0)
-            # Convert milliseconds to seconds
-            duration = duration_in_ms / 1000.0
-
-    return duration
@@ -8,8 +8,10 @@ from uuid import uuid4
 import factory
 import pytest
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.db.models import signals
 from django.http import Http404
+from django.test.utils import CaptureQueriesContext
 
 from odl_video.test_utils import any_instance_of
 from ui import api, models
@@ -20,6 +22,7 @@ from ui.factories import (
     CollectionFactory,
     VideoFactory,
     VideoFileFactory,
+    VideoRenditionFactory,
 )
 
 pytestmark = pytest.mark.django_db
@@ -51,7 +54,7 @@ def edx_api_scenario():
     )
 
 
-def test_process_dropbox_data_happy_path(mocker):
+def test_process_dropbox_data_happy_path(mocker, django_capture_on_commit_callbacks):
     """
     Tests that the process_dropbox_data in case everything is fine
     """
@@ -63,7 +66,7 @@ def test_process_dropbox_data_happy_path(mocker):
     input_data = {
         "collection": collection.hexkey,
         "files": [
-            {"name": name, "link": f"http://example.com/{name}"}
+            {"name": name, "link": f"http://example.com/{name}.mp4"}
             for name in (
                 "foo",
                 "bar",
@@ -71,7 +74,8 @@ def test_process_dropbox_data_happy_path(mocker):
         ],
     }
 
-    results = api.process_dropbox_data(input_data)
+    with django_capture_on_commit_callbacks(execute=True):
+        results = api.process_dropbox_data(input_data)
     assert len(results) == 2
     assert mocked_chain.call_count == 2
     for key, data in results.items():
@@ -82,6 +86,8 @@ def test_process_dropbox_data_happy_path(mocker):
         assert video.collection == collection
         assert video.title == data["title"]
         assert video.get_s3_key() == data["s3key"]
+        assert video.original_video.s3_object_key == data["s3key"]
+        assert video.playback_manifest == video.build_playback_manifest()
         # checking that the functions in the chain have been called
         mocked_stream_to_s3.s.assert_any_call(video.id)
         mocked_transcode_from_s3.si.assert_any_call(video.id)
@@ -90,6 +96,66 @@ def test_process_dropbox_data_happy_path(mocker):
         )
 
 
+@pytest.mark.parametrize(
+    "is_public, include_in_learn, expected",
+    [(True, False, True), (True, True, False), (False, False, False)],
+)
+def test_process_dropbox_data_is_public(mocker, is_public, include_in_learn, expected):
+    """New videos should inherit the collection's is_public value, like they do
+    when created one at a time"""
+    mocker.patch("ui.api.chain")
+    collection = CollectionFactory(
+        is_public=is_public, include_in_learn=include_in_learn
+    )
+    results = api.process_dropbox_data(
+        {
+            "collection": collection.hexkey,
+            "files": [{"name": "foo", "link": "http://example.com/foo.mp4"}],
+        }
+    )
+    video = models.Video.objects.get(key=next(iter(results)))
+    assert video.is_public is expected
+
+
+def test_process_dropbox_data_queries(mocker):
+    """The number of queries shouldn't depend on the number of files"""
+    mocker.patch("ui.api.chain")
+    collection = CollectionFactory()
+    query_counts = []
+    for count in (1, 10):
+        with CaptureQueriesContext(connection) as queries:
+            api.process_dropbox_data(
+                {
+                    "collection": collection.hexkey,
+                    "files": [
+                        {"name": f"file {i}", "link": f"http://example.com/{i}.mp4"}
+                        for i in range(count)
+                    ],
+                }
+            )
+        query_counts.append(len(queries))
+    assert query_counts[0] == query_counts[1]
+    assert models.Video.objects.filter(collection=collection).count() == 11
+
+
+def test_process_dropbox_data_invalid_link(mocker):
+    """No video should be created if any of the files is invalid"""
+    mocked_chain = mocker.patch("ui.api.chain")
+    collection = CollectionFactory()
+    with pytest.raises(ValidationError):
+        api.process_dropbox_data(
+            {
+                "collection": collection.hexkey,
+                "files": [
+                    {"name": "foo", "link": "http://example.com/foo.mp4"},
+                    {"name": "bar", "link": "not a link"},
+                ],
+            }
+        )
+    assert not models.Video.objects.exists()
+    assert mocked_chain.call_count == 0
+
+
 def test_process_dropbox_data_empty_link_list(mocker):
     """
     Tests that the process_dropbox_data in case the collection does not exist
@@ -161,7 +227,9 @@ def test_replace_video_from_dropbox(mocker):
     mocked_retranscode.si.assert_called_once_with(video.id)
 
 
-def test_replace_video_from_dropbox_different_extension(mocker):
+def test_replace_video_from_dropbox_different_extension(
+    mocker, django_capture_on_commit_callbacks
+):
     """
     When the replacement file has a different extension from the original
     (e.g. .mp4 → .m4v), replace_video_from_dropbox must:
@@ -181,6 +249,8 @@ def test_replace_video_from_dropbox_different_extension(mocker):
         video=video,
         s3_object_key=video.get_s3_key(),
         encoding=EncodingNames.ORIGINAL,
+        content_size=100,
+        content_hash="a" * 64,
     )
     old_s3_key = original_vf.s3_object_key
     assert old_s3_key.endswith(".mp4")
@@ -195,7 +265,8 @@ def test_replace_video_from_dropbox_different_extension(mocker):
         "icon": "https://dropbox.example.com/icon.png",
     }
 
-    api.replace_video_from_dropbox(video.key, dropbox_file)
+    with django_capture_on_commit_callbacks(execute=True):
+        api.replace_video_from_dropbox(video.key, dropbox_file)
 
     video.refresh_from_db()
     original_vf.refresh_from_db()
@@ -207,9 +278,13 @@ def test_replace_video_from_dropbox_different_extension(mocker):
     expected_new_key = video.get_s3_key()
     assert expected_new_key.endswith(".m4v")
     assert original_vf.s3_object_key == expected_new_key
+    # Nothing was uploaded to the new key, so it can't be kept as unchanged
+    assert original_vf.content_size is None
+    assert original_vf.content_hash == ""
 
     # The stale old object must be queued for deletion.
-    mock_delete.delay.assert_called_once_with(original_vf.bucket_name, old_s3_key)
+    mock_delete.si.assert_called_once_with(original_vf.bucket_name, old_s3_key)
+    mock_delete.si.return_value.apply_async.assert_called_once()
 
 
 def test_replace_video_from_dropbox_same_extension_no_delete(mocker):
@@ -305,6 +380,32 @@ def test_post_video_to_edx(mocker, reqmocker, edx_api_scenario):
         assert len(request_body["edx_video_id"]) == 36
 
 
+def test_post_video_to_edx_renditions(mocker, reqmocker, edx_api_scenario):
+    """
+    post_video_to_edx should report the size and bitrate of the highest quality
+    rendition of each encoding
+    """
+    video = edx_api_scenario.video_file_hls.video
+    VideoRenditionFactory(video=video, bandwidth=1200000, byte_size=1000)
+    VideoRenditionFactory(video=video, bandwidth=4881000, byte_size=5000)
+    mocked_post = reqmocker.register_uri(
+        "POST",
+        edx_api_scenario.collection_endpoint.full_api_url,
+        status_code=200,
+    )
+    mocker.patch("ui.models.EdxEndpoint.refresh_access_token")
+
+    api.post_video_to_edx(
+        [edx_api_scenario.video_file_hls, edx_api_scenario.video_file_mp4]
+    )
+
+    encoded_videos = mocked_post.last_request.json()["encoded_videos"]
+    assert [
+        (encoded["profile"], encoded["file_size"], encoded["bitrate"])
+        for encoded in encoded_videos
+    ] == [("hls", 5000, 4881), ("desktop_mp4", 0, 0)]
+
+
 def test_post_same_video_to_edx(mocker, reqmocker, edx_api_scenario):
     """
     post_video_to_edx should make update request if the video is already posted to edX
@@ -494,30 +595,6 @@ def test_update_video_on_edx_bad_response(mocker, reqmocker, edx_api_scenario):
     assert next(iter(response.values())).ok is False
 
 
-def test_get_duration_from_encode_job():
-    """
-    get_duration_from_encode_job should return duration from video's encode_jobs message body
-    """
-    encode_job = {
-        "id": "1711563064503-e5qdnh",
-        "outputGroupDetails": [
-            {
-                "outputDetails": [
-                    {
-                        "durationInMs": 10000.0,
-                    }
-                ]
-            }
-        ],
-    }
-    duration = api.get_duration_from_encode_job(encode_job)
-    assert duration == 10.0
-
-    encode_job = {}
-    duration = api.get_duration_from_encode_job(encode_job)
-    assert duration == 0.0
-
-
 def test_retry_failed_upload_dispatches(mocker):
     """An eligible UPLOAD_FAILED video is reset to CREATED and re-queued."""
     mocked_chain = mocker.patch("ui.api.chain")
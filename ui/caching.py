@@ -0,0 +1,217 @@
+"""
+Versioned cache of rendered public video list responses
+"""
+
+import hashlib
+import json
+from urllib.parse import urlencode
+
+import structlog
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import http_date
+
+from ui.utils import now_in_utc
+
+log = structlog.get_logger(__name__)
+
+PUBLIC_CATALOGUE_VERSION_KEY = "public_videos:version"
+PUBLIC_CATALOGUE_MODIFIED_KEY = "public_videos:modified"
+PUBLIC_VIDEO_LIST_KEY_PREFIX = "public_videos:list"
+VIDEO_PAGE_KEY_PREFIX = "video_page"
+
+
+def _cache():
+    """Return the cache backend for public video list responses"""
+    return caches[settings.PUBLIC_VIDEO_CACHE_ALIAS]
+
+
+def public_video_cache_enabled():
+    """Return True if public video list responses should be cached"""
+    return settings.PUBLIC_VIDEO_CACHE_TIMEOUT > 0
+
+
+def get_public_catalogue_version():
+    """
+    Get the current version of the public catalogue, and the time it last changed
+
+    Returns:
+        tuple of (int, str): The version and its HTTP date
+    """
+    cache = _cache()
+    values = cache.get_many(
+        [PUBLIC_CATALOGUE_VERSION_KEY, PUBLIC_CATALOGUE_MODIFIED_KEY]
+    )
+    if PUBLIC_CATALOGUE_VERSION_KEY not in values:
+        # Start from the current time so a version evicted from the cache doesn't
+        # come back and match responses cached before the eviction
+        version = int(now_in_utc().timestamp() * 1000)
+        if not cache.add(PUBLIC_CATALOGUE_VERSION_KEY, version, None):
+            version = cache.get(PUBLIC_CATALOGUE_VERSION_KEY, version)
+        values[PUBLIC_CATALOGUE_VERSION_KEY] = version
+    modified = values.get(PUBLIC_CATALOGUE_MODIFIED_KEY)
+    if modified is None:
+        modified = http_date()
+        cache.add(PUBLIC_CATALOGUE_MODIFIED_KEY, modified, None)
+    return values[PUBLIC_CATALOGUE_VERSION_KEY], modified
+
+
+def bump_public_catalogue_version():
+    """
+    Invalidate every cached public video list response
+    """
+    if not public_video_cache_enabled():
+        return
+    cache = _cache()
+    try:
+        try:
+            cache.incr(PUBLIC_CATALOGUE_VERSION_KEY)
+        except ValueError:
+            # No version yet; the next read starts one from the current time
+            pass
+        cache.set(PUBLIC_CATALOGUE_MODIFIED_KEY, http_date(), None)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Unable to bump the public video catalogue version")
+
+
+def public_video_list_cache_key(query_params, media_type, version):
+    """
+    Build the cache key of a public video list response
+
+    Args:
+        query_params (django.http.QueryDict): The request's query parameters
+        media_type (str): The negotiated media type, including parameters like indent
+        version (int): The public catalogue version
+
+    Returns:
+        str: The cache key
+    """
+    normalized = urlencode(
+        sorted(
+            (name, value)
+            for name in query_params
+            for value in query_params.getlist(name)
+            if value != ""
+        )
+    )
+    digest = hashlib.sha256(f"{media_type}\n{normalized}".encode()).hexdigest()
+    return f"{PUBLIC_VIDEO_LIST_KEY_PREFIX}:{version}:{digest}"
+
+
+def get_cached_response(key):
+    """
+    Get a cached public video list response
+
+    Args:
+        key (str): The cache key
+
+    Returns:
+        dict: The response content, ETag and Last-Modified date, or None
+    """
+    return _cache().get(key)
+
+
+def set_cached_response(key, content, last_modified):
+    """
+    Cache a rendered public video list response
+
+    Args:
+        key (str): The cache key
+        content (bytes): The rendered response
+        last_modified (str): The HTTP date the public catalogue last changed
+
+    Returns:
+        dict: The response content, ETag and Last-Modified date
+    """
+    entry = {
+        "content": content,
+        "etag": content_etag(content),
+        "last_modified": last_modified,
+    }
+    try:
+        _cache().set(key, entry, settings.PUBLIC_VIDEO_CACHE_TIMEOUT)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Unable to cache a public video list response", key=key)
+    return entry
+
+
+def video_page_cache_enabled():
+    """Return True if video detail and embed pages should be cached"""
+    return settings.VIDEO_PAGE_CACHE_TIMEOUT > 0
+
+
+def video_page_version(video):
+    """
+    Get the version of what a video page shows about a video. It changes whenever
+    the video, its collection or its playback manifest changes. Saving or deleting
+    a file, thumbnail, subtitle or YouTube upload of the video changes the video's
+    updated_at (see ui.signals).
+
+    Args:
+        video (ui.models.Video): The video, with its collection
+
+    Returns:
+        str: The version
+    """
+    manifest = json.dumps(video.manifest, sort_keys=True, default=str)
+    version = (
+        f"{video.updated_at.isoformat()}|{video.collection.updated_at.isoformat()}|"
+        f"{manifest}"
+    )
+    return hashlib.sha256(version.encode("utf-8")).hexdigest()[:32]
+
+
+def video_page_cache_key(page, video, tier):
+    """
+    Build the cache key of a video page, or of its video-specific settings
+
+    Args:
+        page (str): The name of the page
+        video (ui.models.Video): The video, with its collection
+        tier (str): The ViewerTier of the viewer
+
+    Returns:
+        str: The cache key
+    """
+    return (
+        f"{VIDEO_PAGE_KEY_PREFIX}:{page}:{video.hexkey}:"
+        f"{video_page_version(video)}:{tier}"
+    )
+
+
+def get_or_build_video_page(key, build):
+    """
+    Get a cached value of a video page, building and caching it first if needed
+
+    Args:
+        key (str): The cache key
+        build (callable): A function which returns the value
+
+    Returns:
+        The value
+    """
+    try:
+        value = _cache().get(key)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Unable to read the video page cache", key=key)
+        return build()
+    if value is None:
+        value = build()
+        try:
+            _cache().set(key, value, settings.VIDEO_PAGE_CACHE_TIMEOUT)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Unable to cache a video page", key=key)
+    return value
+
+
+def content_etag(content):
+    """
+    Build the ETag of response content
+
+    Args:
+        content (bytes): The content
+
+    Returns:
+        str: The quoted ETag
+    """
+    return f'"{hashlib.sha256(content).hexdigest()}"'
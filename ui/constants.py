@@ -32,6 +32,65 @@ class VideoStatus:
         ERROR,
     ]
 
+    # Statuses a video may move to from each status. Any video may also be reset to
+    # CREATED (when its source is replaced) or UPLOADING (when its upload chain is
+    # re-dispatched), and a throttled retranscode returns to the status it had before
+    # it was scheduled. An upload whose source was already transcoded completes
+    # without transcoding, and a failed transcode may be retried, reused or fail again.
+    TRANSITIONS = {
+        CREATED: {
+            UPLOAD_FAILED,
+            TRANSCODING,
+            COMPLETE,
+            TRANSCODE_FAILED_INTERNAL,
+            RETRANSCODE_SCHEDULED,
+        },
+        UPLOADING: {
+            UPLOAD_FAILED,
+            TRANSCODING,
+            COMPLETE,
+            TRANSCODE_FAILED_INTERNAL,
+            RETRANSCODE_SCHEDULED,
+        },
+        UPLOAD_FAILED: {RETRANSCODE_SCHEDULED},
+        TRANSCODING: {
+            COMPLETE,
+            TRANSCODE_FAILED_INTERNAL,
+            TRANSCODE_FAILED_VIDEO,
+            RETRANSCODE_SCHEDULED,
+        },
+        TRANSCODE_FAILED_INTERNAL: {TRANSCODING, COMPLETE, RETRANSCODE_SCHEDULED},
+        TRANSCODE_FAILED_VIDEO: {
+            TRANSCODING,
+            TRANSCODE_FAILED_INTERNAL,
+            COMPLETE,
+            RETRANSCODE_SCHEDULED,
+        },
+        RETRANSCODE_SCHEDULED: {
+            RETRANSCODING,
+            RETRANSCODE_FAILED,
+            UPLOAD_FAILED,
+            TRANSCODING,
+            TRANSCODE_FAILED_INTERNAL,
+            TRANSCODE_FAILED_VIDEO,
+            COMPLETE,
+            ERROR,
+        },
+        RETRANSCODING: {COMPLETE, RETRANSCODE_FAILED},
+        RETRANSCODE_FAILED: {RETRANSCODE_SCHEDULED},
+        COMPLETE: {RETRANSCODE_SCHEDULED},
+        ERROR: {RETRANSCODE_SCHEDULED},
+    }
+
+    @classmethod
+    def can_transition(cls, from_status, to_status):
+        """
+        Returns True if a video may move from one status to another
+        """
+        return to_status in (cls.CREATED, cls.UPLOADING) or (
+            to_status in cls.TRANSITIONS.get(from_status, ())
+        )
+
 
 class YouTubeStatus:
     """Simple class for YouTube statuses"""
@@ -46,6 +105,14 @@ class YouTubeStatus:
     RETRY = "retry"
 
 
+class ViewerTier:
+    """Kinds of viewers of a video page, which are shown different content"""
+
+    ANONYMOUS = "anonymous"
+    USER = "user"
+    ADMIN = "admin"
+
+
 class StreamSource:
     """Simple class for public collection streaming sources"""
 
@@ -7,3 +7,11 @@ class GoogleAnalyticsException(Exception):
 
 class KeycloakException(Exception):
     """Custom exception to be used when something goes wrong with Keycloak API calls"""
+
+
+class InvalidStatusTransition(Exception):
+    """Custom exception to be used when a video status change isn't allowed"""
+
+
+class StatusConflict(Exception):
+    """Custom exception to be used when a video's status was changed concurrently"""
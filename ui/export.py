@@ -0,0 +1,185 @@
+"""
+Bulk export of the videos included in MIT Learn as NDJSON
+
+The export is one JSON object per line:
+
+    {"type": "video", "video": {...}}
+        A video in the feed, with the payload of the public video list API
+    {"type": "tombstone", "key": "...", "deleted_at": "..."}
+        A video which left the feed since updated_since
+    {"type": "end", "count": 123, "watermark": "..."}
+        The last line of a complete export. The watermark is the updated_since
+        of the next incremental export.
+
+updated_at and deleted_at are set by the application before a transaction
+commits, so a change committed after the export read the database can be older
+than the export. The watermark trails the start of the export by
+PUBLIC_VIDEO_EXPORT_WATERMARK_LAG seconds for the next export to pick such changes
+up. Exports therefore overlap: a consumer receives some videos and tombstones
+again, and should apply them idempotently.
+
+An incremental export (with updated_since) has the videos which changed since
+then: the video itself, its collection, or any of the files, thumbnails,
+subtitles or renditions embedded in its payload. A video whose embedded rows were
+deleted is exported again with what's left of them. Tombstones can name videos a
+consumer never received, which it should ignore.
+"""
+
+import operator
+from datetime import UTC, timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from odl_video.json_backend import dumps
+from ui.models import (
+    Video,
+    VideoFile,
+    VideoRendition,
+    VideoSubtitle,
+    VideoThumbnail,
+    VideoTombstone,
+)
+from ui.projections import PublicVideoProjection, format_datetime
+from ui.utils import now_in_utc
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def parse_updated_since(value):
+    """
+    Parse the updated_since of an incremental export
+
+    Args:
+        value (str): An ISO 8601 datetime, assumed to be UTC if it has no timezone
+
+    Returns:
+        datetime.datetime: The aware datetime
+
+    Raises:
+        ValueError: If the value isn't a datetime
+    """
+    updated_since = parse_datetime(value)
+    if updated_since is None:
+        raise ValueError(f"Invalid updated_since {value!r}")
+    if timezone.is_naive(updated_since):
+        updated_since = timezone.make_aware(updated_since, UTC)
+    return updated_since
+
+
+def exported_videos():
+    """
+    The videos included in the export feed
+
+    Returns:
+        django.db.models.query.QuerySet: Public videos of the collections in MIT Learn
+    """
+    return Video.objects.filter(is_public=True, collection__include_in_learn=True)
+
+
+def changed_videos(updated_since):
+    """
+    The exported videos which changed since a time
+
+    Args:
+        updated_since (datetime.datetime): The time, or None for every video
+
+    Returns:
+        django.db.models.query.QuerySet: The videos, ordered by id
+    """
+    queryset = exported_videos()
+    if updated_since is not None:
+        changes = [
+            Q(updated_at__gt=updated_since),
+            Q(collection__updated_at__gt=updated_since),
+        ] + [
+            Exists(
+                model.objects.filter(
+                    video_id=OuterRef("id"), updated_at__gt=updated_since
+                )
+            )
+            for model in (VideoFile, VideoThumbnail, VideoSubtitle, VideoRendition)
+        ]
+        queryset = queryset.filter(reduce(operator.or_, changes))
+    return queryset.order_by("id")
+
+
+def tombstones(updated_since):
+    """
+    The videos which left the export feed since a time, and are still out of it
+
+    Args:
+        updated_since (datetime.datetime): The time, or None for every removal
+
+    Returns:
+        django.db.models.query.QuerySet: video_key and deleted_at values of the last
+            removal of each video
+    """
+    queryset = VideoTombstone.objects.exclude(
+        video_key__in=exported_videos().values("key")
+    )
+    if updated_since is not None:
+        queryset = queryset.filter(deleted_at__gt=updated_since)
+    return queryset.order_by("video_key", "-deleted_at").values(
+        "video_key", "deleted_at"
+    )
+
+
+def export_videos(updated_since=None, chunk_size=None):
+    """
+    Export the videos of the feed as NDJSON
+
+    Args:
+        updated_since (datetime.datetime): Only export what changed since this time
+        chunk_size (int): The number of videos read from the database at a time
+
+    Yields:
+        bytes: Lines of NDJSON
+    """
+    # Rows changed by transactions still running may be exported by the next one
+    watermark = now_in_utc() - timedelta(
+        seconds=settings.PUBLIC_VIDEO_EXPORT_WATERMARK_LAG
+    )
+    chunk_size = chunk_size or settings.PUBLIC_VIDEO_EXPORT_CHUNK_SIZE
+    count = 0
+    projection = PublicVideoProjection()
+    for payload in projection.iterate(changed_videos(updated_since), chunk_size):
+        yield dumps({"type": "video", "video": payload}) + b"\n"
+        count += 1
+
+    last_key = None
+    for tombstone in tombstones(updated_since).iterator(chunk_size=chunk_size):
+        if tombstone["video_key"] == last_key:
+            continue
+        last_key = tombstone["video_key"]
+        yield (
+            dumps(
+                {
+                    "type": "tombstone",
+                    "key": last_key.hex,
+                    "deleted_at": format_datetime(tombstone["deleted_at"]),
+                }
+            )
+            + b"\n"
+        )
+        count += 1
+
+    yield (
+        dumps({"type": "end", "count": count, "watermark": format_datetime(watermark)})
+        + b"\n"
+    )
+
+
+def record_tombstones(video_keys):
+    """
+    Record that videos left the export feed
+
+    Args:
+        video_keys (iterable of uuid.UUID): The keys of the videos
+    """
+    VideoTombstone.objects.bulk_create(
+        VideoTombstone(video_key=video_key) for video_key in video_keys
+    )
@@ -0,0 +1,241 @@
+"""
+Tests for the MIT Learn export feed
+"""
+
+import json
+from datetime import UTC, datetime, timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from ui import export
+from ui.factories import (
+    CollectionFactory,
+    VideoFactory,
+    VideoRenditionFactory,
+    VideoSubtitleFactory,
+)
+from ui.models import (
+    Collection,
+    Video,
+    VideoRendition,
+    VideoSubtitle,
+    VideoTombstone,
+)
+from ui.projections import PublicVideoProjection, format_datetime
+
+pytestmark = pytest.mark.django_db
+
+LAST_EXPORT = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def _export(updated_since=None, chunk_size=2):
+    """Run an export and parse its lines"""
+    return [
+        json.loads(line) for line in export.export_videos(updated_since, chunk_size)
+    ]
+
+
+def _keys(lines, line_type):
+    """The keys of the videos or tombstones of an export"""
+    if line_type == "video":
+        return {line["video"]["key"] for line in lines if line["type"] == "video"}
+    return {line["key"] for line in lines if line["type"] == line_type}
+
+
+@pytest.fixture
+def learn_collection():
+    """A collection included in MIT Learn"""
+    return CollectionFactory(include_in_learn=True)
+
+
+@pytest.fixture
+def exported(learn_collection):
+    """Videos exported before LAST_EXPORT, as if nothing changed since"""
+    videos = VideoFactory.create_batch(3, collection=learn_collection, is_public=True)
+    VideoSubtitleFactory(video=videos[0])
+    VideoRenditionFactory(video=videos[1])
+    for video in videos:
+        video.refresh_playback_manifest()
+    before = LAST_EXPORT - timedelta(days=1)
+    for model in (Video, Collection, VideoSubtitle, VideoRendition):
+        model.objects.update(updated_at=before)
+    return videos
+
+
+def test_export(learn_collection, mocker, settings):
+    """A full export should have every public video of the collections in MIT Learn,
+    with a watermark trailing its start"""
+    settings.PUBLIC_VIDEO_EXPORT_WATERMARK_LAG = 60
+    mocker.patch(
+        "ui.export.now_in_utc", return_value=LAST_EXPORT + timedelta(seconds=60)
+    )
+    videos = VideoFactory.create_batch(3, collection=learn_collection, is_public=True)
+    VideoFactory(collection=learn_collection, is_public=False)
+    VideoFactory(collection=CollectionFactory(include_in_learn=False), is_public=True)
+
+    lines = _export()
+    assert lines[:-1] == [
+        {"type": "video", "video": payload}
+        for payload in PublicVideoProjection().project(
+            Video.objects.filter(id__in=[video.id for video in videos]).order_by("id")
+        )
+    ]
+    assert lines[-1] == {
+        "type": "end",
+        "count": 3,
+        "watermark": format_datetime(LAST_EXPORT),
+    }
+
+
+def test_export_unchanged(exported):
+    """An incremental export should be empty if nothing changed"""
+    assert _export(LAST_EXPORT)[:-1] == []
+
+
+def test_export_changed(exported, learn_collection):
+    """An incremental export should have the videos which changed, or whose
+    collection or embedded rows changed"""
+    changed, with_subtitle, other = exported
+    changed.title = "New title"
+    changed.save()
+    VideoSubtitleFactory(video=with_subtitle, language="fr")
+    assert _keys(_export(LAST_EXPORT), "video") == {
+        changed.hexkey,
+        with_subtitle.hexkey,
+    }
+
+    learn_collection.title = "New collection title"
+    learn_collection.save()
+    assert _keys(_export(LAST_EXPORT), "video") == {
+        video.hexkey for video in (changed, with_subtitle, other)
+    }
+
+
+def test_export_deleted_rows(mocker, exported):
+    """A video should be exported again when one of its embedded rows is deleted"""
+    mocker.patch("ui.models.VideoSubtitle.delete_from_s3")
+    with_subtitle, with_rendition, _ = exported
+    with_subtitle.videosubtitle_set.get().delete()
+    with_rendition.videorendition_set.get().delete()
+
+    lines = _export(LAST_EXPORT)
+    assert _keys(lines, "video") == {with_subtitle.hexkey, with_rendition.hexkey}
+    assert _keys(lines, "tombstone") == set()
+
+
+def test_export_tombstones(exported, learn_collection, settings):
+    """Videos which left the feed should be exported as tombstones"""
+    settings.PUBLIC_VIDEO_EXPORT_WATERMARK_LAG = 0
+    deleted, unpublished, moved = exported
+    deleted.delete()
+    unpublished.is_public = False
+    unpublished.save()
+    moved.collection = CollectionFactory(include_in_learn=False)
+    moved.save()
+
+    lines = _export(LAST_EXPORT)
+    assert _keys(lines, "tombstone") == {
+        video.hexkey for video in (deleted, unpublished, moved)
+    }
+    assert _keys(lines, "video") == set()
+    assert lines[-1]["count"] == 3
+    # Older tombstones aren't exported again
+    watermark = export.parse_updated_since(lines[-1]["watermark"])
+    assert _export(watermark)[:-1] == []
+
+
+def test_export_late_commit(exported, mocker, settings):
+    """A change committed after an export read the database, but dated before the
+    export started, should be in the next incremental export"""
+    settings.PUBLIC_VIDEO_EXPORT_WATERMARK_LAG = 60
+    late, _, _ = exported
+    started = LAST_EXPORT + timedelta(minutes=10)
+    mocker.patch("ui.export.now_in_utc", return_value=started)
+    watermark = export.parse_updated_since(_export(LAST_EXPORT)[-1]["watermark"])
+
+    # Written by a transaction which began before the export and committed after it
+    Video.objects.filter(id=late.id).update(updated_at=started - timedelta(seconds=30))
+    assert _keys(_export(watermark), "video") == {late.hexkey}
+
+
+def test_export_collection_tombstones(exported, learn_collection):
+    """The videos of a collection removed from MIT Learn should be tombstones"""
+    learn_collection.include_in_learn = False
+    learn_collection.save()
+    assert _keys(_export(LAST_EXPORT), "tombstone") == {
+        video.hexkey for video in exported
+    }
+
+
+def test_export_republished(exported):
+    """A video back in the feed should be exported, once, without a tombstone"""
+    video = exported[0]
+    for is_public in (False, True, False, True):
+        video.is_public = is_public
+        video.save()
+
+    lines = _export(LAST_EXPORT)
+    assert _keys(lines, "tombstone") == set()
+    assert [line["video"]["key"] for line in lines[:-1]] == [video.hexkey]
+
+
+def test_export_tombstone_once(exported):
+    """A video which left the feed several times should have one tombstone"""
+    video = exported[0]
+    for is_public in (False, True, False):
+        video.is_public = is_public
+        video.save()
+
+    lines = _export(LAST_EXPORT)
+    assert lines[:-1] == [
+        {
+            "type": "tombstone",
+            "key": video.hexkey,
+            "deleted_at": format_datetime(
+                VideoTombstone.objects.latest("deleted_at").deleted_at
+            ),
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2024-05-06T07:08:09.123456Z", datetime(2024, 5, 6, 7, 8, 9, 123456, UTC)),
+        ("2024-05-06T09:08:09+02:00", datetime(2024, 5, 6, 7, 8, 9, tzinfo=UTC)),
+        ("2024-05-06 07:08:09", datetime(2024, 5, 6, 7, 8, 9, tzinfo=UTC)),
+    ],
+)
+def test_parse_updated_since(value, expected):
+    """parse_updated_since should parse ISO 8601 datetimes, as UTC by default"""
+    assert export.parse_updated_since(value) == expected
+
+
+@pytest.mark.parametrize("value", ["yesterday", "2024-13-01T00:00:00"])
+def test_parse_updated_since_invalid(value):
+    """parse_updated_since should raise a ValueError for anything but a datetime"""
+    with pytest.raises(ValueError):
+        export.parse_updated_since(value)
+
+
+def test_export_command(tmp_path, exported):
+    """The command should write the export to a file or standard output"""
+    output = tmp_path / "videos.ndjson"
+    call_command("export_public_videos", output=str(output), stderr=StringIO())
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert _keys(lines, "video") == {video.hexkey for video in exported}
+
+    stdout = StringIO()
+    call_command(
+        "export_public_videos",
+        updated_since=format_datetime(LAST_EXPORT),
+        stdout=stdout,
+    )
+    assert [json.loads(line)["type"] for line in stdout.getvalue().splitlines()] == [
+        "end"
+    ]
+
+    with pytest.raises(CommandError):
+        call_command("export_public_videos", updated_since="yesterday")
@@ -10,6 +10,7 @@ from django.contrib.contenttypes.models import ContentType
 from factory import (
     Faker,
     LazyAttribute,
+    LazyAttributeSequence,
     LazyFunction,
     Sequence,
     SubFactory,
@@ -142,6 +143,27 @@ class VideoFileFactory(DjangoModelFactory):
         hls = Trait(encoding=EncodingNames.HLS)
 
 
+class VideoRenditionFactory(DjangoModelFactory):
+    """
+    Factory for a VideoRendition
+    """
+
+    video = SubFactory(VideoFactory)
+    encoding = EncodingNames.HLS
+    s3_object_key = LazyAttributeSequence(
+        lambda obj, n: f"{obj.video.hexkey}/rendition_{n}.m3u8"
+    )
+    width = 1280
+    height = 720
+    bandwidth = FuzzyInteger(low=100000, high=5000000)
+    codecs = "avc1.4d401f,mp4a.40.2"
+    byte_size = FuzzyInteger(low=1)
+    segment_count = FuzzyInteger(low=1, high=1000)
+
+    class Meta:
+        model = models.VideoRendition
+
+
 class VideoThumbnailFactory(DjangoModelFactory):
     """
     Factory for a VideoThumbnail
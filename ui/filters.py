@@ -3,9 +3,14 @@ Filters for ui app
 """
 
 import django_filters
-from django.db.models import Q
 
 from ui.models import Collection, EdxEndpoint, Video
+from ui.search import search_collections, search_videos
+
+
+def has_ordering(request):
+    """Return True if the request chose an ordering of the results"""
+    return request is not None and bool(request.GET.get("ordering"))
 
 
 class CollectionFilter(django_filters.FilterSet):
@@ -28,14 +33,7 @@ class CollectionFilter(django_filters.FilterSet):
         Search filter that looks across collection fields (title, description, edx_course_id, slug)
         and video fields (title, description)
         """
-        return queryset.filter(
-            Q(title__icontains=value)
-            | Q(description__icontains=value)
-            | Q(edx_course_id__icontains=value)
-            | Q(slug__icontains=value)
-            | Q(videos__title__icontains=value)
-            | Q(videos__description__icontains=value)
-        ).distinct()
+        return search_collections(queryset, value, ordered=has_ordering(self.request))
 
     class Meta:
         model = Collection
@@ -85,12 +83,7 @@ class PublicVideoFilter(django_filters.FilterSet):
         Full-text search across video title, video description,
         collection title, and collection description.
         """
-        return queryset.filter(
-            Q(title__icontains=value)
-            | Q(description__icontains=value)
-            | Q(collection__title__icontains=value)
-            | Q(collection__description__icontains=value)
-        ).distinct()
+        return search_videos(queryset, value, ordered=has_ordering(self.request))
 
     class Meta:
         model = Video
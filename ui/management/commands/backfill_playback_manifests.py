@@ -0,0 +1,55 @@
+"""
+Django management command for storing the playback manifest of videos which don't
+have one yet.
+
+Usage:
+    python manage.py backfill_playback_manifests [--chunk-size <count>]
+
+Videos without a stored manifest have it built for every read until this is run.
+The manifests are stored without changing updated_at, so the videos aren't exported
+again or evicted from the page caches.
+"""
+
+from django.core.management.base import BaseCommand
+
+from ui.models import Video
+
+
+class Command(BaseCommand):
+    help = """
+    Store the playback manifest of videos which don't have one yet
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of videos updated at a time",
+        )
+
+    def handle(self, *args, **options):
+        queryset = (
+            Video.objects.filter(playback_manifest__isnull=True)
+            .select_related("collection")
+            .prefetch_related("videofile_set", "videothumbnail_set")
+            .order_by("id")
+        )
+        last_id = 0
+        count = 0
+        while True:
+            videos = list(queryset.filter(id__gt=last_id)[: options["chunk_size"]])
+            if not videos:
+                break
+            for video in videos:
+                video.playback_manifest = video.build_playback_manifest(
+                    files=list(video.videofile_set.all()),
+                    thumbnails=list(video.videothumbnail_set.all()),
+                )
+            # Writing updated_at back keeps the update from setting it to now
+            Video.objects.bulk_update(videos, ["playback_manifest", "updated_at"])
+            last_id = videos[-1].id
+            count += len(videos)
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored the playback manifest of {count} videos")
+        )
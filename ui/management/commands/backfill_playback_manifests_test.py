@@ -0,0 +1,28 @@
+"""Tests for the backfill_playback_manifests command"""
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from ui.factories import VideoFactory, VideoFileFactory
+from ui.models import Video
+
+pytestmark = pytest.mark.django_db
+
+
+def test_backfill_playback_manifests():
+    """Videos without a manifest should have it stored, without changing updated_at"""
+    videos = VideoFactory.create_batch(3)
+    for video in videos:
+        VideoFileFactory(video=video)
+    Video.objects.update(playback_manifest=None)
+    updated_at = {video.id: video.updated_at for video in Video.objects.all()}
+
+    stdout = StringIO()
+    call_command("backfill_playback_manifests", chunk_size=2, stdout=stdout)
+
+    assert "3 videos" in stdout.getvalue()
+    for video in Video.objects.all():
+        assert video.playback_manifest == video.build_playback_manifest()
+        assert video.updated_at == updated_at[video.id]
@@ -0,0 +1,124 @@
+"""Management command to compare the serializers and projections of video lists"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from ui import serializers
+from ui.management.commands.benchmark_video_streaming import create_videos
+from ui.models import Video
+from ui.projections import (
+    PublicVideoProjection,
+    SimpleVideoProjection,
+    VideoProjection,
+)
+
+User = get_user_model()
+
+QUERYSETS = {
+    "public": lambda: Video.objects.select_related("collection").prefetch_related(
+        "videothumbnail_set", "videosubtitle_set", "videorendition_set"
+    ),
+    "full": lambda: Video.objects.select_related(
+        "collection", "collection__owner"
+    ).prefetch_related(
+        "videofile_set",
+        "videothumbnail_set",
+        "videosubtitle_set",
+        "videorendition_set",
+        "view_lists",
+        "collection__view_lists",
+        "collection__admin_lists",
+    ),
+}
+
+
+class Command(BaseCommand):
+    """
+    Create public videos with thumbnails, subtitles and renditions in a transaction
+    that is rolled back afterwards, and compare how many objects per second the
+    video serializers and their projections build, including their queries
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--videos",
+            type=int,
+            default=1000,
+            help="Number of videos to create (default 1000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of times each payload is built (default 3)",
+        )
+
+    def _best_time(self, build, repeat):
+        """Return the best time, in seconds, of a function"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            build()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        total = options["videos"]
+        repeat = options["repeat"]
+        with transaction.atomic():
+            self.stdout.write(f"Creating {total} videos...")
+            create_videos(total)
+            request = Request(RequestFactory().get("/"))
+            request.user = User.objects.get(username="video-benchmark")
+            context = {"request": request}
+            self.stdout.write(
+                f"{'payload':>16} {'serializer (ms)':>16} {'projection (ms)':>16} "
+                f"{'speedup':>8}"
+            )
+            for name, serializer_class, projection_class, queryset in (
+                (
+                    "PublicVideo",
+                    serializers.PublicVideoSerializer,
+                    PublicVideoProjection,
+                    QUERYSETS["public"],
+                ),
+                (
+                    "Video",
+                    serializers.VideoSerializer,
+                    VideoProjection,
+                    QUERYSETS["full"],
+                ),
+                (
+                    "SimpleVideo",
+                    serializers.SimpleVideoSerializer,
+                    SimpleVideoProjection,
+                    QUERYSETS["full"],
+                ),
+            ):
+                serialized = self._best_time(
+                    lambda serializer_class=serializer_class, queryset=queryset: (
+                        serializer_class(queryset(), many=True, context=context).data
+                    ),
+                    repeat,
+                )
+                projected = self._best_time(
+                    lambda projection_class=projection_class: projection_class(
+                        context=context
+                    ).project(Video.objects.all()),
+                    repeat,
+                )
+                per_thousand = 1000 / total * 1000
+                self.stdout.write(
+                    f"{name:>16} {serialized * per_thousand:>16.1f} "
+                    f"{projected * per_thousand:>16.1f} "
+                    f"{serialized / projected:>7.1f}x"
+                )
+            self.stdout.write("Times are per 1000 videos")
+            transaction.set_rollback(True)
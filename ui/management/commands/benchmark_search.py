@@ -0,0 +1,129 @@
+"""Management command to compare the old join-based search with ui.search"""
+
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from ui.models import Collection, Video
+from ui.search import search_videos
+
+User = get_user_model()
+
+WORDS = (
+    "quantum",
+    "mechanics",
+    "waves",
+    "optics",
+    "thermodynamics",
+    "calculus",
+    "algebra",
+    "lecture",
+    "recitation",
+    "problem",
+    "solution",
+    "introduction",
+    "review",
+    "energy",
+    "momentum",
+    "field",
+    "circuit",
+    "signal",
+    "system",
+    "probability",
+    "statistics",
+    "biology",
+    "chemistry",
+    "genome",
+)
+
+
+def _text(rng, count):
+    """Return some random words"""
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _old_search(queryset, value):
+    """The search the public video list did before ui.search"""
+    return queryset.filter(
+        Q(title__icontains=value)
+        | Q(description__icontains=value)
+        | Q(collection__title__icontains=value)
+        | Q(collection__description__icontains=value)
+    ).distinct()
+
+
+class Command(BaseCommand):
+    """
+    Create public videos in a transaction that is rolled back afterwards, and time
+    searching them with the old join-based search and with ui.search
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--videos",
+            type=int,
+            default=100000,
+            help="Number of videos to create (default 100000)",
+        )
+        parser.add_argument(
+            "--collections",
+            type=int,
+            default=1000,
+            help="Number of collections to spread the videos over (default 1000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times each search is run (default 5)",
+        )
+
+    def _time_search(self, search, value, repeat):
+        """Return the best time, in ms, of fetching the first page of a search"""
+        timings = []
+        for _ in range(repeat):
+            queryset = Video.objects.filter(is_public=True).select_related("collection")
+            start = time.perf_counter()
+            list(search(queryset, value)[:100])
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        total = options["videos"]
+        with transaction.atomic():
+            owner = User.objects.create(username="search-benchmark")
+            self.stdout.write(f"Creating {total} videos...")
+            collections = Collection.objects.bulk_create(
+                Collection(
+                    title=f"{_text(rng, 3).title()} {index}",
+                    description=_text(rng, 20),
+                    owner=owner,
+                    is_public=True,
+                )
+                for index in range(options["collections"])
+            )
+            Video.objects.bulk_create(
+                (
+                    Video(
+                        collection=rng.choice(collections),
+                        title=f"{_text(rng, 4).title()} {index}",
+                        description=_text(rng, 40),
+                        is_public=True,
+                    )
+                    for index in range(total)
+                ),
+                batch_size=5000,
+            )
+            self.stdout.write(f"{'search':>22} {'old (ms)':>10} {'new (ms)':>10}")
+            for value in ("quantum", "thermodynamics review", "99999", "no such"):
+                old = self._time_search(_old_search, value, options["repeat"])
+                new = self._time_search(search_videos, value, options["repeat"])
+                self.stdout.write(f"{value:>22} {old:>10.1f} {new:>10.1f}")
+            transaction.set_rollback(True)
@@ -0,0 +1,105 @@
+"""Management command to measure how long short celery tasks wait behind long ones"""
+
+import statistics
+import time
+
+from celery import shared_task
+from django.core.management.base import BaseCommand, CommandError
+
+# These tasks are only registered by workers that import this module, like the
+# docker-compose ones (celery worker -I ui.management.commands.benchmark_task_latency)
+
+
+@shared_task
+def benchmark_load(seconds):
+    """
+    Task that keeps a worker process busy, used to benchmark task latency under load
+    """
+    time.sleep(seconds)
+
+
+@shared_task
+def benchmark_probe(sent_at):
+    """
+    Short task used to benchmark task latency under load
+
+    Args:
+        sent_at (float): The epoch time when the task was sent
+
+    Returns:
+        float: Seconds between sending the task and a worker starting it
+    """
+    return time.time() - sent_at
+
+
+class Command(BaseCommand):
+    """
+    Fill a queue with long-running tasks, then send short tasks to the notifications
+    queue and report how long they waited for a worker. Run it against the workers
+    in docker-compose, once with the load on its own queue (the default) and once
+    with --load-queue default to see the latency when everything shares a queue.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--load-queue",
+            default="uploads",
+            help="Queue the long-running tasks are sent to (default uploads)",
+        )
+        parser.add_argument(
+            "--load-tasks",
+            type=int,
+            default=20,
+            help="Number of long-running tasks (default 20)",
+        )
+        parser.add_argument(
+            "--load-seconds",
+            type=float,
+            default=30,
+            help="Seconds each long-running task takes (default 30)",
+        )
+        parser.add_argument(
+            "--probes",
+            type=int,
+            default=50,
+            help="Number of short tasks to send (default 50)",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=600,
+            help="Seconds to wait for each short task (default 600)",
+        )
+
+    def handle(self, *args, **options):
+        if options["probes"] < 1:
+            raise CommandError("--probes must be at least 1")
+        self.stdout.write(
+            f"Sending {options['load_tasks']} tasks of {options['load_seconds']}s "
+            f"to the {options['load_queue']} queue..."
+        )
+        for _ in range(options["load_tasks"]):
+            benchmark_load.apply_async(
+                (options["load_seconds"],), queue=options["load_queue"]
+            )
+        self.stdout.write(
+            f"Sending {options['probes']} short tasks to the notifications queue..."
+        )
+        results = [
+            benchmark_probe.apply_async((time.time(),), queue="notifications")
+            for _ in range(options["probes"])
+        ]
+        latencies = sorted(
+            result.get(timeout=options["timeout"]) * 1000 for result in results
+        )
+        percentiles = (
+            statistics.quantiles(latencies, n=100, method="inclusive")
+            if len(latencies) > 1
+            else latencies * 99
+        )
+        self.stdout.write(
+            f"Short task latency (ms): p50 {percentiles[49]:.1f}, "
+            f"p95 {percentiles[94]:.1f}, max {latencies[-1]:.1f}"
+        )
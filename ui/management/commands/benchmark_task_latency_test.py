@@ -0,0 +1,26 @@
+"""Tests for the benchmark_task_latency command"""
+
+import pytest
+from django.core.management import CommandError, call_command
+
+
+def test_benchmark_task_latency(mocker):
+    """The command should send the load and report the latency of the short tasks"""
+    sleep = mocker.patch("ui.management.commands.benchmark_task_latency.time.sleep")
+    stdout = mocker.Mock()
+    call_command(
+        "benchmark_task_latency",
+        load_tasks=3,
+        load_seconds=5,
+        probes=4,
+        stdout=stdout,
+    )
+    assert sleep.call_count == 3
+    sleep.assert_called_with(5)
+    assert "Short task latency (ms): p50" in stdout.write.call_args[0][0]
+
+
+def test_benchmark_task_latency_no_probes():
+    """The command should require at least one short task"""
+    with pytest.raises(CommandError):
+        call_command("benchmark_task_latency", probes=0)
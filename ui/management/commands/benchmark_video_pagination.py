@@ -0,0 +1,107 @@
+"""Management command to compare page-number and cursor pagination of public videos"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from ui.models import Collection, Video
+from ui.pagination import VideoCursorPagination, VideoSetPagination
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Create public videos in a transaction that is rolled back afterwards, and time
+    fetching pages at increasing depths with page-number and cursor pagination
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--videos",
+            type=int,
+            default=100000,
+            help="Number of videos to create (default 100000)",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=100,
+            help="Videos per page (default 100)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times each page is fetched (default 5)",
+        )
+
+    def _time_page(self, pagination_class, params, repeat):
+        """Return the best time, in ms, of fetching one page of public videos"""
+        timings = []
+        for _ in range(repeat):
+            request = Request(RequestFactory().get("/", params))
+            queryset = Video.objects.filter(is_public=True).select_related("collection")
+            start = time.perf_counter()
+            pagination_class().paginate_queryset(queryset, request)
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    def _cursor_at(self, offset):
+        """Return the cursor a crawler would have after reading offset videos"""
+        if offset == 0:
+            return None
+        video = Video.objects.filter(is_public=True).order_by("-created_at", "-id")[
+            offset - 1
+        ]
+        return VideoCursorPagination().encode_cursor(video)
+
+    def handle(self, *args, **options):
+        total = options["videos"]
+        page_size = options["page_size"]
+        with transaction.atomic():
+            owner = User.objects.create(username="pagination-benchmark")
+            collection = Collection.objects.create(
+                title="Pagination benchmark", owner=owner, is_public=True
+            )
+            self.stdout.write(f"Creating {total} videos...")
+            Video.objects.bulk_create(
+                (
+                    Video(
+                        collection=collection,
+                        title=f"Video {index}",
+                        is_public=True,
+                    )
+                    for index in range(total)
+                ),
+                batch_size=5000,
+            )
+            # Videos created together share a creation time, so later pages also
+            # depend on the id tiebreaker
+            self.stdout.write(
+                f"{'depth':>10} {'page number (ms)':>18} {'cursor (ms)':>12}"
+            )
+            for fraction in (0, 0.1, 0.5, 0.9):
+                offset = int(total * fraction) // page_size * page_size
+                page_number = self._time_page(
+                    VideoSetPagination,
+                    {"page": offset // page_size + 1, "page_size": page_size},
+                    options["repeat"],
+                )
+                cursor = self._cursor_at(offset)
+                cursor_params = {"pagination": "cursor", "page_size": page_size}
+                if cursor:
+                    cursor_params["cursor"] = cursor
+                cursor_time = self._time_page(
+                    VideoCursorPagination, cursor_params, options["repeat"]
+                )
+                self.stdout.write(
+                    f"{offset:>10} {page_number:>18.1f} {cursor_time:>12.1f}"
+                )
+            transaction.set_rollback(True)
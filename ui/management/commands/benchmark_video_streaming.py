@@ -0,0 +1,163 @@
+"""Management command to compare regular and streamed rendering of video lists"""
+
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from ui.encodings import EncodingNames
+from ui.models import (
+    Collection,
+    Video,
+    VideoRendition,
+    VideoSubtitle,
+    VideoThumbnail,
+)
+from ui.views import PublicVideoListView
+
+User = get_user_model()
+
+
+def create_videos(total):
+    """
+    Create public videos in one collection, with a thumbnail, a subtitle and three
+    renditions each
+
+    Args:
+        total (int): The number of videos to create
+    """
+    owner = User.objects.create(username="video-benchmark")
+    collection = Collection.objects.create(
+        title="Benchmark videos", owner=owner, is_public=True
+    )
+    videos = Video.objects.bulk_create(
+        Video(
+            collection=collection,
+            title=f"Video {index}",
+            description="A description of the video " * 10,
+            is_public=True,
+        )
+        for index in range(total)
+    )
+    VideoThumbnail.objects.bulk_create(
+        VideoThumbnail(
+            video=video,
+            s3_object_key=f"thumbnails/{video.id}.jpg",
+            bucket_name="thumbnails",
+            max_width=640,
+            max_height=360,
+        )
+        for video in videos
+    )
+    VideoSubtitle.objects.bulk_create(
+        VideoSubtitle(
+            video=video,
+            s3_object_key=f"subtitles/{video.id}.vtt",
+            bucket_name="subtitles",
+            filename=f"{video.id}.vtt",
+            language="en",
+        )
+        for video in videos
+    )
+    VideoRendition.objects.bulk_create(
+        VideoRendition(
+            video=video,
+            encoding=EncodingNames.HLS,
+            s3_object_key=f"renditions/{video.id}/{height}.m3u8",
+            width=height * 16 // 9,
+            height=height,
+            bandwidth=height * 3000,
+        )
+        for video in videos
+        for height in (360, 720, 1080)
+    )
+
+
+class Command(BaseCommand):
+    """
+    Create public videos with thumbnails, subtitles and renditions in a transaction
+    that is rolled back afterwards, and compare the peak memory, time to first byte
+    and total time of a full page of the public video list, rendered the regular
+    way and streamed
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--videos",
+            type=int,
+            default=1000,
+            help=(
+                "Number of videos to create and list on one page, up to "
+                "PAGE_SIZE_MAXIMUM (default 1000)"
+            ),
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of times each response is rendered (default 3)",
+        )
+
+    def _measure(self, params, repeat):
+        """
+        Return the best peak memory in MB, time to first byte in ms and total time
+        in ms of rendering the public video list
+        """
+        results = []
+        view = PublicVideoListView.as_view()
+        for _ in range(repeat):
+            request = RequestFactory().get("/", params)
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = view(request)
+            if response.streaming:
+                chunks = iter(response.streaming_content)
+                size = len(next(chunks))
+                first_byte = time.perf_counter()
+                size += sum(len(chunk) for chunk in chunks)
+            else:
+                size = len(response.render().content)
+                first_byte = time.perf_counter()
+            end = time.perf_counter()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append(
+                (
+                    peak / 2**20,
+                    (first_byte - start) * 1000,
+                    (end - start) * 1000,
+                    size,
+                )
+            )
+        return tuple(min(values) for values in zip(*results))
+
+    def handle(self, *args, **options):
+        total = options["videos"]
+        with (
+            transaction.atomic(),
+            override_settings(PUBLIC_VIDEO_CACHE_TIMEOUT=0),
+        ):
+            self.stdout.write(f"Creating {total} videos...")
+            create_videos(total)
+            self.stdout.write(
+                f"{'mode':>10} {'peak (MB)':>10} {'first byte (ms)':>16} "
+                f"{'total (ms)':>11} {'size (KB)':>10}"
+            )
+            params = {"page_size": total}
+            for mode, mode_params in (
+                ("regular", params),
+                ("streamed", {**params, "stream": "true"}),
+            ):
+                peak, first_byte, elapsed, size = self._measure(
+                    mode_params, options["repeat"]
+                )
+                self.stdout.write(
+                    f"{mode:>10} {peak:>10.1f} {first_byte:>16.1f} "
+                    f"{elapsed:>11.1f} {size / 1024:>10.0f}"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,60 @@
+"""
+Django management command for exporting the videos included in MIT Learn as NDJSON.
+
+Usage:
+    python manage.py export_public_videos [--updated-since <datetime>] [--output <path>]
+
+Examples:
+    # Export every video to a file
+    python manage.py export_public_videos --output videos.ndjson
+
+    # Export what changed since the watermark on the last line of a previous export
+    python manage.py export_public_videos --updated-since 2024-05-06T07:08:09.123456Z
+
+See ui.export for the format of the lines.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ui import export
+
+
+class Command(BaseCommand):
+    help = """
+    Export the videos included in MIT Learn as NDJSON, optionally only those changed
+    since a time
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--updated-since",
+            help="Only export what changed since this ISO 8601 datetime",
+        )
+        parser.add_argument(
+            "--output",
+            help="The file to write the export to (default: standard output)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="The number of videos read from the database at a time",
+        )
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options["updated_since"]:
+            try:
+                updated_since = export.parse_updated_since(options["updated_since"])
+            except ValueError as exc:
+                raise CommandError(str(exc)) from exc
+
+        lines = export.export_videos(updated_since, options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                output.writelines(lines)
+            self.stderr.write(
+                self.style.SUCCESS(f"Exported the videos to {options['output']}")
+            )
+        else:
+            for line in lines:
+                self.stdout.write(line.decode("utf-8"), ending="")
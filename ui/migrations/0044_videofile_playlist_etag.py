@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui', '0043_fail_stuck_uploading_videos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='playlist_etag',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui', '0044_videofile_playlist_etag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoRendition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('encoding', models.CharField(max_length=128)),
+                ('s3_object_key', models.TextField()),
+                ('width', models.IntegerField(blank=True, null=True)),
+                ('height', models.IntegerField(blank=True, null=True)),
+                ('bandwidth', models.IntegerField(blank=True, null=True)),
+                ('codecs', models.CharField(blank=True, default='', max_length=255)),
+                ('byte_size', models.BigIntegerField(blank=True, null=True)),
+                ('segment_count', models.IntegerField(blank=True, null=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ui.video')),
+            ],
+            options={
+                'ordering': ['encoding', '-bandwidth'],
+                'unique_together': {('video', 's3_object_key')},
+            },
+        ),
+    ]
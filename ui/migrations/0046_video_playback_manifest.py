@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui', '0045_videorendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='playback_manifest',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,167 @@
+"""
+Full-text and trigram search of videos and collections on PostgreSQL
+
+Adds a search_vector column to videos and collections that triggers keep up to
+date, GIN indexes on the vectors, and pg_trgm GIN indexes for case-insensitive
+substring matching of titles and descriptions. Other databases are left unchanged
+and fall back to plain substring matching, see ui.search.
+"""
+
+from django.db import migrations
+
+CREATE_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE ui_collection ADD COLUMN search_vector tsvector;
+ALTER TABLE ui_video ADD COLUMN search_vector tsvector;
+
+CREATE FUNCTION ui_collection_search_vector(
+    title text, description text, slug text, edx_course_id text
+) RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        || setweight(
+            to_tsvector(
+                'english', coalesce(slug, '') || ' ' || coalesce(edx_course_id, '')
+            ),
+            'C'
+        )
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE FUNCTION ui_video_search_vector(
+    title text, description text, collection_title text
+) RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(collection_title, '')), 'C')
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE FUNCTION ui_collection_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := ui_collection_search_vector(
+        NEW.title, NEW.description, NEW.slug, NEW.edx_course_id
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION ui_video_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := ui_video_search_vector(
+        NEW.title,
+        NEW.description,
+        (SELECT title FROM ui_collection WHERE id = NEW.collection_id)
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION ui_collection_videos_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    UPDATE ui_video
+    SET search_vector = ui_video_search_vector(title, description, NEW.title)
+    WHERE collection_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ui_collection_search_vector_insert
+    BEFORE INSERT ON ui_collection
+    FOR EACH ROW EXECUTE FUNCTION ui_collection_search_vector_trigger();
+CREATE TRIGGER ui_collection_search_vector_update
+    BEFORE UPDATE ON ui_collection
+    FOR EACH ROW
+    WHEN (
+        OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.description IS DISTINCT FROM NEW.description
+        OR OLD.slug IS DISTINCT FROM NEW.slug
+        OR OLD.edx_course_id IS DISTINCT FROM NEW.edx_course_id
+    )
+    EXECUTE FUNCTION ui_collection_search_vector_trigger();
+CREATE TRIGGER ui_collection_videos_search_vector_update
+    AFTER UPDATE ON ui_collection
+    FOR EACH ROW
+    WHEN (OLD.title IS DISTINCT FROM NEW.title)
+    EXECUTE FUNCTION ui_collection_videos_search_vector_trigger();
+CREATE TRIGGER ui_video_search_vector_insert
+    BEFORE INSERT ON ui_video
+    FOR EACH ROW EXECUTE FUNCTION ui_video_search_vector_trigger();
+CREATE TRIGGER ui_video_search_vector_update
+    BEFORE UPDATE ON ui_video
+    FOR EACH ROW
+    WHEN (
+        OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.description IS DISTINCT FROM NEW.description
+        OR OLD.collection_id IS DISTINCT FROM NEW.collection_id
+    )
+    EXECUTE FUNCTION ui_video_search_vector_trigger();
+
+UPDATE ui_collection
+SET search_vector = ui_collection_search_vector(
+    title, description, slug, edx_course_id
+);
+UPDATE ui_video
+SET search_vector = ui_video_search_vector(
+    ui_video.title, ui_video.description, ui_collection.title
+)
+FROM ui_collection
+WHERE ui_collection.id = ui_video.collection_id;
+
+CREATE INDEX ui_collection_search_vector_idx
+    ON ui_collection USING gin (search_vector);
+CREATE INDEX ui_video_search_vector_idx ON ui_video USING gin (search_vector);
+-- Django's icontains compares UPPER(column::text), so index that expression
+CREATE INDEX ui_collection_title_trgm_idx
+    ON ui_collection USING gin (UPPER(title::text) gin_trgm_ops);
+CREATE INDEX ui_collection_description_trgm_idx
+    ON ui_collection USING gin (UPPER(description::text) gin_trgm_ops);
+CREATE INDEX ui_video_title_trgm_idx
+    ON ui_video USING gin (UPPER(title::text) gin_trgm_ops);
+CREATE INDEX ui_video_description_trgm_idx
+    ON ui_video USING gin (UPPER(description::text) gin_trgm_ops);
+"""
+
+DROP_SQL = """
+DROP INDEX IF EXISTS ui_video_description_trgm_idx;
+DROP INDEX IF EXISTS ui_video_title_trgm_idx;
+DROP INDEX IF EXISTS ui_collection_description_trgm_idx;
+DROP INDEX IF EXISTS ui_collection_title_trgm_idx;
+
+DROP TRIGGER IF EXISTS ui_video_search_vector_update ON ui_video;
+DROP TRIGGER IF EXISTS ui_video_search_vector_insert ON ui_video;
+DROP TRIGGER IF EXISTS ui_collection_videos_search_vector_update ON ui_collection;
+DROP TRIGGER IF EXISTS ui_collection_search_vector_update ON ui_collection;
+DROP TRIGGER IF EXISTS ui_collection_search_vector_insert ON ui_collection;
+DROP FUNCTION IF EXISTS ui_collection_videos_search_vector_trigger();
+DROP FUNCTION IF EXISTS ui_video_search_vector_trigger();
+DROP FUNCTION IF EXISTS ui_collection_search_vector_trigger();
+DROP FUNCTION IF EXISTS ui_video_search_vector(text, text, text);
+DROP FUNCTION IF EXISTS ui_collection_search_vector(text, text, text, text);
+
+ALTER TABLE ui_video DROP COLUMN IF EXISTS search_vector;
+ALTER TABLE ui_collection DROP COLUMN IF EXISTS search_vector;
+"""
+
+
+def create_search_vectors(apps, schema_editor):
+    """Add the search columns, triggers and indexes on PostgreSQL"""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SQL)
+
+
+def drop_search_vectors(apps, schema_editor):
+    """Remove the search columns, triggers and indexes on PostgreSQL"""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ui", "0048_video_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vectors, drop_search_vectors),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui', '0050_video_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='content_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TranscodeReuse',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reason', models.CharField(choices=[('copied', 'Copied from an identical video'), ('unchanged', 'Replaced with an unchanged file')], max_length=16)),
+                ('upload_bytes_saved', models.BigIntegerField(default=0)),
+                ('output_bytes_reused', models.BigIntegerField(default=0)),
+                ('transcode_seconds_saved', models.FloatField(default=0.0)),
+                ('source', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ui.video')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transcode_reuses', to='ui.video')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
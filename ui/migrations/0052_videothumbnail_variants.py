@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui', '0051_videofile_content_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videothumbnail',
+            name='variants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
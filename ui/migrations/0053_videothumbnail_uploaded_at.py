@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui', '0052_videothumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videothumbnail',
+            name='uploaded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,7 +3,10 @@ Models for UI app
 """
 
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import timedelta
+from functools import cached_property
 from urllib.parse import urlparse
 from uuid import uuid4
 
@@ -12,20 +15,125 @@ from celery import shared_task
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
 from encrypted_model_fields.fields import EncryptedTextField
 from pycountry import languages
 
-from mail import tasks
+from odl_video import outbox
 from odl_video.constants import DEFAULT_EDX_VIDEO_API_PATH
 from odl_video.models import TimestampedModel, TimestampedModelManager
 from ui import utils
 from ui.constants import StreamSource, VideoStatus, YouTubeStatus
 from ui.encodings import EncodingNames
+from ui.exceptions import InvalidStatusTransition, StatusConflict
 from ui.utils import get_bucket, multi_urljoin, now_in_utc, send_refresh_request
 
 TRANSCODE_PREFIX = "transcoded"
 
+# Sent by Video.update_status with video, from_status and to_status
+video_status_changed = Signal()
+# Ids of the videos whose playback manifests are refreshed when the innermost
+# deferred_playback_manifest_refresh block exits, or None outside of one
+_deferred_manifest_refreshes = ContextVar("deferred_manifest_refreshes", default=None)
+
+
+def cloudfront_url_for_key(s3_object_key):
+    """
+    Get the Cloudfront URL for an S3 object in the video bucket
+
+    Args:
+        s3_object_key(str): The S3 object key
+
+    Returns:
+        str: Cloudfront unsigned URL
+    """
+    distribution = settings.VIDEO_CLOUDFRONT_DIST
+    if not distribution:
+        raise RuntimeError("Missing required setting: VIDEO_CLOUDFRONT_DIST")
+    return f"https://{distribution}.cloudfront.net/{s3_object_key}"
+
+
+def _mp4_rank(encoding, default):
+    """Sort key placing MP4 encodings from highest to lowest resolution"""
+    return (
+        EncodingNames.MP4.index(encoding) if encoding in EncodingNames.MP4 else default
+    )
+
+
+def manifest_sources(manifest, is_public):
+    """
+    Generate a sources dict for VideoJS from a playback manifest
+
+    Args:
+        manifest (dict): A video's playback manifest
+        is_public (bool): True if the video is public
+
+    Returns:
+        list of dict: The video sources
+    """
+    if (
+        is_public
+        and manifest["stream_source"] == StreamSource.YOUTUBE
+        and manifest["youtube_id"] is not None
+    ):
+        return []
+    return [
+        {
+            "src": cloudfront_url_for_key(source["key"]),
+            "label": source["encoding"],
+            "type": (
+                "application/x-mpegURL"
+                if source["encoding"] == EncodingNames.HLS
+                else "video/mp4"
+            ),
+        }
+        for source in manifest["sources"]
+    ]
+
+
+@contextmanager
+def deferred_playback_manifest_refresh(*videos):
+    """
+    Refresh the playback manifest of each video whose files, thumbnails or YouTube
+    uploads are saved or deleted inside the block once, when the block exits, rather
+    than after every change (see ui.signals.refresh_video_playback_manifest)
+
+    Args:
+        *videos (Video): Videos to refresh in place instead of loading them again
+    """
+    pending = set()
+    token = _deferred_manifest_refreshes.set(pending)
+    try:
+        yield
+    finally:
+        _deferred_manifest_refreshes.reset(token)
+        loaded = {video.pk: video for video in videos if video.pk in pending}
+        for video in Video.objects.filter(
+            pk__in=pending - loaded.keys()
+        ).select_related("collection"):
+            loaded[video.pk] = video
+        for video in loaded.values():
+            video.refresh_playback_manifest()
+
+
+def defer_playback_manifest_refresh(video_id):
+    """
+    Put off refreshing the playback manifest of a video until the enclosing
+    deferred_playback_manifest_refresh block exits
+
+    Args:
+        video_id (int): The video id
+
+    Returns:
+        bool: False if there is no such block, and the manifest should be refreshed now
+    """
+    pending = _deferred_manifest_refreshes.get()
+    if pending is None:
+        return False
+    pending.add(video_id)
+    return True
+
 
 @shared_task(bind=True)
 def delete_s3_objects(self, bucket_name, key, as_filter=False):
@@ -46,6 +154,63 @@ def delete_s3_objects(self, bucket_name, key, as_filter=False):
             obj.delete()
 
 
+class ChangeTrackingMixin(models.Model):
+    """
+    Mixin that remembers the values of tracked_fields as loaded or last saved, so that
+    post_save receivers can skip work when the fields they depend on didn't change
+    """
+
+    tracked_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tracked_fields()
+        return instance
+
+    def _remember_tracked_fields(self, fields=None):
+        """Remember the current values of the tracked fields (or some of them)"""
+        if not hasattr(self, "_tracked_values"):
+            self._tracked_values = {}
+        for name in self.tracked_fields if fields is None else fields:
+            if name in self.__dict__:
+                self._tracked_values[name] = self.__dict__[name]
+
+    def changed_fields(self):
+        """
+        Tracked fields that changed since the object was loaded or saved. Every tracked
+        field counts as changed for an object that was never saved.
+
+        Returns:
+            set of str: The changed field names
+        """
+        if self._state.adding:
+            return set(self.tracked_fields)
+        loaded = getattr(self, "_tracked_values", {})
+        return {
+            name
+            for name in self.tracked_fields
+            if name in self.__dict__
+            and (name not in loaded or self.__dict__[name] != loaded[name])
+        }
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        # The tracked fields changed by this save, for post_save receivers
+        self.saved_changes = self.changed_fields()
+        if update_fields is not None:
+            self.saved_changes &= set(update_fields)
+        super().save(*args, **kwargs)
+        self._remember_tracked_fields(update_fields)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_tracked_fields()
+
+
 class ValidateOnSaveMixin(models.Model):
     """Mixin that calls field/model v512alidation methods before saving a model object"""
 
@@ -181,11 +346,13 @@ class CollectionManager(TimestampedModelManager):
         ).distinct()
 
 
-class Collection(TimestampedModel):
+class Collection(ChangeTrackingMixin, TimestampedModel):
     """
     Model for Video Collections
     """
 
+    tracked_fields = ("stream_source", "schedule_retranscode", "include_in_learn")
+
     key = models.UUIDField(unique=True, null=False, blank=False, default=uuid4)
     title = models.TextField()
     slug = models.TextField(null=True, blank=True)
@@ -291,6 +458,22 @@ class VideoManager(TimestampedModelManager):
             )
         ).distinct()
 
+    def with_original_s3_key(self):
+        """
+        Return videos annotated with the S3 key of their original VideoFile, so that
+        transcode keys and S3 prefixes can be derived for many videos in one query.
+
+        Returns:
+            QuerySet: Videos with original_s3_key already known
+        """
+        return self.annotate(
+            _original_s3_key=models.Subquery(
+                VideoFile.objects.filter(
+                    video=models.OuterRef("pk"), encoding=EncodingNames.ORIGINAL
+                ).values("s3_object_key")[:1]
+            )
+        )
+
 
 class EncodeJob(models.Model):
     """
@@ -320,12 +503,14 @@ class EncodeJob(models.Model):
     last_modified = models.DateTimeField(auto_now=True)
 
 
-class Video(TimestampedModel):
+class Video(ChangeTrackingMixin, TimestampedModel):
     """
     Represents an uploaded video, primarily in terms of metadata (source url, title, etc).
     The actual video files (original and encoded) are represented by the VideoFile model.
     """
 
+    tracked_fields = ("is_public", "collection_id")
+
     key = models.UUIDField(unique=True, null=False, blank=False, default=uuid4)
     collection = models.ForeignKey(
         Collection, on_delete=models.CASCADE, related_name="videos"
@@ -351,6 +536,8 @@ class Video(TimestampedModel):
     schedule_retranscode = models.BooleanField(default=False)
     duration = models.FloatField(null=True, default=0.0)
     cta_link = models.URLField(max_length=2000, null=True, blank=True)
+    # Denormalized playback details, see build_playback_manifest
+    playback_manifest = models.JSONField(null=True, blank=True, default=None)
 
     objects = VideoManager()
 
@@ -359,6 +546,21 @@ class Video(TimestampedModel):
             "custom_order",
             "-created_at",
         ]
+        indexes = [
+            # Keyset pagination of video listings, see VideoCursorPagination
+            models.Index(fields=["created_at", "id"], name="ui_video_created_id_idx"),
+            models.Index(
+                fields=["created_at", "id"],
+                name="ui_video_public_created_idx",
+                condition=models.Q(is_public=True),
+            ),
+            # Incremental exports, see ui.export
+            models.Index(
+                fields=["updated_at"],
+                name="ui_video_public_updated_idx",
+                condition=models.Q(is_public=True),
+            ),
+        ]
 
     @property
     def hexkey(self):
@@ -379,6 +581,12 @@ class Video(TimestampedModel):
         """
         Return YouTube video id if any
         """
+        return self.manifest["youtube_id"]
+
+    def _processed_youtube_id(self):
+        """
+        Query the YouTube video id, if the upload to YouTube has been processed
+        """
         try:
             youtube_video = self.youtubevideo
             if youtube_video.status == YouTubeStatus.PROCESSED:
@@ -404,11 +612,7 @@ class Video(TimestampedModel):
         """
         return sorted(
             self.videofile_set.exclude(encoding=EncodingNames.ORIGINAL),
-            key=lambda x: (
-                EncodingNames.MP4.index(x.encoding)
-                if x.encoding in EncodingNames.MP4
-                else 0
-            ),
+            key=lambda x: _mp4_rank(x.encoding, 0),
         )
 
     @property
@@ -421,11 +625,7 @@ class Video(TimestampedModel):
         """
         files = sorted(
             self.videofile_set.exclude(encoding=EncodingNames.HLS),
-            key=lambda x: (
-                EncodingNames.MP4.index(x.encoding)
-                if x.encoding in EncodingNames.MP4
-                else len(EncodingNames.MP4)
-            ),
+            key=lambda x: _mp4_rank(x.encoding, len(EncodingNames.MP4)),
         )
         if files:
             return files[0]
@@ -439,25 +639,97 @@ class Video(TimestampedModel):
         Returns:
             dict: Dict of video sources for VideoJS
         """
-        if (
-            self.is_public
-            and self.collection.stream_source == StreamSource.YOUTUBE
-            and self.youtube_id is not None
-        ):
-            return []
-        sources = [
-            {
-                "src": file.cloudfront_url,
-                "label": file.encoding,
-                "type": (
-                    "application/x-mpegURL"
-                    if file.encoding == EncodingNames.HLS
-                    else "video/mp4"
-                ),
-            }
-            for file in self.transcoded_videos
-        ]
-        return sources
+        return manifest_sources(self.manifest, self.is_public)
+
+    @cached_property
+    def manifest(self):
+        """
+        The playback manifest, built in memory if the video doesn't have one stored
+        yet (see the backfill_playback_manifests command). It's cached on the
+        instance until refresh_playback_manifest is called.
+
+        Returns:
+            dict: The playback manifest
+        """
+        return self.playback_manifest or self.build_playback_manifest()
+
+    def build_playback_manifest(self, files=None, thumbnails=None):
+        """
+        Collect everything needed to play or download the video: the transcoded files
+        in source order, the download file, the HLS file, the YouTube id and the
+        thumbnails. S3 keys are stored rather than URLs so the manifest doesn't depend
+        on the CloudFront distribution.
+
+        Args:
+            files (list of VideoFile): The files of the video, if already known
+            thumbnails (list of VideoThumbnail): The thumbnails of the video, if
+                already known
+
+        Returns:
+            dict: The playback manifest
+        """
+        if files is None:
+            files = (
+                list(self.videofile_set.only("encoding", "s3_object_key"))
+                if self.pk
+                else []
+            )
+        if thumbnails is None:
+            thumbnails = list(self.videothumbnail_set.all()) if self.pk else []
+        transcoded = sorted(
+            (file for file in files if file.encoding != EncodingNames.ORIGINAL),
+            key=lambda file: _mp4_rank(file.encoding, 0),
+        )
+        downloadable = sorted(
+            (file for file in files if file.encoding != EncodingNames.HLS),
+            key=lambda file: _mp4_rank(file.encoding, len(EncodingNames.MP4)),
+        )
+        hls_file = next(
+            (file for file in files if file.encoding == EncodingNames.HLS), None
+        )
+        return {
+            "sources": [
+                {"encoding": file.encoding, "key": file.s3_object_key}
+                for file in transcoded
+            ],
+            "download": (
+                {
+                    "encoding": downloadable[0].encoding,
+                    "key": downloadable[0].s3_object_key,
+                }
+                if downloadable
+                else None
+            ),
+            "hls": hls_file.s3_object_key if hls_file else None,
+            "youtube_id": self._processed_youtube_id() if self.pk else None,
+            "stream_source": self.collection.stream_source,
+            "thumbnails": [
+                {
+                    "key": thumbnail.s3_object_key,
+                    "max_width": thumbnail.max_width,
+                    "max_height": thumbnail.max_height,
+                }
+                for thumbnail in thumbnails
+            ],
+        }
+
+    def refresh_playback_manifest(self):
+        """
+        Rebuild and store the playback manifest, without sending post_save signals
+        """
+        self.set_playback_manifest(self.build_playback_manifest())
+        updated_at = now_in_utc()
+        Video.objects.filter(pk=self.pk).update(
+            playback_manifest=self.playback_manifest, updated_at=updated_at
+        )
+        self.updated_at = updated_at
+
+    def set_playback_manifest(self, manifest):
+        """
+        Replace the playback manifest of this instance, and the manifest it cached
+        """
+        self.playback_manifest = manifest
+        self.__dict__.pop("manifest", None)
 
     def get_s3_key(self):
         """
@@ -485,11 +757,10 @@ class Video(TimestampedModel):
         Returns:
             str: The S3 key to used for the encoded file.
         """
-        original_s3_key = self.videofile_set.get(encoding="original").s3_object_key
         if not preset:
-            return original_s3_key
+            return self.original_s3_key
         output_template = "{prefix}/{s3key}_{preset}"
-        basename, _ = os.path.splitext(original_s3_key)
+        basename, _ = os.path.splitext(self.original_s3_key)
         return output_template.format(
             prefix=TRANSCODE_PREFIX, s3key=basename, preset=preset
         )
@@ -498,7 +769,29 @@ class Video(TimestampedModel):
         """
         Get the S3 prefix for all files associated with this video
         """
-        return self.transcode_key().split("/")[0]
+        return self.original_s3_key.split("/")[0]
+
+    @cached_property
+    def original_s3_key(self):
+        """
+        The S3 key of the original VideoFile, queried once per instance unless the
+        video was loaded with VideoManager.with_original_s3_key
+
+        Returns:
+            str: The S3 key
+        """
+        if hasattr(self, "_original_s3_key"):
+            if self._original_s3_key is None:
+                raise VideoFile.DoesNotExist("Video has no original VideoFile")
+            return self._original_s3_key
+        return self.videofile_set.get(encoding=EncodingNames.ORIGINAL).s3_object_key
+
+    def forget_original_s3_key(self):
+        """
+        Drop the cached original S3 key, after the original VideoFile was repointed
+        """
+        self.__dict__.pop("original_s3_key", None)
+        self.__dict__.pop("_original_s3_key", None)
 
     def subtitle_key(self, dttm, language="en", prefix="subtitles", extension="vtt"):
         """
@@ -516,19 +809,56 @@ class Video(TimestampedModel):
         dt = dttm.strftime("%Y%m%d%H%M%S")
         return f"{prefix}/{key}/subtitles_{key}_{dt}_{language}.{extension}"
 
-    def update_status(self, status):
+    def update_status(self, status, **fields):
         """
-        Assign and save the status of a Video
+        Move the video to a new status, recording the transition and sending the
+        video_status_changed signal.
+
+        The status is updated with a single UPDATE that only matches if the video
+        still has the status this instance last saw, so concurrent workers can't
+        both move it. No post_save signals are sent.
 
         Args:
             status(str): The status to assign the video
+            **fields: Other field values to update along with the status
+
+        Raises:
+            InvalidStatusTransition: If the video can't move to the status
+            StatusConflict: If the video's status changed since it was loaded
         """
-        self.status = status
+        from_status = self.status
         if status == VideoStatus.RETRANSCODE_SCHEDULED:
-            self.schedule_retranscode = False
-        self.save()
-        if status in tasks.STATUS_TO_NOTIFICATION:
-            tasks.async_send_notification_email.delay(self.id)
+            fields.setdefault("schedule_retranscode", False)
+        if status == from_status:
+            # Not a transition, but still apply the other fields
+            if fields:
+                Video.objects.filter(pk=self.pk).update(**fields)
+                for name, value in fields.items():
+                    setattr(self, name, value)
+            return
+        if not VideoStatus.can_transition(from_status, status):
+            raise InvalidStatusTransition(
+                f"Video {self.pk} can't move from {from_status!r} to {status!r}"
+            )
+        updated_at = now_in_utc()
+        with transaction.atomic():
+            updated = Video.objects.filter(pk=self.pk, status=from_status).update(
+                status=status, updated_at=updated_at, **fields
+            )
+            if not updated:
+                raise StatusConflict(
+                    f"Video {self.pk} is no longer {from_status!r}, not moving to {status!r}"
+                )
+            VideoStatusTransition.objects.create(
+                video=self, from_status=from_status, to_status=status
+            )
+        self.status = status
+        self.updated_at = updated_at
+        for name, value in fields.items():
+            setattr(self, name, value)
+        video_status_changed.send(
+            sender=Video, video=self, from_status=from_status, to_status=status
+        )
 
     def save(self, *args, **kwargs):
         """
@@ -544,6 +874,44 @@ class Video(TimestampedModel):
         return f"<Video: {self.title!r} {self.key!r}>"
 
 
+class VideoStatusTransition(models.Model):
+    """
+    A change of a video's status, recorded by Video.update_status
+    """
+
+    video = models.ForeignKey(
+        Video, on_delete=models.CASCADE, related_name="status_history"
+    )
+    from_status = models.CharField(max_length=50)
+    to_status = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+
+    def __str__(self):
+        return f"{self.video.title}: {self.from_status} -> {self.to_status}"
+
+    def __repr__(self):
+        return f"<VideoStatusTransition: {self.video_id!r} {self.from_status!r} {self.to_status!r}>"
+
+
+class VideoTombstone(models.Model):
+    """
+    A video which left the export feed (see ui.export), because it was deleted, made
+    private or moved out of the collections included in MIT Learn
+    """
+
+    video_key = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.video_key.hex} removed at {self.deleted_at}"
+
+    def __repr__(self):
+        return f"<VideoTombstone: {self.video_key!r} {self.deleted_at!r}>"
+
+
 class VideoS3(TimestampedModel):
     """
     Abstract class with methods/properties common to both VideoFile and VideoThumbnail models
@@ -595,16 +963,13 @@ class VideoS3(TimestampedModel):
         Returns:
             str: Cloudfront unsigned URL
         """
-        distribution = settings.VIDEO_CLOUDFRONT_DIST
-        if not distribution:
-            raise RuntimeError("Missing required setting: VIDEO_CLOUDFRONT_DIST")
-        return f"https://{distribution}.cloudfront.net/{self.s3_object_key}"
+        return cloudfront_url_for_key(self.s3_object_key)
 
     def delete_from_s3(self):
         """
         Delete the S3 object for this this thumbnail
         """
-        delete_s3_objects.delay(self.bucket_name, self.s3_object_key)
+        outbox.enqueue(delete_s3_objects.si(self.bucket_name, self.s3_object_key))
 
     class Meta:
         abstract = True
@@ -616,6 +981,14 @@ class VideoFile(VideoS3):
     """
 
     encoding = models.CharField(max_length=128, default=EncodingNames.ORIGINAL)
+    # S3 ETag of an HLS master playlist as of its last normalization
+    playlist_etag = models.CharField(max_length=128, blank=True, default="")
+    # Fingerprint of an original file, computed while it's streamed to S3 (see
+    # cloudsync.dedupe)
+    content_size = models.BigIntegerField(null=True, blank=True)
+    content_hash = models.CharField(
+        max_length=64, blank=True, default="", db_index=True
+    )
 
     def delete_from_s3(self):
         """
@@ -623,7 +996,7 @@ class VideoFile(VideoS3):
         """
         if self.encoding == EncodingNames.HLS:
             key = os.path.dirname(self.s3_object_key)
-            delete_s3_objects.delay(self.bucket_name, key, as_filter=True)
+            outbox.enqueue(delete_s3_objects.si(self.bucket_name, key, as_filter=True))
         else:
             super().delete_from_s3()
 
@@ -648,6 +1021,73 @@ class VideoFile(VideoS3):
         return f"<VideoFile: {self.video.title!r} {self.s3_object_key!r} {self.encoding!r}>"
 
 
+class VideoRendition(TimestampedModel):
+    """
+    A single rendition of a transcoded video (an HLS variant stream or an MP4 file),
+    recorded when transcoding completes so clients can choose one without fetching
+    the master playlist.
+    """
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE)
+    encoding = models.CharField(max_length=128)
+    s3_object_key = models.TextField()
+    width = models.IntegerField(null=True, blank=True)
+    height = models.IntegerField(null=True, blank=True)
+    # Bits per second: peak bandwidth for HLS variants, average bitrate for MP4s
+    bandwidth = models.IntegerField(null=True, blank=True)
+    codecs = models.CharField(max_length=255, blank=True, default="")
+    byte_size = models.BigIntegerField(null=True, blank=True)
+    segment_count = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["encoding", "-bandwidth"]
+        unique_together = (("video", "s3_object_key"),)
+
+    def __str__(self):
+        return f"{self.video.title}: {self.encoding} {self.width}x{self.height}"
+
+    def __repr__(self):
+        return f"<VideoRendition: {self.video.title!r} {self.s3_object_key!r}>"
+
+
+class TranscodeReuse(TimestampedModel):
+    """
+    A video whose source was identical to one already transcoded, so its renditions
+    were copied or kept instead of being transcoded again
+    """
+
+    class Reason(models.TextChoices):
+        """
+        Why the renditions were reused
+        """
+
+        COPIED = "copied", "Copied from an identical video"
+        UNCHANGED = "unchanged", "Replaced with an unchanged file"
+
+    video = models.ForeignKey(
+        Video, on_delete=models.CASCADE, related_name="transcode_reuses"
+    )
+    source = models.ForeignKey(
+        Video, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    reason = models.CharField(max_length=16, choices=Reason.choices)
+    # Bytes which weren't streamed from the source URL
+    upload_bytes_saved = models.BigIntegerField(default=0)
+    # Bytes of transcoded files copied or kept rather than transcoded
+    output_bytes_reused = models.BigIntegerField(default=0)
+    # Seconds of video which weren't transcoded
+    transcode_seconds_saved = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.video.title}: {self.get_reason_display()}"
+
+    def __repr__(self):
+        return f"<TranscodeReuse: {self.video_id!r} {self.reason!r}>"
+
+
 class VideoThumbnail(VideoS3):
     """
     A thumbnail associated with a video object; the number of thumbnails for a video
@@ -656,6 +1096,21 @@ class VideoThumbnail(VideoS3):
 
     max_width = models.IntegerField(null=True, blank=True)
     max_height = models.IntegerField(null=True, blank=True)
+    # Every version of an uploaded thumbnail, largest JPEG first, stored next to it
+    # under keys of their upload: the key, width, height and content type of each.
+    # The thumbnail's own key holds a copy of the largest JPEG.
+    variants = models.JSONField(default=list, blank=True)
+    # When the image of an uploaded thumbnail was uploaded, so that an older upload
+    # processed after it is dropped
+    uploaded_at = models.DateTimeField(null=True, blank=True)
+
+    def delete_from_s3(self):
+        """
+        Delete the S3 objects of this thumbnail and its variants
+        """
+        super().delete_from_s3()
+        for variant in self.variants:
+            outbox.enqueue(delete_s3_objects.si(self.bucket_name, variant["key"]))
 
     def __str__(self):
         return f"{self.video.title}: {self.s3_object_key}"
@@ -20,6 +20,7 @@ from django.db.models import signals
 from mail import tasks
 from ui.constants import StreamSource, VideoStatus, YouTubeStatus
 from ui.encodings import EncodingNames
+from ui.exceptions import InvalidStatusTransition, StatusConflict
 from ui.factories import (
     CollectionFactory,
     EdxEndpointFactory,
@@ -28,22 +29,20 @@ from ui.factories import (
     VideoFactory,
     VideoFileFactory,
     VideoSubtitleFactory,
+    VideoThumbnailFactory,
     YouTubeVideoFactory,
 )
-from ui.models import Collection
+from ui.models import (
+    Collection,
+    Video,
+    VideoFile,
+    deferred_playback_manifest_refresh,
+    video_status_changed,
+)
 
 pytestmark = pytest.mark.django_db
 
 
-FAKE_RSA = b"""O\xd3\x91\x01\xf0\x14\xfe\xbf\x12\xb7\xde\xfe\xd83\xf2\x08\xf5x\x93\x12Z)\x0c\x95\xf757\xb5\\>
-\xc0\xd9\x9bf\x1aVM\xbe\x10\xa9C\xe8\xb0\xfei\x11L\xbf\xdei\xadk70$O\x88%T\r\x8c\x9f\x8a\xf8U>\xa1\xfd(\xac.\xa3\xff\xf9
-\x02\x06\x03\xe0\x19,\xb4\x93\xd79MO\x81\xd8\xad\x1de\xb8$\xa4\xdb\x04Q\xa8\xed\x02\x9cY\xb7\xa2\xa1k+b\x00\xcc\x15\x94
-\xe5\xb3B\x0f\x88ZH\x91\xc3\xfe\xa99$I\xdf\xa7i\x08\xec\xd5\xe2\x88\xd6-x\xac_\x8f:_\xb5$,\\\x05I\x00&t\x7f\xae>\xc1\xab
-[\xc2\xf9\x15\x1a\xde\x98V}\xab\xeb\xfd\x89D_\x14\xb1?\x92\xeeR=\xc2\x19%X\xb3\xef\xce\x19\x852\xfc)\xa4\xe3x\xcdE\x8bb
-\xbeI=#\xac\x12GW|\xef\xa5oi\xc1\xe3\xa0\x87\x1d_Aa\xa1-\xb1\x95\rd\xb8\x16.\x1fc\x88\xbdZ4\xb2]\x8d&87\x8cjy\xb0Y<\xf2)
-\xff3\xbe\x8f\xbf\x91\xdc\xcb\x1c"""
-
-
 @pytest.fixture
 def video():
     """Fixture to create a video"""
@@ -123,6 +122,46 @@ def test_video_transcode_key(videofile):
     )
 
 
+def test_video_original_s3_key_cached(videofile, django_assert_num_queries):
+    """Transcode keys and the S3 prefix should only query for the original key once"""
+    video = Video.objects.get(id=videofile.video.id)
+    with django_assert_num_queries(1):
+        assert video.transcode_key() == videofile.s3_object_key
+        assert video.transcode_key("pre01") == (
+            f"transcoded/{video.hexkey}/video_pre01"
+        )
+        assert video.video_s3_prefix() == video.hexkey
+
+
+def test_video_original_s3_key_repointed(videofile):
+    """Repointing the original VideoFile should drop the cached key"""
+    video = Video.objects.get(id=videofile.video.id)
+    assert video.original_s3_key == videofile.s3_object_key
+    original = video.original_video
+    original.s3_object_key = f"{video.hexkey}/video.m4v"
+    original.save()
+    assert video.original_s3_key == f"{video.hexkey}/video.m4v"
+
+
+def test_video_with_original_s3_key(django_assert_num_queries):
+    """with_original_s3_key should derive the keys of many videos in one query"""
+    videofiles = VideoFileFactory.create_batch(3, encoding=EncodingNames.ORIGINAL)
+    missing = VideoFactory()
+    with django_assert_num_queries(1):
+        videos = {
+            video.id: video
+            for video in Video.objects.with_original_s3_key().filter(
+                id__in=[videofile.video.id for videofile in videofiles] + [missing.id]
+            )
+        }
+        for videofile in videofiles:
+            assert videos[videofile.video.id].video_s3_prefix() == (
+                videofile.video.hexkey
+            )
+    with pytest.raises(VideoFile.DoesNotExist):
+        videos[missing.id].video_s3_prefix()
+
+
 def test_video_status(video):
     """
     Tests that a video cannnot have a status different from he allowed
@@ -139,17 +178,100 @@ def test_video_update_status_email(video, mocker):
     """
     Tests the Video.update_status method to sends emails with some statuses
     """
-    mocked_send_email = mocker.patch(
-        "mail.tasks.async_send_notification_email", return_value=FAKE_RSA, autospec=True
-    )
+    mocked_enqueue = mocker.patch("ui.signals.outbox.enqueue")
+    video.collection.edx_course_id = None
     for video_status in tasks.STATUS_TO_NOTIFICATION:
+        video.status = (
+            VideoStatus.UPLOADING
+            if video_status == VideoStatus.UPLOAD_FAILED
+            else VideoStatus.TRANSCODING
+        )
+        video.save()
         video.update_status(video_status)
-        mocked_send_email.delay.assert_called_once_with(video.id)
-        mocked_send_email.reset_mock()
+        mocked_enqueue.assert_called_once_with(
+            tasks.async_send_notification_email.si(video.id)
+        )
+        mocked_enqueue.reset_mock()
 
     # email is not sent for other statuses
+    video.update_status(VideoStatus.CREATED)
     video.update_status(VideoStatus.TRANSCODING)
-    assert mocked_send_email.delay.call_count == 0
+    assert mocked_enqueue.call_count == 0
+
+
+def test_video_update_status_history(video, mocker):
+    """update_status should record each transition and send video_status_changed"""
+    receiver = mocker.Mock()
+    video_status_changed.connect(receiver, sender=Video)
+    try:
+        video.update_status(VideoStatus.UPLOADING)
+        video.update_status(VideoStatus.TRANSCODING)
+        # Not a transition
+        video.update_status(VideoStatus.TRANSCODING)
+    finally:
+        video_status_changed.disconnect(receiver, sender=Video)
+
+    assert Video.objects.get(id=video.id).status == VideoStatus.TRANSCODING
+    assert [
+        (transition.from_status, transition.to_status)
+        for transition in video.status_history.all()
+    ] == [
+        (VideoStatus.CREATED, VideoStatus.UPLOADING),
+        (VideoStatus.UPLOADING, VideoStatus.TRANSCODING),
+    ]
+    assert [call.kwargs["to_status"] for call in receiver.call_args_list] == [
+        VideoStatus.UPLOADING,
+        VideoStatus.TRANSCODING,
+    ]
+
+
+def test_video_update_status_no_post_save(video, mocker):
+    """update_status should update the status and other fields without post_save"""
+    receiver = mocker.Mock()
+    signals.post_save.connect(receiver, sender=Video)
+    try:
+        video.update_status(VideoStatus.RETRANSCODE_SCHEDULED, duration=12.5)
+    finally:
+        signals.post_save.disconnect(receiver, sender=Video)
+    receiver.assert_not_called()
+    video.refresh_from_db()
+    assert video.duration == 12.5
+    assert video.schedule_retranscode is False
+
+
+def test_video_update_status_invalid(video):
+    """update_status should refuse transitions that aren't in the transition table"""
+    with pytest.raises(InvalidStatusTransition):
+        video.update_status(VideoStatus.RETRANSCODING)
+    assert Video.objects.get(id=video.id).status == VideoStatus.CREATED
+    assert not video.status_history.exists()
+
+
+@pytest.mark.parametrize(
+    "from_status, to_status",
+    [
+        (VideoStatus.COMPLETE, VideoStatus.UPLOADING),
+        (VideoStatus.RETRANSCODING, VideoStatus.UPLOADING),
+        (VideoStatus.TRANSCODE_FAILED_VIDEO, VideoStatus.UPLOADING),
+        (VideoStatus.TRANSCODE_FAILED_VIDEO, VideoStatus.TRANSCODE_FAILED_INTERNAL),
+        (VideoStatus.TRANSCODE_FAILED_INTERNAL, VideoStatus.COMPLETE),
+        (VideoStatus.CREATED, VideoStatus.COMPLETE),
+    ],
+)
+def test_video_update_status_retries(from_status, to_status):
+    """Re-dispatched uploads and retried transcodes should be valid transitions"""
+    video = VideoFactory(status=from_status)
+    video.update_status(to_status)
+    assert Video.objects.get(id=video.id).status == to_status
+
+
+def test_video_update_status_conflict(video):
+    """update_status should not move a video whose status changed concurrently"""
+    Video.objects.filter(id=video.id).update(status=VideoStatus.UPLOADING)
+    with pytest.raises(StatusConflict):
+        video.update_status(VideoStatus.TRANSCODING)
+    assert Video.objects.get(id=video.id).status == VideoStatus.UPLOADING
+    assert not video.status_history.exists()
 
 
 @pytest.mark.parametrize(
@@ -203,6 +325,20 @@ def test_collection_for_for_owner():
     assert extra_collection not in qset
 
 
+def test_video_thumbnail_delete_variants(mocker):
+    """Deleting a thumbnail should delete its variants from S3 too"""
+    mock_delete = mocker.patch("ui.models.delete_s3_objects")
+    thumbnail = VideoThumbnailFactory(
+        s3_object_key="thumbnails/abc/thumb.jpg",
+        variants=[{"key": "thumbnails/abc/thumb_320w.jpg"}],
+    )
+    thumbnail.delete()
+    assert [call.args for call in mock_delete.si.call_args_list] == [
+        (thumbnail.bucket_name, "thumbnails/abc/thumb.jpg"),
+        (thumbnail.bucket_name, "thumbnails/abc/thumb_320w.jpg"),
+    ]
+
+
 def test_video_subtitle_language():
     """Tests that the correct language name for a code is returned"""
     assert VideoSubtitleFactory(language="en").language_name == "English"
@@ -437,6 +573,103 @@ def test_video_youtube_id(status, video):
     )
 
 
+def test_video_playback_manifest():
+    """The playback manifest should hold ordered sources, download, HLS, YouTube id and thumbnails"""
+    video = VideoFactory(collection__stream_source=StreamSource.CLOUDFRONT)
+    for encoding in (
+        EncodingNames.ORIGINAL,
+        EncodingNames.SMALL,
+        EncodingNames.HLS,
+        EncodingNames.HD,
+    ):
+        VideoFileFactory(
+            video=video, s3_object_key=f"{encoding}.mp4", encoding=encoding
+        )
+    thumbnail = VideoThumbnailFactory(video=video, max_width=640, max_height=360)
+    youtube_video = YouTubeVideoFactory(video=video, status=YouTubeStatus.PROCESSED)
+
+    manifest = Video.objects.get(id=video.id).playback_manifest
+    assert manifest == {
+        "sources": [
+            {"encoding": EncodingNames.HLS, "key": "HLS.mp4"},
+            {"encoding": EncodingNames.HD, "key": "HD.mp4"},
+            {"encoding": EncodingNames.SMALL, "key": "small.mp4"},
+        ],
+        "download": {"encoding": EncodingNames.HD, "key": "HD.mp4"},
+        "hls": "HLS.mp4",
+        "youtube_id": youtube_video.id,
+        "stream_source": StreamSource.CLOUDFRONT,
+        "thumbnails": [
+            {"key": thumbnail.s3_object_key, "max_width": 640, "max_height": 360}
+        ],
+    }
+    assert [source["label"] for source in video.sources] == [
+        file.encoding for file in video.transcoded_videos
+    ]
+    assert manifest["download"]["key"] == video.download.s3_object_key
+
+
+def test_video_playback_manifest_read_without_queries(django_assert_num_queries):
+    """Reading sources and the YouTube id should not query once the manifest is built"""
+    video = VideoFileFactory(encoding=EncodingNames.HLS).video
+    video = Video.objects.get(id=video.id)
+    with django_assert_num_queries(0):
+        assert video.sources[0]["label"] == EncodingNames.HLS
+        assert video.youtube_id is None
+
+
+def test_video_playback_manifest_built_on_read(video):
+    """A video without a manifest should have one built when it's read, without
+    writing to the database"""
+    Video.objects.filter(id=video.id).update(playback_manifest=None)
+    video = Video.objects.get(id=video.id)
+    assert video.sources == []
+    assert video.manifest == video.build_playback_manifest()
+    assert Video.objects.get(id=video.id).playback_manifest is None
+
+
+def test_video_manifest_cached(mocker, video):
+    """A manifest built on read should be built once, until the video's is refreshed"""
+    Video.objects.filter(id=video.id).update(playback_manifest=None)
+    video = Video.objects.get(id=video.id)
+    build = mocker.spy(video, "build_playback_manifest")
+    assert video.sources == []
+    assert video.youtube_id is None
+    assert video.manifest["hls"] is None
+    build.assert_called_once()
+
+    # Saved through another instance of the video, so this one isn't updated
+    VideoFileFactory(
+        video=Video.objects.get(id=video.id),
+        encoding=EncodingNames.HLS,
+        s3_object_key="video.m3u8",
+    )
+    assert video.manifest["hls"] is None
+    video.refresh_playback_manifest()
+    assert video.manifest["hls"] == "video.m3u8"
+
+
+def test_deferred_playback_manifest_refresh(mocker, video):
+    """Changes inside the block should refresh each video's manifest once, at exit"""
+    other = VideoFactory()
+    refresh = mocker.spy(Video, "refresh_playback_manifest")
+    with deferred_playback_manifest_refresh(video):
+        VideoFileFactory(
+            video=video, encoding=EncodingNames.HLS, s3_object_key="video.m3u8"
+        )
+        VideoFileFactory(
+            video=video, encoding=EncodingNames.DESKTOP_MP4, s3_object_key="video.mp4"
+        )
+        VideoThumbnailFactory(video=other)
+        refresh.assert_not_called()
+    assert refresh.call_count == 2
+    assert video.playback_manifest == video.build_playback_manifest()
+    assert video.manifest["hls"] == "video.m3u8"
+    other.refresh_from_db()
+    assert other.playback_manifest == other.build_playback_manifest()
+    assert len(other.playback_manifest["thumbnails"]) == 1
+
+
 def test_video_source_url(video):
     """
     Tests that a long source_url is acceptable up to 2000 characters
@@ -486,3 +719,26 @@ def test_video_file_can_add_to_edx(encoding, edx_course_id, expected):
         encoding=encoding, video__collection__edx_course_id=edx_course_id
     )
     assert video_files.can_add_to_edx is expected
+
+
+def test_changed_fields():
+    """Tracked fields should be compared with their values as loaded or last saved"""
+    collection = CollectionFactory.build(owner=UserFactory())
+    assert collection.changed_fields() == {
+        "stream_source",
+        "schedule_retranscode",
+        "include_in_learn",
+    }
+    collection.save()
+    assert collection.changed_fields() == set()
+
+    collection = Collection.objects.get(id=collection.id)
+    collection.title = "other title"
+    assert collection.changed_fields() == set()
+    collection.schedule_retranscode = not collection.schedule_retranscode
+    assert collection.changed_fields() == {"schedule_retranscode"}
+    collection.save(update_fields=["title"])
+    assert collection.saved_changes == set()
+    assert collection.changed_fields() == {"schedule_retranscode"}
+    collection.refresh_from_db()
+    assert collection.changed_fields() == set()
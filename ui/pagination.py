@@ -2,8 +2,16 @@
 Custom pagination classes
 """
 
+import base64
+from datetime import datetime
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class OVSPaginationMixin:
@@ -20,6 +28,27 @@ class OVSPaginationMixin:
         response.data["num_pages"] = self.page.paginator.num_pages
         return response
 
+    def paginate_queryset_lazily(self, queryset, request, view=None):
+        """
+        Paginate like paginate_queryset, but return the page as an unevaluated
+        queryset so that its rows can be streamed
+
+        Returns:
+            django.db.models.query.QuerySet: The rows of the requested page
+        """
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            ) from exc
+        return self.page.object_list
+
 
 class CollectionSetPagination(OVSPaginationMixin, PageNumberPagination):
     """Custom pagination class for collections"""
@@ -27,7 +56,165 @@ class CollectionSetPagination(OVSPaginationMixin, PageNumberPagination):
     page_size = settings.PAGE_SIZE_COLLECTIONS
 
 
+class VideoCursorPagination(BasePagination):
+    """
+    Keyset pagination of videos by (created_at, id)
+
+    Each page continues after the last video of the previous one, so every page is
+    an index range scan no matter how deep it is. Newest videos come first, unless
+    the request asks for ?ordering=created_at. The total count is only included
+    when the request asks for it with ?count=true.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    page_size_query_param = settings.PAGE_SIZE_QUERY_PARAM
+    page_size = settings.PAGE_SIZE_VIDEOS
+    max_page_size = settings.PAGE_SIZE_MAXIMUM
+
+    def get_page_size(self, request):
+        """Return the requested page size, capped at max_page_size"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def encode_cursor(self, video):
+        """Encode the position after a video as a cursor"""
+        position = f"{video.created_at.isoformat()}|{video.id}"
+        return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, request):
+        """
+        Decode the request's cursor
+
+        Returns:
+            tuple of (datetime, int): The created_at and id to continue after, or None
+
+        Raises:
+            NotFound: If the cursor is invalid
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            created_at, video_id = (
+                base64.urlsafe_b64decode(cursor.encode("ascii"))
+                .decode("utf-8")
+                .split("|")
+            )
+            return datetime.fromisoformat(created_at), int(video_id)
+        except (TypeError, ValueError, UnicodeError) as exc:
+            raise NotFound("Invalid cursor") from exc
+
+    def _ordered_queryset(self, queryset, request):
+        """Order the queryset by (created_at, id) and start it after the cursor"""
+        self.request = request
+        self.descending = request.query_params.get("ordering") != "created_at"
+        self.count = (
+            queryset.count()
+            if request.query_params.get(self.count_query_param) == "true"
+            else None
+        )
+        queryset = queryset.order_by(
+            *(("-created_at", "-id") if self.descending else ("created_at", "id"))
+        )
+        position = self.decode_cursor(request)
+        if position is None:
+            return queryset
+        created_at, video_id = position
+        # The plain bound on created_at lets the database start a range scan of the
+        # (created_at, id) index at the cursor
+        if self.descending:
+            return queryset.filter(
+                Q(created_at__lt=created_at) | Q(id__lt=video_id),
+                created_at__lte=created_at,
+            )
+        return queryset.filter(
+            Q(created_at__gt=created_at) | Q(id__gt=video_id),
+            created_at__gte=created_at,
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        queryset = self._ordered_queryset(queryset, request)
+        videos = list(queryset[: page_size + 1])
+        self.has_next = len(videos) > page_size
+        self.page = videos[:page_size]
+        return self.page
+
+    def paginate_queryset_lazily(self, queryset, request, view=None):
+        """
+        Paginate like paginate_queryset, but return the page as an unevaluated
+        queryset so that its rows can be streamed. Only the keys of the page are
+        fetched up front, to find the next cursor.
+
+        Returns:
+            django.db.models.query.QuerySet: The videos of the requested page
+        """
+        page_size = self.get_page_size(request)
+        queryset = self._ordered_queryset(queryset, request)
+        keys = list(
+            queryset.values_list("created_at", "id", named=True)[: page_size + 1]
+        )
+        self.has_next = len(keys) > page_size
+        self.page = keys[:page_size]
+        return queryset[:page_size]
+
+    def get_next_link(self):
+        """Return the URL of the next page, or None on the last page"""
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.count_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        response = {"next": self.get_next_link(), "results": data}
+        if self.count is not None:
+            response["count"] = self.count
+        return Response(response)
+
+
 class VideoSetPagination(OVSPaginationMixin, PageNumberPagination):
-    """Custom pagination class for videos"""
+    """
+    Custom pagination class for videos. Requests with ?pagination=cursor (or a
+    cursor from a previous page) are paginated with VideoCursorPagination instead.
+    """
 
     page_size = settings.PAGE_SIZE_VIDEOS
+    cursor_pagination_class = VideoCursorPagination
+
+    def __init__(self):
+        self.cursor_pagination = None
+
+    def use_cursor_pagination(self, request):
+        """Return True if the request should be paginated with a cursor"""
+        params = request.query_params
+        return (
+            params.get("pagination") == "cursor"
+            or self.cursor_pagination_class.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor_pagination(request):
+            self.cursor_pagination = self.cursor_pagination_class()
+            return self.cursor_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_queryset_lazily(self, queryset, request, view=None):
+        if self.use_cursor_pagination(request):
+            self.cursor_pagination = self.cursor_pagination_class()
+            return self.cursor_pagination.paginate_queryset_lazily(
+                queryset, request, view
+            )
+        return super().paginate_queryset_lazily(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
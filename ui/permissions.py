@@ -81,7 +81,7 @@ def has_admin_permission(obj, request):
     if request.user == obj.owner or request.user.is_superuser:
         return True
     return has_common_lists(
-        request.user, list(obj.admin_lists.values_list("name", flat=True))
+        request.user, [group.name for group in obj.admin_lists.all()]
     )
 
 
@@ -129,6 +129,15 @@ class IsCollectionOwner(BasePermission):
         return request.user == obj.owner or request.user.is_superuser
 
 
+class IsCollectionAdmin(BasePermission):
+    """
+    Permission to check if user can edit the collection
+    """
+
+    def has_object_permission(self, request, view, obj):
+        return has_admin_permission(obj, request)
+
+
 class CanUploadToCollection(BasePermission):
     """
     Permission that checks for a collection in the request.data and verifies that the user can post to it
@@ -0,0 +1,569 @@
+"""
+Read-only projections of videos and collections
+
+The video and collection serializers build each payload field by field through DRF's
+field classes and nested serializers, which dominates the CPU time of a large list
+page. The projections here build the same payloads from values() rows and batches
+of related rows, with one function per payload instead of per field. They are used
+by the list endpoints; the serializers are still used for everything else,
+including writes, and projections_test checks that both render the same JSON.
+"""
+
+import abc
+from collections import defaultdict
+from functools import cache
+from itertools import islice
+
+from django.db.models import Count
+from django.utils import timezone
+from pycountry import languages
+
+from ui import permissions as ui_permissions
+from ui.encodings import EncodingNames
+from ui.models import (
+    Collection,
+    Video,
+    VideoFile,
+    VideoRendition,
+    VideoSubtitle,
+    VideoThumbnail,
+    cloudfront_url_for_key,
+    manifest_sources,
+)
+
+
+def format_datetime(value):
+    """
+    Format a datetime the way DRF's DateTimeField does
+
+    Args:
+        value (datetime.datetime): An aware datetime, or None
+
+    Returns:
+        str: The ISO 8601 datetime in the current timezone, or None
+    """
+    if not value:
+        return None
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith("+00:00"):
+        return value[:-6] + "Z"
+    return value
+
+
+@cache
+def language_name(language):
+    """Return the name of a language from its two letter code"""
+    return languages.get(alpha_2=language).name
+
+
+def _group_rows(queryset, group_by, *columns):
+    """
+    Fetch rows of a queryset and group them
+
+    Args:
+        queryset (django.db.models.query.QuerySet): The rows to fetch
+        group_by (str): The column to group the rows by
+        *columns (str): The columns to fetch
+
+    Returns:
+        dict: Lists of row tuples, by the value of their group_by column
+    """
+    groups = defaultdict(list)
+    for group, *values in queryset.values_list(group_by, *columns):
+        groups[group].append(values)
+    return groups
+
+
+def _group_names(through_model, group_by, ids):
+    """Fetch the names of the keycloak groups in a many-to-many relation"""
+    rows = (
+        through_model.objects.filter(**{f"{group_by}__in": ids})
+        .order_by("keycloakgroup_id")
+        .values_list(group_by, "keycloakgroup__name")
+    )
+    groups = defaultdict(list)
+    for group, name in rows:
+        groups[group].append(name)
+    return groups
+
+
+def _video_files(video_ids):
+    """The VideoFileSerializer payloads of some videos, by video id"""
+    return {
+        video_id: [
+            {
+                "id": file_id,
+                "created_at": format_datetime(created_at),
+                "s3_object_key": s3_object_key,
+                "encoding": encoding,
+                "bucket_name": bucket_name,
+                "cloudfront_url": cloudfront_url_for_key(s3_object_key),
+            }
+            for file_id, created_at, s3_object_key, encoding, bucket_name in rows
+        ]
+        for video_id, rows in _group_rows(
+            VideoFile.objects.filter(video_id__in=video_ids),
+            "video_id",
+            "id",
+            "created_at",
+            "s3_object_key",
+            "encoding",
+            "bucket_name",
+        ).items()
+    }
+
+
+def thumbnail_variants(variants):
+    """
+    Serialize the versions of a thumbnail
+
+    Args:
+        variants (list of dict): The versions stored on a VideoThumbnail
+
+    Returns:
+        list of dict: The URL, dimensions and content type of each version
+    """
+    return [
+        {
+            "cloudfront_url": cloudfront_url_for_key(variant["key"]),
+            "width": variant["width"],
+            "height": variant["height"],
+            "content_type": variant["content_type"],
+        }
+        for variant in variants
+    ]
+
+
+def _video_thumbnails(video_ids):
+    """The VideoThumbnailSerializer payloads of some videos, by video id"""
+    return {
+        video_id: [
+            {
+                "id": thumbnail_id,
+                "created_at": format_datetime(created_at),
+                "s3_object_key": s3_object_key,
+                "bucket_name": bucket_name,
+                "cloudfront_url": cloudfront_url_for_key(s3_object_key),
+                "variants": thumbnail_variants(variants),
+            }
+            for thumbnail_id, created_at, s3_object_key, bucket_name, variants in rows
+        ]
+        for video_id, rows in _group_rows(
+            VideoThumbnail.objects.filter(video_id__in=video_ids),
+            "video_id",
+            "id",
+            "created_at",
+            "s3_object_key",
+            "bucket_name",
+            "variants",
+        ).items()
+    }
+
+
+def _video_subtitles(video_ids):
+    """The VideoSubtitleSerializer payloads of some videos, by video id"""
+    return {
+        video_id: [
+            {
+                "id": subtitle_id,
+                "created_at": format_datetime(created_at),
+                "filename": filename,
+                "s3_object_key": s3_object_key,
+                "bucket_name": bucket_name,
+                "language": language,
+                "language_name": language_name(language),
+            }
+            for (
+                subtitle_id,
+                created_at,
+                filename,
+                s3_object_key,
+                bucket_name,
+                language,
+            ) in rows
+        ]
+        for video_id, rows in _group_rows(
+            VideoSubtitle.objects.filter(video_id__in=video_ids),
+            "video_id",
+            "id",
+            "created_at",
+            "filename",
+            "s3_object_key",
+            "bucket_name",
+            "language",
+        ).items()
+    }
+
+
+def _video_renditions(video_ids):
+    """The VideoRenditionSerializer payloads of some videos, by video id"""
+    return {
+        video_id: [
+            {
+                "encoding": encoding,
+                "width": width,
+                "height": height,
+                "bandwidth": bandwidth,
+                "codecs": codecs,
+                "byte_size": byte_size,
+                "segment_count": segment_count,
+            }
+            for (
+                encoding,
+                width,
+                height,
+                bandwidth,
+                codecs,
+                byte_size,
+                segment_count,
+            ) in rows
+        ]
+        for video_id, rows in _group_rows(
+            VideoRendition.objects.filter(video_id__in=video_ids),
+            "video_id",
+            "encoding",
+            "width",
+            "height",
+            "bandwidth",
+            "codecs",
+            "byte_size",
+            "segment_count",
+        ).items()
+    }
+
+
+class Projection(abc.ABC):
+    """
+    Base class of projections. Subclasses list the values() columns they need, and
+    build payloads for a batch of rows in project_rows.
+    """
+
+    columns = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def _rows(self, queryset):
+        """The values() rows of a queryset"""
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    @abc.abstractmethod
+    def project_rows(self, rows):
+        """
+        Build the payloads of a batch of rows
+
+        Args:
+            rows (list of dict): values() rows
+
+        Returns:
+            list of dict: The payloads
+        """
+
+    def project(self, queryset):
+        """
+        Build the payloads of every row of a queryset
+
+        Args:
+            queryset (django.db.models.query.QuerySet): The rows to project
+
+        Returns:
+            list of dict: The payloads
+        """
+        return self.project_rows(list(self._rows(queryset)))
+
+    def iterate(self, queryset, chunk_size):
+        """
+        Build the payloads of a queryset's rows one batch at a time
+
+        Args:
+            queryset (django.db.models.query.QuerySet): The rows to project
+            chunk_size (int): The number of rows in a batch
+
+        Yields:
+            dict: The payload of each row
+        """
+        rows = self._rows(queryset).iterator(chunk_size=chunk_size)
+        while batch := list(islice(rows, chunk_size)):
+            yield from self.project_rows(batch)
+
+
+def _manifest(row):
+    """The playback manifest of a video row, built if it has none stored yet"""
+    if row["playback_manifest"] is None:
+        return Video.objects.get(id=row["id"]).build_playback_manifest()
+    return row["playback_manifest"]
+
+
+class AdminVideoProjectionMixin:
+    """
+    Projection of the cloudfront_url of videos, which is only shown to admins of
+    their collection
+    """
+
+    def _admin_collection_ids(self, rows):
+        """Return the ids of the collections the requesting user can edit"""
+        request = self.context.get("request")
+        if not request:
+            return set()
+        collections = (
+            Collection.objects.filter(id__in={row["collection_id"] for row in rows})
+            .select_related("owner")
+            .prefetch_related("admin_lists")
+        )
+        return {
+            collection.id
+            for collection in collections
+            if ui_permissions.has_admin_permission(collection, request)
+        }
+
+    def _cloudfront_url(self, row, admin_collection_ids, manifest=None):
+        """The cloudfront_url of a video row"""
+        if row["collection_id"] in admin_collection_ids:
+            hls_key = (manifest or _manifest(row))["hls"]
+            if row["collection__allow_share_openedx"] and hls_key:
+                return cloudfront_url_for_key(hls_key)
+        return ""
+
+
+class SimpleVideoProjection(AdminVideoProjectionMixin, Projection):
+    """Projection of SimpleVideoSerializer"""
+
+    columns = (
+        "id",
+        "key",
+        "created_at",
+        "title",
+        "description",
+        "is_public",
+        "is_private",
+        "status",
+        "cta_link",
+        "playback_manifest",
+        "collection_id",
+        "collection__key",
+        "collection__allow_share_openedx",
+    )
+
+    def project_rows(self, rows):
+        video_ids = [row["id"] for row in rows]
+        files = _video_files(video_ids)
+        subtitles = _video_subtitles(video_ids)
+        thumbnails = _video_thumbnails(video_ids)
+        view_lists = _group_names(Video.view_lists.through, "video_id", video_ids)
+        collection_view_lists = _group_names(
+            Collection.view_lists.through,
+            "collection_id",
+            {row["collection_id"] for row in rows},
+        )
+        admin_collection_ids = self._admin_collection_ids(rows)
+        payloads = []
+        for row in rows:
+            video_id = row["id"]
+            payloads.append(
+                {
+                    "key": row["key"].hex,
+                    "created_at": format_datetime(row["created_at"]),
+                    "title": row["title"],
+                    "description": row["description"],
+                    "videofile_set": files.get(video_id, []),
+                    "videosubtitle_set": subtitles.get(video_id, []),
+                    "is_public": row["is_public"],
+                    "is_private": row["is_private"],
+                    "view_lists": view_lists.get(video_id, []),
+                    "collection_view_lists": collection_view_lists.get(
+                        row["collection_id"], []
+                    ),
+                    "videothumbnail_set": thumbnails.get(video_id, []),
+                    "status": row["status"],
+                    "collection_key": row["collection__key"].hex,
+                    "cloudfront_url": self._cloudfront_url(row, admin_collection_ids),
+                    "cta_link": row["cta_link"],
+                }
+            )
+        return payloads
+
+
+class VideoProjection(AdminVideoProjectionMixin, Projection):
+    """Projection of VideoSerializer"""
+
+    columns = SimpleVideoProjection.columns + (
+        "collection__title",
+        "multiangle",
+        "is_logged_in_only",
+    )
+
+    def project_rows(self, rows):
+        video_ids = [row["id"] for row in rows]
+        files = _video_files(video_ids)
+        thumbnails = _video_thumbnails(video_ids)
+        subtitles = _video_subtitles(video_ids)
+        renditions = _video_renditions(video_ids)
+        view_lists = _group_names(Video.view_lists.through, "video_id", video_ids)
+        collection_view_lists = _group_names(
+            Collection.view_lists.through,
+            "collection_id",
+            {row["collection_id"] for row in rows},
+        )
+        admin_collection_ids = self._admin_collection_ids(rows)
+        payloads = []
+        for row in rows:
+            video_id = row["id"]
+            manifest = _manifest(row)
+            payloads.append(
+                {
+                    "key": row["key"].hex,
+                    "created_at": format_datetime(row["created_at"]),
+                    "title": row["title"],
+                    "description": row["description"],
+                    "collection_key": row["collection__key"].hex,
+                    "collection_title": row["collection__title"],
+                    "multiangle": row["multiangle"],
+                    "status": row["status"],
+                    "videofile_set": files.get(video_id, []),
+                    "videothumbnail_set": thumbnails.get(video_id, []),
+                    "videosubtitle_set": subtitles.get(video_id, []),
+                    "view_lists": view_lists.get(video_id, []),
+                    "collection_view_lists": collection_view_lists.get(
+                        row["collection_id"], []
+                    ),
+                    "is_public": row["is_public"],
+                    "is_private": row["is_private"],
+                    "is_logged_in_only": row["is_logged_in_only"],
+                    "sources": manifest_sources(manifest, row["is_public"]),
+                    "renditions": renditions.get(video_id, []),
+                    "youtube_id": manifest["youtube_id"],
+                    "cloudfront_url": self._cloudfront_url(
+                        row, admin_collection_ids, manifest
+                    ),
+                    "cta_link": row["cta_link"],
+                }
+            )
+        return payloads
+
+
+class PublicVideoProjection(Projection):
+    """Projection of PublicVideoSerializer"""
+
+    columns = (
+        "id",
+        "key",
+        "created_at",
+        "title",
+        "description",
+        "status",
+        "is_public",
+        "cta_link",
+        "duration",
+        "multiangle",
+        "playback_manifest",
+        "collection__key",
+        "collection__title",
+        "collection__description",
+        "collection__is_public",
+        "collection__stream_source",
+        "collection__for_shorts",
+    )
+
+    def project_rows(self, rows):
+        video_ids = [row["id"] for row in rows]
+        renditions = _video_renditions(video_ids)
+        thumbnails = _video_thumbnails(video_ids)
+        subtitles = _video_subtitles(video_ids)
+        payloads = []
+        for row in rows:
+            video_id = row["id"]
+            manifest = _manifest(row)
+            hls_key = manifest["hls"]
+            duration = row["duration"]
+            payloads.append(
+                {
+                    "key": row["key"].hex,
+                    "created_at": format_datetime(row["created_at"]),
+                    "title": row["title"],
+                    "description": row["description"],
+                    "status": row["status"],
+                    "is_public": row["is_public"],
+                    "youtube_id": manifest["youtube_id"],
+                    "sources": (
+                        [
+                            {
+                                "src": cloudfront_url_for_key(hls_key),
+                                "label": EncodingNames.HLS,
+                                "type": "application/x-mpegURL",
+                            }
+                        ]
+                        if hls_key
+                        else []
+                    ),
+                    "renditions": renditions.get(video_id, []),
+                    "cta_link": row["cta_link"],
+                    "duration": None if duration is None else float(duration),
+                    "multiangle": row["multiangle"],
+                    "videothumbnail_set": thumbnails.get(video_id, []),
+                    "videosubtitle_set": subtitles.get(video_id, []),
+                    "collection": {
+                        "key": row["collection__key"].hex,
+                        "title": row["collection__title"],
+                        "description": row["collection__description"],
+                        "is_public": row["collection__is_public"],
+                        "stream_source": row["collection__stream_source"],
+                        "for_shorts": row["collection__for_shorts"],
+                    },
+                }
+            )
+        return payloads
+
+
+class CollectionListProjection(Projection):
+    """Projection of CollectionListSerializer"""
+
+    columns = (
+        "id",
+        "key",
+        "created_at",
+        "title",
+        "description",
+        "edx_course_id",
+        "owner_id",
+        "owner__username",
+        "owner__email",
+        "is_public",
+        "stream_source",
+    )
+
+    def project_rows(self, rows):
+        collection_ids = [row["id"] for row in rows]
+        view_lists = _group_names(
+            Collection.view_lists.through, "collection_id", collection_ids
+        )
+        admin_lists = _group_names(
+            Collection.admin_lists.through, "collection_id", collection_ids
+        )
+        video_counts = dict(
+            Video.objects.filter(collection_id__in=collection_ids)
+            .order_by()
+            .values("collection_id")
+            .annotate(count=Count("id"))
+            .values_list("collection_id", "count")
+        )
+        return [
+            {
+                "key": row["key"].hex,
+                "created_at": format_datetime(row["created_at"]),
+                "title": row["title"],
+                "description": row["description"],
+                "view_lists": view_lists.get(row["id"], []),
+                "admin_lists": admin_lists.get(row["id"], []),
+                "video_count": video_counts.get(row["id"], 0),
+                "edx_course_id": row["edx_course_id"],
+                "owner": row["owner_id"],
+                "owner_info": {
+                    "id": row["owner_id"],
+                    "username": row["owner__username"],
+                    "email": row["owner__email"],
+                },
+                "is_public": row["is_public"],
+                "stream_source": row["stream_source"],
+            }
+            for row in rows
+        ]
@@ -0,0 +1,179 @@
+"""
+Tests for the read-only projections of videos and collections
+"""
+
+from datetime import UTC, datetime, timedelta, timezone
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from ui import factories, serializers
+from ui.constants import StreamSource
+from ui.encodings import EncodingNames
+from ui.models import Collection, Video
+from ui.projections import (
+    CollectionListProjection,
+    Projection,
+    PublicVideoProjection,
+    SimpleVideoProjection,
+    VideoProjection,
+    format_datetime,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalogue(mocker):
+    """Videos in collections with every kind of related row"""
+    mocker.patch(
+        "ui.utils.user_groups",
+        side_effect=lambda user: {"admins"} if user.username == "admin" else set(),
+    )
+    admins = factories.KeycloakGroupFactory(name="admins")
+    viewers = factories.KeycloakGroupFactory(name="viewers")
+    owner = factories.UserFactory()
+    shared = factories.CollectionFactory(
+        owner=owner,
+        allow_share_openedx=True,
+        stream_source=StreamSource.YOUTUBE,
+        admin_lists=[admins],
+        view_lists=[admins, viewers],
+    )
+    other = factories.CollectionFactory(description=None, edx_course_id=None)
+    full = factories.VideoFactory(
+        collection=shared, is_public=True, cta_link="https://example.com/next"
+    )
+    factories.VideoFileFactory(video=full)
+    factories.VideoFileFactory(
+        video=full, hls=True, s3_object_key=f"transcoded/{full.hexkey}/video.m3u8"
+    )
+    factories.VideoFileFactory(
+        video=full,
+        encoding=EncodingNames.DESKTOP_MP4,
+        s3_object_key=f"transcoded/{full.hexkey}/video_desktop.mp4",
+    )
+    factories.VideoThumbnailFactory(video=full)
+    factories.VideoThumbnailFactory(
+        video=full,
+        variants=[
+            {
+                "key": f"thumbnails/{full.hexkey}/thumb_320w.webp",
+                "width": 320,
+                "height": 180,
+                "content_type": "image/webp",
+            }
+        ],
+    )
+    factories.VideoSubtitleFactory(video=full, language="fr")
+    factories.VideoRenditionFactory.create_batch(2, video=full)
+    factories.YouTubeVideoFactory(video=full, status="processed")
+    full.view_lists.set([viewers])
+    private = factories.VideoFactory(collection=shared, is_private=True)
+    factories.VideoFileFactory(video=private)
+    Video.objects.filter(id=private.id).update(duration=None)
+    factories.VideoFactory(collection=other, description="")
+    # Rebuild the manifests now that every related row exists
+    for video in Video.objects.all():
+        video.refresh_playback_manifest()
+    return {"owner": owner}
+
+
+def _context(user):
+    """A serializer context with a request by the user"""
+    request = APIRequestFactory().get("/")
+    force_authenticate(request, user=user)
+    return {"request": APIView().initialize_request(request)}
+
+
+def _render(data):
+    """Render data as JSON"""
+    return JSONRenderer().render(data)
+
+
+@pytest.mark.parametrize(
+    "projection_class, serializer_class",
+    [
+        (VideoProjection, serializers.VideoSerializer),
+        (SimpleVideoProjection, serializers.SimpleVideoSerializer),
+        (PublicVideoProjection, serializers.PublicVideoSerializer),
+    ],
+)
+@pytest.mark.parametrize("requester", [None, "owner", "admin", "superuser", "other"])
+def test_video_projections(catalogue, projection_class, serializer_class, requester):
+    """Video projections should render the same JSON as their serializers"""
+    users = {
+        "owner": catalogue["owner"],
+        "admin": factories.UserFactory(username="admin"),
+        "superuser": factories.UserFactory(is_superuser=True),
+        "other": factories.UserFactory(),
+    }
+    context = _context(users[requester]) if requester else {}
+    queryset = Video.objects.order_by("id")
+    expected = serializer_class(queryset, many=True, context=context).data
+
+    assert _render(projection_class(context=context).project(queryset)) == _render(
+        expected
+    )
+
+
+def test_collection_list_projection(catalogue):
+    """CollectionListProjection should render the same JSON as its serializer"""
+    queryset = Collection.objects.all()
+    expected = serializers.CollectionListSerializer(queryset, many=True).data
+
+    assert _render(CollectionListProjection().project(queryset)) == _render(expected)
+
+
+def test_iterate(catalogue, django_assert_num_queries):
+    """iterate should project the rows in batches, with a fixed number of queries each"""
+    queryset = Video.objects.order_by("id")
+    expected = PublicVideoProjection().project(queryset)
+
+    # One query for the videos, and three per batch for their related rows
+    with django_assert_num_queries(1 + 2 * 3):
+        assert list(PublicVideoProjection().iterate(queryset, 2)) == expected
+
+
+def test_missing_manifest(catalogue):
+    """A video without a playback manifest should have it built, without a write"""
+    video = Video.objects.first()
+    Video.objects.filter(id=video.id).update(playback_manifest=None)
+
+    [payload] = PublicVideoProjection().project(Video.objects.filter(id=video.id))
+    video.refresh_from_db()
+    assert video.playback_manifest is None
+    assert payload["youtube_id"] == video.youtube_id
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, None),
+        (
+            datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=UTC),
+            "2024-05-06T07:08:09.123456Z",
+        ),
+        (
+            datetime(2024, 5, 6, 9, 8, 9, tzinfo=timezone(timedelta(hours=2))),
+            "2024-05-06T07:08:09Z",
+        ),
+    ],
+)
+def test_format_datetime(value, expected):
+    """format_datetime should format datetimes in UTC like DRF"""
+    assert format_datetime(value) == expected
+
+
+def test_projection_requires_project_rows():
+    """A projection without project_rows can't be instantiated"""
+
+    class IncompleteProjection(Projection):
+        """A projection that forgot to implement project_rows"""
+
+        columns = ("id",)
+
+    with pytest.raises(TypeError):
+        IncompleteProjection()
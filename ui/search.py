@@ -0,0 +1,145 @@
+"""
+Search of videos and collections
+
+On PostgreSQL, videos and collections have a weighted search_vector column kept up
+to date by triggers (see migration 0049), and their titles and descriptions have
+pg_trgm indexes. A search matches either the full-text query or a substring of the
+same fields as before, and results are ranked unless the request asks for another
+ordering. Other databases only do the substring matching.
+"""
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import Expression
+
+from ui.models import Collection, Video
+
+SEARCH_CONFIG = "english"
+
+
+def is_full_text_search_supported(queryset):
+    """
+    Return True if the queryset's database has search vectors
+
+    Args:
+        queryset (django.db.models.query.QuerySet): A queryset
+
+    Returns:
+        bool: True for PostgreSQL
+    """
+    return connections[queryset.db].vendor == "postgresql"
+
+
+class SearchVectorColumn(Expression):
+    """
+    The search_vector column of the queried table. The column only exists in the
+    database, so it has no model field to refer to.
+    """
+
+    output_field = SearchVectorField()
+
+    def as_sql(self, compiler, connection):
+        table = compiler.quote_name_unless_alias(compiler.query.get_initial_alias())
+        return f"{table}.{connection.ops.quote_name('search_vector')}", []
+
+
+def _video_substring_match(value):
+    """Match videos with the value in their title or description"""
+    return Q(title__icontains=value) | Q(description__icontains=value)
+
+
+def _rank(queryset, query, value, ordered):
+    """
+    Annotate search_rank on matching rows, and order by it unless the request
+    already chose an ordering
+
+    Args:
+        queryset (django.db.models.query.QuerySet): The matching rows
+        query (django.contrib.postgres.search.SearchQuery): The full-text query
+        value (str): The search text
+        ordered (bool): True if the request chose an ordering
+
+    Returns:
+        django.db.models.query.QuerySet: The ranked queryset
+    """
+    queryset = queryset.annotate(
+        search_rank=SearchRank(SearchVectorColumn(), query)
+        + TrigramSimilarity("title", value)
+    )
+    if ordered:
+        return queryset
+    return queryset.order_by(F("search_rank").desc(), "-created_at")
+
+
+def search_videos(queryset, value, ordered=False):
+    """
+    Filter videos to those matching a search in their title or description, or the
+    title or description of their collection
+
+    Args:
+        queryset (django.db.models.query.QuerySet): A Video queryset
+        value (str): The search text
+        ordered (bool): True if the request chose an ordering, so results shouldn't
+            be ordered by rank
+
+    Returns:
+        django.db.models.query.QuerySet: The matching videos
+    """
+    collection_match = Q(
+        collection_id__in=Collection.objects.filter(
+            Q(title__icontains=value) | Q(description__icontains=value)
+        ).values("id")
+    )
+    substring_match = _video_substring_match(value) | collection_match
+    if not is_full_text_search_supported(queryset):
+        return queryset.filter(substring_match)
+
+    query = SearchQuery(value, search_type="websearch", config=SEARCH_CONFIG)
+    queryset = queryset.alias(search_vector=SearchVectorColumn()).filter(
+        Q(search_vector=query) | substring_match
+    )
+    return _rank(queryset, query, value, ordered)
+
+
+def search_collections(queryset, value, ordered=False):
+    """
+    Filter collections to those matching a search in their title, description, edX
+    course id or slug, or in the title or description of one of their videos
+
+    Args:
+        queryset (django.db.models.query.QuerySet): A Collection queryset
+        value (str): The search text
+        ordered (bool): True if the request chose an ordering, so results shouldn't
+            be ordered by rank
+
+    Returns:
+        django.db.models.query.QuerySet: The matching collections
+    """
+    substring_match = (
+        Q(title__icontains=value)
+        | Q(description__icontains=value)
+        | Q(edx_course_id__icontains=value)
+        | Q(slug__icontains=value)
+    )
+    videos = Video.objects.filter(_video_substring_match(value))
+    if not is_full_text_search_supported(queryset):
+        return queryset.filter(
+            substring_match | Q(id__in=videos.values("collection_id"))
+        )
+
+    query = SearchQuery(value, search_type="websearch", config=SEARCH_CONFIG)
+    videos = Video.objects.alias(search_vector=SearchVectorColumn()).filter(
+        Q(search_vector=query) | _video_substring_match(value)
+    )
+    queryset = queryset.alias(search_vector=SearchVectorColumn()).filter(
+        Q(search_vector=query)
+        | substring_match
+        | Q(id__in=videos.values("collection_id"))
+    )
+    return _rank(queryset, query, value, ordered)
@@ -0,0 +1,127 @@
+"""
+Tests for search of videos and collections
+"""
+
+import pytest
+from django.db import connection
+
+from ui.factories import CollectionFactory, VideoFactory
+from ui.models import Collection, Video
+from ui.search import search_collections, search_videos
+
+pytestmark = pytest.mark.django_db
+
+postgres_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Search vectors need PostgreSQL"
+)
+
+
+@pytest.fixture
+def search_data():
+    """Videos and collections with searchable text in different fields"""
+    lectures = CollectionFactory.create(
+        title="Physics lectures", description="Mechanics", slug="physics-lectures"
+    )
+    seminars = CollectionFactory.create(
+        title="Seminars", description="Guest talks about quantum computing"
+    )
+    return {
+        "lectures": lectures,
+        "seminars": seminars,
+        "titled": VideoFactory.create(
+            collection=lectures, title="Quantum tunneling", description="Week 3"
+        ),
+        "described": VideoFactory.create(
+            collection=lectures,
+            title="Week 4",
+            description="Waves and QUANTUM states",
+        ),
+        "in_collection": VideoFactory.create(
+            collection=seminars, title="Talk 1", description="Introduction"
+        ),
+        "other": VideoFactory.create(
+            collection=lectures, title="Week 5", description="Optics"
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("quantum", ["titled", "described", "in_collection"]),
+        ("physics", ["titled", "described", "other"]),
+        ("MECHANICS", ["titled", "described", "other"]),
+        ("week 5", ["other"]),
+        ("nothing matches", []),
+    ],
+)
+def test_search_videos(search_data, value, expected):
+    """Videos match on their own title and description, or their collection's"""
+    results = list(search_videos(Video.objects.all(), value))
+    assert sorted(video.id for video in results) == sorted(
+        search_data[key].id for key in expected
+    )
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("physics", ["lectures"]),
+        ("physics-lec", ["lectures"]),
+        ("quantum", ["lectures", "seminars"]),
+        ("introduction", ["seminars"]),
+        ("nothing matches", []),
+    ],
+)
+def test_search_collections(search_data, value, expected):
+    """
+    Collections match on their own fields or their videos' title and description,
+    once each however many of their videos match
+    """
+    results = list(search_collections(Collection.objects.all(), value))
+    assert sorted(collection.id for collection in results) == sorted(
+        search_data[key].id for key in expected
+    )
+
+
+def test_search_edx_course_id():
+    """Collections match on their edX course id"""
+    collection = CollectionFactory.create(edx_course_id="course-v1:MITx+8.01+2024")
+    CollectionFactory.create()
+    assert list(search_collections(Collection.objects.all(), "8.01+2024")) == [
+        collection
+    ]
+
+
+@postgres_only
+def test_search_videos_ranked(search_data):
+    """Videos matching in their title rank above those matching elsewhere"""
+    results = list(search_videos(Video.objects.all(), "quantum"))
+    assert results[0] == search_data["titled"]
+    assert results[-1] == search_data["in_collection"]
+
+
+@postgres_only
+def test_search_videos_ordered(search_data):
+    """Results keep the requested ordering instead of being ranked"""
+    queryset = Video.objects.order_by("title")
+    results = list(search_videos(queryset, "quantum", ordered=True))
+    assert results == sorted(results, key=lambda video: video.title)
+
+
+@postgres_only
+def test_search_videos_word_forms(search_data):
+    """Full-text search matches other forms of a word"""
+    results = list(search_videos(Video.objects.all(), "tunnels"))
+    assert results == [search_data["titled"]]
+
+
+@postgres_only
+def test_search_vector_follows_collection_title(search_data):
+    """Renaming a collection updates the search vectors of its videos"""
+    seminars = search_data["seminars"]
+    seminars.title = "Running club"
+    seminars.save()
+    assert list(search_videos(Video.objects.all(), "runs")) == [
+        search_data["in_collection"]
+    ]
@@ -2,6 +2,7 @@
 serializers for ui
 """
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy
 from rest_framework import serializers
@@ -12,6 +13,7 @@ from ui import models
 from ui import permissions as ui_permissions
 from ui.encodings import EncodingNames
 from ui.keycloak_utils import get_keycloak_client
+from ui.projections import SimpleVideoProjection, thumbnail_variants
 from ui.utils import has_common_lists
 
 User = get_user_model()
@@ -109,18 +111,49 @@ class VideoFileSerializer(serializers.ModelSerializer):
         )
 
 
+class VideoRenditionSerializer(serializers.ModelSerializer):
+    """VideoRendition serializer"""
+
+    class Meta:
+        model = models.VideoRendition
+        fields = (
+            "encoding",
+            "width",
+            "height",
+            "bandwidth",
+            "codecs",
+            "byte_size",
+            "segment_count",
+        )
+        read_only_fields = fields
+
+
 class VideoThumbnailSerializer(serializers.ModelSerializer):
     """VideoThumbnail serializer"""
 
+    variants = serializers.SerializerMethodField()
+
+    def get_variants(self, obj):
+        """The URL, dimensions and content type of each version of the thumbnail"""
+        return thumbnail_variants(obj.variants)
+
     class Meta:
         model = models.VideoThumbnail
-        fields = ("id", "created_at", "s3_object_key", "bucket_name", "cloudfront_url")
+        fields = (
+            "id",
+            "created_at",
+            "s3_object_key",
+            "bucket_name",
+            "cloudfront_url",
+            "variants",
+        )
         read_only_fields = (
             "id",
             "created_at",
             "s3_object_key",
             "bucket_name",
             "cloudfront_url",
+            "variants",
         )
 
 
@@ -163,6 +196,9 @@ class VideoSerializer(serializers.ModelSerializer):
     videofile_set = VideoFileSerializer(many=True, read_only=True)
     videothumbnail_set = VideoThumbnailSerializer(many=True, read_only=True)
     videosubtitle_set = VideoSubtitleSerializer(many=True)
+    renditions = VideoRenditionSerializer(
+        source="videorendition_set", many=True, read_only=True
+    )
     view_lists = SingleAttrRelatedField(
         model=models.KeycloakGroup, attribute="name", many=True, allow_empty=True
     )
@@ -182,7 +218,7 @@ class VideoSerializer(serializers.ModelSerializer):
 
     def get_collection_view_lists(self, obj):
         """Get collection view lists"""
-        return list(obj.collection.view_lists.values_list("name", flat=True))
+        return [group.name for group in obj.collection.view_lists.all()]
 
     def validate_view_lists(self, value):
         """
@@ -203,9 +239,9 @@ class VideoSerializer(serializers.ModelSerializer):
         if self.context.get("request") and ui_permissions.has_admin_permission(
             obj.collection, self.context["request"]
         ):
-            video_file = obj.videofile_set.filter(encoding=EncodingNames.HLS).first()
-            if obj.collection.allow_share_openedx and video_file:
-                return video_file.cloudfront_url
+            hls_key = obj.manifest["hls"]
+            if obj.collection.allow_share_openedx and hls_key:
+                return models.cloudfront_url_for_key(hls_key)
 
         return ""
 
@@ -229,6 +265,7 @@ class VideoSerializer(serializers.ModelSerializer):
             "is_private",
             "is_logged_in_only",
             "sources",
+            "renditions",
             "youtube_id",
             "cloudfront_url",
             "cta_link",
@@ -243,6 +280,7 @@ class VideoSerializer(serializers.ModelSerializer):
             "videosubtitle_set",
             "collection_view_lists",
             "sources",
+            "renditions",
             "youtube_id",
         )
 
@@ -316,9 +354,7 @@ class CollectionSerializer(serializers.ModelSerializer):
                 videos = obj.videos.filter(is_private=False)
         else:
             videos = obj.videos.all()
-        return [
-            SimpleVideoSerializer(video, context=self.context).data for video in videos
-        ]
+        return SimpleVideoProjection(context=self.context).project(videos)
 
     def get_is_admin(self, obj):
         """Custom field to indicate whether or not the requesting user is an admin"""
@@ -472,6 +508,9 @@ class PublicVideoSerializer(serializers.ModelSerializer):
     videothumbnail_set = VideoThumbnailSerializer(many=True, read_only=True)
     videosubtitle_set = VideoSubtitleSerializer(many=True, read_only=True)
     sources = serializers.SerializerMethodField()
+    renditions = VideoRenditionSerializer(
+        source="videorendition_set", many=True, read_only=True
+    )
 
     def get_key(self, obj):
         """Return hex key"""
@@ -479,13 +518,15 @@ class PublicVideoSerializer(serializers.ModelSerializer):
 
     def get_sources(self, obj):
         """Return only HLS sources"""
+        hls_key = obj.manifest["hls"]
+        if not hls_key:
+            return []
         return [
             {
-                "src": f.cloudfront_url,
-                "label": f.encoding,
+                "src": models.cloudfront_url_for_key(hls_key),
+                "label": EncodingNames.HLS,
                 "type": "application/x-mpegURL",
             }
-            for f in obj.hls_files
         ]
 
     class Meta:
@@ -499,6 +540,7 @@ class PublicVideoSerializer(serializers.ModelSerializer):
             "is_public",
             "youtube_id",
             "sources",
+            "renditions",
             "cta_link",
             "duration",
             "multiangle",
@@ -534,6 +576,44 @@ class ReplaceVideoSerializer(serializers.Serializer):
     file = DropboxFileSerializer()
 
 
+class DirectUploadSerializer(serializers.Serializer):
+    """Serializer for starting a direct upload of a local file to S3"""
+
+    collection = serializers.UUIDField()
+    filename = serializers.CharField()
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class DirectUploadTokenSerializer(serializers.Serializer):
+    """Serializer for the token of a direct upload"""
+
+    token = serializers.CharField()
+
+
+class DirectUploadPartsSerializer(DirectUploadTokenSerializer):
+    """Serializer for presigning the part URLs of a direct upload"""
+
+    part_numbers = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.DIRECT_UPLOAD_MAX_PART_URLS,
+    )
+
+
+class DirectUploadPartSerializer(serializers.Serializer):
+    """Serializer for an uploaded part of a direct upload"""
+
+    part_number = serializers.IntegerField(min_value=1)
+    etag = serializers.CharField()
+
+
+class DirectUploadCompleteSerializer(DirectUploadTokenSerializer):
+    """Serializer for completing a direct upload"""
+
+    parts = DirectUploadPartSerializer(many=True, allow_empty=False)
+
+
 class VideoSubtitleUploadSerializer(serializers.Serializer):
     """Caption File Serializer"""
 
@@ -191,6 +191,9 @@ def get_expected_result(video):
         "collection_view_lists": [],
         "view_lists": [],
         "sources": video.sources,
+        "renditions": serializers.VideoRenditionSerializer(
+            video.videorendition_set.all(), many=True
+        ).data,
         "is_private": False,
         "is_public": video.is_public,
         "is_logged_in_only": video.is_logged_in_only,
@@ -209,6 +212,7 @@ def test_video_serializer(youtube, public):
     video = factories.VideoFactory()
     factories.VideoFileFactory(video=video)
     factories.VideoThumbnailFactory(video=video)
+    factories.VideoRenditionFactory(video=video)
     video.is_public = public
     if youtube and public:
         factories.YouTubeVideoFactory(video=video)
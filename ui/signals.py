@@ -2,20 +2,30 @@
 ui model signals
 """
 
+from functools import wraps
+
 from django.conf import settings
-from django.db.models.signals import post_save, pre_delete
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 from cloudsync.tasks import remove_youtube_caption, remove_youtube_video
+from mail import tasks as mail_tasks
+from odl_video import outbox
+from ui import caching, export
 from ui import tasks as ovs_tasks
 from ui.constants import StreamSource, VideoStatus, YouTubeStatus
+from ui.encodings import EncodingNames
 from ui.models import (
     Collection,
     Video,
     VideoFile,
+    VideoRendition,
     VideoSubtitle,
     VideoThumbnail,
     YouTubeVideo,
+    defer_playback_manifest_refresh,
+    video_status_changed,
 )
 
 
@@ -49,28 +59,102 @@ def delete_youtube_video(sender, **kwargs):
         remove_youtube_video.delay(youtube_id)
 
 
+def depends_on(*fields):
+    """
+    Skip a post_save receiver unless the save changed one of the given fields of a
+    ChangeTrackingMixin model
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(sender, instance, **kwargs):
+            if not instance.saved_changes.isdisjoint(fields):
+                return func(sender, instance=instance, **kwargs)
+            return None
+
+        return wrapper
+
+    return decorator
+
+
 @receiver(post_save, sender=Collection)
-def update_collection_youtube(sender, **kwargs):
+@depends_on("stream_source")
+def update_collection_youtube(sender, instance, **kwargs):
+    """
+    If a collection's stream source is changed, delete the YouTube versions of public
+    videos that should no longer (or could not) be streamed from YouTube
+    """
+    youtube_videos = YouTubeVideo.objects.filter(
+        video__collection=instance, video__is_public=True
+    )
+    if instance.stream_source != StreamSource.CLOUDFRONT:
+        youtube_videos = youtube_videos.filter(
+            status__in=(YouTubeStatus.FAILED, YouTubeStatus.REJECTED)
+        )
+    for youtube_video in youtube_videos:
+        youtube_video.delete()
+
+
+@receiver(post_save, sender=VideoFile)
+@receiver(post_delete, sender=VideoFile)
+@receiver(post_save, sender=VideoThumbnail)
+@receiver(post_delete, sender=VideoThumbnail)
+@receiver(post_save, sender=YouTubeVideo)
+@receiver(post_delete, sender=YouTubeVideo)
+def refresh_video_playback_manifest(sender, instance, **kwargs):
+    """
+    Rebuild the playback manifest of the video a file, thumbnail or YouTube upload belongs to
+    """
+    if defer_playback_manifest_refresh(instance.video_id):
+        return
+    # The video may already be gone if it's being deleted along with its files
+    video = (
+        Video.objects.filter(pk=instance.video_id).select_related("collection").first()
+    )
+    if video is None:
+        return
+    video.refresh_playback_manifest()
+    if sender.video.is_cached(instance):
+        instance.video.set_playback_manifest(video.playback_manifest)
+
+
+@receiver(post_save, sender=VideoFile)
+def forget_video_original_s3_key(sender, instance, **kwargs):
     """
-    If a collection's stream source is changed, sync YoutubeVideo objects for public Videos
+    Drop a video's cached original S3 key when its original VideoFile is saved
     """
-    for video in kwargs["instance"].videos.filter(is_public=True):
-        sync_youtube(video)
+    if instance.encoding == EncodingNames.ORIGINAL and sender.video.is_cached(instance):
+        instance.video.forget_original_s3_key()
 
 
 @receiver(post_save, sender=Collection)
-def update_collection_retranscodes(sender, **kwargs):
+@depends_on("stream_source")
+def update_collection_playback_manifests(sender, instance, **kwargs):
+    """
+    Rebuild the playback manifests of a collection's videos if its stream source changed
+    """
+    for video in (
+        instance.videos.exclude(playback_manifest=None)
+        .exclude(playback_manifest__stream_source=instance.stream_source)
+        .select_related("collection")
+    ):
+        video.refresh_playback_manifest()
+
+
+@receiver(post_save, sender=Collection)
+@depends_on("schedule_retranscode")
+def update_collection_retranscodes(sender, instance, **kwargs):
     """
     Sync schedule_retranscode value for all videos in the collection
     """
     if settings.FEATURES.get("RETRANSCODE_ENABLED", False):
-        collection = kwargs["instance"]
-        Video.objects.filter(collection=collection).update(
-            schedule_retranscode=collection.schedule_retranscode
-        )
+        Video.objects.filter(collection=instance).exclude(
+            schedule_retranscode=instance.schedule_retranscode
+        ).update(schedule_retranscode=instance.schedule_retranscode)
 
 
 @receiver(post_save, sender=Video)
+@depends_on("is_public")
 def update_video_youtube(sender, instance, **kwargs):
     """
     If a video's is_public field is changed, sync associated YoutubeVideo object
@@ -96,13 +180,155 @@ def set_video_is_public_from_collection(sender, instance, created, **kwargs):
             )
 
 
+def _is_rescheduled(from_status, to_status):
+    """
+    Whether a status change puts a throttled retranscode back in line, returning the
+    video to the status it had before it was scheduled
+    """
+    return from_status == VideoStatus.RETRANSCODE_SCHEDULED and to_status not in (
+        VideoStatus.RETRANSCODING,
+        VideoStatus.RETRANSCODE_FAILED,
+    )
+
+
+@receiver(video_status_changed, sender=Video)
+def add_video_to_edx(sender, video, from_status, to_status, **kwargs):
+    """
+    If a Video has just become COMPLETE, we can now post the video to edx if configured.
+    """
+    if (
+        to_status == VideoStatus.COMPLETE
+        and video.collection.edx_course_id
+        and not _is_rescheduled(from_status, to_status)
+    ):
+        outbox.enqueue(ovs_tasks.post_video_to_edx.si(video.id))
+
+
+@receiver(video_status_changed, sender=Video)
+def send_status_notification(sender, video, from_status, to_status, **kwargs):
+    """
+    Email the video's admins about statuses they need to know about
+    """
+    if to_status in mail_tasks.STATUS_TO_NOTIFICATION and not _is_rescheduled(
+        from_status, to_status
+    ):
+        outbox.enqueue(mail_tasks.async_send_notification_email.si(video.id))
+
+
+def _bump_public_catalogue():
+    """Invalidate cached public video lists once the current transaction commits"""
+    if caching.public_video_cache_enabled():
+        transaction.on_commit(caching.bump_public_catalogue_version)
+
+
+@receiver(post_save, sender=Video)
+def bump_public_catalogue_on_video_save(sender, instance, **kwargs):
+    """
+    Invalidate cached public video lists when a public video changes, or a video is
+    made public or private
+    """
+    if instance.is_public or "is_public" in instance.saved_changes:
+        _bump_public_catalogue()
+
+
+@receiver(post_delete, sender=Video)
+def bump_public_catalogue_on_video_delete(sender, instance, **kwargs):
+    """
+    Invalidate cached public video lists when a public video is deleted
+    """
+    if instance.is_public:
+        _bump_public_catalogue()
+
+
+@receiver(video_status_changed, sender=Video)
+def bump_public_catalogue_on_status_change(sender, video, **kwargs):
+    """
+    Invalidate cached public video lists when the status of a public video changes
+    """
+    if video.is_public:
+        _bump_public_catalogue()
+
+
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+@receiver(post_save, sender=VideoFile)
+@receiver(post_delete, sender=VideoFile)
+@receiver(post_save, sender=VideoThumbnail)
+@receiver(post_delete, sender=VideoThumbnail)
+@receiver(post_save, sender=VideoSubtitle)
+@receiver(post_delete, sender=VideoSubtitle)
+@receiver(post_save, sender=YouTubeVideo)
+@receiver(post_delete, sender=YouTubeVideo)
+def bump_public_catalogue(sender, **kwargs):
+    """
+    Invalidate cached public video lists when anything embedded in them changes
+    """
+    _bump_public_catalogue()
+
+
+@receiver(post_delete, sender=Video)
+def record_deleted_video_tombstone(sender, instance, **kwargs):
+    """
+    Record that a deleted public video left the export feed
+    """
+    if instance.is_public:
+        export.record_tombstones([instance.key])
+
+
 @receiver(post_save, sender=Video)
-def add_video_to_edx(sender, instance, created, **kwargs):
+@depends_on("is_public", "collection_id")
+def record_unpublished_video_tombstone(sender, instance, created, **kwargs):
+    """
+    Record that a video left the export feed when it's made private or moved to a
+    collection which isn't included in MIT Learn
+    """
+    if not created and not (
+        instance.is_public and instance.collection.include_in_learn
+    ):
+        export.record_tombstones([instance.key])
+
+
+@receiver(post_save, sender=Collection)
+@depends_on("include_in_learn")
+def record_collection_tombstones(sender, instance, created, **kwargs):
+    """
+    Record that the public videos of a collection left the export feed when the
+    collection is no longer included in MIT Learn
+    """
+    if not created and not instance.include_in_learn:
+        export.record_tombstones(
+            instance.videos.filter(is_public=True).values_list("key", flat=True)
+        )
+
+
+@receiver(post_save, sender=VideoSubtitle)
+@receiver(post_delete, sender=VideoSubtitle)
+@receiver(post_save, sender=VideoRendition)
+@receiver(post_delete, sender=VideoRendition)
+def touch_video(sender, instance, **kwargs):
+    """
+    Update a video's updated_at when one of its subtitles or renditions changes, so
+    the next incremental export has the video again and its cached pages are
+    rebuilt. Changes to files, thumbnails and YouTube uploads update it already, by
+    refreshing the playback manifest.
+    """
+    Video.objects.filter(pk=instance.video_id).update()
+
+
+@receiver(m2m_changed, sender=Video.view_lists.through)
+@receiver(m2m_changed, sender=Collection.view_lists.through)
+@receiver(m2m_changed, sender=Collection.admin_lists.through)
+def touch_on_lists_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
     """
-    If a Video was updated with a status of COMPLETE, we can now post the video to edx if configured.
+    Update the updated_at of videos and collections whose lists changed, since the
+    lists are shown on the cached video pages
     """
-    if instance.status == VideoStatus.COMPLETE and instance.collection.edx_course_id:
-        ovs_tasks.post_video_to_edx.delay(instance.id)
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        type(instance).objects.filter(pk=instance.pk).update()
+    elif pk_set:
+        model.objects.filter(pk__in=pk_set).update()
 
 
 def sync_youtube(video):
@@ -1,5 +1,7 @@
 """Test model signals"""
 
+from unittest.mock import call
+
 import factory
 import pytest
 
@@ -7,12 +9,14 @@ from ui.constants import StreamSource, VideoStatus, YouTubeStatus
 from ui.encodings import EncodingNames
 from ui.factories import (
     CollectionFactory,
+    KeycloakGroupFactory,
     VideoFactory,
     VideoFileFactory,
     VideoSubtitleFactory,
     YouTubeVideoFactory,
 )
 from ui.models import Video
+from ui.tasks import post_video_to_edx
 
 pytestmark = pytest.mark.django_db
 
@@ -87,6 +91,8 @@ def test_youtube_sync_redo_failed(mocker, video_with_file, status):
     """Test that an existing youtube video is deleted if it has a bad status"""
     mock_delete = mocker.patch("ui.signals.YouTubeVideo.delete")
     YouTubeVideoFactory(video=video_with_file, status=status)
+    Video.objects.filter(id=video_with_file.id).update(is_public=False)
+    video_with_file.refresh_from_db()
     video_with_file.is_public = True
     video_with_file.save()
     expected_count = 0 if status == YouTubeStatus.UPLOADED else 1
@@ -95,11 +101,11 @@ def test_youtube_sync_redo_failed(mocker, video_with_file, status):
 
 @pytest.mark.parametrize("edx_course_id", ["123", "", None])
 def test_edx_video_file_signal(mocker, edx_course_id):
-    """When a Video is saved with the status of COMPLETE, a task to add the video to edX should be called"""
-    patched_edx_task = mocker.patch("ui.signals.ovs_tasks.post_video_to_edx.delay")
+    """When a Video becomes COMPLETE, a task to add the video to edX should be called"""
+    patched_enqueue = mocker.patch("ui.signals.outbox.enqueue")
 
     collection = CollectionFactory(edx_course_id=edx_course_id)
-    video = VideoFactory(status=VideoStatus.CREATED, collection=collection)
+    video = VideoFactory(status=VideoStatus.TRANSCODING, collection=collection)
     VideoFileFactory.create_batch(
         3,
         encoding=factory.Iterator(
@@ -108,12 +114,15 @@ def test_edx_video_file_signal(mocker, edx_course_id):
         s3_object_key=factory.Iterator([1, 2, 3]),
         video=video,
     )
-    video.status = VideoStatus.COMPLETE
+    video.update_status(VideoStatus.COMPLETE)
+    # Saving a video that's already COMPLETE doesn't post it again
     video.save()
-    if not edx_course_id:
-        patched_edx_task.assert_not_called()
-    else:
-        patched_edx_task.assert_called_once_with(video.id)
+    edx_post = post_video_to_edx.si(video.id)
+    assert [
+        enqueue_call
+        for enqueue_call in patched_enqueue.call_args_list
+        if enqueue_call == call(edx_post)
+    ] == ([call(edx_post)] if edx_course_id else [])
 
 
 @pytest.mark.parametrize("retranscode_enabled", [True, False])
@@ -161,3 +170,81 @@ def test_set_video_is_public_from_collection(
         source_url="https://example.com/test.mp4",
     )
     assert Video.objects.get(pk=video.pk).is_public is expected_is_public
+
+
+def test_playback_manifest_follows_files(mocker, video_with_file):
+    """Saving or deleting a video file should rebuild the video's playback manifest"""
+    mocker.patch("ui.models.delete_s3_objects")
+    hls_file = VideoFileFactory(
+        video=video_with_file, encoding=EncodingNames.HLS, s3_object_key="video.m3u8"
+    )
+    assert Video.objects.get(id=video_with_file.id).playback_manifest["hls"] == (
+        hls_file.s3_object_key
+    )
+    hls_file.delete()
+    assert Video.objects.get(id=video_with_file.id).playback_manifest["hls"] is None
+
+
+def test_playback_manifest_follows_stream_source(video_with_file):
+    """Changing a collection's stream source should rebuild its videos' manifests"""
+    collection = video_with_file.collection
+    collection.stream_source = StreamSource.YOUTUBE
+    collection.save()
+    assert (
+        Video.objects.get(id=video_with_file.id).playback_manifest["stream_source"]
+        == StreamSource.YOUTUBE
+    )
+
+
+def test_collection_title_save_skips_receivers(settings, django_assert_num_queries):
+    """Saving a collection without changing tracked fields should not touch its videos"""
+    settings.FEATURES["RETRANSCODE_ENABLED"] = True
+    collection = CollectionFactory()
+    VideoFactory.create_batch(5, collection=collection, is_public=True)
+    collection.title = "New title"
+    with django_assert_num_queries(1):
+        collection.save()
+    assert collection.saved_changes == set()
+
+
+def test_collection_stream_source_save(mocker):
+    """Changing the stream source should only delete YouTube versions of public videos"""
+    mock_delete = mocker.patch("ui.signals.YouTubeVideo.delete")
+    collection = CollectionFactory(stream_source=StreamSource.YOUTUBE)
+    YouTubeVideoFactory.create_batch(
+        2, video__collection=collection, video__is_public=True
+    )
+    YouTubeVideoFactory(video__collection=collection, video__is_public=False)
+    collection.stream_source = StreamSource.CLOUDFRONT
+    collection.save()
+    assert collection.saved_changes == {"stream_source"}
+    assert mock_delete.call_count == 2
+
+
+def test_video_title_save_skips_youtube_sync(
+    video_with_file, django_assert_num_queries
+):
+    """Saving a video without changing is_public should not look up its YouTube video"""
+    video = Video.objects.get(id=video_with_file.id)
+    video.title = "New title"
+    # full_clean() checks the collection and the unique key, then the row is updated
+    with django_assert_num_queries(3):
+        video.save()
+    assert video.saved_changes == set()
+
+
+def test_lists_change_touches_video_and_collection():
+    """Changing the lists of a video or collection should update its updated_at"""
+    video = VideoFactory()
+    group = KeycloakGroupFactory()
+    for obj, lists in (
+        (video, video.view_lists),
+        (video.collection, video.collection.admin_lists),
+    ):
+        updated_at = type(obj).objects.get(pk=obj.pk).updated_at
+        lists.add(group)
+        assert type(obj).objects.get(pk=obj.pk).updated_at > updated_at
+
+    updated_at = Video.objects.get(pk=video.pk).updated_at
+    group.video_view_lists.remove(video)
+    assert Video.objects.get(pk=video.pk).updated_at > updated_at
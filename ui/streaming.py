@@ -0,0 +1,113 @@
+"""
+Streaming JSON rendering of paginated list responses
+"""
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from odl_video.json_backend import dumps
+
+STREAM_QUERY_PARAM = "stream"
+# Rendered rows are sent in chunks of at least this many bytes
+STREAM_BUFFER_SIZE = 64 * 1024
+RESULTS_PLACEHOLDER = object()
+
+
+def stream_json(envelope, rows, serialize):
+    """
+    Render a paginated response as JSON, one row at a time
+
+    Args:
+        envelope (dict): The paginated response data, with RESULTS_PLACEHOLDER in
+            place of the list of results
+        rows (iterable): The rows of the page
+        serialize (callable): A function which returns the data of a row, or None
+            if the rows are already data
+
+    Yields:
+        bytes: Chunks of the JSON response
+    """
+    separator = b"," if api_settings.COMPACT_JSON else b", "
+    colon = b":" if api_settings.COMPACT_JSON else b": "
+    buffer = [b"{"]
+    size = 0
+    for index, (key, value) in enumerate(envelope.items()):
+        if index:
+            buffer.append(separator)
+        buffer.extend([dumps(key), colon])
+        if value is not RESULTS_PLACEHOLDER:
+            buffer.append(dumps(value))
+            continue
+        buffer.append(b"[")
+        for row_index, row in enumerate(rows):
+            if row_index:
+                buffer.append(separator)
+            chunk = dumps(row if serialize is None else serialize(row))
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_BUFFER_SIZE:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+        buffer.append(b"]")
+    buffer.append(b"}")
+    yield b"".join(buffer)
+
+
+class StreamingListMixin:
+    """
+    Adds a streaming mode to a paginated list view. With ?stream=true, the page is
+    read from the database in chunks and its rows are serialized and sent one at a
+    time, instead of the whole page being built in memory and rendered at once.
+    The response has the same content as the regular one.
+
+    Views with a projection_class (see ui.projections) build their list payloads
+    with it instead of their serializer, whether or not they are streamed.
+    """
+
+    stream_chunk_size = settings.API_STREAM_CHUNK_SIZE
+    projection_class = None
+
+    def is_streaming(self, request):
+        """Return True if the list should be streamed"""
+        return (
+            request.query_params.get(STREAM_QUERY_PARAM) == "true"
+            and isinstance(request.accepted_renderer, JSONRenderer)
+            and self.paginator is not None
+        )
+
+    def get_projection(self):
+        """Return the projection of the listed rows, or None to use the serializer"""
+        if self.projection_class is None:
+            return None
+        return self.projection_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        projection = self.get_projection()
+        streaming = self.is_streaming(request)
+        if projection is None and not streaming:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is None:
+            return Response(projection.project(queryset))
+        page = self.paginator.paginate_queryset_lazily(queryset, request, view=self)
+        if not streaming:
+            return self.paginator.get_paginated_response(projection.project(page))
+
+        envelope = self.paginator.get_paginated_response(RESULTS_PLACEHOLDER).data
+        if projection is None:
+            serializer = self.get_serializer_class()(
+                context=self.get_serializer_context()
+            )
+            rows = page.iterator(chunk_size=self.stream_chunk_size)
+            serialize = serializer.to_representation
+        else:
+            rows = projection.iterate(page, self.stream_chunk_size)
+            serialize = None
+        return StreamingHttpResponse(
+            stream_json(envelope, rows, serialize), content_type="application/json"
+        )
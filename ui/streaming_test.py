@@ -0,0 +1,30 @@
+"""
+Tests for streaming JSON rendering
+"""
+
+import json
+
+from ui import streaming
+from ui.streaming import RESULTS_PLACEHOLDER, stream_json
+
+
+def test_stream_json(mocker):
+    """stream_json should render the envelope with the rows in place of the results"""
+    mocker.patch.object(streaming, "STREAM_BUFFER_SIZE", 10)
+    envelope = {"count": 3, "next": None, "results": RESULTS_PLACEHOLDER, "end": 3}
+    rows = iter([1, 2, 3])
+
+    chunks = list(stream_json(envelope, rows, lambda row: {"title": "x" * row}))
+    assert len(chunks) == 4
+    assert json.loads(b"".join(chunks)) == {
+        "count": 3,
+        "next": None,
+        "results": [{"title": "x"}, {"title": "xx"}, {"title": "xxx"}],
+        "end": 3,
+    }
+
+
+def test_stream_json_empty():
+    """stream_json should render an empty page"""
+    chunks = list(stream_json({"results": RESULTS_PLACEHOLDER}, [], dict))
+    assert chunks == [b'{"results":[]}']
@@ -7,6 +7,7 @@ from itertools import groupby
 import celery
 import structlog
 from celery import shared_task
+from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
 
@@ -41,6 +42,34 @@ def post_video_to_edx(video_id):
     ]
 
 
+@app.task
+def dispatch_upload_chains(video_ids):
+    """
+    Send the upload chains of imported videos a chunk at a time, so that a large
+    import doesn't hit Dropbox and S3 with every transfer at once. The remaining
+    videos are handed to another dispatch_upload_chains task, scheduled
+    DROPBOX_IMPORT_DISPATCH_INTERVAL seconds later.
+
+    Args:
+        video_ids (list of int): The ids of the videos to upload
+    """
+    chunk_size = max(1, settings.DROPBOX_IMPORT_DISPATCH_CHUNK_SIZE)
+    chunk, remaining = video_ids[:chunk_size], video_ids[chunk_size:]
+    with app.producer_or_acquire() as producer:
+        for video_id in chunk:
+            ovs_api.upload_chain(video_id).apply_async(producer=producer)
+        if remaining:
+            dispatch_upload_chains.si(remaining).apply_async(
+                countdown=settings.DROPBOX_IMPORT_DISPATCH_INTERVAL,
+                producer=producer,
+            )
+    log.info(
+        "Dispatched upload chains",
+        count=len(chunk),
+        remaining=len(remaining),
+    )
+
+
 @app.task
 def batch_update_video_on_edx(video_keys, chunk_size=1000):
     """
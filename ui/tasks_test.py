@@ -48,6 +48,34 @@ def test_post_video_to_edx_missing(mocker):
     patched_api_method.assert_not_called()
 
 
+def test_dispatch_upload_chains(mocker, settings):
+    """dispatch_upload_chains should send a chunk of upload chains and schedule
+    another task for the rest"""
+    settings.DROPBOX_IMPORT_DISPATCH_CHUNK_SIZE = 2
+    settings.DROPBOX_IMPORT_DISPATCH_INTERVAL = 30
+    upload_chain = mocker.patch("ui.tasks.ovs_api.upload_chain")
+    dispatch = mocker.patch("ui.tasks.dispatch_upload_chains.si")
+    tasks.dispatch_upload_chains([1, 2, 3, 4, 5])
+
+    assert [call.args for call in upload_chain.call_args_list] == [(1,), (2,)]
+    assert upload_chain.return_value.apply_async.call_count == 2
+    dispatch.assert_called_once_with([3, 4, 5])
+    dispatch.return_value.apply_async.assert_called_once_with(
+        countdown=30, producer=mocker.ANY
+    )
+
+
+def test_dispatch_upload_chains_last_chunk(mocker, settings):
+    """dispatch_upload_chains shouldn't schedule another task after the last chunk"""
+    settings.DROPBOX_IMPORT_DISPATCH_CHUNK_SIZE = 2
+    upload_chain = mocker.patch("ui.tasks.ovs_api.upload_chain")
+    dispatch = mocker.patch("ui.tasks.dispatch_upload_chains.si")
+    tasks.dispatch_upload_chains([1, 2])
+
+    assert upload_chain.call_count == 2
+    assert dispatch.call_count == 0
+
+
 @pytest.mark.django_db
 def test_batch_update_video_on_edx(mocker):
     """
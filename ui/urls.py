@@ -73,6 +73,26 @@ urlpatterns = [
         views.ReplaceVideoFromDropbox.as_view(),
         name="replace-video",
     ),
+    path(
+        "api/v0/direct_uploads/",
+        views.StartDirectUpload.as_view(),
+        name="direct-upload-start",
+    ),
+    path(
+        "api/v0/direct_uploads/parts/",
+        views.PresignDirectUploadParts.as_view(),
+        name="direct-upload-parts",
+    ),
+    path(
+        "api/v0/direct_uploads/complete/",
+        views.CompleteDirectUpload.as_view(),
+        name="direct-upload-complete",
+    ),
+    path(
+        "api/v0/direct_uploads/abort/",
+        views.AbortDirectUpload.as_view(),
+        name="direct-upload-abort",
+    ),
     path(
         "api/v0/upload_subtitles/",
         views.UploadVideoSubtitle.as_view(),
@@ -88,6 +108,11 @@ urlpatterns = [
         views.PublicVideoListView.as_view(),
         name="public-video-list",
     ),
+    path(
+        "api/v0/public/videos/export/",
+        views.PublicVideoExportView.as_view(),
+        name="public-video-export",
+    ),
     path("api/v0/", include((router.urls, "models-api"))),
     re_path(
         r"^api/v0/groups/user/(?P<username_or_email>[-\w]+$|.*@.*)$",
@@ -1,6 +1,7 @@
 """Views for ui app"""
 
-import json
+import abc
+from functools import cache, partial
 from urllib.parse import urlencode
 
 import django_filters.rest_framework
@@ -10,11 +11,18 @@ from django.contrib.auth import get_user_model, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.views import LoginView as DjangoLoginView
 from django.contrib.auth.views import redirect_to_login
+from django.contrib.messages import get_messages
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.db.models import Prefetch, Q
-from django.http import Http404, HttpResponse
-from django.shortcuts import get_list_or_404, get_object_or_404, redirect, render
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_http_date
 from django.views import View
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.generic import TemplateView
@@ -29,55 +37,64 @@ from rest_framework import (
 from rest_framework.decorators import action
 from rest_framework.filters import OrderingFilter
 from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from cloudsync import api as cloudapi
-from cloudsync.tasks import upload_youtube_caption
-from techtv2ovs.models import TechTVVideo
-from ui import api, serializers
+from cloudsync import direct_upload, progress
+from cloudsync.exceptions import DirectUploadError
+from cloudsync.tasks import process_thumbnail_upload, upload_youtube_caption
+from odl_video.json_backend import dumps_for_script
+from techtv2ovs.resolver import resolve_private_token, resolve_ttv_id
+from ui import api, caching, export, serializers
 from ui import permissions as ui_permissions
-from ui.constants import EDX_ADMIN_GROUP, VideoStatus
-from ui.encodings import EncodingNames
+from ui.constants import EDX_ADMIN_GROUP, VideoStatus, ViewerTier
 from ui.filters import CollectionFilter, PublicVideoFilter
 from ui.models import (
     Collection,
     CollectionEdxEndpoint,
     EdxEndpoint,
     Video,
-    VideoFile,
     VideoSubtitle,
+    cloudfront_url_for_key,
 )
 from ui.pagination import CollectionSetPagination, VideoSetPagination
+from ui.projections import (
+    CollectionListProjection,
+    PublicVideoProjection,
+    VideoProjection,
+)
 from ui.serializers import UserSerializer, VideoSerializer
+from ui.streaming import StreamingListMixin
 from ui.tasks import post_collection_videos_to_edx
-from ui.templatetags.render_bundle import public_path
+from ui.templatetags.render_bundle import ensure_trailing_slash, public_path
 from ui.utils import (
     generate_mock_video_analytics_data,
     get_video_analytics,
     list_members,
+    now_in_utc,
     query_lists,
 )
 
 log = structlog.get_logger(__name__)
 
 
-def default_js_settings(request):
-    """Default JS settings for views"""
+@cache
+def _static_js_settings():
+    """
+    The JS settings which are the same for every request. They are built once per
+    process, and rebuilt when a setting changes (i.e. in tests).
+    """
     return {
         "gaTrackingID": settings.GA_TRACKING_ID,
         "environment": settings.ENVIRONMENT,
         "sentry_dsn": settings.SENTRY_DSN,
         "release_version": settings.VERSION,
-        "public_path": public_path(request),
+        "public_path": None
+        if settings.USE_WEBPACK_DEV_SERVER
+        else ensure_trailing_slash(static("bundles/")),
         "cloudfront_base_url": settings.VIDEO_CLOUDFRONT_BASE_URL,
-        "user": request.user.username if request.user.is_authenticated else None,
-        "email": request.user.email if request.user.is_authenticated else None,
-        "is_app_admin": (
-            (request.user.is_superuser or request.user.is_staff)
-            if request.user.is_authenticated
-            else False
-        ),
         "support_email_address": settings.EMAIL_SUPPORT,
         "ga_dimension_camera": settings.GA_DIMENSION_CAMERA,
         "thumbnail_upload_max_size": settings.THUMBNAIL_UPLOAD_MAX_SIZE,
@@ -88,6 +105,44 @@ def default_js_settings(request):
     }
 
 
+@receiver(setting_changed)
+def _clear_static_js_settings(**kwargs):  # pylint: disable=unused-argument
+    """Rebuild the static JS settings after a setting is changed"""
+    _static_js_settings.cache_clear()
+
+
+def default_js_settings(request):
+    """Default JS settings for views"""
+    js_settings = {
+        **_static_js_settings(),
+        "user": request.user.username if request.user.is_authenticated else None,
+        "email": request.user.email if request.user.is_authenticated else None,
+        "is_app_admin": (
+            (request.user.is_superuser or request.user.is_staff)
+            if request.user.is_authenticated
+            else False
+        ),
+    }
+    if js_settings["public_path"] is None:
+        # The webpack dev server URL depends on the request's host
+        js_settings["public_path"] = public_path(request)
+    return js_settings
+
+
+def js_settings_json(request, **extra):
+    """
+    Render the JS settings for a page
+
+    Args:
+        request (django.http.request.HttpRequest): The request for the page
+        **extra: Settings specific to the page
+
+    Returns:
+        str: The settings as JSON which is safe to put inside a <script> element
+    """
+    return dumps_for_script({**default_js_settings(request), **extra})
+
+
 def conditional_response(view, video=None, **kwargs):
     """
     Redirect to login page if user is anonymous and video is private.
@@ -95,18 +150,134 @@ def conditional_response(view, video=None, **kwargs):
     Otherwise, return standard template response.
 
     Args:
-        view(TemplateView): a video-specific View object (ViewDetail, ViewEmbed, etc).
+        view(VideoPageMixin): a video-specific View object (ViewDetail, ViewEmbed, etc).
         video(ui.models.Video): a video to display with the view
 
     Returns:
-        TemplateResponse: the template response to render
+        HttpResponse: the rendered page
     """
     if not ui_permissions.has_video_view_permission(video, view.request):
         if view.request.user.is_authenticated:
             raise PermissionDenied
         return redirect_to_login(view.request.get_full_path())
-    context = view.get_context_data(video, **kwargs)
-    return view.render_to_response(context)
+    return view.render_video_page(video, **kwargs)
+
+
+def viewer_tier(video, request):
+    """
+    Get the kind of viewer a request is from, for a video page
+
+    Args:
+        video (ui.models.Video): The video of the page
+        request (django.http.request.HttpRequest): The request
+
+    Returns:
+        str: The ViewerTier
+    """
+    if not request.user.is_authenticated:
+        return ViewerTier.ANONYMOUS
+    if ui_permissions.has_admin_permission(video.collection, request):
+        return ViewerTier.ADMIN
+    return ViewerTier.USER
+
+
+class VideoPageMixin(metaclass=abc.ABCMeta):
+    """
+    Renders a page about a video. What the page shows about the video only depends
+    on the video and the ViewerTier of the viewer, so it's cached (see
+    caching.video_page_version). Pages of public videos are rendered once for every
+    anonymous viewer, and may be cached by browsers and CDNs. Other pages have an
+    ETag, so browsers can revalidate them.
+    """
+
+    page_name = None
+
+    @abc.abstractmethod
+    def get_video_js_settings(self, video, tier):
+        """
+        Build the JS settings which are specific to the video
+
+        Args:
+            video (ui.models.Video): The video
+            tier (str): The ViewerTier of the viewer
+
+        Returns:
+            dict: The settings
+        """
+
+    def get_context_data(self, video, tier, **kwargs):
+        context = super().get_context_data(**kwargs)
+        build = partial(self.get_video_js_settings, video, tier)
+        video_js_settings = (
+            caching.get_or_build_video_page(
+                caching.video_page_cache_key(self.page_name, video, tier), build
+            )
+            if caching.video_page_cache_enabled()
+            else build()
+        )
+        context["js_settings_json"] = js_settings_json(
+            self.request, **video_js_settings
+        )
+        return context
+
+    def render_page(self, video, tier, **kwargs):
+        """
+        Render the page
+
+        Returns:
+            TemplateResponse: The rendered page
+        """
+        response = self.render_to_response(self.get_context_data(video, tier, **kwargs))
+        return response.render()
+
+    def render_page_entry(self, video, tier, **kwargs):
+        """
+        Render the page to be cached
+
+        Returns:
+            dict: The content of the page and its ETag
+        """
+        content = self.render_page(video, tier, **kwargs).content
+        return {"content": content, "etag": caching.content_etag(content)}
+
+    def render_video_page(self, video, **kwargs):
+        """
+        Render the page, or get it from the cache, with caching headers. Only the
+        pages of public videos viewed anonymously, without flash messages, are cached.
+
+        Args:
+            video (ui.models.Video): The video, which the viewer may view
+
+        Returns:
+            HttpResponse: The page, or a 304 response if the viewer has it already
+        """
+        tier = viewer_tier(video, self.request)
+        # Pending flash messages are rendered into the page, so a page showing them
+        # is neither cached nor shared
+        public = (
+            tier == ViewerTier.ANONYMOUS
+            and video.is_public
+            and not len(get_messages(self.request))
+        )
+        if public and caching.video_page_cache_enabled():
+            entry = caching.get_or_build_video_page(
+                caching.video_page_cache_key(f"{self.page_name}.html", video, tier),
+                partial(self.render_page_entry, video, tier, **kwargs),
+            )
+            response = HttpResponse(entry["content"])
+            etag = entry["etag"]
+        else:
+            response = self.render_page(video, tier, **kwargs)
+            etag = caching.content_etag(response.content)
+
+        response.headers["ETag"] = etag
+        if public:
+            patch_cache_control(
+                response, public=True, max_age=settings.VIDEO_PAGE_MAX_AGE
+            )
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(self.request, etag=etag, response=response)
 
 
 def index(request):
@@ -122,15 +293,13 @@ class CollectionReactView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["js_settings_json"] = json.dumps(
-            {
-                **default_js_settings(self.request),
-                "is_edx_course_admin": (
-                    self.request.user.is_authenticated
-                    and self.request.user.groups.filter(name=EDX_ADMIN_GROUP).exists()
-                ),
-                "dropbox_key": settings.DROPBOX_KEY,
-            }
+        context["js_settings_json"] = js_settings_json(
+            self.request,
+            is_edx_course_admin=(
+                self.request.user.is_authenticated
+                and self.request.user.groups.filter(name=EDX_ADMIN_GROUP).exists()
+            ),
+            dropbox_key=settings.DROPBOX_KEY,
         )
         return context
 
@@ -145,54 +314,49 @@ class CollectionReactView(TemplateView):
         return super().get(request, *args, **kwargs)
 
 
-class VideoDetail(TemplateView):
+class VideoDetail(VideoPageMixin, TemplateView):
     """
     Details of a video
     """
 
     template_name = "ui/video_detail.html"
+    page_name = "detail"
 
     def get(self, request, *args, **kwargs):
-        video = get_object_or_404(Video, key=kwargs["video_key"])
-        self.get_context_data(video, **kwargs)
+        video = get_object_or_404(
+            Video.objects.select_related("collection"), key=kwargs["video_key"]
+        )
         return conditional_response(self, video, *args, **kwargs)
 
-    def get_context_data(self, video, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["js_settings_json"] = json.dumps(
-            {
-                **default_js_settings(self.request),
-                "videoKey": video.key.hex,
-                "is_video_admin": ui_permissions.has_admin_permission(
-                    video.collection, self.request
-                ),
-                "dropbox_key": settings.DROPBOX_KEY,
-            }
-        )
-        return context
+    def get_video_js_settings(self, video, tier):
+        return {
+            "videoKey": video.key.hex,
+            "is_video_admin": tier == ViewerTier.ADMIN,
+            "dropbox_key": settings.DROPBOX_KEY,
+        }
 
 
 @method_decorator(xframe_options_exempt, name="dispatch")
-class VideoEmbed(TemplateView):
+class VideoEmbed(VideoPageMixin, TemplateView):
     """Display embedded video"""
 
     template_name = "ui/video_embed.html"
+    page_name = "embed"
 
     def get(self, request, *args, **kwargs):
-        video = get_object_or_404(Video, key=kwargs["video_key"])
+        video = get_object_or_404(
+            Video.objects.select_related("collection"), key=kwargs["video_key"]
+        )
         return conditional_response(self, video, *args, **kwargs)
 
-    def get_context_data(self, video, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get_context_data(self, video, tier, **kwargs):
+        context = super().get_context_data(video, tier, **kwargs)
         context["video"] = video
-        context["js_settings_json"] = json.dumps(
-            {
-                **default_js_settings(self.request),
-                "video": VideoSerializer(video).data,
-            }
-        )
         return context
 
+    def get_video_js_settings(self, video, tier):
+        return {"video": VideoSerializer(video).data}
+
 
 class VideoDownload(View):
     """
@@ -209,10 +373,10 @@ class VideoDownload(View):
         Returns:
             HttpResponseRedirect: redirect to the cloudfront URL for the video download
         """
-        video_file = video.download
-        if not video_file:
+        download = video.manifest["download"]
+        if not download:
             raise Http404()
-        return redirect(video_file.cloudfront_url)
+        return redirect(cloudfront_url_for_key(download["key"]))
 
     def get(self, request, *args, **kwargs):
         """
@@ -225,16 +389,36 @@ class VideoDownload(View):
         return self.download(video)
 
 
+def techtv_video_or_404(ttv_id, **filters):
+    """
+    Get the video imported from a TechTV id in a legacy URL
+
+    Args:
+        ttv_id (str): The TechTV id
+        **filters: Other conditions the video must meet
+
+    Returns:
+        Video: The video, with its collection
+
+    Raises:
+        Http404: If there's no such video
+    """
+    video_key = resolve_ttv_id(ttv_id)
+    if video_key is None:
+        raise Http404
+    return get_object_or_404(
+        Video.objects.select_related("collection"), key=video_key, **filters
+    )
+
+
 class TechTVDetail(VideoDetail):
     """
     Video detail page for a TechTV-based URL
     """
 
     def get(self, request, *args, **kwargs):
-        ttv_videos = get_list_or_404(
-            TechTVVideo.objects.filter(ttv_id=kwargs["video_key"])
-        )
-        return conditional_response(self, ttv_videos[0].video, *args, **kwargs)
+        video = techtv_video_or_404(kwargs["video_key"])
+        return conditional_response(self, video, *args, **kwargs)
 
 
 class TechTVPrivateDetail(VideoDetail):
@@ -243,10 +427,10 @@ class TechTVPrivateDetail(VideoDetail):
     """
 
     def get(self, request, *args, **kwargs):
-        ttv_videos = get_list_or_404(
-            TechTVVideo.objects.filter(private_token=kwargs["video_key"])
-        )
-        return conditional_response(self, ttv_videos[0].video, *args, **kwargs)
+        video = resolve_private_token(kwargs["video_key"])
+        if video is None:
+            raise Http404
+        return conditional_response(self, video, *args, **kwargs)
 
 
 @method_decorator(xframe_options_exempt, name="dispatch")
@@ -256,10 +440,8 @@ class TechTVEmbed(VideoEmbed):
     """
 
     def get(self, request, *args, **kwargs):
-        ttv_videos = get_list_or_404(
-            TechTVVideo.objects.filter(ttv_id=kwargs["video_key"])
-        )
-        return conditional_response(self, ttv_videos[0].video, *args, **kwargs)
+        video = techtv_video_or_404(kwargs["video_key"])
+        return conditional_response(self, video, *args, **kwargs)
 
 
 class TechTVDownload(VideoDownload):
@@ -268,13 +450,7 @@ class TechTVDownload(VideoDownload):
     """
 
     def get(self, request, *args, **kwargs):
-        ttv_videos = get_list_or_404(
-            Video.objects.filter(techtvvideo__ttv_id=kwargs["video_key"]).filter(
-                is_public=True
-            )
-        )
-        video = ttv_videos[0]
-        return self.download(video)
+        return self.download(techtv_video_or_404(kwargs["video_key"], is_public=True))
 
 
 class HelpPageView(TemplateView):
@@ -284,8 +460,7 @@ class HelpPageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        js_settings = default_js_settings(self.request)
-        context["js_settings_json"] = json.dumps(js_settings)
+        context["js_settings_json"] = js_settings_json(self.request)
         return context
 
 
@@ -296,8 +471,7 @@ class TermsOfServicePageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        js_settings = default_js_settings(self.request)
-        context["js_settings_json"] = json.dumps(js_settings)
+        context["js_settings_json"] = js_settings_json(self.request)
         return context
 
 
@@ -361,6 +535,109 @@ class ReplaceVideoFromDropbox(APIView):
         return Response(data=response_data, status=status.HTTP_202_ACCEPTED)
 
 
+class StartDirectUpload(APIView):
+    """
+    Start a direct upload of a local file to S3, see cloudsync.direct_upload
+    """
+
+    authentication_classes = (authentication.SessionAuthentication,)
+    permission_classes = (
+        permissions.IsAuthenticated,
+        ui_permissions.CanUploadToCollection,
+    )
+
+    def post(self, request):
+        """
+        Create a video and the multipart upload of its original file
+        """
+        serializer = serializers.DirectUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        collection = get_object_or_404(Collection, key=data["collection"])
+        try:
+            response_data = direct_upload.start_direct_upload(
+                collection, data["filename"], data["size"], data["content_type"]
+            )
+        except DirectUploadError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data=response_data, status=status.HTTP_201_CREATED)
+
+
+class DirectUploadView(APIView, metaclass=abc.ABCMeta):
+    """
+    Base class for the views of a direct upload in progress, which is described by
+    the token returned when it was started
+    """
+
+    authentication_classes = (authentication.SessionAuthentication,)
+    permission_classes = (
+        permissions.IsAuthenticated,
+        ui_permissions.HasVideoPermissions,
+    )
+    serializer_class = serializers.DirectUploadTokenSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = direct_upload.load_upload(serializer.validated_data["token"])
+            video = get_object_or_404(Video, key=upload["video"])
+            self.check_object_permissions(request, video)
+            return self.handle_upload(upload, serializer.validated_data)
+        except DirectUploadError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @abc.abstractmethod
+    def handle_upload(self, upload, data):
+        """
+        Act on the upload
+
+        Args:
+            upload (dict): The description of the upload
+            data (dict): The validated request data
+
+        Returns:
+            Response: The response
+        """
+
+
+class PresignDirectUploadParts(DirectUploadView):
+    """
+    Presign the URLs of some parts of a direct upload
+    """
+
+    serializer_class = serializers.DirectUploadPartsSerializer
+
+    def handle_upload(self, upload, data):
+        parts = direct_upload.presign_parts(upload, data["part_numbers"])
+        return Response({"parts": parts})
+
+
+class CompleteDirectUpload(DirectUploadView):
+    """
+    Complete a direct upload and start transcoding the video
+    """
+
+    serializer_class = serializers.DirectUploadCompleteSerializer
+
+    def handle_upload(self, upload, data):
+        video = direct_upload.complete_direct_upload(upload, data["parts"])
+        return Response(
+            data=VideoSerializer(video, context={"request": self.request}).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class AbortDirectUpload(DirectUploadView):
+    """
+    Cancel a direct upload and delete its video
+    """
+
+    def handle_upload(self, upload, data):
+        direct_upload.abort_direct_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class UploadVideoSubtitle(APIView):
     """
     Class based view for uploading videos from dropbox to S3.
@@ -399,16 +676,18 @@ class UploadVideoSubtitle(APIView):
         )
 
 
-class PublicVideoListView(generics.ListAPIView):
+class PublicVideoListView(StreamingListMixin, generics.ListAPIView):
     """
     Public read-only endpoint listing all publicly accessible videos.
     No authentication required.
     Each video includes embedded collection details.
     Supports filtering by: title, description, status, collection (UUID),
     collection_title, stream_source, and a full-text `search` parameter.
+    Large pages can be streamed with ?stream=true.
     """
 
     serializer_class = serializers.PublicVideoSerializer
+    projection_class = PublicVideoProjection
     permission_classes = (permissions.AllowAny,)
     authentication_classes = ()
     pagination_class = VideoSetPagination
@@ -425,19 +704,87 @@ class PublicVideoListView(generics.ListAPIView):
             Video.objects.filter(is_public=True)
             .select_related("collection")
             .prefetch_related(
-                Prefetch(
-                    "videofile_set",
-                    queryset=VideoFile.objects.filter(encoding=EncodingNames.HLS),
-                    to_attr="hls_files",
-                ),
                 "videothumbnail_set",
                 "videosubtitle_set",
+                "videorendition_set",
                 "youtubevideo",
             )
         )
 
+    def list(self, request, *args, **kwargs):
+        """
+        Serve JSON responses from the public video cache, with an ETag and
+        Last-Modified date so that repeat requests can be answered with a 304.
+        Entries are keyed by the negotiated media type as well as the query, since
+        its parameters (e.g. indent) change the rendered content. Streamed and
+        browsable API responses aren't cached.
+        """
+        if (
+            not caching.public_video_cache_enabled()
+            or not isinstance(request.accepted_renderer, JSONRenderer)
+            or self.is_streaming(request)
+        ):
+            return super().list(request, *args, **kwargs)
+        try:
+            version, last_modified = caching.get_public_catalogue_version()
+            key = caching.public_video_list_cache_key(
+                request.query_params, request.accepted_media_type, version
+            )
+            entry = caching.get_cached_response(key)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Unable to read the public video cache")
+            return super().list(request, *args, **kwargs)
+
+        if entry is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = request.accepted_renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context(),
+            )
+            entry = caching.set_cached_response(key, content, last_modified)
+
+        response = HttpResponse(
+            entry["content"], content_type=request.accepted_media_type
+        )
+        response.headers["ETag"] = entry["etag"]
+        response.headers["Last-Modified"] = entry["last_modified"]
+        return get_conditional_response(
+            request,
+            etag=entry["etag"],
+            last_modified=parse_http_date(entry["last_modified"]),
+            response=response,
+        )
+
+
+class PublicVideoExportView(APIView):
+    """
+    Public read-only export of the videos included in MIT Learn, as NDJSON (see
+    ui.export). With ?updated_since=<ISO 8601 datetime>, only what changed since then
+    is exported, with tombstones for the videos removed from the feed.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
+
+    def get(self, request, *args, **kwargs):
+        updated_since = request.query_params.get("updated_since")
+        if updated_since:
+            try:
+                updated_since = export.parse_updated_since(updated_since)
+            except ValueError as exc:
+                return Response(
+                    {"updated_since": str(exc)}, status=status.HTTP_400_BAD_REQUEST
+                )
+        return StreamingHttpResponse(
+            export.export_videos(updated_since or None),
+            content_type=export.NDJSON_CONTENT_TYPE,
+        )
+
 
-class CollectionViewSet(viewsets.ModelViewSet):
+class CollectionViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     Implements all the REST views for the Collection Model.
     """
@@ -453,6 +800,7 @@ class CollectionViewSet(viewsets.ModelViewSet):
     )
     filterset_class = CollectionFilter
     ordering_fields = ("created_at", "title")
+    projection_class = CollectionListProjection
 
     def get_queryset(self):
         """
@@ -472,6 +820,28 @@ class CollectionViewSet(viewsets.ModelViewSet):
             return serializers.CollectionSerializer
         return serializers.CollectionListSerializer
 
+    @action(
+        detail=True,
+        url_path="upload_progress",
+        permission_classes=(
+            permissions.IsAuthenticated,
+            ui_permissions.IsCollectionAdmin,
+        ),
+    )
+    def upload_progress(self, request, key=None):
+        """
+        Stream the progress of the collection's uploads as Server-Sent Events
+        """
+        collection = self.get_object()
+        response = StreamingHttpResponse(
+            progress.collection_progress_events(collection.id),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Don't let nginx buffer the events
+        response["X-Accel-Buffering"] = "no"
+        return response
+
     def update(self, request, *args, **kwargs):
         """
         Adds EdxEndpoint to the collection if the edx_course_id is present in the request data
@@ -498,16 +868,17 @@ class CollectionViewSet(viewsets.ModelViewSet):
         return response
 
 
-class VideoViewSet(mixins.ListModelMixin, ModelDetailViewset):
+class VideoViewSet(StreamingListMixin, mixins.ListModelMixin, ModelDetailViewset):
     """
     Implements all the REST views for the Video Model.
     This viewset does not implement the `create`: Video objects need
-    to be created via other ways
+    to be created via other ways. Large pages can be streamed with ?stream=true.
     """
 
     lookup_field = "key"
     queryset = Video.objects.all()
     serializer_class = serializers.VideoSerializer
+    projection_class = VideoProjection
     authentication_classes = (authentication.SessionAuthentication,)
     permission_classes = (ui_permissions.HasVideoPermissions,)
     pagination_class = VideoSetPagination
@@ -519,7 +890,18 @@ class VideoViewSet(mixins.ListModelMixin, ModelDetailViewset):
     ordering = ("-created_at",)
 
     def get_queryset(self):
-        return Video.objects.all_viewable(self.request.user)
+        return (
+            Video.objects.all_viewable(self.request.user)
+            .select_related("collection", "collection__owner")
+            .prefetch_related(
+                "videofile_set",
+                "videothumbnail_set",
+                "videosubtitle_set",
+                "videorendition_set",
+                "view_lists",
+                "collection__view_lists",
+            )
+        )
 
     def filter_queryset(self, queryset):
         queryset = super().filter_queryset(queryset)
@@ -538,6 +920,11 @@ class VideoViewSet(mixins.ListModelMixin, ModelDetailViewset):
         """
         Replace the thumbnail image for this video.
         The existing S3 key is overwritten in-place so all URLs remain unchanged.
+
+        The image is processed by the process_thumbnail_upload task, and the response
+        is a 202 with the URL of the task's status. The task drops the image if a
+        newer upload was processed first. If THUMBNAIL_PROCESS_IN_BACKGROUND is False
+        it's converted to a single JPEG during the request instead.
         """
         video = self.get_object()
         thumbnail = video.videothumbnail_set.first()
@@ -568,6 +955,31 @@ class VideoViewSet(mixins.ListModelMixin, ModelDetailViewset):
                 {"error": f"The uploaded image is too large (max {size_str})."},
                 status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             )
+        if settings.THUMBNAIL_PROCESS_IN_BACKGROUND:
+            try:
+                cloudapi.check_thumbnail_image(thumbnail_file)
+            except ValueError as exc:
+                log.warning("Thumbnail upload validation failed", exc_info=exc)
+                return Response(
+                    {"error": "Invalid thumbnail data provided."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            uploaded_at = now_in_utc()
+            staged_key = cloudapi.stage_thumbnail_upload(video, thumbnail_file)
+            task = process_thumbnail_upload.delay(
+                video.id, staged_key, uploaded_at.isoformat()
+            )
+            return Response(
+                {
+                    "task_id": task.id,
+                    "status_url": reverse(
+                        "celery-task-status", kwargs={"task_id": task.id}
+                    ),
+                    "status": "processing",
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+
         try:
             if thumbnail:
                 cloudapi.replace_thumbnail_in_s3(thumbnail, thumbnail_file)
@@ -636,12 +1048,7 @@ def _handle_error_view(request, status_code):
         "error.html",
         status=status_code,
         context={
-            "js_settings_json": json.dumps(
-                {
-                    **default_js_settings(request),
-                    "status_code": status_code,
-                }
-            ),
+            "js_settings_json": js_settings_json(request, status_code=status_code),
         },
     )
 
@@ -672,11 +1079,7 @@ class LoginView(DjangoLoginView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["js_settings_json"] = json.dumps(
-            {
-                **default_js_settings(self.request),
-            }
-        )
+        context["js_settings_json"] = js_settings_json(self.request)
         context["use_keycloak"] = getattr(settings, "USE_KEYCLOAK", False)
         return context
 
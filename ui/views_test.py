@@ -2,18 +2,29 @@
 Tests for views
 """
 
+import io
 import json
 from types import SimpleNamespace
 from uuid import uuid4
 
 import pytest
 from django.contrib.auth.models import AnonymousUser, Group
+from django.contrib.messages import constants
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.http import HttpResponseRedirect
 from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.views.generic import TemplateView
+from PIL import Image
 from rest_framework import status
 from rest_framework.reverse import reverse
+from rest_framework.utils.urls import remove_query_param
 
+from cloudsync.exceptions import DirectUploadError
 from techtv2ovs.factories import TechTVVideoFactory
 from ui import factories
 from ui.constants import StreamSource, YouTubeStatus
@@ -24,19 +35,28 @@ from ui.factories import (
     UserFactory,
     VideoFactory,
     VideoFileFactory,
+    VideoRenditionFactory,
     VideoSubtitleFactory,
     VideoThumbnailFactory,
     YouTubeVideoFactory,
 )
-from ui.models import VideoSubtitle
+from ui.models import Video, VideoSubtitle
 from ui.pagination import CollectionSetPagination, VideoSetPagination
 from ui.serializers import DropboxUploadSerializer, VideoSerializer
 from ui.views import (
+    AbortDirectUpload,
     CollectionReactView,
+    CompleteDirectUpload,
+    DirectUploadView,
     HelpPageView,
+    PresignDirectUploadParts,
     TechTVDetail,
     TechTVEmbed,
     TermsOfServicePageView,
+    VideoDetail,
+    VideoEmbed,
+    VideoPageMixin,
+    VideoViewSet,
 )
 
 pytestmark = pytest.mark.django_db
@@ -203,6 +223,35 @@ def test_video_embed(logged_in_client, settings):
     }
 
 
+def test_video_embed_js_settings_escaped(logged_in_client):
+    """The JS settings should be safe to put inside a <script> element"""
+    client, user = logged_in_client
+    title = "</script><script>alert('&')</script>"
+    video = VideoFactory(collection__owner=user, title=title, status="Complete")
+    response = client.get(reverse("video-embed", kwargs={"video_key": video.hexkey}))
+    content = response.content.decode()
+    assert title not in content
+    js_settings_json = response.context_data["js_settings_json"]
+    assert "<" not in js_settings_json
+    assert json.loads(js_settings_json)["video"]["title"] == title
+
+
+def test_js_settings_setting_changed(logged_in_client, settings):
+    """The JS settings should reflect settings changed after they were first built"""
+    client, _ = logged_in_client
+    url = reverse("help-react-view")
+    settings.VERSION = "1.2.3"
+    response = client.get(url)
+    assert json.loads(response.context_data["js_settings_json"])["release_version"] == (
+        "1.2.3"
+    )
+    settings.VERSION = "4.5.6"
+    response = client.get(url)
+    assert json.loads(response.context_data["js_settings_json"])["release_version"] == (
+        "4.5.6"
+    )
+
+
 def test_upload_dropbox_videos_authentication(mock_user_groups, logged_in_apiclient):
     """
     Tests that only authenticated users with collection admin permissions can call UploadVideosFromDropbox
@@ -410,6 +459,152 @@ def test_collection_viewset_permissions(logged_in_apiclient):
         assert client.post(url, {"owner": 1}).status_code == status.HTTP_403_FORBIDDEN
 
 
+def test_start_direct_upload(mocker, mock_user_groups, logged_in_apiclient):
+    """The admins of a collection should be able to start a direct upload to it"""
+    client, user = logged_in_apiclient
+    collection = CollectionFactory(owner=user)
+    start = mocker.patch(
+        "ui.views.direct_upload.start_direct_upload",
+        return_value={"video": "abc", "token": "t", "part_size": 1, "part_count": 1},
+    )
+    url = reverse("direct-upload-start")
+    input_data = {"collection": collection.hexkey, "filename": "a.mp4", "size": 10}
+
+    response = client.post(url, input_data, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data == start.return_value
+    start.assert_called_once_with(collection, "a.mp4", 10, "")
+
+    start.side_effect = DirectUploadError("too large")
+    response = client.post(url, input_data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data == {"error": "too large"}
+
+    client.force_login(UserFactory())
+    assert (
+        client.post(url, input_data, format="json").status_code
+        == status.HTTP_403_FORBIDDEN
+    )
+
+
+@pytest.mark.parametrize(
+    "url_name, handler, input_data, expected_status",
+    [
+        (
+            "direct-upload-parts",
+            "presign_parts",
+            {"part_numbers": [1, 2]},
+            status.HTTP_200_OK,
+        ),
+        (
+            "direct-upload-complete",
+            "complete_direct_upload",
+            {"parts": [{"part_number": 1, "etag": "e"}]},
+            status.HTTP_202_ACCEPTED,
+        ),
+        ("direct-upload-abort", "abort_direct_upload", {}, status.HTTP_204_NO_CONTENT),
+    ],
+)
+def test_direct_upload_views(
+    mocker,
+    mock_user_groups,
+    logged_in_apiclient,
+    url_name,
+    handler,
+    input_data,
+    expected_status,
+):
+    """Only the admins of a video's collection should act on its direct upload"""
+    client, user = logged_in_apiclient
+    video = VideoFactory(collection=CollectionFactory(owner=user))
+    upload = {"video": video.hexkey}
+    mocker.patch("ui.views.direct_upload.load_upload", return_value=upload)
+    mocked_handler = mocker.patch(
+        f"ui.views.direct_upload.{handler}", return_value=video
+    )
+    if handler == "presign_parts":
+        mocked_handler.return_value = [{"part_number": 1, "url": "u"}]
+    url = reverse(url_name)
+    input_data = {"token": "t", **input_data}
+
+    response = client.post(url, input_data, format="json")
+    assert response.status_code == expected_status
+    assert mocked_handler.call_args[0][0] == upload
+
+    mocked_handler.side_effect = DirectUploadError("nope")
+    response = client.post(url, input_data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    client.force_login(UserFactory())
+    assert (
+        client.post(url, input_data, format="json").status_code
+        == status.HTTP_403_FORBIDDEN
+    )
+
+
+def test_direct_upload_view_requires_handler():
+    """A direct upload view without handle_upload can't be instantiated"""
+
+    class IncompleteDirectUploadView(DirectUploadView):
+        """A view that forgot to implement handle_upload"""
+
+    with pytest.raises(TypeError):
+        IncompleteDirectUploadView()
+    for view_class in (
+        PresignDirectUploadParts,
+        CompleteDirectUpload,
+        AbortDirectUpload,
+    ):
+        assert view_class()
+
+
+def test_direct_upload_invalid_token(mock_user_groups, logged_in_apiclient):
+    """An invalid upload token should be rejected"""
+    client, _ = logged_in_apiclient
+    response = client.post(
+        reverse("direct-upload-abort"), {"token": "invalid"}, format="json"
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data == {"error": "Invalid or expired upload token"}
+
+
+def test_collection_upload_progress(mocker, mock_user_groups, logged_in_apiclient):
+    """The owner of a collection should get the progress of its uploads as
+    Server-Sent Events"""
+    client, user = logged_in_apiclient
+    collection = CollectionFactory(owner=user)
+    events = mocker.patch(
+        "ui.views.progress.collection_progress_events",
+        return_value=iter([b"event: snapshot\ndata: {}\n\n"]),
+    )
+    response = client.get(
+        reverse(
+            "models-api:collection-upload-progress", kwargs={"key": collection.hexkey}
+        )
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == "text/event-stream"
+    assert response["Cache-Control"] == "no-cache"
+    assert b"".join(response.streaming_content) == b"event: snapshot\ndata: {}\n\n"
+    events.assert_called_once_with(collection.id)
+
+
+def test_collection_upload_progress_permissions(
+    mocker, mock_user_groups, logged_in_apiclient
+):
+    """Only the admins of a collection should get the progress of its uploads"""
+    events = mocker.patch("ui.views.progress.collection_progress_events")
+    client, _ = logged_in_apiclient
+    url = reverse(
+        "models-api:collection-upload-progress",
+        kwargs={"key": CollectionFactory().hexkey},
+    )
+    assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+    client.logout()
+    assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+    assert events.call_count == 0
+
+
 def test_collection_viewset_list(mock_user_groups, logged_in_apiclient):
     """
     Tests the list of collections for a user
@@ -699,6 +894,116 @@ def test_public_video_detail_anonymous(
     assert response.status_code == 200
 
 
+@pytest.fixture
+def video_page_cache(settings):
+    """Enable the video page cache, backed by the in-memory cache"""
+    settings.PUBLIC_VIDEO_CACHE_ALIAS = "default"
+    settings.VIDEO_PAGE_CACHE_TIMEOUT = 60
+    settings.VIDEO_PAGE_MAX_AGE = 120
+    caches["default"].clear()
+    yield
+    caches["default"].clear()
+
+
+def test_video_detail_admin_check_once(mocker, logged_in_client):
+    """The video detail page should check the viewer's admin permission once"""
+    client, user = logged_in_client
+    video = VideoFactory(collection__owner=user)
+    has_admin_permission = mocker.patch(
+        "ui.permissions.has_admin_permission", return_value=True
+    )
+    response = client.get(reverse("video-detail", kwargs={"video_key": video.hexkey}))
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.context_data["js_settings_json"])["is_video_admin"]
+    has_admin_permission.assert_called_once()
+
+
+@pytest.mark.parametrize("url_name", ["video-detail", "video-embed"])
+def test_public_video_page_cached(mocker, client, video_page_cache, url_name):
+    """The page of a public video should be rendered once for anonymous viewers"""
+    video = VideoFactory(is_public=True)
+    view_class = VideoDetail if url_name == "video-detail" else VideoEmbed
+    render_page = mocker.spy(view_class, "render_page")
+    url = reverse(url_name, kwargs={"video_key": video.hexkey})
+
+    first = client.get(url)
+    second = client.get(url)
+    assert first.status_code == second.status_code == status.HTTP_200_OK
+    assert first.content == second.content
+    assert first["ETag"] == second["ETag"]
+    assert "public" in first["Cache-Control"]
+    assert "max-age=120" in first["Cache-Control"]
+    assert render_page.call_count == 1
+
+    not_modified = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # A new subtitle changes the video's version
+    mocker.patch("ui.signals.remove_youtube_caption.delay")
+    VideoSubtitleFactory(video=video)
+    client.get(url)
+    assert render_page.call_count == 2
+
+
+def test_video_page_requires_js_settings():
+    """A video page view without get_video_js_settings can't be instantiated"""
+
+    class IncompleteVideoPage(VideoPageMixin, TemplateView):
+        """A video page that forgot to implement get_video_js_settings"""
+
+    with pytest.raises(TypeError):
+        IncompleteVideoPage()
+    assert VideoDetail()
+    assert VideoEmbed()
+
+
+def test_public_video_page_messages_not_cached(mocker, client, video_page_cache):
+    """A page showing flash messages should be neither cached nor shared"""
+    video = VideoFactory(is_public=True)
+    render_page = mocker.spy(VideoDetail, "render_page")
+    url = reverse("video-detail", kwargs={"video_key": video.hexkey})
+    cached = client.get(url)
+    assert render_page.call_count == 1
+
+    request = RequestFactory().get(url)
+    client.cookies["messages"] = CookieStorage(request)._encode(  # pylint: disable=protected-access
+        [Message(constants.INFO, "A flash message")]
+    )
+    with_message = client.get(url)
+    assert b"A flash message" in with_message.content
+    assert "private" in with_message["Cache-Control"]
+    assert render_page.call_count == 2
+
+    without_message = client.get(url)
+    assert b"A flash message" not in without_message.content
+    assert without_message.content == cached.content
+    assert render_page.call_count == 2
+
+
+def test_video_embed_settings_cached_per_tier(mocker, client, video_page_cache):
+    """The video settings of an embed page should be cached for each viewer tier"""
+    mocker.patch("ui.utils.get_keycloak_client")
+    video = VideoFactory(is_public=True)
+    serializer = mocker.spy(VideoSerializer, "to_representation")
+    url = reverse("video-embed", kwargs={"video_key": video.hexkey})
+
+    for user, call_count in (
+        (UserFactory(), 1),
+        (UserFactory(), 1),
+        (UserFactory(is_superuser=True), 2),
+    ):
+        client.force_login(user)
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert "private" in response["Cache-Control"]
+        assert "no-cache" in response["Cache-Control"]
+        assert response["ETag"]
+        js_settings = json.loads(response.context_data["js_settings_json"])
+        assert js_settings["user"] == user.username
+        assert js_settings["video"]["key"] == video.hexkey
+        assert serializer.call_count == call_count
+
+
 @pytest.mark.parametrize("is_public", [True, False])
 def test_video_download(logged_in_client, is_public, mocker):
     """Tests that a video can be downloaded if public, returns 404 otherwise"""
@@ -1095,6 +1400,7 @@ def test_video_viewset_list(mocker, mock_user_groups, logged_in_apiclient):
     view_list = KeycloakGroupFactory()
     admin_list = KeycloakGroupFactory()
     mocker.patch("ui.serializers.ui_permissions")
+    mocker.patch("ui.projections.ui_permissions")
     mock_user_groups.return_value = [view_list.name, admin_list.name]
     non_matching_list = KeycloakGroupFactory()
     client, user = logged_in_apiclient
@@ -1298,6 +1604,29 @@ def test_video_viewset_list_superuser(logged_in_apiclient, settings):
         assert coll_data["key"] in combined_video_keys
 
 
+def test_video_viewset_serializer_queries(mocker, logged_in_apiclient):
+    """
+    The number of queries to serialize videos shouldn't grow with the number of videos
+    """
+    mocker.patch.object(VideoViewSet, "projection_class", None)
+    client, user = logged_in_apiclient
+    user.is_superuser = True
+    user.save()
+    url = reverse("models-api:video-list")
+
+    def list_queries(count):
+        """Add videos with related rows and count the queries to list them"""
+        for video in VideoFactory.create_batch(count):
+            VideoFileFactory(video=video)
+            VideoThumbnailFactory(video=video)
+            VideoRenditionFactory(video=video)
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == status.HTTP_200_OK
+        return len(queries)
+
+    assert list_queries(1) == list_queries(4)
+
+
 def test_videos_pagination(mocker, logged_in_apiclient):
     """
     Verify that the correct number of videos is returned per page
@@ -1398,6 +1727,139 @@ def test_videos_ordering(mocker, logged_in_apiclient, field):
         )
 
 
+@pytest.mark.parametrize("ordering", ["-created_at", "created_at"])
+def test_videos_cursor_pagination(mocker, logged_in_apiclient, ordering):
+    """Cursor pagination should page through every video once, in order, without a count"""
+    mocker.patch("ui.utils.get_keycloak_client")
+    client, user = logged_in_apiclient
+    collection = CollectionFactory(owner=user)
+    videos = VideoFactory.create_batch(7, collection=collection)
+    # Videos created at the same time are ordered by id
+    Video.objects.filter(id__in=[video.id for video in videos[:3]]).update(
+        created_at=videos[0].created_at
+    )
+    expected = list(
+        Video.objects.filter(collection=collection)
+        .order_by(ordering, ordering.replace("created_at", "id"))
+        .values_list("key", flat=True)
+    )
+
+    url = f"{reverse('models-api:video-list')}?pagination=cursor&page_size=3&ordering={ordering}"
+    keys = []
+    pages = 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+        keys.extend(video["key"] for video in response.data["results"])
+        url = response.data["next"]
+        pages += 1
+    assert pages == 3
+    assert keys == [key.hex for key in expected]
+
+
+def test_public_video_list_cursor_pagination(apiclient):
+    """The public video list should support cursor pagination, with an optional count"""
+    videos = VideoFactory.create_batch(3, is_public=True)
+    url = reverse(PUBLIC_VIDEO_URL)
+
+    first = apiclient.get(
+        url, {"pagination": "cursor", "page_size": 2, "count": "true"}
+    )
+    assert first.data["count"] == 3
+    assert "count=" not in first.data["next"]
+    second = apiclient.get(first.data["next"])
+    assert second.data["next"] is None
+    assert [
+        video["key"] for video in first.data["results"] + second.data["results"]
+    ] == [video.hexkey for video in reversed(videos)]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"page_size": 2, "page": 2},
+        {"pagination": "cursor", "page_size": 2, "count": "true"},
+        {"search": "nothing matches"},
+    ],
+)
+def test_public_video_list_streaming(apiclient, params):
+    """A streamed public video list should have the same content as a regular one"""
+    VideoFactory.create_batch(5, is_public=True)
+    url = reverse(PUBLIC_VIDEO_URL)
+
+    regular = apiclient.get(url, params)
+    streamed = apiclient.get(url, {**params, "stream": "true"})
+    assert streamed.status_code == status.HTTP_200_OK
+    assert streamed.streaming
+    assert streamed["Content-Type"] == "application/json"
+    content = json.loads(b"".join(streamed.streaming_content))
+    # Links to other pages keep streaming them
+    for link in ("next", "previous"):
+        if content.get(link):
+            assert "stream=true" in content[link]
+            content[link] = remove_query_param(content[link], "stream")
+    assert content == json.loads(regular.content)
+    assert list(content) == list(regular.data)
+
+
+def test_public_video_export(apiclient, settings):
+    """The export should stream the videos included in MIT Learn as NDJSON"""
+    settings.PUBLIC_VIDEO_EXPORT_WATERMARK_LAG = 0
+    video = VideoFactory(collection__include_in_learn=True, is_public=True)
+    video.refresh_playback_manifest()
+    VideoFactory(collection__include_in_learn=True, is_public=False)
+    url = reverse("public-video-export")
+
+    response = apiclient.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = [
+        json.loads(line) for line in b"".join(response.streaming_content).splitlines()
+    ]
+    assert [line["type"] for line in lines] == ["video", "end"]
+    assert lines[0]["video"]["key"] == video.hexkey
+
+    response = apiclient.get(url, {"updated_since": lines[-1]["watermark"]})
+    assert [
+        json.loads(line)["type"]
+        for line in b"".join(response.streaming_content).splitlines()
+    ] == ["end"]
+
+
+def test_public_video_export_invalid_updated_since(apiclient):
+    """The export should reject an updated_since which isn't a datetime"""
+    response = apiclient.get(
+        reverse("public-video-export"), {"updated_since": "yesterday"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "updated_since" in response.json()
+
+
+def test_videos_streaming(mocker, logged_in_apiclient, django_assert_max_num_queries):
+    """A streamed video list should have the same content as a regular one"""
+    mocker.patch("ui.utils.get_keycloak_client")
+    client, user = logged_in_apiclient
+    collection = CollectionFactory(owner=user)
+    for video in VideoFactory.create_batch(4, collection=collection):
+        VideoFileFactory(video=video)
+        VideoThumbnailFactory(video=video)
+    url = reverse("models-api:video-list")
+
+    regular = client.get(url)
+    with django_assert_max_num_queries(12):
+        streamed = client.get(url, {"stream": "true"})
+        content = json.loads(b"".join(streamed.streaming_content))
+    assert content == json.loads(regular.content)
+    assert len(content["results"]) == 4
+
+
+def test_video_cursor_pagination_invalid_cursor(apiclient):
+    """An invalid cursor should return a 404"""
+    response = apiclient.get(reverse(PUBLIC_VIDEO_URL), {"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 def test_collection_pagination(mocker, logged_in_apiclient):
     """
     Verify that the correct number of collections is returned per page
@@ -1741,6 +2203,7 @@ def _make_jpeg_file(name="thumb.jpg"):
     return SimpleUploadedFile(name, jpeg_bytes, content_type="image/jpeg")
 
 
+@override_settings(THUMBNAIL_PROCESS_IN_BACKGROUND=False)
 def test_upload_thumbnail_replaces_existing(mocker, logged_in_apiclient):
     """
     When a VideoThumbnail already exists, upload_thumbnail should call
@@ -1764,6 +2227,7 @@ def test_upload_thumbnail_replaces_existing(mocker, logged_in_apiclient):
     mock_replace.assert_called_once_with(thumbnail, mocker.ANY)
 
 
+@override_settings(THUMBNAIL_PROCESS_IN_BACKGROUND=False)
 def test_upload_thumbnail_creates_new(mocker, logged_in_apiclient):
     """
     When no VideoThumbnail exists yet, upload_thumbnail should call
@@ -1842,6 +2306,7 @@ def test_upload_thumbnail_too_large(mocker, logged_in_apiclient):
     assert "100 bytes" in response.data["error"]
 
 
+@override_settings(THUMBNAIL_PROCESS_IN_BACKGROUND=False)
 def test_upload_thumbnail_accepts_png(mocker, logged_in_apiclient):
     """
     PNG images should be accepted and forwarded to the cloud API.
@@ -1865,6 +2330,64 @@ def test_upload_thumbnail_accepts_png(mocker, logged_in_apiclient):
     mock_replace.assert_called_once()
 
 
+def test_upload_thumbnail_in_background(mocker, logged_in_apiclient):
+    """
+    upload_thumbnail should stage the image, start process_thumbnail_upload and
+    return HTTP 202 with the URL of the task's status.
+    """
+    mocker.patch("ui.utils.get_keycloak_client")
+    mock_stage = mocker.patch(
+        "ui.views.cloudapi.stage_thumbnail_upload", return_value="thumbnails/uploads/a"
+    )
+    mock_task = mocker.patch("ui.views.process_thumbnail_upload")
+    task_id = str(uuid4())
+    mock_task.delay.return_value.id = task_id
+
+    client, user = logged_in_apiclient
+    video = VideoFactory(collection=CollectionFactory(owner=user))
+    image = io.BytesIO()
+    Image.new("RGB", (16, 9)).save(image, "PNG")
+    png_file = SimpleUploadedFile(
+        "thumb.png", image.getvalue(), content_type="image/png"
+    )
+    url = reverse("models-api:video-upload-thumbnail", kwargs={"key": video.hexkey})
+    response = client.patch(url, {"thumbnail": png_file}, format="multipart")
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.data == {
+        "task_id": task_id,
+        "status_url": f"/api/v0/tasks/{task_id}",
+        "status": "processing",
+    }
+    mock_stage.assert_called_once_with(video, mocker.ANY)
+    mock_task.delay.assert_called_once_with(
+        video.id, "thumbnails/uploads/a", mocker.ANY
+    )
+
+
+def test_upload_thumbnail_in_background_corrupt_file(mocker, logged_in_apiclient):
+    """
+    An image which can't be identified should be rejected with HTTP 400 before
+    it's staged.
+    """
+    mocker.patch("ui.utils.get_keycloak_client")
+    mock_stage = mocker.patch("ui.views.cloudapi.stage_thumbnail_upload")
+    mock_task = mocker.patch("ui.views.process_thumbnail_upload")
+
+    client, user = logged_in_apiclient
+    video = VideoFactory(collection=CollectionFactory(owner=user))
+    corrupt_file = SimpleUploadedFile(
+        "thumb.jpg", b"not-an-image", content_type="image/jpeg"
+    )
+    url = reverse("models-api:video-upload-thumbnail", kwargs={"key": video.hexkey})
+    response = client.patch(url, {"thumbnail": corrupt_file}, format="multipart")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Invalid thumbnail data provided" in response.data["error"]
+    assert mock_stage.call_count == 0
+    assert mock_task.delay.call_count == 0
+
+
 def test_upload_thumbnail_unauthenticated():
     """
     Unauthenticated requests to upload_thumbnail should be rejected.
@@ -1885,6 +2408,7 @@ def test_upload_thumbnail_unauthenticated():
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+@override_settings(THUMBNAIL_PROCESS_IN_BACKGROUND=False)
 def test_upload_thumbnail_corrupt_file_returns_400(mocker, logged_in_apiclient):
     """
     When the cloud API raises ValueError (e.g. corrupt/undecodable image),
@@ -1957,6 +2481,7 @@ def test_public_video_list_response_shape(apiclient):
     )  # original – should NOT appear in sources
     VideoThumbnailFactory(video=video)
     VideoSubtitleFactory(video=video)
+    rendition = VideoRenditionFactory(video=video)
 
     url = reverse(PUBLIC_VIDEO_URL)
     resp = apiclient.get(url)
@@ -2007,6 +2532,18 @@ def test_public_video_list_response_shape(apiclient):
     assert item["sources"][0]["label"] == EncodingNames.HLS
     assert hls_file.cloudfront_url in item["sources"][0]["src"]
 
+    assert item["renditions"] == [
+        {
+            "encoding": EncodingNames.HLS,
+            "width": rendition.width,
+            "height": rendition.height,
+            "bandwidth": rendition.bandwidth,
+            "codecs": rendition.codecs,
+            "byte_size": rendition.byte_size,
+            "segment_count": rendition.segment_count,
+        }
+    ]
+
 
 def test_public_video_list_filter_by_title(apiclient):
     """
@@ -2089,3 +2626,114 @@ def test_public_video_list_filter_by_for_shorts(apiclient):
     assert resp.status_code == status.HTTP_200_OK
     assert resp.data["count"] == 1
     assert resp.data["results"][0]["key"] == v_other.hexkey
+
+
+@pytest.fixture
+def public_video_cache(settings):
+    """Enable the public video cache, backed by the in-memory cache"""
+    settings.PUBLIC_VIDEO_CACHE_ALIAS = "default"
+    settings.PUBLIC_VIDEO_CACHE_TIMEOUT = 60
+    caches["default"].clear()
+    yield
+    caches["default"].clear()
+
+
+def test_public_video_list_cached(
+    apiclient, public_video_cache, django_assert_num_queries
+):
+    """Repeat requests are served from the cache, and conditional ones with a 304"""
+    public_video = VideoFactory(is_public=True)
+    url = reverse(PUBLIC_VIDEO_URL)
+
+    resp = apiclient.get(url, {"page_size": 10, "ordering": "-created_at"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert [video["key"] for video in resp.json()["results"]] == [public_video.hexkey]
+    etag = resp.headers["ETag"]
+    assert resp.headers["Last-Modified"]
+
+    # The same query in a different order doesn't touch the database
+    with django_assert_num_queries(0):
+        cached = apiclient.get(url, {"ordering": "-created_at", "page_size": 10})
+    assert cached.content == resp.content
+    assert cached.headers["ETag"] == etag
+
+    with django_assert_num_queries(0):
+        not_modified = apiclient.get(
+            url,
+            {"page_size": 10, "ordering": "-created_at"},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not_modified.content == b""
+
+
+def test_public_video_list_cached_per_media_type(
+    apiclient, public_video_cache, django_assert_num_queries
+):
+    """Each negotiated media type gets its own cache entry and ETag"""
+    VideoFactory(is_public=True)
+    url = reverse(PUBLIC_VIDEO_URL)
+    compact = apiclient.get(url)
+    indented = apiclient.get(url, HTTP_ACCEPT="application/json; indent=4")
+    assert indented.status_code == status.HTTP_200_OK
+    assert indented.headers["Content-Type"] == "application/json; indent=4"
+    assert indented.content != compact.content
+    assert indented.json() == compact.json()
+    assert indented.headers["ETag"] != compact.headers["ETag"]
+    assert "Accept" in indented.headers["Vary"]
+
+    with django_assert_num_queries(0):
+        cached = apiclient.get(url, HTTP_ACCEPT="application/json; indent=4")
+        not_modified = apiclient.get(
+            url,
+            HTTP_ACCEPT="application/json; indent=4",
+            HTTP_IF_NONE_MATCH=indented.headers["ETag"],
+        )
+        stale = apiclient.get(url, HTTP_IF_NONE_MATCH=indented.headers["ETag"])
+    assert cached.content == indented.content
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert stale.status_code == status.HTTP_200_OK
+    assert stale.content == compact.content
+
+    browsable = apiclient.get(url, HTTP_ACCEPT="text/html")
+    assert browsable.status_code == status.HTTP_200_OK
+    assert browsable.headers["Content-Type"].startswith("text/html")
+    assert "ETag" not in browsable.headers
+
+
+def test_public_video_list_cache_invalidated(
+    apiclient, public_video_cache, django_capture_on_commit_callbacks
+):
+    """Changing a public video invalidates the cached responses"""
+    with django_capture_on_commit_callbacks(execute=True):
+        public_video = VideoFactory(is_public=True)
+    url = reverse(PUBLIC_VIDEO_URL)
+    etag = apiclient.get(url).headers["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        public_video.title = "A new title"
+        public_video.save()
+
+    resp = apiclient.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["ETag"] != etag
+    assert resp.json()["results"][0]["title"] == "A new title"
+
+
+def test_public_video_list_private_change_keeps_cache(
+    apiclient, public_video_cache, django_capture_on_commit_callbacks
+):
+    """Changes to private videos don't invalidate the cached responses"""
+    VideoFactory(is_public=True)
+    private_video = VideoFactory(is_public=False)
+    url = reverse(PUBLIC_VIDEO_URL)
+    etag = apiclient.get(url).headers["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        private_video.title = "A new title"
+        private_video.save()
+
+    assert callbacks == []
+    assert apiclient.get(url, HTTP_IF_NONE_MATCH=etag).status_code == (
+        status.HTTP_304_NOT_MODIFIED
+    )